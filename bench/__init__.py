@@ -0,0 +1 @@
+"""Benchmarks. They aren't part of the installed package, run them from the repository root with python -m bench.<name>"""
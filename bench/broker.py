@@ -0,0 +1,748 @@
+"""A stand-in for RabbitMQ so the benchmarks can run eud_handler and cot_parser without one.
+
+It speaks enough AMQP 0-9-1 for pika and kombu: direct, topic and fanout exchanges, queues with prefetch and acks,
+mandatory publishes, publisher confirms and per-message TTL. Nothing is persisted and there's no flow control, so
+it shows how the OTS processes behave with a broker that keeps up, not how RabbitMQ itself behaves under load.
+Frames are encoded and decoded with pika's own spec module.
+
+python -m bench.broker --port 5672
+"""
+
+import argparse
+import itertools
+import logging
+import socket
+import struct
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from queue import SimpleQueue
+from threading import Lock, Thread
+
+from pika import frame, spec
+
+from opentakserver.extensions import logger
+
+SERVER_PROPERTIES = {
+    "product": "OpenTAKServer bench broker",
+    "capabilities": {
+        "publisher_confirms": True,
+        "basic.nack": True,
+        "consumer_cancel_notify": True,
+        "exchange_exchange_bindings": False,
+        "connection.blocked": False,
+        "authentication_failure_close": True,
+        "per_consumer_qos": True,
+    },
+}
+
+
+@dataclass(slots=True)
+class Message:
+    exchange: str
+    routing_key: str
+    properties: spec.BasicProperties
+    body: bytes
+    # time.monotonic() after which the message is dropped, from its expiration property
+    expires: float | None
+    redelivered: bool = False
+
+
+def topic_matches(binding: list[str], words: list[str]) -> bool:
+    if not binding:
+        return not words
+    if binding[0] == "#":
+        return any(topic_matches(binding[1:], words[i:]) for i in range(len(words) + 1))
+    if not words:
+        return False
+    return binding[0] in ("*", words[0]) and topic_matches(binding[1:], words[1:])
+
+
+class Exchange:
+    def __init__(self, name: str, exchange_type: str):
+        self.name = name
+        self.type = exchange_type
+        # routing key -> queue names
+        self.bindings: dict[str, set[str]] = {}
+        # routing key -> queue names, cleared whenever the bindings change
+        self.routes: dict[str, frozenset[str]] = {}
+
+    def bind(self, queue: str, routing_key: str):
+        self.bindings.setdefault(routing_key, set()).add(queue)
+        self.routes.clear()
+
+    def unbind(self, queue: str, routing_key: str):
+        queues = self.bindings.get(routing_key)
+        if queues:
+            queues.discard(queue)
+            if not queues:
+                del self.bindings[routing_key]
+        self.routes.clear()
+
+    def route(self, routing_key: str) -> frozenset[str]:
+        queues = self.routes.get(routing_key)
+        if queues is not None:
+            return queues
+
+        if self.type == "fanout":
+            queues = frozenset().union(*self.bindings.values())
+        elif self.type == "topic":
+            words = routing_key.split(".")
+            queues = frozenset().union(
+                *(
+                    bound
+                    for key, bound in self.bindings.items()
+                    if topic_matches(key.split("."), words)
+                )
+            )
+        else:
+            queues = frozenset(self.bindings.get(routing_key, ()))
+
+        self.routes[routing_key] = queues
+        return queues
+
+
+class Queue:
+    def __init__(self, name: str, owner: "Connection | None", auto_delete: bool):
+        self.name = name
+        # The connection that declared it exclusive
+        self.owner = owner
+        self.auto_delete = auto_delete
+        self.messages: deque[Message] = deque()
+        self.consumers: list[Consumer] = []
+        self.next_consumer = 0
+        # (exchange, routing key)
+        self.bindings: set[tuple[str, str]] = set()
+
+
+@dataclass(slots=True, eq=False)
+class Consumer:
+    tag: str
+    channel: "Channel"
+    queue: Queue
+    auto_ack: bool
+
+    def has_capacity(self) -> bool:
+        channel = self.channel
+        return self.auto_ack or not channel.prefetch or len(channel.unacked) < channel.prefetch
+
+
+class Channel:
+    def __init__(self, connection: "Connection", number: int):
+        self.connection = connection
+        self.number = number
+        self.prefetch = 0
+        self.consumers: dict[str, Consumer] = {}
+        # delivery tag -> where the message came from, in the order they were delivered
+        self.unacked: dict[int, tuple[Queue, Message]] = {}
+        self.delivery_tags = itertools.count(1)
+        self.confirm = False
+        self.published = 0
+        # [Basic.Publish, properties, body size, body chunks] while a message's frames are arriving
+        self.publishing: list | None = None
+
+
+class Connection:
+    def __init__(self, broker: "Broker", sock: socket.socket, address):
+        self.broker = broker
+        self.sock = sock
+        self.address = address
+        self.channels: dict[int, Channel] = {}
+        # Channels that were closed by the broker and are waiting for the client's CloseOk
+        self.closing_channels: set[int] = set()
+        self.frame_max = 131072
+        self.outbound = SimpleQueue()
+        self.closed = False
+
+    def send(self, *frames):
+        self.outbound.put(b"".join(f.marshal() for f in frames))
+
+    def send_content(self, channel: int, method, properties, body: bytes):
+        frames = [frame.Method(channel, method), frame.Header(channel, len(body), properties)]
+        chunk = self.frame_max - spec.FRAME_HEADER_SIZE - spec.FRAME_END_SIZE
+        if self.frame_max <= 0 or len(body) <= chunk:
+            if body:
+                frames.append(frame.Body(channel, body))
+        else:
+            for i in range(0, len(body), chunk):
+                frames.append(frame.Body(channel, body[i : i + chunk]))
+        self.send(*frames)
+
+    def run(self):
+        Thread(target=self.write_loop, name=f"broker-write-{self.address[1]}", daemon=True).start()
+        try:
+            self.read_loop()
+        except BaseException as e:
+            if not self.closed:
+                logger.debug(f"Broker connection from {self.address} failed: {e}")
+                logger.debug(traceback.format_exc())
+        finally:
+            self.close()
+
+    def read_loop(self):
+        buffer = b""
+        while len(buffer) < 8:
+            data = self.sock.recv(8 - len(buffer))
+            if not data:
+                return
+            buffer += data
+
+        if not buffer.startswith(b"AMQP"):
+            self.sock.sendall(b"AMQP\x00\x00\x09\x01")
+            return
+
+        self.send(
+            frame.Method(
+                0,
+                spec.Connection.Start(
+                    server_properties=SERVER_PROPERTIES, mechanisms="PLAIN AMQPLAIN"
+                ),
+            )
+        )
+
+        buffer = bytearray()
+        while not self.closed:
+            data = self.sock.recv(65536)
+            if not data:
+                return
+            buffer += data
+
+            offset = 0
+            while len(buffer) - offset >= spec.FRAME_HEADER_SIZE:
+                size = struct.unpack_from(">L", buffer, offset + 3)[0]
+                end = offset + spec.FRAME_HEADER_SIZE + size + spec.FRAME_END_SIZE
+                if end > len(buffer):
+                    break
+                consumed, received = frame.decode_frame(bytes(buffer[offset:end]))
+                offset = end
+                with self.broker.lock:
+                    self.handle(received)
+            del buffer[:offset]
+
+    def write_loop(self):
+        while True:
+            data = self.outbound.get()
+            if data is None:
+                break
+
+            # Send everything that's queued up in one go
+            chunks = [data]
+            while not self.outbound.empty():
+                data = self.outbound.get()
+                if data is None:
+                    break
+                chunks.append(data)
+
+            try:
+                self.sock.sendall(b"".join(chunks))
+            except OSError:
+                break
+
+            if data is None:
+                break
+
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def close(self):
+        with self.broker.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.broker.close_connection(self)
+        self.outbound.put(None)
+
+    def handle(self, received):
+        if isinstance(received, frame.Heartbeat):
+            return
+
+        channel_number = received.channel_number
+        if channel_number in self.closing_channels:
+            if isinstance(received, frame.Method) and isinstance(
+                received.method, (spec.Channel.CloseOk, spec.Channel.Close)
+            ):
+                self.closing_channels.discard(channel_number)
+            return
+
+        if isinstance(received, frame.Method):
+            self.broker.handle_method(self, channel_number, received.method)
+            return
+
+        channel = self.channels.get(channel_number)
+        if not channel or not channel.publishing:
+            self.broker.close_with_error(self, 505, "UNEXPECTED_FRAME")
+            return
+
+        if isinstance(received, frame.Header):
+            channel.publishing[1] = received.properties
+            channel.publishing[2] = received.body_size
+        else:
+            channel.publishing[3].append(received.fragment)
+
+        method, properties, body_size, chunks = channel.publishing
+        if properties is not None and sum(len(chunk) for chunk in chunks) >= body_size:
+            channel.publishing = None
+            self.broker.publish(channel, method, properties, b"".join(chunks))
+
+
+class Broker:
+    def __init__(self, host: str = "127.0.0.1", port: int = 5672):
+        self.host = host
+        self.port = port
+        self.lock = Lock()
+        self.exchanges: dict[str, Exchange] = {}
+        self.queues: dict[str, Queue] = {}
+        self.connections: set[Connection] = set()
+        self.queue_names = itertools.count(1)
+        self.consumer_tags = itertools.count(1)
+        self.listener: socket.socket | None = None
+        self.stats = {"published": 0, "delivered": 0, "acked": 0, "returned": 0, "expired": 0}
+
+    def start(self) -> "Broker":
+        """Starts listening in a thread of its own"""
+        self.listener = socket.create_server((self.host, self.port))
+        Thread(target=self.serve, name="broker", daemon=True).start()
+        return self
+
+    def serve(self):
+        while True:
+            try:
+                sock, address = self.listener.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = Connection(self, sock, address)
+            with self.lock:
+                self.connections.add(connection)
+            Thread(target=connection.run, name=f"broker-{address[1]}", daemon=True).start()
+
+    def stop(self):
+        if self.listener:
+            self.listener.close()
+        with self.lock:
+            connections = list(self.connections)
+        for connection in connections:
+            connection.close()
+
+    def close_connection(self, connection: Connection):
+        for channel in list(connection.channels.values()):
+            self.close_channel(channel)
+        connection.channels.clear()
+        for queue in [queue for queue in self.queues.values() if queue.owner is connection]:
+            self.delete_queue(queue)
+        self.connections.discard(connection)
+
+    def close_channel(self, channel: Channel):
+        for consumer in list(channel.consumers.values()):
+            self.cancel(consumer)
+
+        # Unacked messages go back to the front of their queues in the order they were delivered
+        requeued = set()
+        for queue, message in reversed(channel.unacked.values()):
+            message.redelivered = True
+            queue.messages.appendleft(message)
+            requeued.add(queue)
+        channel.unacked.clear()
+        channel.connection.channels.pop(channel.number, None)
+        for queue in requeued:
+            self.dispatch(queue)
+
+    def close_with_error(self, connection: Connection, code: int, text: str):
+        connection.send(frame.Method(0, spec.Connection.Close(reply_code=code, reply_text=text)))
+        logger.debug(f"Closing broker connection from {connection.address}: {text}")
+
+    def channel_error(self, channel: Channel, code: int, text: str, method):
+        """Like RabbitMQ, errors such as a missing queue close the channel they happened on"""
+        connection = channel.connection
+        logger.warning(f"Closing channel {channel.number} of {connection.address}: {text}")
+        self.close_channel(channel)
+        connection.closing_channels.add(channel.number)
+        connection.send(
+            frame.Method(
+                channel.number,
+                spec.Channel.Close(
+                    reply_code=code,
+                    reply_text=text,
+                    class_id=method.INDEX >> 16,
+                    method_id=method.INDEX & 0xFFFF,
+                ),
+            )
+        )
+
+    def handle_method(self, connection: Connection, channel_number: int, method):
+        if channel_number == 0:
+            if isinstance(method, spec.Connection.StartOk):
+                connection.send(
+                    frame.Method(0, spec.Connection.Tune(channel_max=2047, frame_max=131072))
+                )
+            elif isinstance(method, spec.Connection.TuneOk):
+                if method.frame_max:
+                    connection.frame_max = method.frame_max
+            elif isinstance(method, spec.Connection.Open):
+                connection.send(frame.Method(0, spec.Connection.OpenOk()))
+            elif isinstance(method, spec.Connection.Close):
+                connection.send(frame.Method(0, spec.Connection.CloseOk()))
+                connection.closed = True
+                self.close_connection(connection)
+                connection.outbound.put(None)
+            elif isinstance(method, spec.Connection.CloseOk):
+                connection.closed = True
+                self.close_connection(connection)
+                connection.outbound.put(None)
+            return
+
+        if isinstance(method, spec.Channel.Open):
+            connection.channels[channel_number] = Channel(connection, channel_number)
+            connection.send(frame.Method(channel_number, spec.Channel.OpenOk()))
+            return
+
+        channel = connection.channels.get(channel_number)
+        if not channel:
+            self.close_with_error(connection, 504, "CHANNEL_ERROR - channel isn't open")
+            return
+
+        handler = HANDLERS.get(type(method))
+        if not handler:
+            self.close_with_error(connection, 540, f"NOT_IMPLEMENTED - {method.NAME}")
+            return
+
+        reply = handler(self, channel, method)
+        if reply is not None and not getattr(method, "nowait", False):
+            connection.send(frame.Method(channel_number, reply))
+
+    def on_channel_close(self, channel: Channel, method):
+        self.close_channel(channel)
+        return spec.Channel.CloseOk()
+
+    def on_channel_flow(self, channel: Channel, method):
+        return spec.Channel.FlowOk(active=method.active)
+
+    def on_exchange_declare(self, channel: Channel, method):
+        exchange = self.exchanges.get(method.exchange)
+        if not exchange:
+            if method.passive:
+                return self.channel_error(
+                    channel, 404, f"NOT_FOUND - no exchange '{method.exchange}'", method
+                )
+            self.exchanges[method.exchange] = Exchange(method.exchange, method.type)
+        return spec.Exchange.DeclareOk()
+
+    def on_exchange_delete(self, channel: Channel, method):
+        exchange = self.exchanges.pop(method.exchange, None)
+        if exchange:
+            for routing_key, queues in exchange.bindings.items():
+                for name in queues:
+                    if name in self.queues:
+                        self.queues[name].bindings.discard((exchange.name, routing_key))
+        return spec.Exchange.DeleteOk()
+
+    def on_queue_declare(self, channel: Channel, method):
+        name = method.queue or f"amq.gen-{next(self.queue_names)}"
+        queue = self.queues.get(name)
+        if not queue:
+            if method.passive:
+                return self.channel_error(channel, 404, f"NOT_FOUND - no queue '{name}'", method)
+            queue = Queue(
+                name, channel.connection if method.exclusive else None, method.auto_delete
+            )
+            self.queues[name] = queue
+        return spec.Queue.DeclareOk(
+            queue=name, message_count=len(queue.messages), consumer_count=len(queue.consumers)
+        )
+
+    def on_queue_bind(self, channel: Channel, method):
+        queue = self.queues.get(method.queue)
+        exchange = self.exchanges.get(method.exchange)
+        if not queue or not exchange:
+            return self.channel_error(
+                channel, 404, f"NOT_FOUND - no queue '{method.queue}' or exchange", method
+            )
+        exchange.bind(queue.name, method.routing_key or "")
+        queue.bindings.add((exchange.name, method.routing_key or ""))
+        return spec.Queue.BindOk()
+
+    def on_queue_unbind(self, channel: Channel, method):
+        exchange = self.exchanges.get(method.exchange)
+        if exchange:
+            exchange.unbind(method.queue, method.routing_key or "")
+        queue = self.queues.get(method.queue)
+        if queue:
+            queue.bindings.discard((method.exchange, method.routing_key or ""))
+        return spec.Queue.UnbindOk()
+
+    def on_queue_purge(self, channel: Channel, method):
+        queue = self.queues.get(method.queue)
+        count = len(queue.messages) if queue else 0
+        if queue:
+            queue.messages.clear()
+        return spec.Queue.PurgeOk(message_count=count)
+
+    def on_queue_delete(self, channel: Channel, method):
+        queue = self.queues.get(method.queue)
+        count = len(queue.messages) if queue else 0
+        if queue:
+            self.delete_queue(queue)
+        return spec.Queue.DeleteOk(message_count=count)
+
+    def delete_queue(self, queue: Queue):
+        for exchange_name, routing_key in queue.bindings:
+            exchange = self.exchanges.get(exchange_name)
+            if exchange:
+                exchange.unbind(queue.name, routing_key)
+        for consumer in list(queue.consumers):
+            consumer.channel.consumers.pop(consumer.tag, None)
+        self.queues.pop(queue.name, None)
+
+    def on_basic_qos(self, channel: Channel, method):
+        channel.prefetch = method.prefetch_count
+        return spec.Basic.QosOk()
+
+    def on_basic_consume(self, channel: Channel, method):
+        queue = self.queues.get(method.queue)
+        if not queue:
+            return self.channel_error(
+                channel, 404, f"NOT_FOUND - no queue '{method.queue}'", method
+            )
+        tag = method.consumer_tag or f"ctag-{next(self.consumer_tags)}"
+        consumer = Consumer(tag, channel, queue, method.no_ack)
+        channel.consumers[tag] = consumer
+        queue.consumers.append(consumer)
+        if not method.nowait:
+            channel.connection.send(
+                frame.Method(channel.number, spec.Basic.ConsumeOk(consumer_tag=tag))
+            )
+        self.dispatch(queue)
+
+    def on_basic_cancel(self, channel: Channel, method):
+        consumer = channel.consumers.get(method.consumer_tag)
+        if consumer:
+            self.cancel(consumer)
+        return spec.Basic.CancelOk(consumer_tag=method.consumer_tag)
+
+    def cancel(self, consumer: Consumer):
+        consumer.channel.consumers.pop(consumer.tag, None)
+        queue = consumer.queue
+        if consumer in queue.consumers:
+            queue.consumers.remove(consumer)
+        if queue.auto_delete and not queue.consumers and queue.name in self.queues:
+            self.delete_queue(queue)
+
+    def on_basic_publish(self, channel: Channel, method):
+        channel.publishing = [method, None, 0, []]
+
+    def on_basic_ack(self, channel: Channel, method):
+        self.settle(channel, method.delivery_tag, method.multiple, False)
+
+    def on_basic_nack(self, channel: Channel, method):
+        self.settle(channel, method.delivery_tag, method.multiple, method.requeue)
+
+    def on_basic_reject(self, channel: Channel, method):
+        self.settle(channel, method.delivery_tag, False, method.requeue)
+
+    def on_basic_get(self, channel: Channel, method):
+        queue = self.queues.get(method.queue)
+        if not queue:
+            return self.channel_error(
+                channel, 404, f"NOT_FOUND - no queue '{method.queue}'", method
+            )
+        self.expire(queue)
+        if not queue.messages:
+            return spec.Basic.GetEmpty()
+
+        message = queue.messages.popleft()
+        tag = next(channel.delivery_tags)
+        if not method.no_ack:
+            channel.unacked[tag] = (queue, message)
+        channel.connection.send_content(
+            channel.number,
+            spec.Basic.GetOk(
+                delivery_tag=tag,
+                redelivered=message.redelivered,
+                exchange=message.exchange,
+                routing_key=message.routing_key,
+                message_count=len(queue.messages),
+            ),
+            message.properties,
+            message.body,
+        )
+        self.stats["delivered"] += 1
+
+    def on_basic_recover(self, channel: Channel, method):
+        self.settle(channel, max(channel.unacked, default=0), True, True)
+        return spec.Basic.RecoverOk()
+
+    def on_confirm_select(self, channel: Channel, method):
+        channel.confirm = True
+        return spec.Confirm.SelectOk()
+
+    def settle(self, channel: Channel, delivery_tag: int, multiple: bool, requeue: bool):
+        if multiple:
+            tags = [tag for tag in channel.unacked if tag <= delivery_tag or not delivery_tag]
+        else:
+            tags = [delivery_tag] if delivery_tag in channel.unacked else []
+
+        queues = set()
+        for tag in tags:
+            queue, message = channel.unacked.pop(tag)
+            queues.add(queue)
+            if requeue:
+                message.redelivered = True
+                queue.messages.appendleft(message)
+            else:
+                self.stats["acked"] += 1
+
+        # Room was made under the channel's prefetch, so its other queues might have something to send as well
+        queues.update(consumer.queue for consumer in channel.consumers.values())
+        for queue in queues:
+            self.dispatch(queue)
+
+    def publish(self, channel: Channel, method, properties, body: bytes):
+        self.stats["published"] += 1
+        connection = channel.connection
+
+        if method.exchange:
+            exchange = self.exchanges.get(method.exchange)
+            if not exchange:
+                self.channel_error(
+                    channel, 404, f"NOT_FOUND - no exchange '{method.exchange}'", method
+                )
+                return
+            queues = exchange.route(method.routing_key)
+        else:
+            queues = {method.routing_key} if method.routing_key in self.queues else ()
+
+        if not queues and method.mandatory:
+            self.stats["returned"] += 1
+            connection.send_content(
+                channel.number,
+                spec.Basic.Return(
+                    reply_code=312,
+                    reply_text="NO_ROUTE",
+                    exchange=method.exchange,
+                    routing_key=method.routing_key,
+                ),
+                properties,
+                body,
+            )
+
+        expires = None
+        if properties.expiration:
+            expires = time.monotonic() + int(properties.expiration) / 1000
+
+        for name in queues:
+            queue = self.queues.get(name)
+            if queue:
+                queue.messages.append(
+                    Message(method.exchange, method.routing_key, properties, body, expires)
+                )
+                self.dispatch(queue)
+
+        if channel.confirm:
+            channel.published += 1
+            connection.send(frame.Method(channel.number, spec.Basic.Ack(channel.published)))
+
+    def expire(self, queue: Queue):
+        now = time.monotonic()
+        while queue.messages and queue.messages[0].expires and queue.messages[0].expires <= now:
+            queue.messages.popleft()
+            self.stats["expired"] += 1
+
+    def dispatch(self, queue: Queue):
+        """Sends the queue's messages to its consumers in turn while they're under their channel's prefetch"""
+        self.expire(queue)
+        while queue.messages and queue.consumers:
+            consumer = None
+            for i in range(len(queue.consumers)):
+                candidate = queue.consumers[(queue.next_consumer + i) % len(queue.consumers)]
+                if candidate.has_capacity():
+                    consumer = candidate
+                    queue.next_consumer = (queue.next_consumer + i + 1) % len(queue.consumers)
+                    break
+            if not consumer:
+                return
+
+            message = queue.messages.popleft()
+            channel = consumer.channel
+            tag = next(channel.delivery_tags)
+            if not consumer.auto_ack:
+                channel.unacked[tag] = (queue, message)
+            channel.connection.send_content(
+                channel.number,
+                spec.Basic.Deliver(
+                    consumer_tag=consumer.tag,
+                    delivery_tag=tag,
+                    redelivered=message.redelivered,
+                    exchange=message.exchange,
+                    routing_key=message.routing_key,
+                ),
+                message.properties,
+                message.body,
+            )
+            self.stats["delivered"] += 1
+
+    def queue_depth(self, name: str) -> int | None:
+        with self.lock:
+            queue = self.queues.get(name)
+            return len(queue.messages) if queue else None
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(
+                self.stats,
+                connections=len(self.connections),
+                queues=len(self.queues),
+                ready=sum(len(queue.messages) for queue in self.queues.values()),
+                unacked=sum(
+                    len(channel.unacked)
+                    for connection in self.connections
+                    for channel in connection.channels.values()
+                ),
+            )
+
+
+HANDLERS = {
+    spec.Channel.Close: Broker.on_channel_close,
+    spec.Channel.Flow: Broker.on_channel_flow,
+    spec.Exchange.Declare: Broker.on_exchange_declare,
+    spec.Exchange.Delete: Broker.on_exchange_delete,
+    spec.Queue.Declare: Broker.on_queue_declare,
+    spec.Queue.Bind: Broker.on_queue_bind,
+    spec.Queue.Unbind: Broker.on_queue_unbind,
+    spec.Queue.Purge: Broker.on_queue_purge,
+    spec.Queue.Delete: Broker.on_queue_delete,
+    spec.Basic.Qos: Broker.on_basic_qos,
+    spec.Basic.Consume: Broker.on_basic_consume,
+    spec.Basic.Cancel: Broker.on_basic_cancel,
+    spec.Basic.Publish: Broker.on_basic_publish,
+    spec.Basic.Ack: Broker.on_basic_ack,
+    spec.Basic.Nack: Broker.on_basic_nack,
+    spec.Basic.Reject: Broker.on_basic_reject,
+    spec.Basic.Get: Broker.on_basic_get,
+    spec.Basic.Recover: Broker.on_basic_recover,
+    spec.Confirm.Select: Broker.on_confirm_select,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5672)
+    args = parser.parse_args()
+
+    logger.setLevel(logging.INFO)
+    broker = Broker(args.host, args.port).start()
+    print(f"Listening on {args.host}:{args.port}")
+    try:
+        while True:
+            time.sleep(10)
+            print(broker.get_stats())
+    except KeyboardInterrupt:
+        broker.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Messages per second parsing a corpus of ATAK, iTAK and WinTAK CoTs with BeautifulSoup and with CoTEvent.
+
+Both sides parse each message and look up the tags that the eud_handler and cot_parser read from every message.
+
+python -m bench.cot_event
+"""
+
+import argparse
+import time
+
+from bs4 import BeautifulSoup
+
+from bench import samples
+from opentakserver.cot_event import CoTEvent
+
+
+def beautifulsoup(message: bytes):
+    event = BeautifulSoup(message, "xml").find("event")
+    event.attrs.get("type")
+    event.find("point")
+    event.find("track")
+    event.find("contact")
+    event.find("takv")
+    event.find("__chat")
+    event.find_all("dest")
+    event.find("detail")
+    str(event)
+
+
+def cot_event(message: bytes):
+    event = CoTEvent.from_xml(message)
+    event.type
+    event.point
+    event.track
+    event.contact
+    event.takv
+    event.chat
+    event.dests
+    event.detail
+    event.xml
+
+
+def run(function, corpus: list[bytes], seconds: float) -> float:
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for message in corpus:
+            function(message)
+        count += len(corpus)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=3, help="How long to run each parser")
+    args = parser.parse_args()
+
+    corpus = samples.corpus()
+    print(f"{len(corpus)} messages, {sum(len(m) for m in corpus)} bytes")
+
+    before = run(beautifulsoup, corpus, args.seconds)
+    after = run(cot_event, corpus, args.seconds)
+    print(f"BeautifulSoup: {before:10.0f} messages/second")
+    print(f"CoTEvent:      {after:10.0f} messages/second ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Compares CoTFramer to the old regex split of the whole buffer on every read.
+
+python -m bench.cot_framer
+"""
+
+import argparse
+import re
+import timeit
+from xml.etree.ElementTree import ParseError, fromstring
+
+from bench import samples
+from opentakserver.eud_handler.cot_framer import CoTFramer
+
+
+def regex_split(chunks: list[bytes]) -> int:
+    """What ClientController.handle_data used to do"""
+    frames = 0
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk.decode("utf-8")
+        cot_list = re.split("</event>|</auth>", buffer)
+        if len(cot_list) < 2:
+            continue
+
+        for c in cot_list:
+            try:
+                if "<event" in c:
+                    fromstring(c + "</event>")
+                    frames += 1
+                elif "<auth>" in c:
+                    fromstring(c + "</auth>")
+                    frames += 1
+            except ParseError:
+                buffer = c
+                break
+
+        buffer = ""
+    return frames
+
+
+def framer(chunks: list[bytes]) -> int:
+    cot_framer = CoTFramer()
+    frames = 0
+    for chunk in chunks:
+        for _ in cot_framer.feed(chunk):
+            frames += 1
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunk-size", type=int, default=1460, help="Bytes per read")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    workloads = {
+        "positions": samples.position() * 200,
+        "drawing shape": samples.drawing_shape(),
+        "route": samples.route(),
+    }
+
+    for name, stream in workloads.items():
+        chunks = [stream[i : i + args.chunk_size] for i in range(0, len(stream), args.chunk_size)]
+        print(f"{name}: {len(stream)} bytes in {len(chunks)} reads")
+        for function in (regex_split, framer):
+            seconds = min(timeit.repeat(lambda: function(chunks), number=1, repeat=args.repeat))
+            print(f"  {function.__name__:<12} {seconds * 1000:8.2f} ms  {function(chunks)} frames")
+
+
+if __name__ == "__main__":
+    main()
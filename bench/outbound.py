@@ -0,0 +1,98 @@
+"""Syscalls and CPU time per message delivered to an EUD, sending each message on its own like on_message used to and
+sending everything that's queued in batches like ClientController.send_loop() does.
+
+Messages are queued in bursts, like a mission sync or a busy ADS-B feed, and read from the other end of a socketpair.
+
+python -m bench.outbound --burst 200
+"""
+
+import argparse
+import socket
+import time
+from threading import Thread
+
+from bench import samples
+from opentakserver.eud_handler.client_controller import ClientController
+from opentakserver.eud_handler.outbound_queue import OutboundQueue
+
+
+class CountingSocket:
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.syscalls = 0
+
+    def send(self, data) -> int:
+        self.syscalls += 1
+        return self.sock.send(data)
+
+    def sendmsg(self, buffers) -> int:
+        self.syscalls += 1
+        return self.sock.sendmsg(buffers)
+
+
+class Sender:
+    """Just enough of a ClientController to call its write()"""
+
+    def __init__(self, sock, is_ssl=False):
+        self.sock = sock
+        self.is_ssl = is_ssl
+        self.shutdown = False
+
+    write = ClientController.write
+
+
+def drain(sock: socket.socket):
+    while sock.recv(1 << 20):
+        pass
+
+
+def one_at_a_time(sock: CountingSocket, queue: OutboundQueue, batch_bytes: int):
+    while (data := queue.pop()) is not None:
+        sock.sock.sendall(data)
+        sock.syscalls += 1
+
+
+def batched(sock: CountingSocket, queue: OutboundQueue, batch_bytes: int):
+    sender = Sender(sock)
+    while batch := queue.pop_batch(batch_bytes):
+        sender.write(batch)
+
+
+def run(function, messages: list[bytes], bursts: int, burst: int, batch_bytes: int):
+    server, client = socket.socketpair()
+    reader = Thread(target=drain, args=(client,))
+    reader.start()
+
+    sock = CountingSocket(server)
+    queue = OutboundQueue(64 * 1024 * 1024)
+    cpu = time.process_time()
+    for i in range(bursts):
+        for j in range(burst):
+            queue.put(messages[(i * burst + j) % len(messages)])
+        function(sock, queue, batch_bytes)
+    cpu = time.process_time() - cpu
+
+    server.shutdown(socket.SHUT_WR)
+    reader.join()
+    server.close()
+    client.close()
+
+    delivered = bursts * burst
+    return sock.syscalls / delivered, cpu / delivered * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--burst", type=int, default=200, help="Messages queued at once")
+    parser.add_argument("--bursts", type=int, default=500)
+    parser.add_argument("--batch-bytes", type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    messages = [message for message in samples.corpus() if len(message) < 4096]
+    for name, function in (("One send per message", one_at_a_time), ("Batched", batched)):
+        syscalls, cpu = run(function, messages, args.bursts, args.burst, args.batch_bytes)
+        print(f"{name:21} {syscalls:6.3f} syscalls/message {cpu:8.2f} us CPU/message")
+
+
+if __name__ == "__main__":
+    main()
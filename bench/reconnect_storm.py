@@ -0,0 +1,214 @@
+"""Many EUDs reconnecting to the SSL streaming port at once, like after a server restart or a network outage.
+
+Compares doing each TLS handshake in the accept loop like SocketServer used to, doing them in its handshake pool,
+and the handshake pool with clients resuming their previous TLS session. A few clients connect first and never
+start their handshake, like EUDs on a bad network. Uses a throwaway CA with a server certificate and a client
+certificate, and a SocketServer that closes each connection after the handshake, so it measures the TLS side of
+connecting. The clients run in the same process so CPU time includes theirs.
+
+python -m bench.reconnect_storm --clients 500
+"""
+
+import argparse
+import datetime
+import logging
+import os
+import socket
+import ssl
+import statistics
+import tempfile
+import time
+from threading import Barrier, Thread
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from flask import Flask
+
+from opentakserver.defaultconfig import DefaultConfig
+from opentakserver.eud_handler.SocketServer import SocketServer
+from opentakserver.extensions import logger
+
+
+def make_certificate(common_name: str, issuer_key=None, issuer_name=None, is_ca=False):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(issuer_name or name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.BasicConstraints(ca=is_ca, path_length=None), critical=True)
+        .sign(issuer_key or key, hashes.SHA256())
+    )
+    return key, certificate
+
+
+def write_pem(path: str, key=None, certificate=None):
+    with open(path, "wb") as f:
+        if certificate:
+            f.write(certificate.public_bytes(serialization.Encoding.PEM))
+        if key:
+            f.write(
+                key.private_bytes(
+                    serialization.Encoding.PEM,
+                    serialization.PrivateFormat.TraditionalOpenSSL,
+                    serialization.NoEncryption(),
+                )
+            )
+
+
+def make_ca_folder(folder: str | None = None) -> str:
+    """Lays out a CA folder like the one SocketServer.get_ssl_context() reads"""
+    folder = folder or tempfile.mkdtemp(prefix="ots-bench-ca-")
+    os.makedirs(os.path.join(folder, "certs", "opentakserver"))
+
+    ca_key, ca = make_certificate("bench-ca", is_ca=True)
+    server_key, server = make_certificate("opentakserver", ca_key, ca.subject)
+    client_key, client = make_certificate("bench", ca_key, ca.subject)
+
+    write_pem(os.path.join(folder, "ca.pem"), certificate=ca)
+    write_pem(
+        os.path.join(folder, "certs", "opentakserver", "opentakserver.pem"), certificate=server
+    )
+    write_pem(
+        os.path.join(folder, "certs", "opentakserver", "opentakserver.nopass.key"), server_key
+    )
+    write_pem(os.path.join(folder, "client.pem"), client_key, client)
+    return folder
+
+
+class InlineExecutor:
+    """Runs the handshake in the accept loop like SocketServer did before it had a handshake pool"""
+
+    def submit(self, function, *args):
+        function(*args)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+class BenchSocketServer(SocketServer):
+    def start_client(self, sock: ssl.SSLSocket, addr):
+        # The client waits for this so it gets the TLS 1.3 session ticket, which is sent after the handshake
+        sock.sendall(b"x")
+        sock.close()
+
+
+def connect(port: int, context: ssl.SSLContext, barrier: Barrier, session, results: list):
+    barrier.wait()
+    start = time.perf_counter()
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=60) as sock:
+            with context.wrap_socket(sock, session=session) as tls:
+                tls.recv(1)
+                results.append((time.perf_counter() - start, tls.session, tls.session_reused))
+    except OSError as e:
+        results.append((time.perf_counter() - start, None, False))
+        logger.debug(f"Client failed: {e}")
+
+
+def storm(port: int, context: ssl.SSLContext, sessions: list) -> list:
+    barrier = Barrier(len(sessions) + 1)
+    results = []
+    threads = [
+        Thread(target=connect, args=(port, context, barrier, session, results))
+        for session in sessions
+    ]
+    for thread in threads:
+        thread.start()
+
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def run(
+    app: Flask, port: int, clients: int, stalled: int, inline: bool, resume: bool, client_context
+):
+    server = BenchSocketServer(logger, app.app_context(), port, True)
+    server.report_stats = lambda: None
+    thread = Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.handshake_pool:
+        time.sleep(0.01)
+    if inline:
+        server.handshake_pool.shutdown()
+        server.handshake_pool = InlineExecutor()
+
+    sessions = [None] * clients
+    if resume:
+        sessions = [result[1] for result in storm(port, client_context, sessions)]
+
+    stalled_sockets = [socket.create_connection(("127.0.0.1", port)) for _ in range(stalled)]
+
+    cpu = time.process_time()
+    start = time.perf_counter()
+    results = storm(port, client_context, sessions)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+
+    for sock in stalled_sockets:
+        sock.close()
+
+    server.shutdown = True
+    thread.join()
+
+    latencies = sorted(result[0] for result in results)
+    return {
+        "connected": sum(1 for result in results if result[1]),
+        "resumed": sum(1 for result in results if result[2]),
+        "seconds": elapsed,
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "cpu": cpu,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument(
+        "--stalled", type=int, default=5, help="Clients that never finish their handshake"
+    )
+    parser.add_argument("--port", type=int, default=18089)
+    args = parser.parse_args()
+
+    # Stalled clients' handshakes failing is expected
+    logger.setLevel(logging.ERROR)
+
+    ca_folder = make_ca_folder()
+    app = Flask(__name__)
+    app.config.from_object(DefaultConfig)
+    app.config["OTS_CA_FOLDER"] = ca_folder
+    app.config["OTS_DATA_FOLDER"] = ca_folder
+    app.config["OTS_EUD_HANDLER_HANDSHAKE_TIMEOUT"] = 2
+
+    client_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    client_context.check_hostname = False
+    client_context.load_verify_locations(os.path.join(ca_folder, "ca.pem"))
+    client_context.load_cert_chain(os.path.join(ca_folder, "client.pem"))
+
+    cases = (
+        ("Handshake in accept loop", True, False),
+        ("Handshake pool", False, False),
+        ("Handshake pool, resumed", False, True),
+    )
+    print(f"{args.clients} clients reconnecting at once, {args.stalled} stalled")
+    for i, (name, inline, resume) in enumerate(cases):
+        result = run(app, args.port + i, args.clients, args.stalled, inline, resume, client_context)
+        print(
+            f"{name:25} {result['connected']:4} connected {result['resumed']:4} resumed "
+            f"{result['seconds']:6.2f} s total p50 {result['p50'] * 1000:7.1f} ms "
+            f"p99 {result['p99'] * 1000:7.1f} ms {result['cpu']:5.2f} s CPU"
+        )
+
+
+if __name__ == "__main__":
+    main()
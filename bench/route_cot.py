@@ -0,0 +1,100 @@
+"""Messages per second through ClientController.route_cot for an SSL user in several groups, looking up the user's
+groups for every message like route_cot used to and with the per-session cache.
+
+Uses a throwaway SQLite database and a channel that only counts publishes, so it measures the eud_handler's side.
+
+python -m bench.route_cot --groups 10
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+
+class CountingChannel:
+    is_open = True
+    is_closing = False
+    is_closed = False
+
+    def __init__(self):
+        self.publishes = 0
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.publishes += 1
+
+
+def run(controller, event, seconds: float) -> float:
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for _ in range(100):
+            controller.route_cot(event)
+        count += 100
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--groups", type=int, default=10, help="How many IN groups the user is in")
+    parser.add_argument("--seconds", type=float, default=3, help="How long to run each case")
+    args = parser.parse_args()
+
+    data_folder = tempfile.mkdtemp(prefix="ots-bench-")
+    os.environ["OTS_DATA_FOLDER"] = data_folder
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(data_folder, 'bench.db')}"
+
+    # The eud_handler app reads its config when it's imported
+    from bench import samples
+    from opentakserver.cot_event import CoTEvent
+    from opentakserver.eud_handler.client_controller import ClientController
+    from opentakserver.eud_handler.eud_handler import app
+    from opentakserver.extensions import db
+    from opentakserver.models.Group import Group
+    from opentakserver.models.GroupUser import GroupUser
+
+    class BenchClientController(ClientController):
+        def setup_socket(self):
+            pass
+
+        def connect_to_rabbitmq(self):
+            self.rabbit_channel = CountingChannel()
+
+    with app.app_context():
+        db.create_all()
+        user = app.security.datastore.create_user(username="bench", password="bench")
+        db.session.commit()
+        for i in range(args.groups):
+            group = Group()
+            group.name = f"bench-{i}"
+            group.type = Group.SYSTEM
+            db.session.add(group)
+            db.session.commit()
+
+            membership = GroupUser()
+            membership.user_id = user.id
+            membership.group_id = group.id
+            membership.direction = Group.IN
+            db.session.add(membership)
+        db.session.commit()
+
+    controller = BenchClientController("127.0.0.1", 8089, None, app.logger, app, True)
+    controller.uid = "ANDROID-0000000000000001"
+    with app.app_context():
+        controller.user = app.security.datastore.find_user(username="bench")
+    event = CoTEvent.from_xml(samples.position())
+
+    app.config["OTS_GROUP_ROUTING_CACHE_SECONDS"] = 0
+    before = run(controller, event, args.seconds)
+    app.config["OTS_GROUP_ROUTING_CACHE_SECONDS"] = 300
+    after = run(controller, event, args.seconds)
+
+    print(
+        f"{args.groups} groups, {len(controller.get_group_routing_keys()) + 2} publishes per message"
+    )
+    print(f"Groups looked up every message: {before:10.0f} messages/second")
+    print(f"Groups cached for the session:  {after:10.0f} messages/second ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import datetime
+import uuid
+
+
+def _times() -> tuple[str, str]:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    start = now.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    stale = (now + datetime.timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    return start, stale
+
+
+def position(
+    callsign: str = "EUD-1",
+    uid: str = "ANDROID-0000000000000001",
+    lat: float = 40.744213,
+    lon: float = -73.986939,
+) -> bytes:
+    """A position report like the ones ATAK sends every few seconds"""
+    start, stale = _times()
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<event version="2.0" uid="{uid}" type="a-f-G-U-C" how="m-g" time="{start}" start="{start}" '
+        f'stale="{stale}"><point lat="{lat:.6f}" lon="{lon:.6f}" hae="12.5" ce="4.9" le="9999999.0"/>'
+        f'<detail><takv os="34" version="5.2.0" device="GOOGLE PIXEL" platform="ATAK-CIV"/>'
+        f'<contact endpoint="*:-1:stcp" callsign="{callsign}"/><uid Droid="{callsign}"/>'
+        f'<__group role="Team Member" name="Cyan"/><status battery="88"/>'
+        f'<track course="123.4" speed="1.2"/></detail></event>'
+    ).encode()
+
+
+def drawing_shape(points: int = 2000) -> bytes:
+    """A freehand polygon with one link element per vertex"""
+    start, stale = _times()
+    links = "".join(
+        f'<link point="{40 + i * 0.0001:.7f},{-73 - i * 0.0001:.7f}"/>' for i in range(points)
+    )
+    return (
+        f'<event version="2.0" uid="{uuid.uuid4()}" type="u-d-f" how="h-e" time="{start}" '
+        f'start="{start}" stale="{stale}"><point lat="40.0" lon="-73.0" hae="9999999.0" ce="9999999.0" '
+        f'le="9999999.0"/><detail>{links}<contact callsign="Drawing"/><strokeColor value="-1"/>'
+        f'<strokeWeight value="4.0"/><labels_on value="false"/></detail></event>'
+    ).encode()
+
+
+def route(waypoints: int = 500) -> bytes:
+    """A route with a waypoint link and control point for every leg"""
+    start, stale = _times()
+    links = "".join(
+        f'<link uid="{uuid.uuid4()}" callsign="CP{i}" type="b-m-p-c" '
+        f'point="{40 + i * 0.001:.7f},{-73 - i * 0.001:.7f}" remarks="" relation="c"/>'
+        for i in range(waypoints)
+    )
+    return (
+        f'<event version="2.0" uid="{uuid.uuid4()}" type="b-m-r" how="h-e" time="{start}" '
+        f'start="{start}" stale="{stale}"><point lat="40.0" lon="-73.0" hae="0.0" ce="9999999.0" '
+        f'le="9999999.0"/><detail>{links}<link_attr planningmethod="Infil" color="-1" method="Driving" '
+        f'prefix="CP" type="Vehicle" stroke="3" direction="Infil" routetype="Primary" order="Ascending Check Points"/>'
+        f'<contact callsign="Route 1"/><remarks/></detail></event>'
+    ).encode()
+
+
+def itak_position(callsign: str = "iTAK-1") -> bytes:
+    start, stale = _times()
+    return (
+        f'<event version="2.0" uid="{uuid.uuid4()}" type="a-f-G-U-C" how="m-g" time="{start}" '
+        f'start="{start}" stale="{stale}"><point lat="40.744213" lon="-73.986939" hae="10.0" ce="5.0" '
+        f'le="3.0"/><detail><contact callsign="{callsign}" endpoint="*:-1:stcp" phone="5555555555"/>'
+        f'<__group name="Cyan" role="Team Member"/><precisionlocation geolocationsrc="GPS" altsrc="GPS"/>'
+        f'<status battery="100"/><takv device="iPhone" platform="iTAK" os="17.5" version="2.12.1.651"/>'
+        f'<track speed="0.0" course="0.0"/></detail></event>'
+    ).encode()
+
+
+def wintak_position(callsign: str = "WinTAK-1") -> bytes:
+    start, stale = _times()
+    return (
+        f'<?xml version="1.0" encoding="utf-8"?>\n'
+        f'<event version="2.0" uid="{uuid.uuid4()}" type="a-f-G-U-C-I" time="{start}" start="{start}" '
+        f'stale="{stale}" how="h-e"><point lat="40.744213" lon="-73.986939" hae="9999999" ce="9999999" '
+        f'le="9999999"/><detail><contact callsign="{callsign}" endpoint="*:-1:stcp"/>'
+        f'<uid Droid="{callsign}"/><__group name="Cyan" role="Team Member"/><status battery="100"/>'
+        f'<takv version="5.4.0.149" platform="WinTAK-CIV" device="LENOVO 20XW" os="Microsoft Windows 11 Pro"/>'
+        f'<track course="0" speed="0"/><_flow-tags_ TAK-Server-e87a0e02420b44a08f6032bcf1877745="{start}"/>'
+        f"</detail></event>"
+    ).encode()
+
+
+def geochat(
+    sender_uid: str = "ANDROID-0000000000000001",
+    callsign: str = "EUD-1",
+    to_callsign: str = "EUD-2",
+) -> bytes:
+    start, stale = _times()
+    message_id = uuid.uuid4()
+    return (
+        f'<event version="2.0" uid="GeoChat.{sender_uid}.All Chat Rooms.{message_id}" type="b-t-f" '
+        f'how="h-g-i-g-o" time="{start}" start="{start}" stale="{stale}"><point lat="40.744213" '
+        f'lon="-73.986939" hae="12.5" ce="4.9" le="9999999.0"/><detail><__chat parent="RootContactGroup" '
+        f'groupOwner="false" messageId="{message_id}" chatroom="All Chat Rooms" id="All Chat Rooms" '
+        f'senderCallsign="{callsign}"><chatgrp uid0="{sender_uid}" uid1="All Chat Rooms" '
+        f'id="All Chat Rooms"/></__chat><link uid="{sender_uid}" type="a-f-G-U-C" relation="p-p"/>'
+        f'<remarks source="BAO.F.ATAK.{sender_uid}" to="All Chat Rooms" time="{start}">Moving to the '
+        f'rally point</remarks><__serverdestination destinations="0.0.0.0:4242:tcp:{sender_uid}"/>'
+        f'<marti><dest callsign="{to_callsign}"/></marti></detail></event>'
+    ).encode()
+
+
+def marker() -> bytes:
+    start, stale = _times()
+    return (
+        f'<event version="2.0" uid="{uuid.uuid4()}" type="a-h-G" how="h-g-i-g-o" time="{start}" '
+        f'start="{start}" stale="{stale}"><point lat="40.75" lon="-73.99" hae="15.2" ce="9999999.0" '
+        f'le="9999999.0"/><detail><status readiness="true"/><archive/><link uid="ANDROID-0000000000000001" '
+        f'production_time="{start}" type="a-f-G-U-C" parent_callsign="EUD-1" relation="p-p"/>'
+        f'<contact callsign="H.15.123456"/><remarks/><archive/><color argb="-1"/>'
+        f'<precisionlocation altsrc="DTED0"/><usericon iconsetpath="COT_MAPPING_2525B/a-h/a-h-G"/>'
+        f"</detail></event>"
+    ).encode()
+
+
+def mission_marker(mission: str = "bench", sender_uid: str = "ANDROID-0000000000000001") -> bytes:
+    """A marker ATAK sends to a data sync mission it's subscribed to"""
+    start, stale = _times()
+    return (
+        f'<event version="2.0" uid="{uuid.uuid4()}" type="a-u-G" how="h-g-i-g-o" time="{start}" '
+        f'start="{start}" stale="{stale}"><point lat="40.75" lon="-73.99" hae="15.2" ce="9999999.0" '
+        f'le="9999999.0"/><detail><status readiness="true"/><archive/><link uid="{sender_uid}" '
+        f'production_time="{start}" type="a-f-G-U-C" parent_callsign="EUD-1" relation="p-p"/>'
+        f'<contact callsign="U.16.123456"/><remarks/><color argb="-1"/>'
+        f'<usericon iconsetpath="COT_MAPPING_2525B/a-u/a-u-G"/><marti><dest mission="{mission}"/></marti>'
+        f"</detail></event>"
+    ).encode()
+
+
+def casevac() -> bytes:
+    start, stale = _times()
+    return (
+        f'<event version="2.0" uid="{uuid.uuid4()}" type="b-r-f-h-c" how="h-g-i-g-o" time="{start}" '
+        f'start="{start}" stale="{stale}"><point lat="40.75" lon="-73.99" hae="15.2" ce="9999999.0" '
+        f'le="9999999.0"/><detail><contact callsign="MED.16.123456"/><link uid="ANDROID-0000000000000001" '
+        f'type="a-f-G-U-C" relation="p-p"/><_medevac_ title="MED.16.123456" casevac="true" freq="0.0" '
+        f'urgent="1" priority="0" routine="0" hoist="false" extraction_equipment="false" '
+        f'ventilator="false" equipment_other="false" litter="1" ambulatory="0" security="0" '
+        f'hlz_marking="3" us_military="1" child="0" terrain_none="true" medline_remarks="">'
+        f'<zMistsMap><zMist title="ZMIST1" z="Fall" m="Fracture" i="Left leg" s="Stable" t="Splint"/>'
+        f"</zMistsMap></_medevac_></detail></event>"
+    ).encode()
+
+
+def corpus() -> list[bytes]:
+    """A mix of the messages ATAK, iTAK and WinTAK send, weighted towards position reports"""
+    return (
+        [position(f"EUD-{i}", f"ANDROID-{i:016x}") for i in range(40)]
+        + [itak_position(f"iTAK-{i}") for i in range(20)]
+        + [wintak_position(f"WinTAK-{i}") for i in range(20)]
+        + [geochat() for _ in range(10)]
+        + [marker() for _ in range(6)]
+        + [casevac() for _ in range(2)]
+        + [drawing_shape(200), route(50)]
+    )
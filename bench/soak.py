@@ -0,0 +1,522 @@
+"""Simulated ATAK clients streaming to one eud_handler and cot_parser pair, to see how many EUDs and messages per
+second they sustain.
+
+Starts eud_handler on the TCP and SSL streaming ports and cot_parser as separate processes, just like
+opentakserver runs them, with a throwaway data folder, CA and SQLite database. RabbitMQ is the stand-in broker in
+bench.broker unless --rabbitmq is given, and --database can point at PostgreSQL instead. Anything
+else can be changed with the usual OTS_* environment variables, like OTS_EUD_HANDLER_ASYNCIO=true.
+
+Each client connects over TCP, or TLS with a client certificate for --tls of them, sends its position every
+--sa-interval seconds and sends GeoChat to another client, markers to everyone and markers to a data sync mission
+that every client is subscribed to at their own intervals. Every CoT carries the time it was sent, so the clients
+that receive it measure the end to end fan-out latency. Every --report-interval seconds it prints the messages sent
+and received, latency percentiles, the cot_parser queue's depth, CoTs written to the DB per second and each
+process's CPU and memory. The clients and the stand-in broker share the bench's own process.
+
+python -m bench.soak --clients 200 --tls 0.5 --seconds 300
+"""
+
+import argparse
+import logging
+import os
+import random
+import re
+import select
+import signal
+import socket
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+import uuid
+from threading import Event, Lock, Thread
+
+import pika
+import psutil
+
+from bench import samples
+from opentakserver.eud_handler.cot_framer import CoTFramer
+
+MISSION = "bench-soak"
+BENCH_TAG = re.compile(rb'<__bench kind="(\w+)" from="([^"]+)" sent="([0-9.]+)"/>')
+
+
+class Latencies:
+    """Fan-out latencies by kind of CoT, for the whole run and since the last report"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.total: dict[str, list[float]] = {}
+        self.interval: list[float] = []
+        self.sent = 0
+        self.received = 0
+        self.recording = False
+
+    def add_sent(self):
+        with self.lock:
+            self.sent += 1
+
+    def add(self, kind: str, latency: float):
+        with self.lock:
+            self.received += 1
+            if self.recording:
+                self.total.setdefault(kind, []).append(latency)
+                self.interval.append(latency)
+
+    def take_interval(self) -> tuple[int, int, list[float]]:
+        with self.lock:
+            sent, received, interval = self.sent, self.received, self.interval
+            self.sent = self.received = 0
+            self.interval = []
+            return sent, received, interval
+
+
+def percentiles(latencies: list[float]) -> str:
+    if not latencies:
+        return "p50      - p95      - p99      - ms"
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p95 = latencies[int(len(latencies) * 0.95) - 1 if len(latencies) >= 20 else -1] * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1 if len(latencies) >= 100 else -1] * 1000
+    return f"p50 {p50:6.1f} p95 {p95:6.1f} p99 {p99:6.1f} ms"
+
+
+class SimulatedEUD:
+    """One ATAK client. It sends and receives from the same thread so the bench doesn't need two per client"""
+
+    def __init__(self, index: int, args, tls_context: ssl.SSLContext | None, latencies: Latencies):
+        self.index = index
+        self.args = args
+        self.tls_context = tls_context
+        self.latencies = latencies
+        self.uid = f"BENCH-{index:06d}"
+        self.callsign = f"BENCH-{index}"
+        self.lat = 40.7 + random.uniform(-0.05, 0.05)
+        self.lon = -74.0 + random.uniform(-0.05, 0.05)
+        self.peers: list[str] = []
+        self.sock: socket.socket | None = None
+        self.connected = False
+        self.errors = 0
+
+    def stamp(self, xml: bytes, kind: str) -> bytes:
+        return xml.replace(
+            b"<detail>",
+            f'<detail><__bench kind="{kind}" from="{self.uid}" sent="{time.time():.6f}"/>'.encode(),
+            1,
+        )
+
+    def position(self) -> bytes:
+        self.lat += random.uniform(-0.0005, 0.0005)
+        self.lon += random.uniform(-0.0005, 0.0005)
+        return self.stamp(samples.position(self.callsign, self.uid, self.lat, self.lon), "sa")
+
+    def messages(self):
+        """(interval, function that makes the CoT) for each kind of CoT the client sends"""
+        args = self.args
+        return [
+            (args.sa_interval, self.position),
+            (
+                args.chat_interval,
+                lambda: self.stamp(
+                    samples.geochat(self.uid, self.callsign, random.choice(self.peers)), "chat"
+                ),
+            ),
+            (args.marker_interval, lambda: self.stamp(samples.marker(), "marker")),
+            (
+                args.mission_interval,
+                lambda: self.stamp(samples.mission_marker(MISSION, self.uid), "mission"),
+            ),
+        ]
+
+    def connect(self):
+        port = self.args.ssl_port if self.tls_context else self.args.tcp_port
+        sock = socket.create_connection(("127.0.0.1", port), timeout=30)
+        if self.tls_context:
+            sock = self.tls_context.wrap_socket(sock)
+        sock.settimeout(None)
+        self.sock = sock
+        self.sock.sendall(self.position())
+        self.connected = True
+
+    def run(self, stop: Event):
+        try:
+            self.connect()
+        except OSError as e:
+            self.errors += 1
+            print(f"{self.callsign} failed to connect: {e}", file=sys.stderr)
+            return
+
+        # Spread the first of each kind of message over its interval so the clients don't send in lockstep
+        now = time.monotonic()
+        schedule = [
+            [now + random.uniform(0, interval), interval, make]
+            for interval, make in self.messages()
+            if interval > 0
+        ]
+        framer = CoTFramer()
+        try:
+            while not stop.is_set():
+                due = min((entry[0] for entry in schedule), default=time.monotonic() + 1)
+                timeout = max(0.0, due - time.monotonic())
+                pending = self.tls_context and self.sock.pending()
+                if pending or select.select([self.sock], [], [], min(timeout, 1))[0]:
+                    data = self.sock.recv(65536)
+                    if not data:
+                        break
+                    self.receive(framer, data)
+
+                now = time.monotonic()
+                for entry in schedule:
+                    if entry[0] <= now:
+                        self.sock.sendall(entry[2]())
+                        self.latencies.add_sent()
+                        entry[0] += entry[1]
+        except (OSError, ValueError) as e:
+            if not stop.is_set():
+                self.errors += 1
+                print(f"{self.callsign} disconnected: {e}", file=sys.stderr)
+        finally:
+            self.connected = False
+            self.sock.close()
+
+    def receive(self, framer: CoTFramer, data: bytes):
+        now = time.time()
+        for message in framer.feed(data):
+            match = BENCH_TAG.search(message)
+            if match and match.group(2).decode() != self.uid:
+                self.latencies.add(match.group(1).decode(), now - float(match.group(3)))
+
+
+class ProcessMonitor:
+    """CPU and resident memory of a process and the children it forks, like cot_parser's workers"""
+
+    def __init__(self, name: str, pid: int):
+        self.name = name
+        self.process = psutil.Process(pid)
+        self.cpu = self.cpu_seconds()
+        self.time = time.monotonic()
+
+    def processes(self) -> list[psutil.Process]:
+        try:
+            return [self.process] + self.process.children(recursive=True)
+        except psutil.Error:
+            return []
+
+    def cpu_seconds(self) -> float:
+        total = 0.0
+        for process in self.processes():
+            try:
+                times = process.cpu_times()
+                total += times.user + times.system
+            except psutil.Error:
+                pass
+        return total
+
+    def sample(self) -> str:
+        cpu = self.cpu_seconds()
+        now = time.monotonic()
+        percent = (cpu - self.cpu) / (now - self.time) * 100
+        self.cpu, self.time = cpu, now
+
+        rss = 0
+        for process in self.processes():
+            try:
+                rss += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return f"{self.name} {percent:5.1f}% CPU {rss / 1024 / 1024:6.1f} MB"
+
+
+def rabbitmq_parameters(host: str) -> pika.ConnectionParameters:
+    return pika.ConnectionParameters(
+        host=host,
+        credentials=pika.PlainCredentials(
+            os.getenv("OTS_RABBITMQ_USERNAME", "guest"), os.getenv("OTS_RABBITMQ_PASSWORD", "guest")
+        ),
+    )
+
+
+def declare_exchanges(host: str):
+    """The exchanges the web app declares when it starts, since it isn't part of the bench"""
+    connection = pika.BlockingConnection(rabbitmq_parameters(host))
+    channel = connection.channel()
+    channel.exchange_declare("dms", durable=True, exchange_type="direct")
+    channel.exchange_declare("cot_parser", durable=True, exchange_type="direct")
+    channel.exchange_declare("chatrooms", durable=True, exchange_type="direct")
+    channel.exchange_declare("missions", durable=True, exchange_type="topic")
+    channel.exchange_declare("groups", durable=True, exchange_type="topic")
+    channel.exchange_declare("firehose", durable=True, exchange_type="fanout")
+    # Declared by python-socketio in the web app, eud_handler publishes EUDs to it for the map
+    channel.exchange_declare("flask-socketio", durable=False, exchange_type="fanout")
+    connection.close()
+
+
+def subscribe_to_mission(host: str, clients: list[SimulatedEUD]):
+    """Binds each client's queue like the Marti API does when an EUD subscribes to a mission"""
+    connection = pika.BlockingConnection(rabbitmq_parameters(host))
+    channel = connection.channel()
+    for client in clients:
+        if client.connected:
+            channel.queue_declare(queue=client.uid)
+            channel.queue_bind(
+                queue=client.uid, exchange="missions", routing_key=f"missions.{MISSION}"
+            )
+    connection.close()
+
+
+class QueueMonitor:
+    """Messages waiting in the cot_parser queue, from a passive queue_declare which works with any broker"""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.connection: pika.BlockingConnection | None = None
+        self.channel = None
+
+    def depth(self) -> int | None:
+        try:
+            if not self.channel or not self.channel.is_open:
+                if not self.connection or not self.connection.is_open:
+                    self.connection = pika.BlockingConnection(rabbitmq_parameters(self.host))
+                self.channel = self.connection.channel()
+            return self.channel.queue_declare(queue="cot_parser", passive=True).method.message_count
+        except pika.exceptions.AMQPError:
+            return None
+
+
+def setup_database(app, tls_clients: int):
+    """Tables, a user for the client certificate's common name and the data sync mission"""
+    from opentakserver.extensions import db
+    from opentakserver.models.Mission import Mission
+
+    with app.app_context():
+        db.create_all()
+        if tls_clients and not app.security.datastore.find_user(username="bench"):
+            app.security.datastore.create_user(username="bench", password="bench")
+        if not db.session.get(Mission, MISSION):
+            mission = Mission()
+            mission.name = MISSION
+            mission.tool = "public"
+            mission.guid = str(uuid.uuid4())
+            db.session.add(mission)
+        db.session.commit()
+
+
+def count_cots(app) -> int | None:
+    from sqlalchemy import func, select
+
+    from opentakserver.extensions import db
+    from opentakserver.models.CoT import CoT
+
+    try:
+        with app.app_context():
+            count = db.session.execute(select(func.count()).select_from(CoT)).scalar()
+            db.session.remove()
+            return count
+    except BaseException:
+        # SQLite can be locked by cot_parser's writes, the next report will catch up
+        return None
+
+
+def start_process(data_folder: str, name: str, args: list[str]) -> subprocess.Popen:
+    log = open(os.path.join(data_folder, f"{name}.out"), "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", *args],
+        stdout=log,
+        stderr=subprocess.STDOUT,
+        # Its own process group so its forked workers are stopped with it
+        start_new_session=True,
+    )
+
+
+def wait_for_port(port: int, process: subprocess.Popen, seconds: float = 30):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited with {process.returncode}, see its .out file")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Nothing is listening on port {port}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--tls", type=float, default=0.5, help="Fraction of clients using TLS")
+    parser.add_argument("--seconds", type=float, default=60, help="How long to measure for")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds before measuring")
+    parser.add_argument("--report-interval", type=float, default=10)
+    parser.add_argument("--sa-interval", type=float, default=5, help="0 doesn't send any")
+    parser.add_argument("--chat-interval", type=float, default=60, help="0 doesn't send any")
+    parser.add_argument("--marker-interval", type=float, default=120, help="0 doesn't send any")
+    parser.add_argument("--mission-interval", type=float, default=120, help="0 doesn't send any")
+    parser.add_argument("--connect-rate", type=float, default=50, help="New clients per second")
+    parser.add_argument("--tcp-port", type=int, default=18088)
+    parser.add_argument("--ssl-port", type=int, default=18089)
+    parser.add_argument(
+        "--rabbitmq", help="Use this RabbitMQ server instead of starting the stand-in broker"
+    )
+    parser.add_argument("--database", help="SQLAlchemy URI, defaults to a throwaway SQLite DB")
+    args = parser.parse_args()
+
+    data_folder = tempfile.mkdtemp(prefix="ots-bench-soak-")
+    ca_folder = os.path.join(data_folder, "ca")
+    rabbitmq = args.rabbitmq or "127.0.0.1"
+    os.environ["OTS_DATA_FOLDER"] = data_folder
+    os.environ["OTS_CA_FOLDER"] = ca_folder
+    os.environ["OTS_TCP_STREAMING_PORT"] = str(args.tcp_port)
+    os.environ["OTS_SSL_STREAMING_PORT"] = str(args.ssl_port)
+    os.environ["OTS_RABBITMQ_SERVER_ADDRESS"] = rabbitmq
+    os.environ["SQLALCHEMY_DATABASE_URI"] = args.database or (
+        f"sqlite:///{os.path.join(data_folder, 'bench.db')}"
+    )
+
+    # DefaultConfig reads the environment when it's imported, so nothing that imports it can be imported before this
+    from bench.reconnect_storm import make_ca_folder
+
+    make_ca_folder(ca_folder)
+
+    broker = None
+    if not args.rabbitmq:
+        from bench.broker import Broker
+
+        # pika connects to 5672 and the OTS processes have no setting for the port
+        broker = Broker(port=5672).start()
+
+    # The eud_handler app writes config.yml from the environment when it's imported, which the processes load
+    from opentakserver.eud_handler.eud_handler import app
+    from opentakserver.extensions import logger
+
+    logger.setLevel(logging.WARNING)
+
+    tls_clients = round(args.clients * args.tls)
+    setup_database(app, tls_clients)
+    declare_exchanges(rabbitmq)
+
+    processes = {
+        "cot_parser": start_process(
+            data_folder, "cot_parser", ["opentakserver.cot_parser.cot_parser"]
+        )
+    }
+    if args.clients - tls_clients:
+        processes["eud_handler"] = start_process(
+            data_folder, "eud_handler", ["opentakserver.eud_handler.eud_handler"]
+        )
+    if tls_clients:
+        processes["eud_handler_ssl"] = start_process(
+            data_folder, "eud_handler_ssl", ["opentakserver.eud_handler.eud_handler", "--ssl"]
+        )
+
+    stop = Event()
+    try:
+        if "eud_handler" in processes:
+            wait_for_port(args.tcp_port, processes["eud_handler"])
+        if "eud_handler_ssl" in processes:
+            wait_for_port(args.ssl_port, processes["eud_handler_ssl"])
+
+        tls_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        tls_context.check_hostname = False
+        tls_context.load_verify_locations(os.path.join(ca_folder, "ca.pem"))
+        tls_context.load_cert_chain(os.path.join(ca_folder, "client.pem"))
+
+        latencies = Latencies()
+        clients = [
+            SimulatedEUD(i, args, tls_context if i < tls_clients else None, latencies)
+            for i in range(args.clients)
+        ]
+        callsigns = [client.callsign for client in clients]
+        for client in clients:
+            client.peers = [callsign for callsign in callsigns if callsign != client.callsign] or [
+                client.callsign
+            ]
+
+        print(
+            f"{args.clients} clients, {tls_clients} over TLS. "
+            f"{'Stand-in broker' if broker else f'RabbitMQ at {rabbitmq}'}, "
+            f"{os.environ['SQLALCHEMY_DATABASE_URI']}. Logs are in {data_folder}"
+        )
+        for client in clients:
+            Thread(target=client.run, args=(stop,), name=client.callsign, daemon=True).start()
+            time.sleep(1 / args.connect_rate)
+
+        # Give eud_handler time to declare the clients' queues before binding them to the mission
+        time.sleep(min(args.warmup, 2))
+        subscribe_to_mission(rabbitmq, clients)
+        time.sleep(max(0.0, args.warmup - 2))
+
+        monitors = [ProcessMonitor(name, process.pid) for name, process in processes.items()]
+        monitors.append(ProcessMonitor("bench", os.getpid()))
+        queue_monitor = QueueMonitor(rabbitmq)
+        latencies.take_interval()
+        latencies.recording = True
+
+        start = last_report = time.monotonic()
+        cots = count_cots(app)
+        cots_time = start
+        max_depth = 0
+        while time.monotonic() - start < args.seconds:
+            time.sleep(
+                min(args.report_interval, max(0.0, args.seconds - (time.monotonic() - start)))
+            )
+            now = time.monotonic()
+            sent, received, interval = latencies.take_interval()
+            elapsed = now - last_report
+            last_report = now
+
+            depth = queue_monitor.depth()
+            if depth is not None:
+                max_depth = max(max_depth, depth)
+
+            db_rate = "-"
+            count = count_cots(app)
+            if count is not None and cots is not None:
+                db_rate = f"{(count - cots) / (now - cots_time):.0f}"
+            if count is not None:
+                cots, cots_time = count, now
+
+            print(
+                f"{now - start:6.0f} s {sum(c.connected for c in clients):5} connected "
+                f"{sent / elapsed:7.0f} sent/s {received / elapsed:8.0f} received/s "
+                f"{percentiles(interval)} queue {depth if depth is not None else '-':>6} "
+                f"DB {db_rate:>5} CoTs/s"
+            )
+            print("         " + " | ".join(monitor.sample() for monitor in monitors))
+
+        print(
+            f"\nFan-out latency after {args.seconds:.0f} s, max cot_parser queue depth {max_depth}"
+        )
+        for kind, values in sorted(latencies.total.items()):
+            print(
+                f"  {kind:8} {len(values):9} received {percentiles(values)} max {max(values) * 1000:.1f} ms"
+            )
+        if broker:
+            print(f"  Stand-in broker: {broker.get_stats()}")
+        print(f"  Client errors: {sum(client.errors for client in clients)}")
+    except BaseException as e:
+        if not isinstance(e, KeyboardInterrupt):
+            print(f"Soak failed: {e}", file=sys.stderr)
+            traceback.print_exc()
+    finally:
+        stop.set()
+        for process in processes.values():
+            os.killpg(process.pid, signal.SIGINT)
+        for process in processes.values():
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                pass
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        if broker:
+            broker.stop()
+
+
+if __name__ == "__main__":
+    main()
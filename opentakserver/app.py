@@ -44,6 +44,7 @@ from opentakserver.models.Group import Group, GroupTypeEnum
 from opentakserver.models.Icon import Icon
 from opentakserver.models.role import Role
 from opentakserver.models.WebAuthn import WebAuthn
+from opentakserver.partitions import create_future_partitions
 from opentakserver.PasswordValidator import PasswordValidator
 from opentakserver.plugins.Plugin import Plugin
 from opentakserver.plugins.PluginManager import PluginManager
@@ -87,6 +88,19 @@ def init_extensions(app):
         else:
             logger.setLevel(logging.INFO)
 
+        # delete_old_data() keeps creating partitions too, this covers servers that don't run it
+        if app.config.get("OTS_HISTORY_PARTITION_INTERVAL"):
+            try:
+                create_future_partitions(
+                    db.session,
+                    app.config.get("OTS_HISTORY_PARTITION_INTERVAL"),
+                    app.config.get("OTS_HISTORY_PARTITIONS_AHEAD"),
+                )
+            except BaseException as e:
+                db.session.rollback()
+                logger.error(f"Failed to create partitions: {e}")
+                logger.debug(traceback.format_exc())
+
     # Handle config options that can't be serialized to yaml
     app.config.update(
         {
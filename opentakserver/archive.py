@@ -0,0 +1,165 @@
+import datetime
+import io
+import json
+import os
+import uuid
+from typing import Callable, Iterator
+
+import zstandard
+from sqlalchemy import DateTime, Table, select
+from sqlalchemy.orm import Session
+
+from opentakserver.extensions import logger
+
+
+def naive_utc(value: datetime.datetime) -> datetime.datetime:
+    """The database stores naive timestamps, API arguments are usually UTC"""
+    if value.tzinfo:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class ArchiveWriter:
+    """Writes one table's rows to zstd compressed NDJSON files, one per day in folder/<table>/date=YYYY-MM-DD/.
+
+    Every run writes new files so nothing is ever appended to. Files get their final name in close(), so readers never
+    see one that's half written.
+    """
+
+    def __init__(self, folder: str, table: Table, level: int):
+        self.folder = os.path.join(folder, table.name)
+        self.table = table
+        self.level = level
+        self.run_id = (
+            f"{datetime.datetime.now(datetime.timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        )
+        # date -> (temporary path, file, zstd writer)
+        self.files = {}
+
+    def write(self, rows: list[dict]):
+        for row in rows:
+            day = row["timestamp"].date().isoformat()
+            if day not in self.files:
+                folder = os.path.join(self.folder, f"date={day}")
+                os.makedirs(folder, exist_ok=True)
+                path = os.path.join(folder, f"{self.run_id}.ndjson.zst")
+                file = open(f"{path}.tmp", "wb")
+                # A compressor only handles one stream at a time
+                compressor = zstandard.ZstdCompressor(level=self.level)
+                self.files[day] = (path, file, compressor.stream_writer(file))
+
+            line = {
+                key: value.isoformat() if isinstance(value, datetime.datetime) else value
+                for key, value in row.items()
+            }
+            self.files[day][2].write(json.dumps(line).encode() + b"\n")
+
+    def close(self):
+        for path, file, writer in self.files.values():
+            writer.flush(zstandard.FLUSH_FRAME)
+            file.flush()
+            os.fsync(file.fileno())
+            file.close()
+            os.replace(f"{path}.tmp", path)
+        self.files = {}
+
+    def abort(self):
+        for path, file, writer in self.files.values():
+            file.close()
+            os.remove(f"{path}.tmp")
+        self.files = {}
+
+
+def archive_expired(
+    session: Session,
+    table: Table,
+    cutoff: datetime.datetime,
+    folder: str,
+    batch_size: int,
+    level: int,
+    on_batch: Callable[[int], None] | None = None,
+) -> int | None:
+    """Copies table's rows with a timestamp <= cutoff into the archive, paging through them by id. Returns the highest
+    id that was archived, or None when there was nothing to archive. Only rows up to that id should be deleted, newer
+    ones with old timestamps can arrive while this runs.
+    """
+    writer = ArchiveWriter(folder, table, level)
+    last_id = None
+    try:
+        while True:
+            query = select(table).where(table.c.timestamp <= cutoff).order_by(table.c.id)
+            if last_id is not None:
+                query = query.where(table.c.id > last_id)
+            rows = [dict(row) for row in session.execute(query.limit(batch_size)).mappings()]
+            if not rows:
+                break
+
+            writer.write(rows)
+            last_id = rows[-1]["id"]
+            if on_batch:
+                on_batch(len(rows))
+            if len(rows) < batch_size:
+                break
+    except BaseException:
+        writer.abort()
+        raise
+
+    writer.close()
+    return last_id
+
+
+def read_archive(
+    folder: str,
+    table: Table,
+    start: datetime.datetime | None = None,
+    end: datetime.datetime | None = None,
+    contains: str | None = None,
+    match: Callable[[dict], bool] | None = None,
+) -> Iterator[dict]:
+    """Yields archived rows from the days between start and end. Lines that don't contain the string contains are
+    skipped before they're parsed, then match decides which of the rest to yield. Rows archived more than once, when a
+    delete failed after archiving, are only yielded once.
+    """
+    folder = os.path.join(folder, table.name)
+    if not os.path.isdir(folder):
+        return
+
+    # Rows are filed by their timestamp, which can be a little off from start and stale
+    first_day = (naive_utc(start) - datetime.timedelta(days=1)).date() if start else None
+    last_day = (naive_utc(end) + datetime.timedelta(days=1)).date() if end else None
+    datetime_columns = [c.name for c in table.columns if isinstance(c.type, DateTime)]
+
+    seen = set()
+    for day_folder in sorted(os.listdir(folder)):
+        try:
+            day = datetime.date.fromisoformat(day_folder.removeprefix("date="))
+        except ValueError:
+            continue
+        if (first_day and day < first_day) or (last_day and day > last_day):
+            continue
+
+        for name in sorted(os.listdir(os.path.join(folder, day_folder))):
+            if not name.endswith(".ndjson.zst"):
+                continue
+
+            path = os.path.join(folder, day_folder, name)
+            try:
+                with open(path, "rb") as file:
+                    reader = zstandard.ZstdDecompressor().stream_reader(
+                        file, read_across_frames=True
+                    )
+                    for line in io.BufferedReader(reader):
+                        if contains and contains.encode() not in line:
+                            continue
+
+                        row = json.loads(line)
+                        if row["id"] in seen:
+                            continue
+                        for column in datetime_columns:
+                            if row.get(column):
+                                row[column] = datetime.datetime.fromisoformat(row[column])
+                        if match is None or match(row):
+                            seen.add(row["id"])
+                            yield row
+            except zstandard.ZstdError as e:
+                logger.error(f"Failed to read {path}: {e}")
@@ -1,3 +1,4 @@
+import datetime
 import os
 import platform
 import sys
@@ -9,8 +10,10 @@ from flask import g
 from flask.cli import with_appcontext
 
 from opentakserver.certificate_authority import CertificateAuthority
+from opentakserver.cot_storage import train_dictionary
 from opentakserver.defaultconfig import DefaultConfig
-from opentakserver.extensions import logger
+from opentakserver.extensions import db, logger
+from opentakserver.partitions import partition_tables
 
 
 @click.group()
@@ -35,6 +38,42 @@ def create_ca():
     sys.exit()
 
 
+@ots.command()
+@with_appcontext
+def partition_history():
+    """Convert the cot and points tables to PostgreSQL partitioned tables. Stop OpenTAKServer first"""
+    interval = app.config.get("OTS_HISTORY_PARTITION_INTERVAL")
+    if not interval:
+        logger.error("Set OTS_HISTORY_PARTITION_INTERVAL to day or week first")
+        sys.exit(1)
+
+    # Older rows are deleted by delete_old_data() anyway, don't make partitions for them
+    since = datetime.datetime.now() - datetime.timedelta(
+        seconds=app.config.get("OTS_DELETE_OLD_DATA_SECONDS"),
+        minutes=app.config.get("OTS_DELETE_OLD_DATA_MINUTES"),
+        hours=app.config.get("OTS_DELETE_OLD_DATA_HOURS"),
+        days=app.config.get("OTS_DELETE_OLD_DATA_DAYS"),
+        weeks=app.config.get("OTS_DELETE_OLD_DATA_WEEKS"),
+    )
+    partition_tables(db.session, interval, since, app.config.get("OTS_HISTORY_PARTITIONS_AHEAD"))
+
+
+@ots.command()
+@click.option("--samples", default=10000, help="How many of the newest CoTs to train it on")
+@click.option("--size", default=16384, help="Dictionary size in bytes")
+@with_appcontext
+def train_cot_dictionary(samples, size):
+    """Train a zstd dictionary for OTS_COT_XML_STORAGE = zstd. Restart cot_parser to start using it"""
+    try:
+        dictionary = train_dictionary(db.session, samples, size)
+        db.session.commit()
+        logger.info(f"Saved CoT dictionary {dictionary.id}")
+    except BaseException as e:
+        db.session.rollback()
+        logger.error(f"Failed to train a CoT dictionary: {e}")
+        sys.exit(1)
+
+
 @ots.command()
 @click.option("--overwrite", is_flag=True)
 @with_appcontext
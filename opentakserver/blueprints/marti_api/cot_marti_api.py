@@ -1,9 +1,13 @@
 import datetime
+import json
 from xml.etree.ElementTree import Element, fromstring, tostring
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint
+from flask import current_app as app
+from flask import jsonify, request
 from flask_babel import gettext
 
+from opentakserver.archive import naive_utc, read_archive
 from opentakserver.extensions import db, logger
 from opentakserver.functions import datetime_from_iso8601_string
 from opentakserver.models.CoT import CoT
@@ -46,9 +50,14 @@ def get_all_cot(uid):
     end = request.args.get("end")
 
     query = db.session.query(CoT).filter_by(uid=uid)
+    start_time = None
+    end_time = None
     if sec_ago:
         try:
-            query = query.filter(CoT.start >= datetime.datetime.now(datetime.UTC) - datetime.timedelta(seconds=int(sec_ago)))
+            start_time = datetime.datetime.now(datetime.UTC) - datetime.timedelta(
+                seconds=int(sec_ago)
+            )
+            query = query.filter(CoT.start >= start_time)
         except ValueError:
             return (
                 jsonify(
@@ -60,15 +69,40 @@ def get_all_cot(uid):
                 400,
             )
     if start:
-        query = query.filter(CoT.start >= datetime_from_iso8601_string(start))
+        start_time = datetime_from_iso8601_string(start)
+        query = query.filter(CoT.start >= start_time)
     if end:
-        query = query.filter(CoT.stale <= datetime_from_iso8601_string(end))
+        end_time = datetime_from_iso8601_string(end)
+        query = query.filter(CoT.stale <= end_time)
 
-    cots = db.session.execute(query)
+    cots = db.session.execute(query).scalars().all()
+    ids = {cot.id for cot in cots}
 
     events = Element("events")
+
+    # CoTs that delete_old_data() has moved out of the database
+    if app.config.get("OTS_ARCHIVE_EXPIRED_DATA"):
+
+        def match(row: dict) -> bool:
+            return (
+                row["uid"] == uid
+                and row["id"] not in ids
+                and (not start_time or row["start"] >= naive_utc(start_time))
+                and (not end_time or row["stale"] <= naive_utc(end_time))
+            )
+
+        for row in read_archive(
+            app.config.get("OTS_ARCHIVE_FOLDER"),
+            CoT.__table__,
+            start_time,
+            end_time,
+            json.dumps(uid),
+            match,
+        ):
+            events.append(fromstring(row["xml"]))
+
     for cot in cots:
-        events.append(fromstring(cot[0].xml))
+        events.append(fromstring(cot.xml))
 
     return tostring(events).decode("utf-8"), 200
 
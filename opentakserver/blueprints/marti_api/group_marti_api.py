@@ -12,7 +12,7 @@ from OpenSSL.crypto import X509
 
 from opentakserver.blueprints.marti_api.marti_api import verify_client_cert
 from opentakserver.extensions import db, ldap_manager, logger
-from opentakserver.functions import iso8601_string_from_datetime
+from opentakserver.functions import iso8601_string_from_datetime, notify_groups_changed
 from opentakserver.models.Group import Group
 from opentakserver.models.GroupUser import GroupUser
 
@@ -304,18 +304,20 @@ def put_active_groups():
                     group_subscription.enabled = active
                     db.session.add(group_subscription)
 
-                if active:
-                    channel.queue_bind(
-                        queue=uid,
-                        exchange="groups",
-                        routing_key=f"{group_subscription.group.name}.{group_subscription.direction}",
-                    )
-                else:
-                    channel.queue_unbind(
-                        queue=uid,
-                        exchange="groups",
-                        routing_key=f"{group_subscription.group.name}.{group_subscription.direction}",
-                    )
+                # With OTS_EUD_HANDLER_LOCAL_ROUTING the EUD has no queue, notify_groups_changed() updates it
+                if not app.config.get("OTS_EUD_HANDLER_LOCAL_ROUTING"):
+                    if active:
+                        channel.queue_bind(
+                            queue=uid,
+                            exchange="groups",
+                            routing_key=f"{group_subscription.group.name}.{group_subscription.direction}",
+                        )
+                    else:
+                        channel.queue_unbind(
+                            queue=uid,
+                            exchange="groups",
+                            routing_key=f"{group_subscription.group.name}.{group_subscription.direction}",
+                        )
 
                 user_in_group = True
 
@@ -342,6 +344,7 @@ def put_active_groups():
         channel.close()
         rabbit_connection.close()
         db.session.commit()
+        notify_groups_changed([user])
         return "", 200
     except BaseException as e:
         logger.error(f"Failed to update group subscriptions for {current_user.username}: {e}")
@@ -1,4 +1,5 @@
 import glob
+import json
 import os
 import traceback
 from urllib.parse import unquote, urlparse
@@ -13,6 +14,7 @@ from OpenSSL.crypto import X509
 from simplekml import Document, GxMultiTrack, GxTrack, Icon, IconStyle, Kml, Style
 
 from opentakserver import __version__ as version
+from opentakserver.archive import naive_utc, read_archive
 from opentakserver.extensions import db, logger
 from opentakserver.functions import datetime_from_iso8601_string, iso8601_string_from_datetime
 from opentakserver.models.EUD import EUD
@@ -128,18 +130,42 @@ def atak_track_history():
             query = query.filter(Point.device_uid == uid)
 
         if start_time:
-            query = query.filter(Point.timestamp >= datetime_from_iso8601_string(start_time))
+            start_time = datetime_from_iso8601_string(start_time)
+            query = query.filter(Point.timestamp >= start_time)
 
         if end_time:
-            query = query.filter(Point.timestamp <= datetime_from_iso8601_string(end_time))
+            end_time = datetime_from_iso8601_string(end_time)
+            query = query.filter(Point.timestamp <= end_time)
+
+        points = {}
+        for point in db.session.execute(query).scalars():
+            points[point.id] = (point.timestamp, point.longitude, point.latitude)
+
+        # Points that delete_old_data() has moved out of the database
+        if app.config.get("OTS_ARCHIVE_EXPIRED_DATA"):
+
+            def match(row: dict) -> bool:
+                return (
+                    row["device_uid"] == uid
+                    and (not start_time or row["timestamp"] >= naive_utc(start_time))
+                    and (not end_time or row["timestamp"] <= naive_utc(end_time))
+                )
+
+            for row in read_archive(
+                app.config.get("OTS_ARCHIVE_FOLDER"),
+                Point.__table__,
+                start_time,
+                end_time,
+                json.dumps(uid),
+                match,
+            ):
+                points.setdefault(row["id"], (row["timestamp"], row["longitude"], row["latitude"]))
 
-        points = db.session.execute(query)
         timestamps = []
         coords = []
-        for point in points:
-            point = point[0]
-            timestamps.append(iso8601_string_from_datetime(point.timestamp))
-            coords.append((point.longitude, point.latitude))
+        for timestamp, longitude, latitude in sorted(points.values(), key=lambda p: p[0]):
+            timestamps.append(iso8601_string_from_datetime(timestamp))
+            coords.append((longitude, latitude))
 
         multitrack: GxMultiTrack = doc.newgxmultitrack(gxinterpolate=0)
         multitrack.style = style
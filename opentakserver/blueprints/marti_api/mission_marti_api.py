@@ -23,8 +23,15 @@ from sqlalchemy import insert, or_, update
 from werkzeug.utils import secure_filename
 
 from opentakserver.blueprints.marti_api.marti_api import verify_client_cert
+from opentakserver.cot_event import CoTEvent
 from opentakserver.extensions import db, logger
-from opentakserver.functions import datetime_from_iso8601_string, iso8601_string_from_datetime
+from opentakserver.functions import (
+    SUBSCRIPTIONS_CHANGED_MESSAGE_TYPE,
+    datetime_from_iso8601_string,
+    iso8601_string_from_datetime,
+    notify_euds,
+    notify_missions_changed,
+)
 from opentakserver.models.CoT import CoT
 from opentakserver.models.EUD import EUD
 from opentakserver.models.Group import Group
@@ -581,6 +588,7 @@ def put_mission(mission_name: str):
 
             channel.close()
             rabbit_connection.close()
+            notify_missions_changed(mission_name)
     except sqlalchemy.exc.IntegrityError:
         # Mission exists, needs updating
         db.session.rollback()
@@ -679,7 +687,7 @@ def delete_mission(mission_name: str):
         if isinstance(role, flask.Response):
             return role
         # Safely access clientUid - handle SQLAlchemy result proxy issues
-        eud_uid = getattr(role, 'clientUid', None)
+        eud_uid = getattr(role, "clientUid", None)
         if not eud_uid:
             return jsonify({"success": False, "error": "Invalid client UID"}), 400
 
@@ -691,7 +699,7 @@ def delete_mission(mission_name: str):
 
         # Check if the UID in the token has the MISSION_OWNER role for this mission. If not, it can't delete the mission
         for role in mission.roles:
-            role_client_uid = getattr(role, 'clientUid', None)
+            role_client_uid = getattr(role, "clientUid", None)
             if role_client_uid == eud_uid and role.role_type == MissionRole.MISSION_OWNER:
                 can_delete = True
                 break
@@ -727,6 +735,7 @@ def delete_mission(mission_name: str):
         )
         channel.close()
         rabbit_connection.close()
+        notify_missions_changed(mission_name)
 
         return jsonify({"success": True})
     else:
@@ -756,7 +765,7 @@ def set_password(mission_name: str):
         role = verify_itak_certificate(mission_name)
         if isinstance(role, flask.Response):
             return role
-        eud_uid = getattr(role, 'clientUid', None)
+        eud_uid = getattr(role, "clientUid", None)
         if not eud_uid:
             return jsonify({"success": False, "error": "Invalid client UID"}), 400
 
@@ -1127,7 +1136,7 @@ def change_eud_role(mission_name: str):
         role = verify_itak_certificate(mission_name)
         if isinstance(role, flask.Response):
             return role
-        eud_uid = getattr(role, 'clientUid', None)
+        eud_uid = getattr(role, "clientUid", None)
         if not eud_uid:
             return jsonify({"success": False, "error": "Invalid client UID"}), 400
 
@@ -1489,18 +1498,22 @@ def mission_subscribe(mission_name: str = None, mission_guid: str = None):
             "role": role.to_json()["role"],
         }
 
-    rabbit_credentials = pika.PlainCredentials(
-        app.config.get("OTS_RABBITMQ_USERNAME"), app.config.get("OTS_RABBITMQ_PASSWORD")
-    )
-    rabbit_host = app.config.get("OTS_RABBITMQ_SERVER_ADDRESS")
-    rabbit_connection = pika.BlockingConnection(
-        pika.ConnectionParameters(host=rabbit_host, credentials=rabbit_credentials)
-    )
-    channel = rabbit_connection.channel()
-    channel.queue_declare(queue=uid)
-    channel.queue_bind(queue=uid, exchange="missions", routing_key=f"missions.{mission_name}")
-    channel.close()
-    rabbit_connection.close()
+    if app.config.get("OTS_EUD_HANDLER_LOCAL_ROUTING"):
+        # There's no queue for the EUD, its eud_handler reloads its subscriptions instead
+        notify_euds([uid], SUBSCRIPTIONS_CHANGED_MESSAGE_TYPE)
+    else:
+        rabbit_credentials = pika.PlainCredentials(
+            app.config.get("OTS_RABBITMQ_USERNAME"), app.config.get("OTS_RABBITMQ_PASSWORD")
+        )
+        rabbit_host = app.config.get("OTS_RABBITMQ_SERVER_ADDRESS")
+        rabbit_connection = pika.BlockingConnection(
+            pika.ConnectionParameters(host=rabbit_host, credentials=rabbit_credentials)
+        )
+        channel = rabbit_connection.channel()
+        channel.queue_declare(queue=uid)
+        channel.queue_bind(queue=uid, exchange="missions", routing_key=f"missions.{mission_name}")
+        channel.close()
+        rabbit_connection.close()
 
     # Delete any invitations to this mission for this EUD
     invitations = db.session.execute(
@@ -1526,7 +1539,7 @@ def mission_unsubscribe(mission_name: str):
         role = verify_itak_certificate(mission_name)
         if isinstance(role, flask.Response):
             return role
-        eud_uid = getattr(role, 'clientUid', None)
+        eud_uid = getattr(role, "clientUid", None)
         if not eud_uid:
             return jsonify({"success": False, "error": "Invalid client UID"}), 400
 
@@ -1542,17 +1555,22 @@ def mission_unsubscribe(mission_name: str):
         db.session.delete(role[0])
         db.session.commit()
 
-    rabbit_credentials = pika.PlainCredentials(
-        app.config.get("OTS_RABBITMQ_USERNAME"), app.config.get("OTS_RABBITMQ_PASSWORD")
-    )
-    rabbit_host = app.config.get("OTS_RABBITMQ_SERVER_ADDRESS")
-    rabbit_connection = pika.BlockingConnection(
-        pika.ConnectionParameters(host=rabbit_host, credentials=rabbit_credentials)
-    )
-    channel = rabbit_connection.channel()
-    channel.queue_unbind(queue=eud_uid, exchange="missions", routing_key=f"missions.{mission_name}")
-    channel.close()
-    rabbit_connection.close()
+    if app.config.get("OTS_EUD_HANDLER_LOCAL_ROUTING"):
+        notify_euds([eud_uid], SUBSCRIPTIONS_CHANGED_MESSAGE_TYPE)
+    else:
+        rabbit_credentials = pika.PlainCredentials(
+            app.config.get("OTS_RABBITMQ_USERNAME"), app.config.get("OTS_RABBITMQ_PASSWORD")
+        )
+        rabbit_host = app.config.get("OTS_RABBITMQ_SERVER_ADDRESS")
+        rabbit_connection = pika.BlockingConnection(
+            pika.ConnectionParameters(host=rabbit_host, credentials=rabbit_credentials)
+        )
+        channel = rabbit_connection.channel()
+        channel.queue_unbind(
+            queue=eud_uid, exchange="missions", routing_key=f"missions.{mission_name}"
+        )
+        channel.close()
+        rabbit_connection.close()
 
     return "", 200
 
@@ -2025,7 +2043,7 @@ def delete_content(mission_name: str):
         role = verify_itak_certificate(mission_name)
         if isinstance(role, flask.Response):
             return role
-        eud_uid = getattr(role, 'clientUid', None)
+        eud_uid = getattr(role, "clientUid", None)
         if not eud_uid:
             return jsonify({"success": False, "error": "Invalid client UID"}), 400
 
@@ -2079,7 +2097,7 @@ def delete_content(mission_name: str):
             cot_event = cot_event[0]
             cot_event.mission_name = None
             db.session.add(cot_event)
-            cot_event = BeautifulSoup(cot_event.xml, "xml").find("event")
+            cot_event = CoTEvent.from_xml(cot_event.xml)
 
     # Files will be kept in the DB so the mission log is correct and on disk in case it gets added back to a mission
     content = None
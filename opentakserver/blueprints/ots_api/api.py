@@ -19,6 +19,7 @@ from flask_babel import gettext
 from flask_ldap3_login import AuthenticationResponseStatus
 from flask_security import auth_required, current_user, verify_password
 from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 
 from opentakserver import __version__ as version
 from opentakserver.certificate_authority import CertificateAuthority
@@ -39,6 +40,7 @@ from opentakserver.models.RBLine import RBLine
 from opentakserver.models.Token import Token
 from opentakserver.models.user import User
 from opentakserver.models.ZMIST import ZMIST
+from opentakserver.process_stats import read_stats, total_stats
 
 api_blueprint = Blueprint("api_blueprint", __name__)
 
@@ -241,6 +243,7 @@ def status():
     }
 
     online_euds = db.session.execute(select(EUD).filter(EUD.last_status == "Connected")).all()
+    process_stats = read_stats(app.config.get("OTS_DATA_FOLDER"))
 
     response = {
         "online_euds": len(online_euds),
@@ -257,6 +260,8 @@ def status():
         "uname": uname,
         "os_release": os_release,
         "python_version": platform.python_version(),
+        "process_stats": process_stats,
+        "process_totals": total_stats(process_stats),
     }
 
     return jsonify(response)
@@ -536,7 +541,9 @@ def get_map_state():
     try:
         results = {"euds": [], "markers": [], "rb_lines": [], "casevacs": []}
 
-        euds = db.session.execute(db.session.query(EUD)).all()
+        euds = db.session.execute(
+            db.session.query(EUD).options(selectinload(EUD.current_track))
+        ).all()
         for eud in euds:
             results["euds"].append(eud[0].to_json())
 
@@ -12,6 +12,7 @@ from flask_security import auth_required, roles_required
 
 from opentakserver.blueprints.ots_api.api import paginate, search
 from opentakserver.extensions import db, ldap_manager, logger
+from opentakserver.functions import notify_groups_changed
 from opentakserver.models.Group import Group
 from opentakserver.models.GroupUser import GroupUser
 
@@ -230,13 +231,16 @@ def remove_user_from_group():
             pika.ConnectionParameters(host=rabbit_host, credentials=rabbit_credentials)
         )
         channel = rabbit_connection.channel()
-        for eud in user.euds:
-            channel.queue_unbind(
-                exchange="groups", queue=eud.uid, routing_key=f"{group_name}.{direction}"
-            )
+        # With OTS_EUD_HANDLER_LOCAL_ROUTING there are no queues to unbind, notify_groups_changed() takes care of it
+        if not app.config.get("OTS_EUD_HANDLER_LOCAL_ROUTING"):
+            for eud in user.euds:
+                channel.queue_unbind(
+                    exchange="groups", queue=eud.uid, routing_key=f"{group_name}.{direction}"
+                )
 
         channel.close()
         rabbit_connection.close()
+        notify_groups_changed([user])
 
         return jsonify({"success": True})
     except BaseException as e:
@@ -399,6 +403,7 @@ def add_user_to_group():
         try:
             db.session.add(membership)
             db.session.commit()
+            notify_groups_changed([user])
         except sqlalchemy.exc.IntegrityError:
             db.session.rollback()
 
@@ -449,9 +454,15 @@ def delete_group():
 
         group = group[0]
 
+        members = db.session.execute(
+            db.session.query(GroupUser).filter_by(group_id=group.id)
+        ).scalars()
+        users = list({membership.user for membership in members})
+
         GroupUser.query.filter_by(group_id=group.id).delete()
         db.session.delete(group)
         db.session.commit()
+        notify_groups_changed(users)
     except BaseException as e:
         logger.error(f"Failed to delete {request.args.get('group_name')}: {e}")
         logger.debug(traceback.format_exc())
@@ -28,6 +28,7 @@ from opentakserver.blueprints.marti_api.mission_marti_api import (
 )
 from opentakserver.blueprints.ots_api.api import paginate, search
 from opentakserver.extensions import db, logger
+from opentakserver.functions import notify_missions_changed
 from opentakserver.models.CoT import CoT
 from opentakserver.models.EUD import EUD
 from opentakserver.models.Group import Group
@@ -229,6 +230,7 @@ def create_edit_mission():
             ),
         )
         channel.close()
+        notify_missions_changed(mission.name)
 
         return jsonify({"success": True})
 
@@ -356,6 +358,7 @@ def delete_mission():
     )
     channel.close()
     rabbit_connection.close()
+    notify_missions_changed(mission_name)
 
     return jsonify({"success": True})
 
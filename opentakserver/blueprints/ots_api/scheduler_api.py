@@ -2,10 +2,13 @@ from apscheduler.triggers.combining import AndTrigger, OrTrigger
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.date import DateTrigger
 from apscheduler.triggers.interval import IntervalTrigger
-from flask import Blueprint, jsonify, request
+from flask import Blueprint
+from flask import current_app as app
+from flask import jsonify, request
 from flask_apscheduler import api
 from flask_security import roles_accepted
 
+from opentakserver.blueprints.scheduled_jobs import JobProgress
 from opentakserver.extensions import apscheduler
 
 scheduler_api_blueprint = Blueprint("schedule_api_blueprint", __name__)
@@ -23,6 +26,27 @@ def get_jobs():
     return api.get_jobs()
 
 
+@scheduler_api_blueprint.route("/api/scheduler/job/progress", strict_slashes=False)
+@roles_accepted("administrator")
+def get_job_progress():
+    job_id = request.args.get("job_id")
+    if not job_id:
+        return (
+            {"success": False, "errors": "Please provide a job_id"},
+            400,
+            {"Content-Type": "application/json"},
+        )
+
+    progress = JobProgress.for_app(app).get(job_id)
+    if progress is None:
+        return (
+            {"success": False, "error": f"No progress for {job_id}"},
+            404,
+            {"Content-Type": "application/json"},
+        )
+    return jsonify(progress)
+
+
 @scheduler_api_blueprint.route("/api/scheduler/job/pause", methods=["POST"], strict_slashes=False)
 @roles_accepted("administrator")
 def pause_job():
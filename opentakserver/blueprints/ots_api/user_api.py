@@ -16,6 +16,7 @@ from flask_security import (
 
 from opentakserver.blueprints.ots_api.api import paginate, search
 from opentakserver.extensions import db, ldap_manager, logger
+from opentakserver.functions import notify_groups_changed
 from opentakserver.models.EUD import EUD
 from opentakserver.models.Group import Group
 from opentakserver.models.GroupUser import GroupUser
@@ -614,4 +615,5 @@ def add_user_to_groups():
         except sqlalchemy.exc.IntegrityError:
             db.session.rollback()
 
+    notify_groups_changed([user])
     return jsonify({"success": True})
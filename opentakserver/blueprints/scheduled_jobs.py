@@ -1,6 +1,7 @@
 import datetime
 import json
 import traceback
+from threading import Lock
 from xml.etree.ElementTree import tostring
 
 import adsbxcot
@@ -8,13 +9,16 @@ import aiscot
 import pika
 import requests
 from bs4 import BeautifulSoup
-from flask import Blueprint
+from flask import Blueprint, Flask
 from flask import current_app as app
-from sqlalchemy import delete
+from sqlalchemy import delete, select
 
+from opentakserver import cot_envelope
+from opentakserver.archive import archive_expired
+from opentakserver.cot_event import CoTEvent
+from opentakserver.cot_storage import delete_unused_details
 from opentakserver.extensions import apscheduler, db, logger
 from opentakserver.functions import (
-    datetime_from_iso8601_string,
     generate_delete_cot,
     iso8601_string_from_datetime,
 )
@@ -24,6 +28,7 @@ from opentakserver.models.Certificate import Certificate
 from opentakserver.models.Chatrooms import Chatroom
 from opentakserver.models.ChatroomsUids import ChatroomsUids
 from opentakserver.models.CoT import CoT
+from opentakserver.models.CurrentTrack import CurrentTrack
 from opentakserver.models.DataPackage import DataPackage
 from opentakserver.models.EUD import EUD
 from opentakserver.models.GeoChat import GeoChat
@@ -41,9 +46,12 @@ from opentakserver.models.Team import Team
 from opentakserver.models.VideoRecording import VideoRecording
 from opentakserver.models.VideoStream import VideoStream
 from opentakserver.models.ZMIST import ZMIST
+from opentakserver.partitions import create_future_partitions, delete_expired
 
 scheduler_blueprint = Blueprint("scheduler_blueprint", __name__)
 
+_create_lock = Lock()
+
 
 def get_adsb_data():
     with apscheduler.app.app_context():
@@ -180,6 +188,7 @@ def purge_data():
     Marker.query.delete()
     GeoChat.query.delete()
     Point.query.delete()
+    CurrentTrack.query.delete()
     RBLine.query.delete()
     Chatroom.query.delete()
     CoT.query.delete()
@@ -273,118 +282,231 @@ def get_aishub_data():
             logger.debug(traceback.format_exc())
 
 
+class JobProgress:
+    """Progress of the scheduled jobs that report it, served by /api/scheduler/job/progress. Use
+    JobProgress.for_app(app).
+    """
+
+    def __init__(self):
+        self.jobs: dict[str, dict] = {}
+        self.lock = Lock()
+
+    @classmethod
+    def for_app(cls, app: Flask) -> "JobProgress":
+        with _create_lock:
+            if "ots_job_progress" not in app.extensions:
+                app.extensions["ots_job_progress"] = cls()
+        return app.extensions["ots_job_progress"]
+
+    def start(self, job_id: str, **info):
+        with self.lock:
+            self.jobs[job_id] = {
+                "running": True,
+                "started": iso8601_string_from_datetime(
+                    datetime.datetime.now(datetime.timezone.utc)
+                ),
+                "finished": None,
+                "stage": None,
+                "counts": {},
+                "error": None,
+                **info,
+            }
+
+    def set_stage(self, job_id: str, stage: str):
+        with self.lock:
+            self.jobs[job_id]["stage"] = stage
+
+    def add(self, job_id: str, name: str, count: int):
+        with self.lock:
+            counts = self.jobs[job_id]["counts"]
+            counts[name] = counts.get(name, 0) + count
+
+    def finish(self, job_id: str, error: str | None = None):
+        with self.lock:
+            self.jobs[job_id].update(
+                running=False,
+                stage=None,
+                error=error,
+                finished=iso8601_string_from_datetime(datetime.datetime.now(datetime.timezone.utc)),
+            )
+
+    def get(self, job_id: str) -> dict | None:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job, counts=dict(job["counts"])) if job else None
+
+
+def publish_delete_cots(channel, group_names: list[str], deleted: list[tuple[str, str | None]]):
+    """Tells every group's EUDs to remove the (uid, type) objects. Each delete CoT is packed once and published to
+    every group and the firehose
+    """
+    envelope_format = app.config.get("OTS_RABBITMQ_ENVELOPE")
+    properties = pika.BasicProperties(
+        content_type=cot_envelope.content_type(envelope_format),
+        expiration=app.config.get("OTS_RABBITMQ_TTL"),
+    )
+    for uid, cot_type in deleted:
+        body = cot_envelope.pack(
+            CoTEvent.from_xml(tostring(generate_delete_cot(uid, cot_type or ""))),
+            app.config["OTS_NODE_ID"],
+            envelope_format,
+        )
+        # Consumers expect one CoT per message
+        for group_name in group_names:
+            channel.basic_publish(
+                exchange="groups",
+                routing_key=f"{group_name}.{Group.OUT}",
+                body=body,
+                properties=properties,
+            )
+        channel.basic_publish(exchange="firehose", routing_key="", body=body, properties=properties)
+
+
+def delete_expired_objects(
+    model, timestamp_column, cutoff, channel, group_names: list[str], progress: JobProgress
+):
+    """Deletes markers, alerts or R&B lines older than cutoff in batches, paging through them by id, and sends a
+    delete CoT for each one
+    """
+    name = model.__tablename__
+    progress.set_stage("delete_old_data", name)
+    batch_size = app.config.get("OTS_DELETE_OLD_DATA_BATCH_SIZE")
+
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(model.id, model.uid, CoT.type)
+            .outerjoin(CoT, CoT.id == model.cot_id)
+            .where(timestamp_column <= cutoff, model.id > last_id)
+            .order_by(model.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+
+        publish_delete_cots(channel, group_names, [(row.uid, row.type) for row in rows])
+        db.session.execute(delete(model).where(model.id.in_([row.id for row in rows])))
+        db.session.commit()
+        progress.add("delete_old_data", name, len(rows))
+
+        last_id = rows[-1].id
+        if len(rows) < batch_size:
+            return
+
+
 def delete_old_data():
     with apscheduler.app.app_context():
-        timestamp = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+        progress = JobProgress.for_app(app)
+        retention = datetime.timedelta(
             seconds=app.config.get("OTS_DELETE_OLD_DATA_SECONDS"),
             minutes=app.config.get("OTS_DELETE_OLD_DATA_MINUTES"),
             hours=app.config.get("OTS_DELETE_OLD_DATA_HOURS"),
             days=app.config.get("OTS_DELETE_OLD_DATA_DAYS"),
             weeks=app.config.get("OTS_DELETE_OLD_DATA_WEEKS"),
         )
+        timestamp = datetime.datetime.now(datetime.timezone.utc) - retention
+        progress.start("delete_old_data", cutoff=iso8601_string_from_datetime(timestamp))
 
-        rabbit_credentials = pika.PlainCredentials(
-            app.config.get("OTS_RABBITMQ_USERNAME"), app.config.get("OTS_RABBITMQ_PASSWORD")
-        )
-        rabbit_host = app.config.get("OTS_RABBITMQ_SERVER_ADDRESS")
-        rabbit_connection = pika.BlockingConnection(
-            pika.ConnectionParameters(host=rabbit_host, credentials=rabbit_credentials)
-        )
-        channel = rabbit_connection.channel()
-
-        # I wish I hadn't made the marker's timestamp field a string...
-        markers = db.session.execute(db.session.query(Marker)).all()
-        groups = db.session.execute(db.session.query(Group)).scalars()
-        for marker in markers:
-            marker = marker[0]
-            if datetime_from_iso8601_string(marker.production_time) <= timestamp:
-                cot = generate_delete_cot(marker.uid, marker.cot.type)
-                for group in groups:
-                    channel.basic_publish(
-                        exchange="groups",
-                        routing_key=f"{group.name}.{Group.OUT}",
-                        body=json.dumps(
-                            {"cot": tostring(cot).decode("utf-8"), "uid": app.config["OTS_NODE_ID"]}
-                        ),
-                        properties=pika.BasicProperties(expiration=app.config.get("OTS_RABBITMQ_TTL")),
-                    )
-                    channel.basic_publish(
-                        exchange="firehose",
-                        routing_key="",
-                        body=json.dumps(
-                            {"cot": tostring(cot).decode("utf-8"), "uid": app.config["OTS_NODE_ID"]}
-                        ),
-                        properties=pika.BasicProperties(expiration=app.config.get("OTS_RABBITMQ_TTL")),
-                    )
-                db.session.delete(marker)
+        rabbit_connection = None
+        try:
+            rabbit_credentials = pika.PlainCredentials(
+                app.config.get("OTS_RABBITMQ_USERNAME"), app.config.get("OTS_RABBITMQ_PASSWORD")
+            )
+            rabbit_host = app.config.get("OTS_RABBITMQ_SERVER_ADDRESS")
+            rabbit_connection = pika.BlockingConnection(
+                pika.ConnectionParameters(host=rabbit_host, credentials=rabbit_credentials)
+            )
+            channel = rabbit_connection.channel()
 
-        alerts = db.session.execute(db.session.query(Alert).where(Alert.start_time <= timestamp)).all()
-        for alert in alerts:
-            alert = alert[0]
-            cot = generate_delete_cot(alert.uid, alert.cot.type)
-            for group in groups:
-                channel.basic_publish(
-                    exchange="groups",
-                    routing_key=f"{group.name}.{Group.OUT}",
-                    body=json.dumps(
-                        {"cot": tostring(cot).decode("utf-8"), "uid": app.config["OTS_NODE_ID"]}
-                    ),
-                    properties=pika.BasicProperties(expiration=app.config.get("OTS_RABBITMQ_TTL")),
-                )
-                channel.basic_publish(
-                    exchange="firehose",
-                    routing_key="",
-                    body=json.dumps(
-                        {"cot": tostring(cot).decode("utf-8"), "uid": app.config["OTS_NODE_ID"]}
-                    ),
-                    properties=pika.BasicProperties(expiration=app.config.get("OTS_RABBITMQ_TTL")),
-                )
-            db.session.delete(alert)
+            group_names = db.session.execute(select(Group.name)).scalars().all()
+            delete_expired_objects(
+                Marker, Marker.timestamp, timestamp, channel, group_names, progress
+            )
+            delete_expired_objects(
+                Alert, Alert.start_time, timestamp, channel, group_names, progress
+            )
+            delete_expired_objects(
+                RBLine, RBLine.timestamp, timestamp, channel, group_names, progress
+            )
 
-        rb_lines = db.session.execute(
-            db.session.query(RBLine).where(RBLine.timestamp <= timestamp)
-        ).all()
-        for rb_line in rb_lines:
-            rb_line = rb_line[0]
-            cot = generate_delete_cot(rb_line.uid, rb_line.cot.type)
-            for group in groups:
-                channel.basic_publish(
-                    exchange="groups",
-                    routing_key=f"{group.name}.{Group.OUT}",
-                    body=json.dumps(
-                        {"cot": tostring(cot).decode("utf-8"), "uid": app.config["OTS_NODE_ID"]}
-                    ),
-                    properties=pika.BasicProperties(expiration=app.config.get("OTS_RABBITMQ_TTL")),
-                )
-                channel.basic_publish(
-                    exchange="firehose",
-                    routing_key="",
-                    body=json.dumps(
-                        {"cot": tostring(cot).decode("utf-8"), "uid": app.config["OTS_NODE_ID"]}
-                    ),
-                    properties=pika.BasicProperties(expiration=app.config.get("OTS_RABBITMQ_TTL")),
+            batch_size = app.config.get("OTS_DELETE_OLD_DATA_BATCH_SIZE")
+            progress.set_stage("delete_old_data", "geochat")
+            delete_expired(
+                db.session,
+                GeoChat.__table__,
+                timestamp,
+                batch_size,
+                lambda count: progress.add("delete_old_data", "geochat", count),
+            )
+
+            timestamp = datetime.datetime.now() - retention
+
+            progress.set_stage("delete_old_data", "current_tracks")
+            result = db.session.execute(
+                delete(CurrentTrack).where(CurrentTrack.timestamp <= timestamp)
+            )
+            db.session.commit()
+            progress.add("delete_old_data", "current_tracks", result.rowcount)
+
+            if app.config.get("OTS_HISTORY_PARTITION_INTERVAL"):
+                progress.set_stage("delete_old_data", "partitions")
+                create_future_partitions(
+                    db.session,
+                    app.config.get("OTS_HISTORY_PARTITION_INTERVAL"),
+                    app.config.get("OTS_HISTORY_PARTITIONS_AHEAD"),
                 )
-            db.session.delete(rb_line)
 
-        db.session.execute(delete(GeoChat).where(GeoChat.timestamp <= timestamp))
+            # Points first, they reference CoTs
+            for table in (Point.__table__, CoT.__table__):
+                max_id = None
+                if app.config.get("OTS_ARCHIVE_EXPIRED_DATA"):
+                    progress.set_stage("delete_old_data", f"archive_{table.name}")
+                    max_id = archive_expired(
+                        db.session,
+                        table,
+                        timestamp,
+                        app.config.get("OTS_ARCHIVE_FOLDER"),
+                        batch_size,
+                        app.config.get("OTS_ARCHIVE_COMPRESSION_LEVEL"),
+                        lambda count, name=f"archived_{table.name}": progress.add(
+                            "delete_old_data", name, count
+                        ),
+                    )
+                    # Nothing was archived so nothing can be deleted
+                    if max_id is None:
+                        continue
 
-        timestamp = datetime.datetime.now() - datetime.timedelta(
-            seconds=app.config.get("OTS_DELETE_OLD_DATA_SECONDS"),
-            minutes=app.config.get("OTS_DELETE_OLD_DATA_MINUTES"),
-            hours=app.config.get("OTS_DELETE_OLD_DATA_HOURS"),
-            days=app.config.get("OTS_DELETE_OLD_DATA_DAYS"),
-            weeks=app.config.get("OTS_DELETE_OLD_DATA_WEEKS"),
-        )
+                progress.set_stage("delete_old_data", table.name)
+                delete_expired(
+                    db.session,
+                    table,
+                    timestamp,
+                    batch_size,
+                    lambda count, name=table.name: progress.add("delete_old_data", name, count),
+                    max_id,
+                )
 
-        db.session.execute(delete(EUD).where(EUD.last_event_time <= timestamp))
-        db.session.execute(delete(Point).where(Point.timestamp <= timestamp))
-        db.session.execute(delete(CoT).where(CoT.timestamp <= timestamp))
-        db.session.commit()
+            progress.set_stage("delete_old_data", "cot_details")
+            progress.add(
+                "delete_old_data", "cot_details", delete_unused_details(db.session, timestamp)
+            )
 
-        channel.close()
-        rabbit_connection.close()
+            # After the CoTs so there's little left for the cascade
+            progress.set_stage("delete_old_data", "euds")
+            result = db.session.execute(delete(EUD).where(EUD.last_event_time <= timestamp))
+            db.session.commit()
+            progress.add("delete_old_data", "euds", result.rowcount)
 
-        logger.info(f"Deleted data older than {iso8601_string_from_datetime(timestamp)}")
+            progress.finish("delete_old_data")
+            logger.info(f"Deleted data older than {iso8601_string_from_datetime(timestamp)}")
+        except BaseException as e:
+            db.session.rollback()
+            progress.finish("delete_old_data", str(e))
+            logger.error(f"Failed to delete old data: {e}")
+            logger.debug(traceback.format_exc())
+        finally:
+            if rabbit_connection and rabbit_connection.is_open:
+                rabbit_connection.close()
 
 
 # This function is to prevent errors caused by changing get_airplanes_live_data() to get_adsb_data
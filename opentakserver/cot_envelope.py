@@ -0,0 +1,72 @@
+import json
+import re
+from xml.sax.saxutils import unescape
+
+from opentakserver.cot_event import CoTEvent
+from opentakserver.proto.cot_envelope_pb2 import CoTEnvelope
+
+# Incremented when a change to cot_envelope.proto would break older consumers
+ENVELOPE_VERSION = 1
+CONTENT_TYPE = "application/x-protobuf; proto=opentakserver.CoTEnvelope"
+JSON_CONTENT_TYPE = "application/json"
+
+EVENT_TAG_REGEX = re.compile(r"<event\s[^>]*>")
+ATTRIBUTE_REGEX = re.compile(r"""\s(uid|type|how)\s*=\s*(["'])(.*?)\2""", re.DOTALL)
+ENTITIES = {"&quot;": '"', "&apos;": "'"}
+
+
+def pack(event: CoTEvent, sender_uid: str | None, envelope_format: str = "protobuf") -> bytes:
+    """Serializes a CoT for the internal exchanges. Do this once per CoT and publish the same bytes everywhere.
+
+    envelope_format "json" publishes the old {"uid": ..., "cot": ...} format for consumers that haven't been updated.
+    """
+    if envelope_format == "json":
+        return json.dumps({"uid": sender_uid, "cot": event.xml}).encode()
+
+    envelope = CoTEnvelope(
+        version=ENVELOPE_VERSION,
+        sender_uid=sender_uid or "",
+        uid=event.uid or "",
+        type=event.type or "",
+        how=event.how or "",
+        xml=event.xml.encode("utf-8"),
+    )
+
+    if event.point:
+        try:
+            envelope.latitude = float(event.point["lat"])
+            envelope.longitude = float(event.point["lon"])
+            envelope.hae = float(event.point.get("hae", 0))
+            envelope.has_point = True
+        except (KeyError, ValueError):
+            pass
+
+    return envelope.SerializeToString()
+
+
+def content_type(envelope_format: str = "protobuf") -> str:
+    return JSON_CONTENT_TYPE if envelope_format == "json" else CONTENT_TYPE
+
+
+def unpack(body: bytes) -> CoTEnvelope:
+    """Reads a message from one of the internal exchanges.
+
+    Messages in the JSON format only carry sender_uid and xml. Their uid, type and how are read from the <event> tag
+    without parsing the rest of the XML so position reports can still be coalesced.
+    """
+    if body[:1] == b"{":
+        message = json.loads(body)
+        envelope = CoTEnvelope(
+            sender_uid=message.get("uid") or "", xml=message["cot"].encode("utf-8")
+        )
+        event_tag = EVENT_TAG_REGEX.search(message["cot"])
+        if event_tag:
+            for name, quote, value in ATTRIBUTE_REGEX.findall(event_tag.group()):
+                setattr(envelope, name, unescape(value, ENTITIES))
+        return envelope
+
+    envelope = CoTEnvelope.FromString(body)
+    if envelope.version > ENVELOPE_VERSION:
+        raise ValueError(f"Unsupported CoT envelope version {envelope.version}")
+
+    return envelope
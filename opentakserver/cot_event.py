@@ -0,0 +1,103 @@
+from dataclasses import dataclass, field
+
+from lxml import etree
+
+# Don't resolve entities or load anything over the network, CoT comes from untrusted EUDs
+_parser = etree.XMLParser(
+    resolve_entities=False,
+    no_network=True,
+    remove_comments=True,
+    remove_pis=True,
+    huge_tree=False,
+)
+
+
+class CoTParseError(ValueError):
+    pass
+
+
+def parse_xml(xml: bytes | str) -> etree._Element:
+    if isinstance(xml, str):
+        xml = xml.encode("utf-8")
+
+    try:
+        return etree.fromstring(xml, _parser)
+    except etree.XMLSyntaxError as e:
+        raise CoTParseError(f"Invalid XML: {e}") from e
+
+
+@dataclass(slots=True)
+class CoTEvent:
+    """A CoT <event> parsed once and passed to everything that needs it.
+
+    The tags that almost every message has are pulled out into plain dicts of their attributes. Anything else can
+    be looked up with find(), which returns an lxml element. xml is the message exactly as it was received so it
+    can be forwarded without serializing it again.
+    """
+
+    xml: str
+    element: etree._Element
+    uid: str | None = None
+    type: str | None = None
+    how: str | None = None
+    time: str | None = None
+    start: str | None = None
+    stale: str | None = None
+    point: dict | None = None
+    track: dict | None = None
+    contact: dict | None = None
+    takv: dict | None = None
+    chat: dict | None = None
+    dests: list[dict] = field(default_factory=list)
+    detail: etree._Element | None = None
+    # The name of every tag under <detail>
+    tags: set[str] = field(default_factory=set)
+
+    @classmethod
+    def from_xml(cls, xml: bytes | str) -> "CoTEvent":
+        element = parse_xml(xml)
+        if element.tag != "event":
+            raise CoTParseError(f"Expected an <event>, got <{element.tag}>")
+
+        if isinstance(xml, bytes):
+            xml = xml.decode("utf-8")
+
+        attrib = element.attrib
+        event = cls(
+            xml,
+            element,
+            uid=attrib.get("uid"),
+            type=attrib.get("type"),
+            how=attrib.get("how"),
+            time=attrib.get("time"),
+            start=attrib.get("start"),
+            stale=attrib.get("stale"),
+        )
+
+        point = element.find("point")
+        if point is not None:
+            event.point = dict(point.attrib)
+
+        event.detail = element.find("detail")
+        if event.detail is None:
+            return event
+
+        for tag in event.detail.iter(etree.Element):
+            name = tag.tag
+            event.tags.add(name)
+            if name == "dest":
+                event.dests.append(dict(tag.attrib))
+            elif name == "contact" and event.contact is None:
+                event.contact = dict(tag.attrib)
+            elif name == "takv" and event.takv is None:
+                event.takv = dict(tag.attrib)
+            elif name == "track" and event.track is None:
+                event.track = dict(tag.attrib)
+            elif name == "__chat" and event.chat is None:
+                event.chat = dict(tag.attrib)
+
+        return event
+
+    def find(self, tag: str) -> etree._Element | None:
+        """The first element anywhere in the event named tag"""
+        return self.element.find(f".//{tag}")
@@ -1,5 +1,6 @@
 import base64
 import datetime
+import json
 import logging
 import os
 import platform
@@ -8,6 +9,7 @@ import sys
 import time
 import traceback
 from logging.handlers import TimedRotatingFileHandler
+from xml.etree.ElementTree import tostring
 
 import bleach
 import colorlog
@@ -16,7 +18,6 @@ import pika
 import sqlalchemy.exc
 import unishox2
 import yaml
-from bs4 import BeautifulSoup
 from flask import Flask, jsonify
 from flask_security import SQLAlchemyUserDatastore
 from flask_security.models import fsqla
@@ -25,6 +26,10 @@ from meshtastic import BROADCAST_NUM, mesh_pb2, mqtt_pb2, portnums_pb2
 from pika.channel import Channel
 from sqlalchemy import exc, insert, select, update
 
+from opentakserver import cot_envelope
+from opentakserver.cot_event import CoTEvent
+from opentakserver.cot_parser.handlers import HandlerRegistry
+from opentakserver.cot_storage import CoTXmlEncoder
 from opentakserver.defaultconfig import DefaultConfig
 from opentakserver.extensions import db, logger
 from opentakserver.functions import *
@@ -35,6 +40,7 @@ from opentakserver.models.Certificate import Certificate
 from opentakserver.models.Chatrooms import Chatroom
 from opentakserver.models.ChatroomsUids import ChatroomsUids
 from opentakserver.models.CoT import CoT
+from opentakserver.models.CurrentTrack import CurrentTrack, upsert_current_tracks
 from opentakserver.models.DataPackage import DataPackage
 from opentakserver.models.DeviceProfiles import DeviceProfiles
 from opentakserver.models.EUD import EUD
@@ -58,8 +64,15 @@ from opentakserver.models.VideoRecording import VideoRecording
 from opentakserver.models.VideoStream import VideoStream
 from opentakserver.models.WebAuthn import WebAuthn
 from opentakserver.models.ZMIST import ZMIST
+from opentakserver.process_stats import write_stats
 from opentakserver.proto import atak_pb2
 
+# a-[affiliation]-[battle dimension] and spot map types that are saved as markers
+MARKER_TYPES = tuple(f"a-{a}-{d}" for a in "fhupansjk" for d in "ZPAGSUF") + ("b-m-p",)
+
+# Handlers that write_batch() saves for the whole batch instead of calling them for each message
+BATCHED_HANDLERS = ("marker", "stats", "mission_content")
+
 
 class CoTController:
 
@@ -74,6 +87,54 @@ class CoTController:
         self.rabbit_connection: pika.BlockingConnection = None
         self.rabbit_channel = None
 
+        # Messages waiting to be written to the database together. Each item is (delivery_tag, event, uid)
+        self.batch_size = self.context.app.config.get("OTS_COT_PARSER_BATCH_SIZE")
+        self.batch_linger = self.context.app.config.get("OTS_COT_PARSER_BATCH_LINGER_MS") / 1000
+        self.batch = []
+        self.batch_timer = None
+        self.batch_stats = {
+            "batch_size": self.batch_size,
+            "batches": 0,
+            "messages": 0,
+            "failed_batches": 0,
+            "full_batches": 0,
+            "linger_batches": 0,
+            "last_batch_size": 0,
+            "max_batch_size": 0,
+            "write_seconds": 0.0,
+            "max_write_seconds": 0.0,
+        }
+        self.stats_written = 0
+
+        # Positions with these types only update current_tracks instead of also being saved to points and cot
+        self.no_history_types = tuple(
+            self.context.app.config.get("OTS_COT_PARSER_NO_HISTORY_TYPES") or ()
+        )
+        self.xml_encoder = CoTXmlEncoder.for_app(self.context.app)
+
+        self.handlers = HandlerRegistry()
+        self.register_handlers()
+        self.handlers.load_plugins()
+
+    def register_handlers(self):
+        self.handlers.register("geochat", self.parse_geochat, tags=("__chat",))
+        self.handlers.register("video", self.parse_video, tags=("__video",))
+        self.handlers.register("alert", self.parse_alert, tags=("emergency",))
+        self.handlers.register("casevac", self.parse_casevac, tags=("_medevac_",))
+        self.handlers.register(
+            "marker",
+            self.parse_marker,
+            types=MARKER_TYPES,
+            # Ignore video streams from sources like OpenTAK ICU
+            exclude_types=("b-m-p-s-p-loc",),
+            # Don't worry about EUD location updates
+            exclude_tags=("takv", "contact"),
+        )
+        self.handlers.register("rbline", self.parse_rbline, types=("u-rb",))
+        self.handlers.register("stats", self.parse_stats, tags=("stats",))
+        self.handlers.register("eud_disconnected", self.update_disconnected_eud, types=("t-x-d-d",))
+        self.handlers.register("mission_content", self.parse_mission_content, tags=("dest",))
+
     def run(self):
         rabbit_credentials = pika.PlainCredentials(
             app.config.get("OTS_RABBITMQ_USERNAME"), app.config.get("OTS_RABBITMQ_PASSWORD")
@@ -87,288 +148,303 @@ class CoTController:
         self.rabbit_channel.queue_bind(
             exchange="cot_parser", queue="cot_parser", routing_key="cot_parser"
         )
-        self.rabbit_channel.basic_qos(
-            prefetch_count=self.context.app.config.get("OTS_RABBITMQ_PREFETCH")
-        )
+        # Batches can't fill up unless RabbitMQ sends enough messages without waiting for them to be acked
+        prefetch = self.context.app.config.get("OTS_RABBITMQ_PREFETCH")
+        if self.batch_size > 1:
+            prefetch = max(prefetch, self.batch_size * 2)
+        self.rabbit_channel.basic_qos(prefetch_count=prefetch)
         self.rabbit_channel.basic_consume(
             queue="cot_parser", on_message_callback=self.on_message, auto_ack=False
         )
         self.rabbit_channel.start_consuming()
 
-    def insert_cot(self, soup, event, uid):
-        start = datetime_from_iso8601_string(event.attrs["start"])
-        stale = datetime_from_iso8601_string(event.attrs["stale"])
-        timestamp = datetime_from_iso8601_string(event.attrs["time"])
-
+    def build_cot(self, event: CoTEvent, uid) -> CoT:
         # Assign CoT to a data sync mission
-        dest = event.find("dest")
         mission_name = None
-        if dest and "mission" in dest.attrs:
-            mission_name = dest.attrs["mission"]
+        if event.dests and "mission" in event.dests[0]:
+            mission_name = event.dests[0]["mission"]
+
+        timestamp = datetime_from_iso8601_string(event.time)
+        xml = event.xml
+        if self.xml_encoder:
+            xml = self.xml_encoder.encode(self.db.session, event.uid, xml, timestamp)
+
+        return CoT(
+            how=event.how,
+            type=event.type,
+            sender_uid=uid,
+            timestamp=timestamp,
+            xml=xml,
+            start=datetime_from_iso8601_string(event.start),
+            stale=datetime_from_iso8601_string(event.stale),
+            mission_name=mission_name,
+            uid=event.uid,
+        )
 
+    def insert_cot(self, event: CoTEvent, uid):
         with self.context:
-            res = self.db.session.execute(
-                insert(CoT).values(
-                    how=event.attrs["how"],
-                    type=event.attrs["type"],
-                    sender_uid=uid,
-                    timestamp=timestamp,
-                    xml=str(soup),
-                    start=start,
-                    stale=stale,
-                    mission_name=mission_name,
-                    uid=event.attrs["uid"],
-                )
-            )
+            cot = self.build_cot(event, uid)
+            self.db.session.add(cot)
 
             try:
                 self.db.session.commit()
-                return res.inserted_primary_key[0]
+                return cot.id
             except sqlalchemy.exc.IntegrityError:
                 # When using MySQL it will raise IntegrityError when a new EUD connects and it doesn't exist yet in the EUDs table
                 # We'll ignore this error and not insert this CoT so the EUD table can be populated
+                self.db.session.rollback()
                 return None
 
-    def parse_point(self, event, uid, cot_id):
+    def build_point(self, event: CoTEvent, uid) -> Point | None:
         # hae = Height above the WGS ellipsoid in meters
         # ce = Circular 1-sigma or a circular area about the location in meters
         # le = Linear 1-sigma error or an altitude range about the location in meters
-        point = event.find("point")
-        if point and not point.attrs["lat"].startswith("999"):
-            p = Point()
-            p.uid = event.attrs["uid"]
-            p.device_uid = uid
-            p.ce = point.attrs["ce"]
-            p.hae = point.attrs["hae"]
-            p.le = point.attrs["le"]
-            p.latitude = float(point.attrs["lat"])
-            p.longitude = float(point.attrs["lon"])
-            p.timestamp = datetime_from_iso8601_string(event.attrs["time"])
-            p.cot_id = cot_id
-
-            # We only really care about the rest of the data if there's a valid lat/lon
-            if p.latitude == 0 and p.longitude == 0:
-                return None
+        point = event.point
+        if point is None or point["lat"].startswith("999"):
+            return None
+
+        p = Point()
+        p.uid = event.uid
+        p.device_uid = uid
+        # Convert here, points that aren't saved are never loaded back from the database as floats
+        p.ce = float(point["ce"]) if "ce" in point else None
+        p.hae = float(point["hae"]) if "hae" in point else None
+        p.le = float(point["le"]) if "le" in point else None
+        p.latitude = float(point["lat"])
+        p.longitude = float(point["lon"])
+        p.timestamp = datetime_from_iso8601_string(event.time)
+
+        # We only really care about the rest of the data if there's a valid lat/lon
+        if p.latitude == 0 and p.longitude == 0:
+            return None
+
+        track = event.track
+        if track is not None:
+            if "course" in track and track["course"] != "9999999.0":
+                p.course = float(track["course"])
+            else:
+                p.course = 0
 
-            track = event.find("track")
-            if track:
-                if "course" in track.attrs and track.attrs["course"] != "9999999.0":
-                    p.course = track.attrs["course"]
-                else:
-                    p.course = 0
-
-                if "speed" in track.attrs and track.attrs["speed"] != "9999999.0":
-                    p.speed = track.attrs["speed"]
-                else:
-                    p.speed = 0
-
-            # For TAK ICU and OpenTAK ICU CoT's with bearing from the compass
-            sensor = event.find("sensor")
-            if sensor:
-                if "azimuth" in sensor.attrs:
-                    p.azimuth = sensor.attrs["azimuth"]
-                # Camera's field of view
-                if "fov" in sensor.attrs:
-                    p.fov = sensor.attrs["fov"]
-
-            precision_location = event.find("precisionlocation")
-            if precision_location and "geolocationsrc" in precision_location.attrs:
-                p.location_source = precision_location.attrs["geolocationsrc"]
-            elif precision_location and "altsrc" in precision_location.attrs:
-                p.location_source = precision_location.attrs["altsrc"]
-            elif event.attrs["how"] == "m-g":
-                p.location_source = "GPS"
-
-            status = event.find("status")
-            if status:
-                if "battery" in status.attrs:
-                    p.battery = status.attrs["battery"]
+            if "speed" in track and track["speed"] != "9999999.0":
+                p.speed = float(track["speed"])
+            else:
+                p.speed = 0
+
+        # For TAK ICU and OpenTAK ICU CoT's with bearing from the compass
+        sensor = event.find("sensor")
+        if sensor is not None:
+            if "azimuth" in sensor.attrib:
+                p.azimuth = float(sensor.attrib["azimuth"])
+            # Camera's field of view
+            if "fov" in sensor.attrib:
+                p.fov = float(sensor.attrib["fov"])
+
+        precision_location = event.find("precisionlocation")
+        if precision_location is not None and "geolocationsrc" in precision_location.attrib:
+            p.location_source = precision_location.attrib["geolocationsrc"]
+        elif precision_location is not None and "altsrc" in precision_location.attrib:
+            p.location_source = precision_location.attrib["altsrc"]
+        elif event.how == "m-g":
+            p.location_source = "GPS"
+
+        status = event.find("status")
+        if status is not None:
+            if "battery" in status.attrib:
+                p.battery = int(float(status.attrib["battery"]))
+
+        return p
+
+    def update_mission_uid(self, event: CoTEvent, p: Point):
+        # iTAK sucks. Instead of sending mission CoTs with a <dest mission="mission_name"> tag, it sends a normal CoT and
+        # makes a POST to /Marti/api/missions/mission_name/contents. The POST happens faster than the CoT can be received and parsed,
+        # so we're left with a row in the mission_uids table without most of the details that come from the CoT. Fortunately
+        # the mission_uids.uid field corresponds to the CoT's event UID, so the row in mission_uids can be updated here.
+        usericon = event.find("usericon")
+        color = event.find("color")
+        contact = event.contact
+
+        iconset_path = None
+        if usericon is not None and "iconsetpath" in usericon.attrib:
+            iconset_path = usericon.attrib["iconsetpath"]
+        elif usericon is not None and "iconsetPath" in usericon.attrib:
+            iconset_path = usericon.attrib["iconsetPath"]
+
+        cot_color = None
+        if color is not None and "argb" in color.attrib:
+            cot_color = color.attrib["argb"]
+        if color is not None and "value" in color.attrib:
+            cot_color = color.attrib["value"]
+
+        callsign = None
+        if contact is not None and "callsign" in contact:
+            callsign = contact["callsign"]
+
+        self.db.session.execute(
+            update(MissionUID)
+            .where(MissionUID.uid == event.uid)
+            .values(
+                cot_type=event.type,
+                latitude=p.latitude,
+                longitude=p.longitude,
+                iconset_path=iconset_path,
+                color=cot_color,
+                callsign=callsign,
+            )
+        )
 
-            with self.context:
-                res = self.db.session.execute(
-                    insert(Point).values(
-                        uid=p.uid,
-                        device_uid=p.device_uid,
-                        ce=p.ce,
-                        hae=p.hae,
-                        le=p.le,
-                        latitude=p.latitude,
-                        longitude=p.longitude,
-                        timestamp=p.timestamp,
-                        cot_id=cot_id,
-                        location_source=p.location_source,
-                        course=p.course,
-                        speed=p.speed,
-                        battery=p.battery,
-                        fov=p.fov,
-                        azimuth=p.azimuth,
-                    )
-                )
+    @staticmethod
+    def is_eud_position(event: CoTEvent) -> bool:
+        # OpenTAK ICU position updates don't include the <takv> tag, but we still want to send the updated position
+        # to the UI's map
+        return event.takv is not None or "__video" in event.tags
+
+    def build_current_track(self, event: CoTEvent, p: Point) -> dict:
+        return {
+            "uid": p.uid,
+            "device_uid": p.device_uid,
+            "type": event.type,
+            "how": event.how,
+            "callsign": event.contact.get("callsign") if event.contact else None,
+            "latitude": p.latitude,
+            "longitude": p.longitude,
+            "ce": p.ce,
+            "hae": p.hae,
+            "le": p.le,
+            "course": p.course,
+            "speed": p.speed,
+            "azimuth": p.azimuth,
+            "fov": p.fov,
+            "location_source": p.location_source,
+            "battery": p.battery,
+            "timestamp": p.timestamp,
+            "stale": datetime_from_iso8601_string(event.stale),
+        }
+
+    def keep_history(self, event: CoTEvent) -> bool:
+        return not (self.no_history_types and event.type.startswith(self.no_history_types))
+
+    def parse_point(self, event: CoTEvent, uid, cot_id, history=True):
+        p = self.build_point(event, uid)
+        if p is None:
+            return None
+
+        p.cot_id = cot_id
+        track = self.build_current_track(event, p)
+        with self.context:
+            if history:
+                self.db.session.add(p)
+            upsert_current_tracks(self.db.session, [track])
+            self.update_mission_uid(event, p)
+            self.db.session.commit()
 
-                # iTAK sucks. Instead of sending mission CoTs with a <dest mission="mission_name"> tag, it sends a normal CoT and
-                # makes a POST to /Marti/api/missions/mission_name/contents. The POST happens faster than the CoT can be received and parsed,
-                # so we're left with a row in the mission_uids table without most of the details that come from the CoT. Fortunately
-                # the mission_uids.uid field corresponds to the CoT's event UID, so the row in mission_uids can be updated here.
-                usericon = event.find("usericon")
-                color = event.find("color")
-                contact = event.find("contact")
-
-                iconset_path = None
-                if usericon and "iconsetpath" in usericon.attrs:
-                    iconset_path = usericon.attrs["iconsetpath"]
-                elif usericon and "iconsetPath" in usericon.attrs:
-                    iconset_path = usericon.attrs["iconsetPath"]
-
-                cot_color = None
-                if color and "argb" in color.attrs:
-                    cot_color = color.attrs["argb"]
-                if color and "value" in color.attrs:
-                    cot_color = color.attrs["value"]
-
-                callsign = None
-                if contact and "callsign" in contact.attrs:
-                    callsign = contact.attrs["callsign"]
-
-                self.db.session.execute(
-                    update(MissionUID)
-                    .where(MissionUID.uid == event.attrs["uid"])
-                    .values(
-                        cot_type=event.attrs["type"],
-                        latitude=p.latitude,
-                        longitude=p.longitude,
-                        iconset_path=iconset_path,
-                        color=cot_color,
-                        callsign=callsign,
-                    )
-                )
+            # This CoT is a position update for an EUD. Send it to socketio clients so it can be seen on the UI map
+            if self.is_eud_position(event):
+                self.socketio.emit("point", CurrentTrack(**track).to_json(), namespace="/socket.io")
 
-                self.db.session.commit()
-                # Get the point from the DB with its related CoT
-                p = self.db.session.execute(
-                    select(Point).filter(Point.id == res.inserted_primary_key[0])
-                ).first()[0]
+            if self.context.app.config.get("OTS_ENABLE_MESHTASTIC"):
+                self.publish_point_to_meshtastic(event, uid, p)
 
-                # This CoT is a position update for an EUD. Send it to socketio clients so it can be seen on the UI map
-                # OpenTAK ICU position updates don't include the <takv> tag, but we still want to send the updated position
-                # to the UI's map
-                if event.find("takv") or event.find("__video"):
-                    self.socketio.emit("point", p.to_json(), namespace="/socket.io")
+            return p.id if history else None
 
-                if self.context.app.config.get("OTS_ENABLE_MESHTASTIC"):
-                    try:
-                        eud = self.db.session.execute(select(EUD).filter_by(uid=uid)).first()
+    def publish_point_to_meshtastic(self, event: CoTEvent, uid, p: Point):
+        try:
+            eud = self.db.session.execute(select(EUD).filter_by(uid=uid)).first()
 
-                        if not eud:
-                            return res.inserted_primary_key[0]
+            if not eud:
+                return
+
+            eud = eud[0]
 
-                        eud = eud[0]
+            now = datetime.now(timezone.utc)
+            if eud.last_meshtastic_publish is None or (
+                now - eud.last_meshtastic_publish.replace(tzinfo=timezone.utc)
+            ).total_seconds() >= self.context.app.config.get("OTS_MESHTASTIC_PUBLISH_INTERVAL"):
 
-                        now = datetime.now(timezone.utc)
-                        if eud.last_meshtastic_publish is None or (
+                self.logger.debug("publishing position to mesh")
+                try:
+                    eud.last_meshtastic_publish = now
+                    self.db.session.execute(
+                        update(EUD).filter_by(uid=eud.uid).values(last_meshtastic_publish=now)
+                    )
+                    self.db.session.commit()
+
+                    if eud.platform != "Meshtastic":
+                        mesh_user = mesh_pb2.User()
+                        setattr(mesh_user, "id", "!{:x}".format(eud.meshtastic_id))
+                        mesh_user.hw_model = mesh_pb2.HardwareModel.PRIVATE_HW
+                        mesh_user.short_name = p.device_uid[-4:]
+
+                        if event.contact is not None:
+                            mesh_user.long_name = event.contact["callsign"]
+
+                        # Rate limits how often to send NodeInfo messages
+                        if (
                             now - eud.last_meshtastic_publish.replace(tzinfo=timezone.utc)
                         ).total_seconds() >= self.context.app.config.get(
+                            "OTS_MESHTASTIC_NODEINFO_INTERVAL"
+                        ) * self.context.app.config.get(
                             "OTS_MESHTASTIC_PUBLISH_INTERVAL"
                         ):
 
-                            self.logger.debug("publishing position to mesh")
-                            try:
-                                eud.last_meshtastic_publish = now
-                                self.db.session.execute(
-                                    update(EUD)
-                                    .filter_by(uid=eud.uid)
-                                    .values(last_meshtastic_publish=now)
-                                )
-                                self.db.session.commit()
-
-                                if eud.platform != "Meshtastic":
-                                    mesh_user = mesh_pb2.User()
-                                    setattr(mesh_user, "id", "!{:x}".format(eud.meshtastic_id))
-                                    mesh_user.hw_model = mesh_pb2.HardwareModel.PRIVATE_HW
-                                    mesh_user.short_name = p.device_uid[-4:]
-
-                                    contact = event.find("contact")
-                                    if contact:
-                                        mesh_user.long_name = contact.attrs["callsign"]
-
-                                    # Rate limits how often to send NodeInfo messages
-                                    if (
-                                        now
-                                        - eud.last_meshtastic_publish.replace(tzinfo=timezone.utc)
-                                    ).total_seconds() >= self.context.app.config.get(
-                                        "OTS_MESHTASTIC_NODEINFO_INTERVAL"
-                                    ) * self.context.app.config.get(
-                                        "OTS_MESHTASTIC_PUBLISH_INTERVAL"
-                                    ):
-
-                                        # Note to future self: The Meshtastic firmware expects a User payload when the Portnum is NodeInfo
-                                        # DO NOT SEND A NODEINFO PAYLOAD!
-                                        encoded_message = mesh_pb2.Data()
-                                        encoded_message.portnum = portnums_pb2.NODEINFO_APP
-                                        encoded_message.payload = mesh_user.SerializeToString()
-                                        self.publish_to_meshtastic(
-                                            self.get_protobuf(encoded_message, uid=p.device_uid)
-                                        )
-
-                                    position = mesh_pb2.Position()
-                                    position.latitude_i = int(p.latitude / 0.0000001)
-                                    position.longitude_i = int(p.longitude / 0.0000001)
-                                    position.altitude = int(p.hae)
-                                    position.timestamp = int(time.mktime(p.timestamp.timetuple()))
-                                    position.ground_track = int(p.course) if p.course else 0
-                                    position.ground_speed = (
-                                        int(p.speed) if p.speed and p.speed >= 0 else 0
-                                    )
-                                    position.seq_number = 1
-                                    position.precision_bits = 32
-
-                                    encoded_message = mesh_pb2.Data()
-                                    encoded_message.portnum = portnums_pb2.POSITION_APP
-                                    encoded_message.payload = position.SerializeToString()
-                                    self.publish_to_meshtastic(
-                                        self.get_protobuf(encoded_message, uid=p.device_uid)
-                                    )
+                            # Note to future self: The Meshtastic firmware expects a User payload when the Portnum is NodeInfo
+                            # DO NOT SEND A NODEINFO PAYLOAD!
+                            encoded_message = mesh_pb2.Data()
+                            encoded_message.portnum = portnums_pb2.NODEINFO_APP
+                            encoded_message.payload = mesh_user.SerializeToString()
+                            self.publish_to_meshtastic(
+                                self.get_protobuf(encoded_message, uid=p.device_uid)
+                            )
 
-                                    tak_packet = atak_pb2.TAKPacket()
-                                    tak_packet.is_compressed = True
-                                    tak_packet.contact.device_callsign, size = unishox2.compress(
-                                        eud.uid
-                                    )
-                                    tak_packet.contact.callsign, size = unishox2.compress(
-                                        eud.callsign
-                                    )
-                                    tak_packet.group.team = (
-                                        eud.team.name.replace(" ", "_") if eud.team else "Cyan"
-                                    )
-                                    tak_packet.group.role = (
-                                        eud.team_role.replace(" ", "")
-                                        if eud.team_role
-                                        else "TeamMember"
-                                    )
-                                    tak_packet.status.battery = int(p.battery) if p.battery else 0
-                                    tak_packet.pli.latitude_i = int(p.latitude / 0.0000001)
-                                    tak_packet.pli.longitude_i = int(p.longitude / 0.0000001)
-                                    tak_packet.pli.altitude = int(p.hae) if p.hae else 0
-                                    tak_packet.pli.speed = int(p.speed) if p.speed else 0
-                                    tak_packet.pli.course = int(p.course) if p.course else 0
-
-                                    encoded_message = mesh_pb2.Data()
-                                    encoded_message.portnum = portnums_pb2.ATAK_PLUGIN
-                                    encoded_message.payload = tak_packet.SerializeToString()
-
-                                    self.publish_to_meshtastic(
-                                        self.get_protobuf(
-                                            encoded_message, uid=eud.uid, from_id=eud.meshtastic_id
-                                        )
-                                    )
-                            except BaseException as e:
-                                self.logger.error(f"Failed to send publish message to mesh: {e}")
-                                self.logger.debug(traceback.format_exc())
+                        position = mesh_pb2.Position()
+                        position.latitude_i = int(p.latitude / 0.0000001)
+                        position.longitude_i = int(p.longitude / 0.0000001)
+                        position.altitude = int(p.hae)
+                        position.timestamp = int(time.mktime(p.timestamp.timetuple()))
+                        position.ground_track = int(p.course) if p.course else 0
+                        position.ground_speed = int(p.speed) if p.speed and p.speed >= 0 else 0
+                        position.seq_number = 1
+                        position.precision_bits = 32
+
+                        encoded_message = mesh_pb2.Data()
+                        encoded_message.portnum = portnums_pb2.POSITION_APP
+                        encoded_message.payload = position.SerializeToString()
+                        self.publish_to_meshtastic(
+                            self.get_protobuf(encoded_message, uid=p.device_uid)
+                        )
 
-                    except BaseException as e:
-                        logger.warning(f"Failed to publish Meshtastic message: {e}")
-                        logger.debug(traceback.format_exc())
+                        tak_packet = atak_pb2.TAKPacket()
+                        tak_packet.is_compressed = True
+                        tak_packet.contact.device_callsign, size = unishox2.compress(eud.uid)
+                        tak_packet.contact.callsign, size = unishox2.compress(eud.callsign)
+                        tak_packet.group.team = (
+                            eud.team.name.replace(" ", "_") if eud.team else "Cyan"
+                        )
+                        tak_packet.group.role = (
+                            eud.team_role.replace(" ", "") if eud.team_role else "TeamMember"
+                        )
+                        tak_packet.status.battery = int(p.battery) if p.battery else 0
+                        tak_packet.pli.latitude_i = int(p.latitude / 0.0000001)
+                        tak_packet.pli.longitude_i = int(p.longitude / 0.0000001)
+                        tak_packet.pli.altitude = int(p.hae) if p.hae else 0
+                        tak_packet.pli.speed = int(p.speed) if p.speed else 0
+                        tak_packet.pli.course = int(p.course) if p.course else 0
+
+                        encoded_message = mesh_pb2.Data()
+                        encoded_message.portnum = portnums_pb2.ATAK_PLUGIN
+                        encoded_message.payload = tak_packet.SerializeToString()
+
+                        self.publish_to_meshtastic(
+                            self.get_protobuf(
+                                encoded_message, uid=eud.uid, from_id=eud.meshtastic_id
+                            )
+                        )
+                except BaseException as e:
+                    self.logger.error(f"Failed to send publish message to mesh: {e}")
+                    self.logger.debug(traceback.format_exc())
 
-                return res.inserted_primary_key[0]
+        except BaseException as e:
+            logger.warning(f"Failed to publish Meshtastic message: {e}")
+            logger.debug(traceback.format_exc())
 
     def get_protobuf(
         self, payload, uid=None, from_id=None, to_id=BROADCAST_NUM, channel_id="LongFast"
@@ -404,21 +480,22 @@ class CoTController:
 
         return service_envelope
 
-    def parse_geochat(self, event, cot_id, point_pk):
-        chat = event.find("__chat")
-        if chat:
+    def parse_geochat(self, event: CoTEvent, uid, point_pk, cot_id):
+        chat = event.chat
+        if chat is not None:
             chat_group = event.find("chatgrp")
             remarks = event.find("remarks")
 
             # Sometimes WinTAK seems to send GeoChat CoTs without remarks
-            if not remarks:
+            if remarks is None:
                 return
 
+            remarks_text = "".join(remarks.itertext())
             chatroom = Chatroom()
 
-            chatroom.name = chat.attrs["chatroom"]
-            chatroom.id = chat.attrs["id"]
-            chatroom.parent = chat.attrs["parent"] if "parent" in chat.attrs else None
+            chatroom.name = chat["chatroom"]
+            chatroom.id = chat["id"]
+            chatroom.parent = chat.get("parent")
 
             with self.context:
                 try:
@@ -429,11 +506,11 @@ class CoTController:
 
             geochat = GeoChat()
 
-            geochat.uid = event.attrs["uid"]
-            geochat.chatroom_id = chat.attrs["id"]
-            geochat.sender_uid = chat_group.attrs["uid0"]
-            geochat.remarks = remarks.text
-            geochat.timestamp = datetime_from_iso8601_string(remarks.attrs["time"])
+            geochat.uid = event.uid
+            geochat.chatroom_id = chat["id"]
+            geochat.sender_uid = chat_group.attrib["uid0"]
+            geochat.remarks = remarks_text
+            geochat.timestamp = datetime_from_iso8601_string(remarks.attrib["time"])
             geochat.point_id = point_pk
             geochat.cot_id = cot_id
 
@@ -457,20 +534,16 @@ class CoTController:
                             geochat.sender_uid
                         )
                         tak_packet.contact.callsign, size = unishox2.compress(from_eud.callsign)
-                        tak_packet.chat.message, size = unishox2.compress(remarks.text)
+                        tak_packet.chat.message, size = unishox2.compress(remarks_text)
                         tak_packet.group.team = from_eud.team.name.replace(" ", "_")
                         tak_packet.group.role = from_eud.team_role.replace(" ", "")
                         tak_packet.is_compressed = True
 
                         send_meshtastic_text = False
-                        dest = event.find("dest")
-                        if (
-                            dest
-                            and "callsign" in dest.attrs
-                            and dest.attrs["callsign"] == chat.attrs["chatroom"]
-                        ):
+                        dest = event.dests[0] if event.dests else None
+                        if dest and dest.get("callsign") == chat["chatroom"]:
                             # This is a DM
-                            to = chat.attrs["id"]
+                            to = chat["id"]
                             try:
                                 # DM to a Meshtastic device
                                 to_id = int(to, 16)
@@ -482,7 +555,7 @@ class CoTController:
                             tak_packet.chat.to, size = unishox2.compress(to)
                         else:
                             # This goes to a chat room
-                            to = chat.attrs["chatroom"]
+                            to = chat["chatroom"]
                             to_id = BROADCAST_NUM
                             tak_packet.chat.to, size = unishox2.compress(to)
 
@@ -495,7 +568,7 @@ class CoTController:
                             # Publish again for Meshtastic devices without the ATAK Plugin
                             encoded_message = mesh_pb2.Data()
                             encoded_message.portnum = portnums_pb2.TEXT_MESSAGE_APP
-                            encoded_message.payload = remarks.text.encode("utf-8")
+                            encoded_message.payload = remarks_text.encode("utf-8")
                             self.publish_to_meshtastic(
                                 self.get_protobuf(
                                     encoded_message, to_id=to_id, from_id=from_eud.meshtastic_id
@@ -517,25 +590,21 @@ class CoTController:
                     self.logger.error("Failed to publish MQTT message: {}".format(e))
                     self.logger.debug(traceback.format_exc())
 
-            for attr in chat_group.attrs:
+            for attr in chat_group.attrib:
                 if attr.startswith("uid") and attr != "uid":
 
-                    if (
-                        "groupOwner" in chat.attrs
-                        and chat.attrs["groupOwner"].lower() == "true"
-                        and attr == "uid0"
-                    ):
+                    if chat.get("groupOwner", "").lower() == "true" and attr == "uid0":
                         with self.context:
                             self.db.session.execute(
                                 update(Chatroom)
-                                .where(Chatroom.id == chat.attrs["id"])
-                                .values(group_owner=chat_group.attrs[attr])
+                                .where(Chatroom.id == chat["id"])
+                                .values(group_owner=chat_group.attrib[attr])
                             )
                             self.db.session.commit()
 
                     chatroom_uid = ChatroomsUids()
-                    chatroom_uid.chatroom_id = chat.attrs["id"]
-                    chatroom_uid.uid = chat_group.attrs[attr]
+                    chatroom_uid.chatroom_id = chat["id"]
+                    chatroom_uid.uid = chat_group.attrib[attr]
 
                     with self.context:
                         try:
@@ -549,31 +618,31 @@ class CoTController:
                         except exc.IntegrityError:
                             self.db.session.rollback()
 
-    def parse_video(self, event, cot_pk):
+    def parse_video(self, event: CoTEvent, uid, point_pk, cot_pk):
         video = event.find("__video")
-        if video:
+        if video is not None:
             self.logger.debug("Got video stream")
-            connection_entry = video.find("ConnectionEntry")
-            if not connection_entry:
+            connection_entry = video.find(".//ConnectionEntry")
+            if connection_entry is None:
                 return
 
-            path = connection_entry.attrs["path"]
+            path = connection_entry.attrib["path"]
             if path.startswith("/"):
                 path = path[1:]
 
             v = VideoStream()
-            v.network_timeout = connection_entry.attrs["networkTimeout"]
-            v.uid = connection_entry.attrs["uid"]
+            v.network_timeout = connection_entry.attrib["networkTimeout"]
+            v.uid = connection_entry.attrib["uid"]
             v.path = path
-            v.protocol = connection_entry.attrs["protocol"]
-            v.buffer_time = connection_entry.attrs["bufferTime"]
-            v.port = connection_entry.attrs["port"]
-            v.rover_port = connection_entry.attrs["roverPort"]
-            v.rtsp_reliable = connection_entry.attrs["rtspReliable"]
-            v.ignore_embedded_klv = connection_entry.attrs["ignoreEmbeddedKLV"].lower() == "true"
-            v.alias = connection_entry.attrs["alias"]
+            v.protocol = connection_entry.attrib["protocol"]
+            v.buffer_time = connection_entry.attrib["bufferTime"]
+            v.port = connection_entry.attrib["port"]
+            v.rover_port = connection_entry.attrib["roverPort"]
+            v.rtsp_reliable = connection_entry.attrib["rtspReliable"]
+            v.ignore_embedded_klv = connection_entry.attrib["ignoreEmbeddedKLV"].lower() == "true"
+            v.alias = connection_entry.attrib["alias"]
             v.cot_id = cot_pk
-            v.generate_xml(connection_entry.attrs["address"])
+            v.generate_xml(connection_entry.attrib["address"])
 
             with self.context:
                 try:
@@ -584,34 +653,34 @@ class CoTController:
                     self.db.session.rollback()
                     self.db.session.execute(
                         update(VideoStream)
-                        .where(VideoStream.uid == connection_entry.attrs["uid"])
+                        .where(VideoStream.uid == connection_entry.attrib["uid"])
                         .values(
-                            network_timeout=connection_entry.attrs["networkTimeout"],
-                            protocol=connection_entry.attrs["protocol"],
-                            buffer_time=connection_entry.attrs["bufferTime"],
-                            # address=connection_entry.attrs['address'],
-                            port=connection_entry.attrs["port"],
-                            rover_port=connection_entry.attrs["roverPort"],
-                            rtsp_reliable=connection_entry.attrs["rtspReliable"],
+                            network_timeout=connection_entry.attrib["networkTimeout"],
+                            protocol=connection_entry.attrib["protocol"],
+                            buffer_time=connection_entry.attrib["bufferTime"],
+                            # address=connection_entry.attrib['address'],
+                            port=connection_entry.attrib["port"],
+                            rover_port=connection_entry.attrib["roverPort"],
+                            rtsp_reliable=connection_entry.attrib["rtspReliable"],
                             ignore_embedded_klv=(
-                                connection_entry.attrs["ignoreEmbeddedKLV"].lower() == "true"
+                                connection_entry.attrib["ignoreEmbeddedKLV"].lower() == "true"
                             ),
-                            alias=connection_entry.attrs["alias"],
+                            alias=connection_entry.attrib["alias"],
                             xml=v.xml,
                         )
                     )
 
                     self.db.session.commit()
 
-    def parse_alert(self, event, uid, point_pk, cot_pk):
+    def parse_alert(self, event: CoTEvent, uid, point_pk, cot_pk):
         emergency = event.find("emergency")
-        if emergency:
-            if "type" in emergency.attrs:
-                emergency_type = emergency.attrs["type"]
+        if emergency is not None:
+            if "type" in emergency.attrib:
+                emergency_type = emergency.attrib["type"]
                 alert = Alert()
                 alert.sender_uid = uid
-                alert.uid = event.attrs["uid"]
-                alert.start_time = datetime_from_iso8601_string(event.attrs["start"])
+                alert.uid = event.uid
+                alert.start_time = datetime_from_iso8601_string(event.start)
                 alert.point_id = point_pk
                 alert.alert_type = emergency_type
                 alert.cot_id = cot_pk
@@ -620,7 +689,7 @@ class CoTController:
                     self.db.session.add(alert)
                     self.db.session.commit()
                     self.socketio.emit("alert", alert.to_json(), namespace="/socket.io")
-            elif "cancel" in emergency.attrs:
+            elif "cancel" in emergency.attrib:
                 with self.context:
                     try:
                         alert = self.db.session.execute(
@@ -628,227 +697,210 @@ class CoTController:
                                 Alert.cancel_time == None, Alert.sender_uid == uid
                             ).order_by(Alert.start_time.desc())
                         ).first()[0]
-                        alert.cancel_time = datetime_from_iso8601_string(event.attrs["start"])
+                        alert.cancel_time = datetime_from_iso8601_string(event.start)
                         self.db.session.commit()
                         self.socketio.emit("alert", alert.to_json(), namespace="/socket.io")
                     except BaseException as e:
                         self.logger.error("Failed to set alert cancel time: {}".format(e))
                         self.logger.debug(traceback.format_exc())
 
-    def parse_casevac(self, event, uid, point_pk, cot_pk):
+    def parse_casevac(self, event: CoTEvent, uid, point_pk, cot_pk):
         medevac = event.find("_medevac_")
-        if medevac:
-            zmist = medevac.find("zMist")
+        if medevac is not None:
+            zmist = medevac.find(".//zMist")
+            zmist = dict(zmist.attrib) if zmist is not None else None
+            medevac = dict(medevac.attrib)
             with self.context:
-                for a in medevac.attrs:
-                    if medevac.attrs[a].lower() == "true":
-                        medevac.attrs[a] = True
-                    elif medevac.attrs[a].lower() == "false":
-                        medevac.attrs[a] = False
+                for a in medevac:
+                    if medevac[a].lower() == "true":
+                        medevac[a] = True
+                    elif medevac[a].lower() == "false":
+                        medevac[a] = False
 
                 try:
                     self.db.session.execute(
                         insert(CasEvac).values(
-                            timestamp=datetime_from_iso8601_string(event.attrs["start"]),
+                            timestamp=datetime_from_iso8601_string(event.start),
                             sender_uid=uid,
-                            uid=event.attrs["uid"],
+                            uid=event.uid,
                             point_id=point_pk,
                             cot_id=cot_pk,
-                            **medevac.attrs,
+                            **medevac,
                         )
                     )
 
                     if zmist:
                         self.db.session.execute(
-                            insert(ZMIST).values(casevac_uid=event.attrs["uid"], **zmist.attrs)
+                            insert(ZMIST).values(casevac_uid=event.uid, **zmist)
                         )
                 except exc.IntegrityError as e:
                     self.db.session.rollback()
                     self.db.session.execute(
-                        update(CasEvac)
-                        .where(CasEvac.uid == event.attrs["uid"])
-                        .values(**medevac.attrs)
+                        update(CasEvac).where(CasEvac.uid == event.uid).values(**medevac)
                     )
 
                     if zmist:
                         self.db.session.execute(
-                            update(ZMIST)
-                            .where(CasEvac.uid == event.attrs["uid"])
-                            .values(**zmist.attrs)
+                            update(ZMIST).where(CasEvac.uid == event.uid).values(**zmist)
                         )
                 self.db.session.commit()
 
                 try:
                     casevac: CasEvac = self.db.session.execute(
-                        self.db.session.query(CasEvac).filter_by(uid=event.attrs["uid"])
+                        self.db.session.query(CasEvac).filter_by(uid=event.uid)
                     ).first()[0]
                     self.socketio.emit("casevac", casevac.to_json(), namespace="/socket.io")
                 except BaseException as e:
                     self.logger.error(f"Failed to emit CasEvac: {e}")
                     self.logger.debug(traceback.format_exc())
 
-    def parse_marker(self, event, uid, point_pk, cot_pk):
-        if (
-            (
-                re.match("^a-[f|h|u|p|a|n|s|j|k]-[Z|P|A|G|S|U|F]", event.attrs["type"])
-                or
-                # Spot map
-                re.match("^b-m-p", event.attrs["type"])
-            )
-            and
-            # Don't worry about EUD location updates
-            not event.find("takv")
-            and not event.find("contact")
-            and
-            # Ignore video streams from sources like OpenTAK ICU
-            event.attrs["type"] != "b-m-p-s-p-loc"
-        ):
+    def build_marker(self, event: CoTEvent) -> Marker:
+        # The marker handler's registration decides which CoTs are markers
+        marker = Marker()
+        marker.uid = event.uid
+        marker.affiliation = get_affiliation(event.type)
+        marker.battle_dimension = get_battle_dimension(event.type)
+        marker.mil_std_2525c = cot_type_to_2525c(event.type)
+
+        detail = event.detail
+        icon = None
+
+        if detail is not None:
+            for tag in detail.iterdescendants():
+                if "readiness" in tag.attrib:
+                    marker.readiness = tag.attrib["readiness"] == "true"
+                if "argb" in tag.attrib:
+                    marker.argb = tag.attrib["argb"]
+                    marker.color_hex = marker.color_to_hex()
+                if tag.tag == "contact":
+                    marker.callsign = tag.attrib["callsign"]
+                if "iconsetpath" in tag.attrib:
+                    marker.iconset_path = tag.attrib["iconsetpath"]
+                    if marker.iconset_path.lower().endswith(".png"):
+                        with self.context:
+                            filename = marker.iconset_path.split("/")[-1]
 
-            try:
-                marker = Marker()
-                marker.uid = event.attrs["uid"]
-                marker.affiliation = get_affiliation(event.attrs["type"])
-                marker.battle_dimension = get_battle_dimension(event.attrs["type"])
-                marker.mil_std_2525c = cot_type_to_2525c(event.attrs["type"])
-
-                detail = event.find("detail")
-                icon = None
-
-                if detail:
-                    for tag in detail.find_all():
-                        if "readiness" in tag.attrs:
-                            marker.readiness = tag.attrs["readiness"] == "true"
-                        if "argb" in tag.attrs:
-                            marker.argb = tag.attrs["argb"]
-                            marker.color_hex = marker.color_to_hex()
-                        if tag.name == "contact":
-                            marker.callsign = tag.attrs["callsign"]
-                        if "iconsetpath" in tag.attrs:
-                            marker.iconset_path = tag.attrs["iconsetpath"]
-                            if marker.iconset_path.lower().endswith(".png"):
-                                with self.context:
-                                    filename = marker.iconset_path.split("/")[-1]
-
-                                    try:
-                                        icon = self.db.session.execute(
-                                            self.db.session.query(Icon).filter(
-                                                Icon.filename == filename
-                                            )
-                                        ).first()[0]
-                                        marker.icon_id = icon.id
-                                    except:
-                                        icon = self.db.session.execute(
-                                            self.db.session.query(Icon).filter(
-                                                Icon.filename == "marker-icon.png"
-                                            )
-                                        ).first()
-                                        if icon is None:
-                                            marker.icon_id = None
-                                        else:
-                                            marker.icon_id = icon.id
-                            elif not marker.mil_std_2525c:
-                                with self.context:
-                                    icon = self.db.session.execute(
-                                        self.db.session.query(Icon).filter(
-                                            Icon.filename == "marker-icon.png"
-                                        )
-                                    ).first()[0]
+                            try:
+                                icon = self.db.session.execute(
+                                    self.db.session.query(Icon).filter(Icon.filename == filename)
+                                ).first()[0]
+                                marker.icon_id = icon.id
+                            except:
+                                icon = self.db.session.execute(
+                                    self.db.session.query(Icon).filter(
+                                        Icon.filename == "marker-icon.png"
+                                    )
+                                ).first()
+                                if icon is None:
+                                    marker.icon_id = None
+                                else:
                                     marker.icon_id = icon.id
+                    elif not marker.mil_std_2525c:
+                        with self.context:
+                            icon = self.db.session.execute(
+                                self.db.session.query(Icon).filter(
+                                    Icon.filename == "marker-icon.png"
+                                )
+                            ).first()[0]
+                            marker.icon_id = icon.id
 
-                        if "altsrc" in tag.attrs:
-                            marker.location_source = tag.attrs["altsrc"]
+                if "altsrc" in tag.attrib:
+                    marker.location_source = tag.attrib["altsrc"]
 
-                link = event.find("link")
-                if link:
-                    marker.parent_callsign = (
-                        link.attrs["parent_callsign"] if "parent_callsign" in link.attrs else None
-                    )
-                    marker.production_time = (
-                        link.attrs["production_time"]
-                        if "production_time" in link.attrs
-                        else iso8601_string_from_datetime(datetime.now(timezone.utc))
-                    )
-                    marker.relation = link.attrs["relation"] if "relation" in link.attrs else None
-                    marker.relation_type = (
-                        link.attrs["relation_type"] if "relation_type" in link.attrs else None
-                    )
-                    marker.parent_uid = link.attrs["uid"] if "uid" in link.attrs else None
-                else:
-                    marker.production_time = iso8601_string_from_datetime(
-                        datetime.now(timezone.utc)
-                    )
+        link = event.find("link")
+        if link is not None:
+            marker.parent_callsign = link.get("parent_callsign")
+            marker.production_time = link.get(
+                "production_time", iso8601_string_from_datetime(datetime.now(timezone.utc))
+            )
+            marker.relation = link.get("relation")
+            marker.relation_type = link.get("relation_type")
+            marker.parent_uid = link.get("uid")
+        else:
+            marker.production_time = iso8601_string_from_datetime(datetime.now(timezone.utc))
 
-                marker.point_id = point_pk
-                marker.cot_id = cot_pk
+        try:
+            marker.timestamp = datetime_from_iso8601_string(marker.production_time)
+        except ValueError:
+            marker.timestamp = datetime.now(timezone.utc)
 
-                with self.context:
-                    try:
-                        self.db.session.add(marker)
-                        self.db.session.commit()
-                        self.logger.debug("added marker")
-                    except exc.IntegrityError:
-                        self.db.session.rollback()
-                        self.db.session.execute(
-                            update(Marker)
-                            .where(Marker.uid == marker.uid)
-                            .values(
-                                point_id=marker.point_id,
-                                icon_id=marker.icon_id,
-                                **marker.serialize(),
-                            )
+        return marker
+
+    def parse_marker(self, event: CoTEvent, uid, point_pk, cot_pk):
+        try:
+            marker = self.build_marker(event)
+            marker.point_id = point_pk
+            marker.cot_id = cot_pk
+
+            with self.context:
+                try:
+                    self.db.session.add(marker)
+                    self.db.session.commit()
+                    self.logger.debug("added marker")
+                except exc.IntegrityError:
+                    self.db.session.rollback()
+                    self.db.session.execute(
+                        update(Marker)
+                        .where(Marker.uid == marker.uid)
+                        .values(
+                            point_id=marker.point_id,
+                            icon_id=marker.icon_id,
+                            timestamp=marker.timestamp,
+                            **marker.serialize(),
                         )
-                        self.db.session.commit()
-                        self.logger.debug("updated marker")
-                        marker = self.db.session.execute(
-                            self.db.session.query(Marker).filter(Marker.uid == marker.uid)
-                        ).first()[0]
+                    )
+                    self.db.session.commit()
+                    self.logger.debug("updated marker")
+                    marker = self.db.session.execute(
+                        self.db.session.query(Marker).filter(Marker.uid == marker.uid)
+                    ).first()[0]
 
-                    self.socketio.emit("marker", marker.to_json(), namespace="/socket.io")
+                self.socketio.emit("marker", marker.to_json(), namespace="/socket.io")
 
-            except BaseException as e:
-                self.logger.error("Failed to parse marker: {}".format(e))
-                self.logger.debug(traceback.format_exc())
+        except BaseException as e:
+            self.logger.error("Failed to parse marker: {}".format(e))
+            self.logger.debug(traceback.format_exc())
 
-    def parse_rbline(self, event, uid, point_pk, cot_pk):
-        if re.match("^u-rb", event.attrs["type"]):
+    def parse_rbline(self, event: CoTEvent, uid, point_pk, cot_pk):
+        if event.type.startswith("u-rb"):
             self.logger.debug("Got an R&B line")
             rb_line = RBLine()
 
-            detail = event.find("detail")
-            if detail:
-                rb_line.uid = event.attrs["uid"]
+            detail = event.detail
+            if detail is not None:
+                rb_line.uid = event.uid
                 rb_line.sender_uid = uid
-                rb_line.timestamp = datetime_from_iso8601_string(event.attrs["start"])
+                rb_line.timestamp = datetime_from_iso8601_string(event.start)
                 rb_line.point_id = point_pk
                 rb_line.cot_id = cot_pk
 
                 for tag in detail:
-                    if tag.name == "range":
-                        rb_line.range = tag.attrs["value"]
-                    if tag.name == "bearing":
-                        rb_line.bearing = tag.attrs["value"]
+                    if tag.tag == "range":
+                        rb_line.range = tag.attrib["value"]
+                    if tag.tag == "bearing":
+                        rb_line.bearing = tag.attrib["value"]
                     # Sometimes ATAK sends NaN for the inclination which causes issues in the DB
-                    if tag.name == "inclination" and tag.attrs["value"].isnumeric():
-                        rb_line.inclination = tag.attrs["value"]
-                    if tag.name == "anchorUID":
-                        rb_line.anchor_uid = tag.attrs["value"]
-                    if tag.name == "rangeUnits":
-                        rb_line.range_units = tag.attrs["value"]
-                    if tag.name == "bearingUnits":
-                        rb_line.bearing_units = tag.attrs["value"]
-                    if tag.name == "northRef":
-                        rb_line.north_ref = tag.attrs["value"]
-                    if tag.name == "color":
-                        rb_line.color = tag.attrs["value"]
+                    if tag.tag == "inclination" and tag.attrib["value"].isnumeric():
+                        rb_line.inclination = tag.attrib["value"]
+                    if tag.tag == "anchorUID":
+                        rb_line.anchor_uid = tag.attrib["value"]
+                    if tag.tag == "rangeUnits":
+                        rb_line.range_units = tag.attrib["value"]
+                    if tag.tag == "bearingUnits":
+                        rb_line.bearing_units = tag.attrib["value"]
+                    if tag.tag == "northRef":
+                        rb_line.north_ref = tag.attrib["value"]
+                    if tag.tag == "color":
+                        rb_line.color = tag.attrib["value"]
                         rb_line.color_hex = rb_line.color_to_hex()
-                    if tag.name == "contact":
-                        rb_line.callsign = tag.attrs["callsign"]
-                    if tag.name == "strokeColor":
-                        rb_line.stroke_color = tag.attrs["value"]
-                    if tag.name == "strokeWeight":
-                        rb_line.stroke_weight = tag.attrs["value"]
-                    if tag.name == "labels_on":
-                        rb_line.labels_on = tag.attrs["value"] == "true"
+                    if tag.tag == "contact":
+                        rb_line.callsign = tag.attrib["callsign"]
+                    if tag.tag == "strokeColor":
+                        rb_line.stroke_color = tag.attrib["value"]
+                    if tag.tag == "strokeWeight":
+                        rb_line.stroke_weight = tag.attrib["value"]
+                    if tag.tag == "labels_on":
+                        rb_line.labels_on = tag.attrib["value"] == "true"
 
                 with self.context:
 
@@ -876,39 +928,173 @@ class CoTController:
                     rb_line.point = start_point
                     self.socketio.emit("rb_line", rb_line.to_json(), namespace="/socket.io")
 
-    def parse_stats(self, event, uid):
+    def build_stats(self, event: CoTEvent, uid) -> EUDStats | None:
         stats = event.find("stats")
-        eud_stats = EUDStats()
-        if stats:
-            eud_stats.timestamp = datetime_from_iso8601_string(event.attrs.get("time"))
-            eud_stats.eud_uid = uid
-            eud_stats.battery_status = stats.attrs.get("battery_status")
-            eud_stats.ip_address = stats.attrs.get("ip_address")
-            if stats.attrs.get("app_framerate"):
-                eud_stats.app_framerate = int(stats.attrs.get("app_framerate"))
-            if stats.attrs.get("deviceDataRx"):
-                eud_stats.deviceDataRx = int(stats.attrs.get("deviceDataRx"))
-            if stats.attrs.get("deviceDataTx"):
-                eud_stats.deviceDataTx = int(stats.attrs.get("deviceDataTx"))
-            if stats.attrs.get("heap_current_size"):
-                eud_stats.heap_current_size = int(stats.attrs.get("heap_current_size"))
-            if stats.attrs.get("heap_free_size"):
-                eud_stats.heap_free_size = int(stats.attrs.get("heap_free_size"))
-            if stats.attrs.get("heap_max_size"):
-                eud_stats.heap_max_size = int(stats.attrs.get("heap_max_size"))
-            if stats.attrs.get("storage_available"):
-                eud_stats.storage_available = int(stats.attrs.get("storage_available"))
-            if stats.attrs.get("storage_total"):
-                eud_stats.storage_total = int(stats.attrs.get("storage_total"))
-            if stats.attrs.get("battery_temp"):
-                eud_stats.battery_temp = int(stats.attrs.get("battery_temp"))
-            if stats.attrs.get("battery"):
-                eud_stats.battery = int(stats.attrs.get("battery").replace("%", ""))
+        if stats is None:
+            return None
 
+        eud_stats = EUDStats()
+        eud_stats.timestamp = datetime_from_iso8601_string(event.time)
+        eud_stats.eud_uid = uid
+        eud_stats.battery_status = stats.get("battery_status")
+        eud_stats.ip_address = stats.get("ip_address")
+        if stats.get("app_framerate"):
+            eud_stats.app_framerate = int(stats.get("app_framerate"))
+        if stats.get("deviceDataRx"):
+            eud_stats.deviceDataRx = int(stats.get("deviceDataRx"))
+        if stats.get("deviceDataTx"):
+            eud_stats.deviceDataTx = int(stats.get("deviceDataTx"))
+        if stats.get("heap_current_size"):
+            eud_stats.heap_current_size = int(stats.get("heap_current_size"))
+        if stats.get("heap_free_size"):
+            eud_stats.heap_free_size = int(stats.get("heap_free_size"))
+        if stats.get("heap_max_size"):
+            eud_stats.heap_max_size = int(stats.get("heap_max_size"))
+        if stats.get("storage_available"):
+            eud_stats.storage_available = int(stats.get("storage_available"))
+        if stats.get("storage_total"):
+            eud_stats.storage_total = int(stats.get("storage_total"))
+        if stats.get("battery_temp"):
+            eud_stats.battery_temp = int(stats.get("battery_temp"))
+        if stats.get("battery"):
+            eud_stats.battery = int(stats.get("battery").replace("%", ""))
+
+        return eud_stats
+
+    def parse_stats(self, event: CoTEvent, uid, point_pk, cot_pk):
+        eud_stats = self.build_stats(event, uid)
+        if eud_stats is not None:
             with self.context:
                 self.db.session.add(eud_stats)
                 self.db.session.commit()
 
+    @staticmethod
+    def get_mission_names(event: CoTEvent, uid) -> list[str]:
+        """Data sync missions the CoT was sent to, the same <dest> tags that eud_handler routes to missions"""
+        return [
+            destination["mission"]
+            for destination in event.dests
+            if "mission" in destination
+            and not destination.get("callsign")
+            and destination.get("uid", uid) == uid
+        ]
+
+    def build_mission_content(
+        self, event: CoTEvent, uid, mission_name: str
+    ) -> tuple[MissionUID, MissionChange]:
+        creator = event.find("creator")
+        creator_uid = uid
+        if creator is not None and "uid" in creator.attrib:
+            creator_uid = creator.attrib["uid"]
+
+        mission_uid = MissionUID()
+        mission_uid.uid = event.uid
+        mission_uid.mission_name = mission_name
+        mission_uid.timestamp = datetime_from_iso8601_string(event.start)
+        mission_uid.creator_uid = creator_uid
+        mission_uid.cot_type = event.type
+
+        color = event.find("color")
+        icon = event.find("usericon")
+        point = event.point
+        contact = event.contact
+
+        if color is not None and "argb" in color.attrib:
+            mission_uid.color = color.attrib["argb"]
+        elif color is not None and "value" in color.attrib:
+            mission_uid.color = color.attrib["value"]
+        if icon is not None:
+            mission_uid.iconset_path = icon.attrib["iconsetpath"]
+        if point is not None:
+            mission_uid.latitude = float(point["lat"])
+            mission_uid.longitude = float(point["lon"])
+        if contact is not None:
+            mission_uid.callsign = contact["callsign"]
+
+        mission_change = MissionChange()
+        mission_change.isFederatedChange = False
+        mission_change.change_type = MissionChange.ADD_CONTENT
+        mission_change.mission_name = mission_name
+        mission_change.timestamp = datetime_from_iso8601_string(event.start)
+        mission_change.creator_uid = creator_uid
+        mission_change.server_time = datetime_from_iso8601_string(event.start)
+        mission_change.mission_uid = event.uid
+
+        return mission_uid, mission_change
+
+    def add_mission_contents(self, contents: list[tuple[CoTEvent, str | None]]) -> list[tuple]:
+        """Adds the MissionUID and MissionChange rows for CoTs that are new to their mission to the current
+        transaction. Returns the (routing key, body) of each mission change to publish once it's committed
+        """
+        mission_names = {
+            name for event, uid in contents for name in self.get_mission_names(event, uid)
+        }
+        if not mission_names:
+            return []
+
+        missions = {
+            mission.name: mission
+            for mission in self.db.session.execute(
+                select(Mission.name, Mission.guid).where(Mission.name.in_(mission_names))
+            )
+        }
+        existing = set(
+            self.db.session.execute(
+                select(MissionUID.uid).where(
+                    MissionUID.uid.in_({event.uid for event, uid in contents})
+                )
+            ).scalars()
+        )
+
+        changes = []
+        for event, uid in contents:
+            for mission_name in self.get_mission_names(event, uid):
+                # Only the first CoT with each uid is new content, later ones are updates to it
+                if mission_name not in missions or event.uid in existing:
+                    continue
+                existing.add(event.uid)
+
+                mission_uid, mission_change = self.build_mission_content(event, uid, mission_name)
+                self.db.session.add(mission_uid)
+                self.db.session.add(mission_change)
+
+                mission = missions[mission_name]
+                body = {
+                    "uid": self.context.app.config.get("OTS_NODE_ID"),
+                    "cot": tostring(
+                        generate_mission_change_cot(
+                            mission_name, mission, mission_change, cot_event=event
+                        )
+                    ).decode("utf-8"),
+                }
+                changes.append((f"missions.{mission_name}", json.dumps(body)))
+
+        return changes
+
+    def publish_mission_changes(self, changes: list[tuple]):
+        for routing_key, body in changes:
+            self.rabbit_channel.basic_publish(
+                "missions",
+                routing_key=routing_key,
+                body=body,
+                properties=pika.BasicProperties(
+                    expiration=self.context.app.config.get("OTS_RABBITMQ_TTL")
+                ),
+            )
+
+    def parse_mission_content(self, event: CoTEvent, uid, point_pk, cot_pk):
+        # Data sync mission CoTs from eud_handler, which only checks that the mission exists
+        with self.context:
+            try:
+                changes = self.add_mission_contents([(event, uid)])
+                self.db.session.commit()
+            except exc.IntegrityError:
+                # Another cot_parser added it first
+                self.db.session.rollback()
+                return
+
+        self.publish_mission_changes(changes)
+
     def publish_to_meshtastic(self, body):
         for channel in self.get_meshtastic_channels():
             body.channel_id = channel
@@ -942,57 +1128,243 @@ class CoTController:
         body: bytes,
     ):
         try:
-            start = time.time()
-            body = json.loads(body)
-            soup = BeautifulSoup(body["cot"], "xml")
-            event: BeautifulSoup = soup.find("event")
+            envelope = cot_envelope.unpack(body)
+            event = CoTEvent.from_xml(envelope.xml)
 
-            uid = body["uid"] or event.attrs["uid"]
+            uid = envelope.sender_uid or event.uid
             if uid == self.context.app.config["OTS_NODE_ID"]:
                 uid = None
+        except BaseException as e:
+            self.logger.error(f"Failed to parse CoT: {e}")
+            self.logger.debug(traceback.format_exc())
+            self.rabbit_channel.basic_nack(delivery_tag=basic_deliver.delivery_tag, requeue=False)
+            return
+
+        if self.batch_size <= 1:
+            self.process_message(basic_deliver.delivery_tag, event, uid)
+            return
+
+        self.batch.append((basic_deliver.delivery_tag, event, uid))
+        if len(self.batch) >= self.batch_size:
+            self.batch_stats["full_batches"] += 1
+            self.flush_batch()
+        elif self.batch_timer is None:
+            self.batch_timer = self.rabbit_connection.call_later(
+                self.batch_linger, self.on_batch_linger
+            )
 
-            if event:
-                cot_pk = self.insert_cot(soup, event, uid)
-                point_pk = self.parse_point(event, uid, cot_pk)
-                self.parse_geochat(event, cot_pk, point_pk)
-                self.parse_video(event, cot_pk)
-                self.parse_alert(event, uid, point_pk, cot_pk)
-                self.parse_casevac(event, uid, point_pk, cot_pk)
-                self.parse_marker(event, uid, point_pk, cot_pk)
-                self.parse_rbline(event, uid, point_pk, cot_pk)
-                self.parse_stats(event, uid)
-                self.rabbit_channel.basic_ack(delivery_tag=basic_deliver.delivery_tag)
-
-                # EUD went offline
-                if event.attrs["type"] == "t-x-d-d":
+    def process_message(self, delivery_tag, event: CoTEvent, uid):
+        try:
+            history = self.keep_history(event)
+            cot_pk = self.insert_cot(event, uid) if history else None
+            point_pk = self.parse_point(event, uid, cot_pk, history)
+            self.handlers.run(event, uid, point_pk, cot_pk)
+            self.rabbit_channel.basic_ack(delivery_tag=delivery_tag)
+        except BaseException as e:
+            self.logger.error(f"Failed to parse CoT: {e}")
+            self.logger.debug(traceback.format_exc())
+            self.rabbit_channel.basic_nack(delivery_tag=delivery_tag, requeue=False)
 
-                    try:
-                        with self.context:
-                            eud = self.db.session.execute(
-                                self.db.session.query(EUD).filter_by(uid=uid)
-                            ).first()
-                            if eud:
-                                eud = eud[0]
-                                eud.last_event_time = datetime_from_iso8601_string(
-                                    event.attrs["start"]
-                                )
-                                eud.last_status = "Disconnected"
-                                self.db.session.commit()
-                                self.logger.debug("Updated {}".format(uid))
-                                eud_json = eud.to_json()
-                                # The first time an EUD connects but doesn't have a location.
-                                # Tells the UI what kind of EUD this is, ie ATAK/WinTAK/iTAK or OpenTAK ICU
-                                if not eud_json["last_point"]:
-                                    eud_json["type"] = event.attrs["type"]
-                                self.socketio.emit("eud", eud.to_json(), namespace="/socket.io")
-                    except BaseException as e:
-                        self.logger.error("Failed to update EUD: {}".format(e))
-                        self.logger.debug(traceback.format_exc())
+        self.report_stats()
+
+    def on_batch_linger(self):
+        self.batch_timer = None
+        self.batch_stats["linger_batches"] += 1
+        self.flush_batch()
+
+    def flush_batch(self):
+        if self.batch_timer is not None:
+            self.rabbit_connection.remove_timeout(self.batch_timer)
+            self.batch_timer = None
 
+        batch, self.batch = self.batch, []
+        if not batch:
+            return
+
+        start = time.perf_counter()
+        try:
+            rows, points, markers = self.write_batch(batch)
         except BaseException as e:
-            self.logger.error(f"Failed to parse CoT: {e}")
+            # Usually an IntegrityError from one bad row. Write them one at a time so only that CoT is lost
+            self.logger.error(f"Failed to write {len(batch)} CoTs, retrying one at a time: {e}")
+            self.logger.debug(traceback.format_exc())
+            self.batch_stats["failed_batches"] += 1
+            for delivery_tag, event, uid in batch:
+                self.process_message(delivery_tag, event, uid)
+            return
+
+        write_seconds = time.perf_counter() - start
+
+        for point in points:
+            self.socketio.emit("point", point, namespace="/socket.io")
+        for marker in markers:
+            self.socketio.emit("marker", marker, namespace="/socket.io")
+
+        for (delivery_tag, event, uid), (cot_pk, point_pk) in zip(batch, rows):
+            self.handlers.run(event, uid, point_pk, cot_pk, exclude=BATCHED_HANDLERS)
+
+        # Every message up to and including this one has been handled
+        self.rabbit_channel.basic_ack(delivery_tag=batch[-1][0], multiple=True)
+
+        self.batch_stats["batches"] += 1
+        self.batch_stats["messages"] += len(batch)
+        self.batch_stats["last_batch_size"] = len(batch)
+        self.batch_stats["max_batch_size"] = max(self.batch_stats["max_batch_size"], len(batch))
+        self.batch_stats["write_seconds"] += write_seconds
+        self.batch_stats["max_write_seconds"] = max(
+            self.batch_stats["max_write_seconds"], write_seconds
+        )
+        self.logger.debug(f"Wrote {len(batch)} CoTs in {write_seconds * 1000:.1f} ms")
+        self.report_stats()
+
+    def report_stats(self):
+        if time.monotonic() - self.stats_written < 10:
+            return
+
+        self.stats_written = time.monotonic()
+        write_stats(
+            self.context.app.config.get("OTS_DATA_FOLDER"),
+            "cot_parser",
+            {"batches": self.batch_stats, "handlers": self.handlers.stats()},
+        )
+
+    def write_batch(self, batch) -> tuple[list, list, list]:
+        """Writes the CoT, Point, Marker, EUDStats and mission content rows for a batch of messages in one transaction.
+
+        Returns the (cot_pk, point_pk) of each message and the Points and Markers to send to socketio clients
+        """
+        with self.context:
+            cots = []
+            points = []
+            tracks = []
+            markers = {}
+            mission_contents = []
+            for delivery_tag, event, uid in batch:
+                history = self.keep_history(event)
+                cot = None
+                if history:
+                    cot = self.build_cot(event, uid)
+                    self.db.session.add(cot)
+
+                point = self.build_point(event, uid)
+                if point is not None:
+                    tracks.append(self.build_current_track(event, point))
+                    if history:
+                        point.cot = cot
+                        self.db.session.add(point)
+
+                handlers = {handler.name for handler in self.handlers.match(event)}
+                if "marker" in handlers:
+                    marker = self.build_marker(event)
+                    # Only the latest update for each marker in the batch needs to be saved, but it keeps the
+                    # CoT that created it like parse_marker() does
+                    marker_cot = markers[marker.uid][2] if marker.uid in markers else cot
+                    # Without history the point isn't saved, and setting it here would save it through the cascade
+                    markers[marker.uid] = (marker, point if history else None, marker_cot)
+
+                if "stats" in handlers:
+                    eud_stats = self.build_stats(event, uid)
+                    if eud_stats is not None:
+                        self.db.session.add(eud_stats)
+
+                if "mission_content" in handlers:
+                    mission_contents.append((event, uid))
+
+                cots.append(cot)
+                points.append(point)
+
+            existing_markers = {}
+            if markers:
+                existing_markers = {
+                    marker.uid: marker
+                    for marker in self.db.session.execute(
+                        select(Marker).where(Marker.uid.in_(markers.keys()))
+                    ).scalars()
+                }
+
+            for marker_uid, (marker, point, cot) in markers.items():
+                existing = existing_markers.get(marker_uid)
+                if existing is None:
+                    marker.point = point
+                    marker.cot = cot
+                    self.db.session.add(marker)
+                    continue
+
+                # Updating a marker keeps its original CoT, the same as parse_marker()
+                existing.point = point
+                existing.icon_id = marker.icon_id
+                for key, value in marker.serialize().items():
+                    setattr(existing, key, value)
+                markers[marker_uid] = (existing, point, cot)
+
+            # Only look up the mission UIDs that exist instead of running an UPDATE for every point
+            point_uids = {point.uid for point in points if point is not None}
+            mission_uids = set()
+            if point_uids:
+                mission_uids = set(
+                    self.db.session.execute(
+                        select(MissionUID.uid).where(MissionUID.uid.in_(point_uids))
+                    ).scalars()
+                )
+
+            for (delivery_tag, event, uid), point in zip(batch, points):
+                if point is not None and point.uid in mission_uids:
+                    self.update_mission_uid(event, point)
+
+            mission_changes = []
+            if mission_contents:
+                mission_changes = self.add_mission_contents(mission_contents)
+
+            upsert_current_tracks(self.db.session, tracks)
+            self.db.session.flush()
+
+            rows = [
+                (
+                    cot.id if cot is not None else None,
+                    point.id if point is not None and cot is not None else None,
+                )
+                for cot, point in zip(cots, points)
+            ]
+            point_json = [
+                CurrentTrack(**self.build_current_track(event, point)).to_json()
+                for (delivery_tag, event, uid), point in zip(batch, points)
+                if point is not None and self.is_eud_position(event)
+            ]
+            marker_json = [marker.to_json() for marker, point, cot in markers.values()]
+
+            self.db.session.commit()
+            self.publish_mission_changes(mission_changes)
+
+            if self.context.app.config.get("OTS_ENABLE_MESHTASTIC"):
+                for (delivery_tag, event, uid), point in zip(batch, points):
+                    if point is not None:
+                        self.publish_point_to_meshtastic(event, uid, point)
+
+            return rows, point_json, marker_json
+
+    def update_disconnected_eud(self, event: CoTEvent, uid, point_pk, cot_pk):
+        # EUD went offline
+        if event.type != "t-x-d-d":
+            return
+
+        try:
+            with self.context:
+                eud = self.db.session.execute(self.db.session.query(EUD).filter_by(uid=uid)).first()
+                if eud:
+                    eud = eud[0]
+                    eud.last_event_time = datetime_from_iso8601_string(event.start)
+                    eud.last_status = "Disconnected"
+                    self.db.session.commit()
+                    self.logger.debug("Updated {}".format(uid))
+                    eud_json = eud.to_json()
+                    # The first time an EUD connects but doesn't have a location.
+                    # Tells the UI what kind of EUD this is, ie ATAK/WinTAK/iTAK or OpenTAK ICU
+                    if not eud_json["last_point"]:
+                        eud_json["type"] = event.type
+                    self.socketio.emit("eud", eud.to_json(), namespace="/socket.io")
+        except BaseException as e:
+            self.logger.error("Failed to update EUD: {}".format(e))
             self.logger.debug(traceback.format_exc())
-            self.rabbit_channel.basic_nack(delivery_tag=basic_deliver.delivery_tag, requeue=False)
 
 
 def setup_logging(app):
@@ -0,0 +1,117 @@
+import time
+import traceback
+from dataclasses import dataclass
+from importlib import metadata
+from typing import Callable
+
+from opentakserver.cot_event import CoTEvent
+from opentakserver.extensions import logger
+
+# Packages can add their own CoT handlers to cot_parser with an entry point in this group. The entry point should be a
+# function that takes the HandlerRegistry and calls register() on it, for example in pyproject.toml:
+#
+# [project.entry-points."opentakserver.cot_handler"]
+# my_plugin = "my_plugin.cot:register_handlers"
+ENTRY_POINT_GROUP = "opentakserver.cot_handler"
+
+
+@dataclass(slots=True)
+class CoTHandler:
+    """A function that cot_parser calls with (event, uid, point_pk, cot_pk) for every CoT it applies to.
+
+    types and exclude_types are CoT type prefixes. tags and exclude_tags are tag names anywhere under <detail>.
+    Empty types or tags match everything.
+    """
+
+    name: str
+    function: Callable[[CoTEvent, str | None, int | None, int | None], None]
+    types: tuple[str, ...] = ()
+    exclude_types: tuple[str, ...] = ()
+    tags: tuple[str, ...] = ()
+    exclude_tags: tuple[str, ...] = ()
+    calls: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+
+    def matches_type(self, cot_type: str) -> bool:
+        if self.types and not cot_type.startswith(self.types):
+            return False
+        return not (self.exclude_types and cot_type.startswith(self.exclude_types))
+
+    def matches_tags(self, tags: set[str]) -> bool:
+        if self.tags and tags.isdisjoint(self.tags):
+            return False
+        return not (self.exclude_tags and not tags.isdisjoint(self.exclude_tags))
+
+
+class HandlerRegistry:
+    """Decides which handlers apply to a CoT so each message only runs the ones it needs.
+
+    Matching handlers by type is done once per CoT type and cached, leaving only a set lookup for the detail tags.
+    """
+
+    # EUDs can send any type, don't let the cache grow forever
+    MAX_CACHED_TYPES = 10000
+
+    def __init__(self):
+        self.handlers: list[CoTHandler] = []
+        self.handlers_by_type: dict[str, list[CoTHandler]] = {}
+
+    def register(
+        self,
+        name: str,
+        function: Callable,
+        types: tuple[str, ...] = (),
+        exclude_types: tuple[str, ...] = (),
+        tags: tuple[str, ...] = (),
+        exclude_tags: tuple[str, ...] = (),
+    ):
+        """Handlers run in the order they're registered"""
+        self.handlers.append(CoTHandler(name, function, types, exclude_types, tags, exclude_tags))
+        self.handlers_by_type.clear()
+
+    def load_plugins(self):
+        for entry_point in metadata.entry_points(group=ENTRY_POINT_GROUP):
+            try:
+                entry_point.load()(self)
+                logger.info(f"Loaded CoT handlers from {entry_point.name}")
+            except BaseException as e:
+                logger.error(f"Failed to load CoT handlers from {entry_point.name}: {e}")
+                logger.debug(traceback.format_exc())
+
+    def match(self, event: CoTEvent) -> list[CoTHandler]:
+        cot_type = event.type or ""
+        handlers = self.handlers_by_type.get(cot_type)
+        if handlers is None:
+            if len(self.handlers_by_type) >= self.MAX_CACHED_TYPES:
+                self.handlers_by_type.clear()
+            handlers = [handler for handler in self.handlers if handler.matches_type(cot_type)]
+            self.handlers_by_type[cot_type] = handlers
+
+        return [handler for handler in handlers if handler.matches_tags(event.tags)]
+
+    def run(self, event: CoTEvent, uid, point_pk, cot_pk, exclude: tuple[str, ...] = ()):
+        for handler in self.match(event):
+            if handler.name in exclude:
+                continue
+
+            start = time.perf_counter()
+            try:
+                handler.function(event, uid, point_pk, cot_pk)
+            except BaseException as e:
+                handler.errors += 1
+                logger.error(f"{handler.name} failed to handle {event.uid}: {e}")
+                logger.debug(traceback.format_exc())
+            finally:
+                handler.calls += 1
+                handler.seconds += time.perf_counter() - start
+
+    def stats(self) -> dict:
+        return {
+            handler.name: {
+                "calls": handler.calls,
+                "errors": handler.errors,
+                "seconds": handler.seconds,
+            }
+            for handler in self.handlers
+        }
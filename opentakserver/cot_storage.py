@@ -0,0 +1,271 @@
+"""Compact storage for the xml column of the cot table.
+
+Values in the column are one of
+    - The XML as it was received
+    - zstd:<base64 zstd frame>, compressed with the cot_dictionaries row whose ID is in the frame header
+    - detail:<sha256>:<offset>:<the XML without its <detail> element>, the <detail> is in cot_details and goes
+      back in at offset
+
+A detail: value can itself be compressed. cot_parser writes them with CoTXmlEncoder and the CoTXml column type turns
+them back into the XML when they're read, so CoT.xml always looks like it did before.
+"""
+
+import base64
+import datetime
+import hashlib
+import re
+from threading import Lock
+
+import zstandard
+from flask import Flask
+from sqlalchemy import TEXT, DateTime, delete, func, select, sql
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.types import TypeDecorator
+
+from opentakserver.extensions import db, logger
+from opentakserver.models.CoTDetail import CoTDetail
+from opentakserver.models.CoTDictionary import CoTDictionary
+
+ZSTD_PREFIX = "zstd:"
+DETAIL_PREFIX = "detail:"
+
+# cot_details.last_used is only updated when a CoT is at least this much newer, instead of for every CoT
+LAST_USED_INTERVAL = datetime.timedelta(hours=1)
+
+DETAIL_START_REGEX = re.compile(r"<detail[\s>]")
+
+# Dictionaries never change once they're saved, and details never change for their hash
+_decompressors: dict[int, zstandard.ZstdDecompressor] = {}
+_details: dict[str, str] = {}
+_cache_lock = Lock()
+MAX_CACHED_DETAILS = 10000
+
+
+def _get_decompressor(dict_id: int) -> zstandard.ZstdDecompressor:
+    with _cache_lock:
+        decompressor = _decompressors.get(dict_id)
+    if decompressor:
+        return decompressor
+
+    dict_data = None
+    if dict_id:
+        with db.engine.connect() as connection:
+            data = connection.execute(
+                select(CoTDictionary.data).where(CoTDictionary.id == dict_id)
+            ).scalar()
+        if data is None:
+            raise ValueError(f"Missing CoT dictionary {dict_id}")
+        dict_data = zstandard.ZstdCompressionDict(data)
+
+    decompressor = zstandard.ZstdDecompressor(dict_data=dict_data)
+    with _cache_lock:
+        _decompressors[dict_id] = decompressor
+    return decompressor
+
+
+def _get_detail(detail_hash: str) -> str:
+    with _cache_lock:
+        detail = _details.get(detail_hash)
+    if detail is not None:
+        return detail
+
+    with db.engine.connect() as connection:
+        detail = connection.execute(
+            select(CoTDetail.xml).where(CoTDetail.hash == detail_hash)
+        ).scalar()
+    if detail is None:
+        raise ValueError(f"Missing CoT detail {detail_hash}")
+
+    with _cache_lock:
+        if len(_details) >= MAX_CACHED_DETAILS:
+            _details.clear()
+        _details[detail_hash] = detail
+    return detail
+
+
+def decode(value: str | None) -> str | None:
+    if not value or value.startswith("<"):
+        return value
+
+    if value.startswith(ZSTD_PREFIX):
+        frame = base64.b64decode(value[len(ZSTD_PREFIX) :])
+        dict_id = zstandard.get_frame_parameters(frame).dict_id
+        value = _get_decompressor(dict_id).decompress(frame).decode("utf-8")
+
+    if value.startswith(DETAIL_PREFIX):
+        detail_hash, offset, xml = value[len(DETAIL_PREFIX) :].split(":", 2)
+        offset = int(offset)
+        value = xml[:offset] + _get_detail(detail_hash) + xml[offset:]
+
+    return value
+
+
+class CoTXml(TypeDecorator):
+    """TEXT that decodes the formats above when it's read. Values are written as they are"""
+
+    impl = TEXT
+    cache_ok = True
+
+    def process_result_value(self, value, dialect):
+        try:
+            return decode(value)
+        except BaseException as e:
+            logger.error(f"Failed to decode CoT XML: {e}")
+            return value
+
+
+class CoTXmlEncoder:
+    """Encodes cot_parser's CoT XML for the cot table according to OTS_COT_XML_STORAGE and
+    OTS_COT_XML_DEDUPE_DETAILS.
+
+    There's one encoder per cot_parser process. Use CoTXmlEncoder.for_app(app).
+    """
+
+    def __init__(self, compress: bool, level: int, dedupe_details: bool):
+        self.compress = compress
+        self.level = level
+        self.dedupe_details = dedupe_details
+        self.compressor = None
+
+        # uid -> hash of the <detail> of its last CoT
+        self.last_details: dict[str, str] = {}
+        # hash -> the last_used this process last saved for a cot_details row
+        self.last_used: dict[str, datetime.datetime] = {}
+        self.lock = Lock()
+
+    @classmethod
+    def for_app(cls, app: Flask) -> "CoTXmlEncoder | None":
+        """Returns None when CoTs are stored as they are"""
+        compress = app.config.get("OTS_COT_XML_STORAGE") == "zstd"
+        if not compress and not app.config.get("OTS_COT_XML_DEDUPE_DETAILS"):
+            return None
+
+        if "ots_cot_xml_encoder" not in app.extensions:
+            app.extensions["ots_cot_xml_encoder"] = cls(
+                compress,
+                app.config.get("OTS_COT_XML_COMPRESSION_LEVEL"),
+                app.config.get("OTS_COT_XML_DEDUPE_DETAILS"),
+            )
+        return app.extensions["ots_cot_xml_encoder"]
+
+    def get_compressor(self, session: Session) -> zstandard.ZstdCompressor:
+        """Uses the newest dictionary. Dictionaries trained after this process started are used after a restart"""
+        if self.compressor is None:
+            data = session.execute(
+                select(CoTDictionary.data).order_by(CoTDictionary.id.desc()).limit(1)
+            ).scalar()
+            dict_data = zstandard.ZstdCompressionDict(data) if data else None
+            self.compressor = zstandard.ZstdCompressor(
+                level=self.level, dict_data=dict_data, write_checksum=False
+            )
+        return self.compressor
+
+    def encode(self, session: Session, uid: str, xml: str, timestamp: datetime.datetime) -> str:
+        """The cot_details row the value refers to is saved in session, so it's committed with the CoT"""
+        with self.lock:
+            if self.dedupe_details:
+                xml = self.replace_detail(session, uid, xml, timestamp)
+
+            if self.compress:
+                frame = self.get_compressor(session).compress(xml.encode("utf-8"))
+                xml = ZSTD_PREFIX + base64.b64encode(frame).decode("ascii")
+
+            return xml
+
+    def replace_detail(
+        self, session: Session, uid: str, xml: str, timestamp: datetime.datetime
+    ) -> str:
+        match = DETAIL_START_REGEX.search(xml)
+        end = xml.rfind("</detail>")
+        if not match or end < match.start():
+            return xml
+
+        start = match.start()
+        end += len("</detail>")
+        detail = xml[start:end]
+        detail_hash = hashlib.sha256(detail.encode("utf-8")).hexdigest()
+
+        # Only a detail that's the same as the uid's last one is likely to be seen again
+        previous = self.last_details.get(uid)
+        self.last_details[uid] = detail_hash
+        if previous != detail_hash:
+            return xml
+
+        # The row is saved with every CoT that refers to it, in case this process saved it in a transaction that was
+        # rolled back. last_used only needs updating now and then
+        last_used = self.last_used.get(detail_hash)
+        refresh = last_used is None or timestamp > last_used + LAST_USED_INTERVAL
+        save_detail(session, detail_hash, detail, timestamp, refresh)
+        if refresh:
+            if len(self.last_used) >= MAX_CACHED_DETAILS:
+                self.last_used.clear()
+            self.last_used[detail_hash] = max(timestamp, last_used or timestamp)
+
+        return f"{DETAIL_PREFIX}{detail_hash}:{start}:{xml[:start]}{xml[end:]}"
+
+
+def save_detail(
+    session: Session, detail_hash: str, detail: str, timestamp: datetime.datetime, refresh: bool
+):
+    """Inserts the cot_details row if it doesn't exist. With refresh, an existing row's last_used is moved forward to
+    timestamp
+    """
+    values = {"hash": detail_hash, "xml": detail, "last_used": timestamp}
+    dialect = session.get_bind().dialect.name
+    if dialect == "mysql":
+        statement = mysql.insert(CoTDetail).values(values)
+        last_used = CoTDetail.last_used
+        if refresh:
+            last_used = func.greatest(CoTDetail.last_used, statement.inserted.last_used)
+        statement = statement.on_duplicate_key_update(last_used=last_used)
+    else:
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = insert(CoTDetail).values(values)
+        if refresh:
+            statement = statement.on_conflict_do_update(
+                index_elements=[CoTDetail.hash],
+                set_={"last_used": statement.excluded.last_used},
+                where=CoTDetail.last_used < statement.excluded.last_used,
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=[CoTDetail.hash])
+    session.execute(statement)
+
+
+def delete_unused_details(session: Session, cutoff: datetime.datetime) -> int:
+    """Deletes the cot_details that no CoT newer than cutoff can refer to. Run it after deleting the old CoTs"""
+    cot = sql.table("cot", sql.column("timestamp", DateTime))
+    # Older CoTs that are still there, like ones that haven't been archived yet, keep theirs
+    oldest = session.execute(
+        select(func.min(cot.c.timestamp)).where(cot.c.timestamp <= cutoff)
+    ).scalar()
+    if oldest is not None:
+        cutoff = min(cutoff, oldest)
+
+    # last_used can be behind by an interval, and by another one when an update to it was rolled back
+    result = session.execute(
+        delete(CoTDetail).where(CoTDetail.last_used < cutoff - 2 * LAST_USED_INTERVAL)
+    )
+    session.commit()
+    return result.rowcount
+
+
+def train_dictionary(session: Session, samples: int, size: int) -> CoTDictionary:
+    """Trains a zstd dictionary on the newest CoTs and saves it. The caller commits"""
+    cot = sql.table("cot", sql.column("id"), sql.column("xml", CoTXml()))
+    xml = [
+        row.encode("utf-8")
+        for row in session.execute(select(cot.c.xml).order_by(cot.c.id.desc()).limit(samples))
+        .scalars()
+        .all()
+        if row
+    ]
+    if not xml:
+        raise ValueError("There are no CoTs to train a dictionary with")
+
+    dict_id = (session.execute(select(func.max(CoTDictionary.id))).scalar() or 0) + 1
+    dictionary = zstandard.train_dictionary(size, xml, dict_id=dict_id)
+    row = CoTDictionary(id=dict_id, data=dictionary.as_bytes(), created=datetime.datetime.now())
+    session.add(row)
+    return row
@@ -36,6 +36,73 @@ class DefaultConfig:
     ]
     OTS_TCP_STREAMING_PORT = int(os.getenv("OTS_TCP_STREAMING_PORT", 8088))
     OTS_SSL_STREAMING_PORT = int(os.getenv("OTS_SSL_STREAMING_PORT", 8089))
+    # Serve the streaming ports from one asyncio event loop per eud_handler process instead of one thread per EUD
+    OTS_EUD_HANDLER_ASYNCIO = os.getenv("OTS_EUD_HANDLER_ASYNCIO", "False").lower() in [
+        "true",
+        "1",
+        "yes",
+    ]
+    # eud_handler processes serving each streaming port. More than 1 shares the port between them with SO_REUSEPORT
+    OTS_EUD_HANDLER_WORKERS = int(os.getenv("OTS_EUD_HANDLER_WORKERS", 1))
+    # Threads doing TLS handshakes for new connections to the SSL streaming port, and how long a handshake can take
+    OTS_EUD_HANDLER_HANDSHAKE_THREADS = int(os.getenv("OTS_EUD_HANDLER_HANDSHAKE_THREADS", 8))
+    OTS_EUD_HANDLER_HANDSHAKE_TIMEOUT = int(os.getenv("OTS_EUD_HANDLER_HANDSHAKE_TIMEOUT", 10))
+    # How long the user for a client certificate's common name is cached. A deactivated user can still connect with
+    # their certificate for this long. 0 looks them up on every connection
+    OTS_CERT_USER_CACHE_SECONDS = int(os.getenv("OTS_CERT_USER_CACHE_SECONDS", 60))
+    # How long what's looked up and saved when an EUD connects is kept, so reconnecting with the same callsign, team
+    # etc doesn't do it all again. An EUD that's offline when its groups change keeps the old ones for this long
+    OTS_EUD_SESSION_CACHE_SECONDS = int(os.getenv("OTS_EUD_SESSION_CACHE_SECONDS", 60))
+    # Number of threads the asyncio eud_handler uses for parsing and database work
+    OTS_EUD_HANDLER_DB_THREADS = int(os.getenv("OTS_EUD_HANDLER_DB_THREADS", 8))
+    # RabbitMQ connections shared by every EUD in an asyncio eud_handler process. 0 gives each EUD its own connection
+    OTS_EUD_HANDLER_RABBITMQ_CONNECTIONS = int(os.getenv("OTS_EUD_HANDLER_RABBITMQ_CONNECTIONS", 2))
+    # Largest CoT message in bytes an EUD can send, anything bigger is dropped
+    OTS_EUD_HANDLER_MAX_FRAME_SIZE = int(
+        os.getenv("OTS_EUD_HANDLER_MAX_FRAME_SIZE", 8 * 1024 * 1024)
+    )
+    # Bytes of messages that can wait to be sent to each EUD. When an EUD can't keep up, older position reports from
+    # the same uid are replaced with newer ones and then OTS_EUD_HANDLER_SLOW_CLIENT_POLICY decides what to drop.
+    # drop_oldest: drop the oldest messages. drop_sa: drop position reports before anything else.
+    # disconnect: drop the oldest messages, and disconnect EUDs that are still behind after SLOW_CLIENT_SECONDS
+    OTS_EUD_HANDLER_SEND_BUFFER_BYTES = int(
+        os.getenv("OTS_EUD_HANDLER_SEND_BUFFER_BYTES", 4 * 1024 * 1024)
+    )
+    OTS_EUD_HANDLER_SLOW_CLIENT_POLICY = os.getenv("OTS_EUD_HANDLER_SLOW_CLIENT_POLICY", "drop_sa")
+    OTS_EUD_HANDLER_SLOW_CLIENT_SECONDS = int(os.getenv("OTS_EUD_HANDLER_SLOW_CLIENT_SECONDS", 30))
+    # Messages waiting for an EUD are sent together, up to this many bytes per write
+    OTS_EUD_HANDLER_SEND_BATCH_BYTES = int(os.getenv("OTS_EUD_HANDLER_SEND_BATCH_BYTES", 64 * 1024))
+    # How long to wait for more messages to send together. 0 sends whatever is waiting right away
+    OTS_EUD_HANDLER_SEND_LINGER_MS = int(os.getenv("OTS_EUD_HANDLER_SEND_LINGER_MS", 0))
+    # Deliver to EUDs from one RabbitMQ queue per eud_handler process instead of a queue for every EUD
+    OTS_EUD_HANDLER_LOCAL_ROUTING = os.getenv("OTS_EUD_HANDLER_LOCAL_ROUTING", "False").lower() in [
+        "true",
+        "1",
+        "yes",
+    ]
+    # EUDs that disconnect within this many milliseconds of each other are marked disconnected and announced to
+    # their groups together, one message per group
+    OTS_EUD_HANDLER_DISCONNECT_WINDOW_MS = int(
+        os.getenv("OTS_EUD_HANDLER_DISCONNECT_WINDOW_MS", 250)
+    )
+    # 0 always publishes CoTs to the firehose exchange. Otherwise they're only published while something is bound to
+    # it, and when nothing is, eud_handler checks again after this many seconds. That saves publishing every CoT when
+    # nothing reads the firehose, but a plugin or federation consumer that binds to it misses up to this many seconds
+    # of CoTs, so only set it when nothing reads the firehose or that's acceptable
+    OTS_FIREHOSE_CHECK_SECONDS = int(os.getenv("OTS_FIREHOSE_CHECK_SECONDS", 0))
+    # How long data sync missions are cached by name. Creating or deleting a mission clears it right away
+    OTS_MISSION_CACHE_SECONDS = int(os.getenv("OTS_MISSION_CACHE_SECONDS", 60))
+    # How long an EUD's groups are cached before they're looked up again. Changes made in the web UI apply immediately
+    OTS_GROUP_ROUTING_CACHE_SECONDS = int(os.getenv("OTS_GROUP_ROUTING_CACHE_SECONDS", 300))
+    # Drop an EUD's position reports when it moved less than these thresholds since its last report that was saved
+    # and sent to other EUDs. One report is always let through every OTS_DEAD_BAND_SECONDS so stationary EUDs don't
+    # go stale, keep it below the EUDs' stale time. 0 disables the filter
+    OTS_DEAD_BAND_SECONDS = int(os.getenv("OTS_DEAD_BAND_SECONDS", 0))
+    OTS_DEAD_BAND_METERS = float(os.getenv("OTS_DEAD_BAND_METERS", 5))
+    OTS_DEAD_BAND_ALTITUDE_METERS = float(os.getenv("OTS_DEAD_BAND_ALTITUDE_METERS", 5))
+    OTS_DEAD_BAND_COURSE_DEGREES = float(os.getenv("OTS_DEAD_BAND_COURSE_DEGREES", 10))
+    # Meters per second
+    OTS_DEAD_BAND_SPEED = float(os.getenv("OTS_DEAD_BAND_SPEED", 1))
     OTS_BACKUP_COUNT = int(os.getenv("OTS_BACKUP_COUNT", 7))
     OTS_ENABLE_CHANNELS = os.getenv("OTS_ENABLE_CHANNELS", "True").lower() in ["true", "1", "yes"]
 
@@ -48,6 +115,10 @@ class DefaultConfig:
     OTS_RABBITMQ_TTL = "86400000"
     # How many CoT messages that cot_parser processes should prefetch. https://www.rabbitmq.com/docs/consumer-prefetch
     OTS_RABBITMQ_PREFETCH = 2
+    # Format of CoT messages on the firehose, cot_parser, dms, groups and missions exchanges. "json" or "protobuf".
+    # "json" is the {"uid": ..., "cot": ...} format that plugins, federation and other programs reading these exchanges
+    # expect. "protobuf" is faster but only use it when everything that reads them uses cot_envelope.unpack()
+    OTS_RABBITMQ_ENVELOPE = os.getenv("OTS_RABBITMQ_ENVELOPE", "json")
 
     # TAK.gov account link settings
     OTS_TAK_GOV_LINKED = False
@@ -79,6 +150,30 @@ class DefaultConfig:
     )
 
     OTS_COT_PARSER_PROCESSES = int(os.getenv("OTS_COT_PARSER_PROCESSES", 1))
+    # How many CoTs cot_parser writes to the database in one transaction. 1 writes each CoT as soon as it's received
+    OTS_COT_PARSER_BATCH_SIZE = int(os.getenv("OTS_COT_PARSER_BATCH_SIZE", 1))
+    # How long cot_parser waits for a batch to fill up before writing it anyway
+    OTS_COT_PARSER_BATCH_LINGER_MS = int(os.getenv("OTS_COT_PARSER_BATCH_LINGER_MS", 100))
+    # Comma separated CoT type prefixes, like a-f-G-U-C, whose positions only update the current_tracks table instead of
+    # also being saved to the points and cot tables. Useful when breadcrumb history isn't needed. Only list position
+    # types, things like markers and GeoChats need their point and CoT saved
+    OTS_COT_PARSER_NO_HISTORY_TYPES = [
+        cot_type
+        for cot_type in os.getenv("OTS_COT_PARSER_NO_HISTORY_TYPES", "").split(",")
+        if cot_type
+    ]
+    # How cot_parser stores the raw XML in the cot table. text stores it as it is, zstd compresses it with the newest
+    # dictionary from `flask ots train-cot-dictionary`, or without one if there isn't one yet
+    OTS_COT_XML_STORAGE = os.getenv("OTS_COT_XML_STORAGE", "text")
+    # zstd compression level for OTS_COT_XML_STORAGE, 1-22
+    OTS_COT_XML_COMPRESSION_LEVEL = int(os.getenv("OTS_COT_XML_COMPRESSION_LEVEL", 3))
+    # Store a CoT's <detail> once in the cot_details table when it's the same as in the last CoT from the same uid,
+    # like periodic SA from stationary units
+    OTS_COT_XML_DEDUPE_DETAILS = os.getenv("OTS_COT_XML_DEDUPE_DETAILS", "False").lower() in [
+        "true",
+        "1",
+        "yes",
+    ]
 
     OTS_ENABLE_LDAP = False
     # LDAP users in this group will be considered OTS administrators
@@ -118,6 +213,8 @@ class DefaultConfig:
     OTS_ENABLE_PLUGINS = True
     OTS_PLUGIN_REPO = "https://repo.opentakserver.io/brian/prod/"
     OTS_PLUGIN_PREFIXES = ["ots-", "ots_"]
+    # CoTs that can wait for each plugin subscribed with PluginManager.subscribe_cot() before newer ones are dropped
+    OTS_PLUGIN_COT_QUEUE_SIZE = int(os.getenv("OTS_PLUGIN_COT_QUEUE_SIZE", 1000))
 
     # AIS Settings
     OTS_AISHUB_USERNAME = None
@@ -165,6 +262,23 @@ class DefaultConfig:
     OTS_DELETE_OLD_DATA_HOURS = int(os.getenv("OTS_DELETE_OLD_DATA_HOURS", 0))
     OTS_DELETE_OLD_DATA_DAYS = int(os.getenv("OTS_DELETE_OLD_DATA_DAYS", 0))
     OTS_DELETE_OLD_DATA_WEEKS = int(os.getenv("OTS_DELETE_OLD_DATA_WEEKS", 1))
+    # delete_old_data() deletes expired CoTs and points this many rows at a time, committing after each batch
+    OTS_DELETE_OLD_DATA_BATCH_SIZE = int(os.getenv("OTS_DELETE_OLD_DATA_BATCH_SIZE", 10000))
+    # PostgreSQL only. Set to day or week to store the cot and points tables in partitions of that size, which
+    # delete_old_data() drops whole once they expire. Convert existing tables with `flask ots partition-history`
+    OTS_HISTORY_PARTITION_INTERVAL = os.getenv("OTS_HISTORY_PARTITION_INTERVAL", "")
+    # How many partitions to create ahead of the current one
+    OTS_HISTORY_PARTITIONS_AHEAD = int(os.getenv("OTS_HISTORY_PARTITIONS_AHEAD", 3))
+    # Copy expired CoTs and points to zstd compressed NDJSON files in OTS_ARCHIVE_FOLDER before delete_old_data()
+    # deletes them. /Marti/api/cot/xml/<uid>/all and /Marti/ExportMissionKML read them for older time ranges
+    OTS_ARCHIVE_EXPIRED_DATA = os.getenv("OTS_ARCHIVE_EXPIRED_DATA", "False").lower() in [
+        "true",
+        "1",
+        "yes",
+    ]
+    OTS_ARCHIVE_FOLDER = os.getenv("OTS_ARCHIVE_FOLDER", os.path.join(OTS_DATA_FOLDER, "archive"))
+    # zstd compression level, 1-22
+    OTS_ARCHIVE_COMPRESSION_LEVEL = int(os.getenv("OTS_ARCHIVE_COMPRESSION_LEVEL", 10))
 
     # flask-sqlalchemy
     SQLALCHEMY_DATABASE_URI = os.getenv(
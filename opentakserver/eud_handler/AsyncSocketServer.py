@@ -0,0 +1,134 @@
+import asyncio
+import signal
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from opentakserver.eud_handler.async_client_controller import AsyncClientController
+from opentakserver.eud_handler.rabbitmq_pool import RabbitMQPool
+from opentakserver.eud_handler.SocketServer import SocketServer
+
+
+class AsyncSocketServer(SocketServer):
+    """Serves the TCP or SSL streaming port from a single asyncio event loop instead of a thread per EUD"""
+
+    def __init__(self, logger, app_context=None, port=8088, ssl_server=False, ssl_context=None):
+        super().__init__(logger, app_context, port, ssl_server, ssl_context)
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.server: asyncio.Server | None = None
+        self.rabbitmq_pool: RabbitMQPool | None = None
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.app_context.app.config.get("OTS_EUD_HANDLER_DB_THREADS"),
+            thread_name_prefix="eud_handler",
+        )
+
+    def run(self):
+        if not self.ssl and not self.app_context.app.config.get("OTS_ENABLE_TCP_STREAMING_PORT"):
+            self.logger.info("TCP connections are disabled")
+            return
+
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+        if self.ssl:
+            self.logger.info("SSL server has shut down")
+        else:
+            self.logger.info("TCP server has shut down")
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                # Windows, or the server isn't running in the main thread
+                pass
+
+        pool_size = self.app_context.app.config.get("OTS_EUD_HANDLER_RABBITMQ_CONNECTIONS")
+        if pool_size > 0:
+            self.rabbitmq_pool = RabbitMQPool(
+                self.app_context.app, self.logger, self.loop, pool_size
+            )
+            self.rabbitmq_pool.start()
+
+        self.loop.call_soon(self.report_stats_periodically)
+
+        # Uses the context passed in, like the parent's when there are workers, or creates one
+        ssl_context = self.get_ssl_context() if self.ssl else None
+        self.server = await asyncio.start_server(
+            self.handle_client,
+            "0.0.0.0",
+            self.port,
+            ssl=ssl_context,
+            reuse_address=True,
+            reuse_port=self.reuse_port or None,
+            ssl_handshake_timeout=self.handshake_timeout if self.ssl else None,
+        )
+
+        async with self.server:
+            try:
+                await self.server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+        if self.rabbitmq_pool:
+            self.rabbitmq_pool.close()
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        address = writer.get_extra_info("peername")[0]
+        if self.ssl:
+            self.logger.info("New SSL connection from {}".format(address))
+        else:
+            self.logger.info("New TCP connection from {}".format(address))
+
+        if self.ssl:
+            # The event loop has already done the handshake
+            self.handshake_stats["handshakes"] += 1
+            self.handshake_stats["resumed"] += writer.get_extra_info("ssl_object").session_reused
+
+        client = None
+        try:
+            client = AsyncClientController(
+                self, reader, writer, self.logger, self.app_context.app, self.ssl
+            )
+            self.clients.append(client)
+            await client.serve()
+        except BaseException as e:
+            self.logger.warning(str(e))
+            self.logger.debug(traceback.format_exc())
+        finally:
+            if client in self.clients:
+                self.clients.remove(client)
+            if not writer.is_closing():
+                writer.close()
+
+    def report_stats_periodically(self):
+        try:
+            self.report_stats()
+        except BaseException as e:
+            self.logger.error(f"Failed to write eud_handler stats: {e}")
+            self.logger.debug(traceback.format_exc())
+
+        if not self.shutdown:
+            self.loop.call_later(10, self.report_stats_periodically)
+
+    def stop(self):
+        if self.ssl:
+            self.logger.warning("Shutting down SSL server")
+        else:
+            self.logger.warning("Shutting down TCP server")
+
+        self.shutdown = True
+        for client in self.clients:
+            self.logger.debug("Attempting to stop client {}".format(client.address))
+            client.stop()
+
+        if self.server:
+            self.server.close()
+
+        router = self.app_context.app.extensions.get("ots_local_router")
+        if router:
+            router.close()
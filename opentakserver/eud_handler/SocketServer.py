@@ -1,26 +1,51 @@
 import os
 import socket
 import ssl
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from flask import Flask
 
 from opentakserver.eud_handler.client_controller import ClientController
+from opentakserver.process_stats import write_stats
 
 
 class SocketServer:
-    def __init__(self, logger, app_context=None, port=8088, ssl_server=False):
+    def __init__(self, logger, app_context=None, port=8088, ssl_server=False, ssl_context=None):
         self.logger = logger
         self.port = port
         self.ssl = ssl_server
         self.shutdown = False
         self.daemon = True
         self.socket = None
+        # Appended to from the handshake threads, guarded by self.lock like handshake_stats
         self.clients = []
+        self.lock = Lock()
         self.app_context = app_context
+        self.stats_written = 0.0
+        # Lets every eud_handler worker process listen on the same port
+        self.reuse_port = app_context.app.config.get("OTS_EUD_HANDLER_WORKERS") > 1
+        # Workers share the parent's context so they share its session ticket keys
+        self.ssl_context: ssl.SSLContext | None = ssl_context
+        self.handshake_pool: ThreadPoolExecutor | None = None
+        self.handshake_timeout = app_context.app.config.get("OTS_EUD_HANDLER_HANDSHAKE_TIMEOUT")
+        self.handshake_stats = {
+            "handshakes": 0,
+            "resumed": 0,
+            "failed": 0,
+            "handshake_seconds": 0.0,
+        }
         # self.socketio = SocketIO(message_queue="amqp://" + self.app_context.app.config.get("OTS_RABBITMQ_SERVER_ADDRESS"), async_mode='gevent')
 
     def run(self):
         if self.ssl:
             self.socket = self.launch_ssl_server()
+            self.handshake_pool = ThreadPoolExecutor(
+                max_workers=self.app_context.app.config.get("OTS_EUD_HANDLER_HANDSHAKE_THREADS"),
+                thread_name_prefix="handshake",
+            )
         elif self.app_context.app.config.get("OTS_ENABLE_TCP_STREAMING_PORT"):
             self.socket = self.launch_tcp_server()
         else:
@@ -31,18 +56,14 @@ class SocketServer:
 
         while not self.shutdown:
             try:
+                self.report_stats()
                 sock, addr = self.socket.accept()
                 if self.ssl:
                     self.logger.info("New SSL connection from {}".format(addr[0]))
+                    self.handshake_pool.submit(self.handshake, sock, addr)
                 else:
                     self.logger.info("New TCP connection from {}".format(addr[0]))
-
-                new_thread = ClientController(
-                    addr[0], addr[1], sock, self.logger, self.app_context.app, self.ssl
-                )
-                new_thread.daemon = True
-                new_thread.start()
-                self.clients.append(new_thread)
+                    self.start_client(sock, addr)
             except KeyboardInterrupt:
                 self.socket.close()
                 break
@@ -63,28 +84,71 @@ class SocketServer:
                 self.logger.debug(traceback.format_exc())
                 continue
 
+        if self.handshake_pool:
+            self.handshake_pool.shutdown(wait=False, cancel_futures=True)
+
         if self.ssl:
             self.logger.info("SSL server has shut down")
         else:
             self.logger.info("TCP server has shut down")
 
+    def handshake(self, sock: ssl.SSLSocket, addr):
+        """Runs in the handshake pool so slow or stalled handshakes don't hold up the accept loop"""
+        start = time.perf_counter()
+        try:
+            sock.settimeout(self.handshake_timeout)
+            sock.do_handshake()
+        except BaseException as e:
+            self.logger.warning(f"Failed to do handshake with {addr[0]}: {e}")
+            self.logger.debug(traceback.format_exc())
+            with self.lock:
+                self.handshake_stats["failed"] += 1
+            sock.close()
+            return
+
+        with self.lock:
+            self.handshake_stats["handshakes"] += 1
+            self.handshake_stats["resumed"] += sock.session_reused
+            self.handshake_stats["handshake_seconds"] += time.perf_counter() - start
+
+        try:
+            self.start_client(sock, addr)
+        except BaseException as e:
+            self.logger.warning(str(e))
+            self.logger.debug(traceback.format_exc())
+
+    def start_client(self, sock: socket.socket, addr):
+        new_thread = ClientController(
+            addr[0], addr[1], sock, self.logger, self.app_context.app, self.ssl
+        )
+        new_thread.daemon = True
+        new_thread.start()
+        with self.lock:
+            self.clients.append(new_thread)
+
     def launch_tcp_server(self):
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         s.bind(("0.0.0.0", self.port))
-        s.listen(1)
+        # A reconnect storm overflows a short backlog and the kernel makes the EUDs retry a second or more later
+        s.listen(socket.SOMAXCONN)
 
         return s
 
     def launch_ssl_server(self):
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM, 0) as sock:
             sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if self.reuse_port:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
 
             context = self.get_ssl_context()
 
-            sconn = context.wrap_socket(sock, server_side=True)
+            # The handshake is done in the handshake pool instead of in accept()
+            sconn = context.wrap_socket(sock, server_side=True, do_handshake_on_connect=False)
             sconn.bind(("0.0.0.0", self.port))
-            sconn.listen(0)
+            sconn.listen(socket.SOMAXCONN)
 
             return sconn
 
@@ -95,32 +159,95 @@ class SocketServer:
             self.logger.warning("Shutting down TCP server")
 
         self.shutdown = True
-        for client in self.clients:
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
             self.logger.debug("Attempting to stop client {}".format(client.address))
             client.stop()
 
-    def get_ssl_context(self):
-        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-
-        with self.app_context:
-            context.load_cert_chain(
-                os.path.join(
-                    self.app_context.app.config.get("OTS_CA_FOLDER"),
-                    "certs",
-                    "opentakserver",
-                    "opentakserver.pem",
-                ),
-                os.path.join(
-                    self.app_context.app.config.get("OTS_CA_FOLDER"),
-                    "certs",
-                    "opentakserver",
-                    "opentakserver.nopass.key",
-                ),
-            )
+        router = self.app_context.app.extensions.get("ots_local_router")
+        if router:
+            router.close()
 
-            context.verify_mode = self.app_context.app.config.get("OTS_SSL_VERIFICATION_MODE")
-            context.load_verify_locations(
-                cafile=os.path.join(self.app_context.app.config.get("OTS_CA_FOLDER"), "ca.pem")
-            )
+    def report_stats(self):
+        """Saves every connected EUD's send queue stats for /api/status"""
+        if time.monotonic() - self.stats_written < 10:
+            return
+
+        self.stats_written = time.monotonic()
+        with self.lock:
+            self.clients[:] = [client for client in self.clients if not client.shutdown]
+            connected = list(self.clients)
+            handshake_stats = dict(self.handshake_stats)
 
-            return context
+        clients = []
+        for client in connected:
+            stats = client.outbound.get_stats()
+            stats.update(uid=client.uid, callsign=client.callsign, address=client.address)
+            clients.append(stats)
+
+        totals = {
+            key: sum(client[key] for client in clients)
+            for key in ("queued", "queued_bytes", "dropped", "coalesced")
+        }
+        stats = {"ssl": self.ssl, "port": self.port, **totals, "clients": clients}
+
+        router = self.app_context.app.extensions.get("ots_local_router")
+        if router:
+            stats["local_router"] = router.get_stats()
+
+        if self.ssl:
+            stats["tls"] = dict(handshake_stats, **self.get_ssl_context().session_stats())
+
+        cert_user_cache = self.app_context.app.extensions.get("ots_cert_user_cache")
+        if cert_user_cache:
+            stats["cert_user_cache"] = cert_user_cache.get_stats()
+
+        session_cache = self.app_context.app.extensions.get("ots_session_cache")
+        if session_cache:
+            stats["session_cache"] = session_cache.get_stats()
+
+        firehose = self.app_context.app.extensions.get("ots_firehose_demand")
+        if firehose:
+            stats["firehose"] = firehose.get_stats()
+
+        mission_cache = self.app_context.app.extensions.get("ots_mission_cache")
+        if mission_cache:
+            stats["mission_cache"] = mission_cache.get_stats()
+
+        disconnects = self.app_context.app.extensions.get("ots_disconnect_batcher")
+        if disconnects:
+            stats["disconnects"] = disconnects.get_stats()
+
+        write_stats(self.app_context.app.config.get("OTS_DATA_FOLDER"), "eud_handler", stats)
+
+    def get_ssl_context(self):
+        if not self.ssl_context:
+            self.ssl_context = create_ssl_context(self.app_context.app)
+        return self.ssl_context
+
+
+def create_ssl_context(app: Flask) -> ssl.SSLContext:
+    """Every connection uses the same context so EUDs that reconnect can resume their TLS session from its session
+    cache or ticket keys instead of doing a full handshake. OpenSSL enables both by default."""
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+
+    with app.app_context():
+        context.load_cert_chain(
+            os.path.join(
+                app.config.get("OTS_CA_FOLDER"), "certs", "opentakserver", "opentakserver.pem"
+            ),
+            os.path.join(
+                app.config.get("OTS_CA_FOLDER"),
+                "certs",
+                "opentakserver",
+                "opentakserver.nopass.key",
+            ),
+        )
+
+        context.verify_mode = app.config.get("OTS_SSL_VERIFICATION_MODE")
+        context.load_verify_locations(
+            cafile=os.path.join(app.config.get("OTS_CA_FOLDER"), "ca.pem")
+        )
+
+        return context
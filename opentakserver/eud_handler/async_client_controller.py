@@ -0,0 +1,207 @@
+import asyncio
+import traceback
+
+import pika
+from flask import Flask
+from pika.adapters.asyncio_connection import AsyncioConnection
+from pika.channel import Channel
+
+from opentakserver.eud_handler.client_controller import ClientController
+from opentakserver.eud_handler.rabbitmq_pool import PooledChannel
+
+
+class ThreadsafeChannel:
+    """Wraps a pika channel that lives on an asyncio event loop so it can be used from worker threads.
+
+    pika channels aren't thread safe. Calls that talk to the broker are scheduled on the event loop in the order
+    they're made, everything else (is_open, is_closed, etc) is read straight from the channel.
+    """
+
+    SCHEDULED_METHODS = (
+        "basic_publish",
+        "basic_consume",
+        "basic_cancel",
+        "queue_declare",
+        "queue_bind",
+        "queue_unbind",
+        "close",
+    )
+
+    def __init__(self, channel: Channel, loop: asyncio.AbstractEventLoop):
+        self.channel = channel
+        self.loop = loop
+
+    def __getattr__(self, name):
+        attribute = getattr(self.channel, name)
+        if name in self.SCHEDULED_METHODS:
+
+            def schedule(*args, **kwargs):
+                self.loop.call_soon_threadsafe(lambda: attribute(*args, **kwargs))
+
+            return schedule
+
+        return attribute
+
+
+class AsyncClientController(ClientController):
+    """Handles one EUD connection on the asyncio event loop of an AsyncSocketServer.
+
+    Socket reads and writes and the RabbitMQ connection all run on the event loop. Parsing, authentication and
+    database work are blocking so they're handed to the server's thread pool one read at a time, which keeps the
+    messages from each EUD in order.
+    """
+
+    def __init__(
+        self,
+        server,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        logger,
+        app: Flask,
+        is_ssl: bool,
+    ):
+        self.server = server
+        self.loop = server.loop
+        self.reader = reader
+        self.writer = writer
+        # Set when there are messages in self.outbound for write_loop()
+        self.writable = asyncio.Event()
+
+        address, port = writer.get_extra_info("peername")[:2]
+        super().__init__(address, port, writer.get_extra_info("socket"), logger, app, is_ssl)
+
+    def setup_socket(self):
+        # The TLS handshake has already been done by the event loop
+        if self.is_ssl:
+            peer_cert = self.writer.get_extra_info("peercert")
+            if not peer_cert:
+                return
+
+            for c in peer_cert["subject"]:
+                if c[0][0] == "commonName":
+                    self.common_name = c[0][1]
+                    self.logger.debug("Got common name {}".format(self.common_name))
+
+    def connect_to_rabbitmq(self):
+        if self.server.rabbitmq_pool:
+            self.server.rabbitmq_pool.channel(self.open_channel)
+            return
+
+        try:
+            rabbit_credentials = pika.PlainCredentials(
+                self.app.config.get("OTS_RABBITMQ_USERNAME"),
+                self.app.config.get("OTS_RABBITMQ_PASSWORD"),
+            )
+            rabbit_host = self.app.config.get("OTS_RABBITMQ_SERVER_ADDRESS")
+            self.rabbit_connection = AsyncioConnection(
+                pika.ConnectionParameters(host=rabbit_host, credentials=rabbit_credentials),
+                on_open_callback=self.on_connection_open,
+                on_close_callback=self.on_close,
+                custom_ioloop=self.loop,
+            )
+        except BaseException as e:
+            self.logger.error("Failed to connect to rabbitmq: {}".format(e))
+
+    def on_connection_open(self, connection: AsyncioConnection):
+        self.rabbit_connection.channel(on_open_callback=self.on_channel_open)
+
+    def on_channel_open(self, channel: Channel):
+        if self.firehose:
+            channel.add_on_return_callback(self.firehose.on_return)
+        self.open_channel(ThreadsafeChannel(channel, self.loop))
+
+    def open_channel(self, channel: ThreadsafeChannel | PooledChannel):
+        self.logger.debug(f"Opening RabbitMQ channel for {self.callsign or self.address}")
+        self.rabbit_channel = channel
+        channel.add_on_close_callback(self.on_channel_close)
+
+        # Routing cached messages needs the DB so it can't run on the event loop
+        self.loop.run_in_executor(self.server.executor, self.on_channel_ready)
+
+    def on_close(self, connection, error):
+        # The event loop is shared with every other EUD so it must not be stopped here
+        self.logger.info("Connection closed for {}: {}".format(self.address, error))
+
+    def call_on_rabbitmq_thread(self, callback):
+        # ThreadsafeChannel and PooledChannel already schedule each call on the event loop in order. Scheduling the
+        # callback as well would let close_rabbitmq_connection() run before the calls it makes
+        callback()
+
+    def send_to_client(self, data: bytes, uid: str = "", cot_type: str = ""):
+        super().send_to_client(data, uid, cot_type)
+        self.loop.call_soon_threadsafe(self.writable.set)
+
+    async def write_loop(self):
+        while not self.shutdown:
+            await self.writable.wait()
+            self.writable.clear()
+
+            if self.send_linger and self.outbound.bytes < self.send_batch_bytes:
+                await asyncio.sleep(self.send_linger)
+
+            # Everything that's queued by now goes out in one write per batch
+            while not self.writer.is_closing():
+                batch = self.outbound.pop_batch(self.send_batch_bytes)
+                if not batch:
+                    break
+
+                self.writer.write(b"".join(batch))
+                try:
+                    # Waits while the transport's buffer is full so the rest stays in self.outbound
+                    await self.writer.drain()
+                except ConnectionError:
+                    return
+
+    def disconnect_slow_client(self):
+        self.outbound.close()
+        # serve() sees the connection close and cleans up
+        self.close_socket()
+
+    def close_socket(self):
+        self.loop.call_soon_threadsafe(self.writer.close)
+
+    def close_db_session(self):
+        # The engine is shared by every EUD on this event loop so only close the session
+        with self.app.app_context():
+            self.db.session.close()
+
+    def stop(self):
+        self.loop.run_in_executor(self.server.executor, self.close_connection)
+
+    async def serve(self):
+        write_task = self.loop.create_task(self.write_loop())
+        while not self.shutdown:
+            try:
+                if self.common_name and not self.is_authenticated:
+                    await self.loop.run_in_executor(self.server.executor, self.handle_auth, "")
+
+                data = await self.reader.read(65536)
+                if not data:
+                    # Occurs when an EUD disconnects
+                    self.logger.warning("No Data Closing connection to {}".format(self.address))
+                    await self.loop.run_in_executor(self.server.executor, self.close_connection)
+                    break
+
+                await self.loop.run_in_executor(self.server.executor, self.handle_data, data)
+
+            except (ConnectionError, ConnectionResetError) as e:
+                self.logger.info(f"Closing connection {e}")
+                await self.loop.run_in_executor(self.server.executor, self.close_connection)
+                break
+            except OSError as e:
+                # Client disconnected abruptly, either ATAK crashed, lost network connectivity, the battery died, etc
+                self.logger.warning("OSError, stopping")
+                self.logger.error(str(e))
+                self.logger.error(traceback.format_exc())
+                await self.loop.run_in_executor(self.server.executor, self.close_connection)
+                break
+
+        write_task.cancel()
+        # Let the channel close that close_connection() scheduled run first
+        self.loop.call_soon(self.close_rabbitmq_connection)
+
+    def close_rabbitmq_connection(self):
+        if self.rabbit_connection and not (
+            self.rabbit_connection.is_closing or self.rabbit_connection.is_closed
+        ):
+            self.rabbit_connection.close()
@@ -0,0 +1,63 @@
+import time
+from threading import Lock
+
+from flask import Flask
+
+from opentakserver.extensions import db
+
+
+class CertUserCache:
+    """Users looked up by the common name in their client certificate, so a reconnecting EUD doesn't query the DB.
+
+    Only users that exist are cached. A user that's deactivated or deleted can still connect until their entry is
+    older than seconds. There's one cache per eud_handler process. Use CertUserCache.for_app(app).
+    """
+
+    MAX_SIZE = 10000
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        # common name -> (user, time it was looked up)
+        self.users = {}
+        self.lock = Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @classmethod
+    def for_app(cls, app: Flask) -> "CertUserCache | None":
+        """Returns None when OTS_CERT_USER_CACHE_SECONDS is 0"""
+        if not app.config.get("OTS_CERT_USER_CACHE_SECONDS"):
+            return None
+
+        if "ots_cert_user_cache" not in app.extensions:
+            app.extensions["ots_cert_user_cache"] = cls(
+                app.config.get("OTS_CERT_USER_CACHE_SECONDS")
+            )
+        return app.extensions["ots_cert_user_cache"]
+
+    def find_user(self, app: Flask, common_name: str):
+        """Call inside an app context. The user is detached from its session, only use its columns"""
+        now = time.monotonic()
+        with self.lock:
+            cached = self.users.get(common_name)
+            if cached and now - cached[1] < self.seconds:
+                self.stats["hits"] += 1
+                return cached[0]
+
+        self.stats["misses"] += 1
+        user = app.security.datastore.find_user(username=common_name)
+        if user:
+            # Other threads use it too, so it must not be expired by a commit in this one
+            db.session.expunge(user)
+            with self.lock:
+                if len(self.users) >= self.MAX_SIZE:
+                    self.users.clear()
+                self.users[common_name] = (user, now)
+        return user
+
+    def forget(self, common_name: str):
+        with self.lock:
+            self.users.pop(common_name, None)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(self.stats, cached=len(self.users))
@@ -3,36 +3,53 @@ import datetime
 import json
 import os
 import random
-import re
 import socket
+import time
 import traceback
 import uuid
 from threading import Thread
-from xml.etree.ElementTree import Element, ParseError, SubElement, fromstring, tostring
+from xml.etree.ElementTree import Element, SubElement, tostring
 
 import bleach
 import pika
 import sqlalchemy
-from bs4 import BeautifulSoup
 from flask import Flask
 from flask_ldap3_login import AuthenticationResponseStatus
 from flask_security import verify_password
 from meshtastic import BROADCAST_NUM, mesh_pb2, mqtt_pb2, portnums_pb2
 from pika.channel import Channel
-from sqlalchemy import insert, select, update
-
+from sqlalchemy import select, update
+
+from opentakserver import cot_envelope
+from opentakserver.cot_event import CoTEvent, CoTParseError, parse_xml
+from opentakserver.eud_handler.cert_user_cache import CertUserCache
+from opentakserver.eud_handler.cot_framer import CoTFramer, FrameTooLarge
+from opentakserver.eud_handler.dead_band import DeadBandFilter
+from opentakserver.eud_handler.disconnects import Disconnect, DisconnectBatcher
+from opentakserver.eud_handler.firehose import FirehoseDemand
+from opentakserver.eud_handler.local_router import LocalRouter
+from opentakserver.eud_handler.mission_cache import MissionCache, MissionInfo, lookup_mission
+from opentakserver.eud_handler.outbound_queue import OutboundQueue
+from opentakserver.eud_handler.session_cache import SessionBootstrap, SessionCache
 from opentakserver.extensions import db, ldap_manager, logger
-from opentakserver.functions import datetime_from_iso8601_string, iso8601_string_from_datetime
+from opentakserver.functions import (
+    GROUPS_CHANGED_MESSAGE_TYPE,
+    MISSIONS_CHANGED_MESSAGE_TYPE,
+    SUBSCRIPTIONS_CHANGED_MESSAGE_TYPE,
+    datetime_from_iso8601_string,
+    iso8601_string_from_datetime,
+)
 from opentakserver.models.Chatrooms import Chatroom
 from opentakserver.models.EUD import EUD
 from opentakserver.models.Group import Group
 from opentakserver.models.GroupUser import GroupUser
 from opentakserver.models.Meshtastic import MeshtasticChannel
-from opentakserver.models.Mission import Mission
-from opentakserver.models.MissionChange import MissionChange, generate_mission_change_cot
-from opentakserver.models.MissionUID import MissionUID
+from opentakserver.models.MissionRole import MissionRole
 from opentakserver.models.Team import Team
 
+# Most buffers one sendmsg() call can write
+IOV_MAX = os.sysconf("SC_IOV_MAX") if hasattr(os, "sysconf") else 1024
+
 
 class ClientController(Thread):
     def __init__(self, address: str, port: int, sock: socket, logger, app: Flask, is_ssl: bool):
@@ -42,12 +59,12 @@ class ClientController(Thread):
         self.sock = sock
         self.logger = logger
         self.shutdown = False
-        self.sock.settimeout(1.0)
         self.app = app
         self.db = db
         self.is_ssl = is_ssl
         self.bound_queues = []
-        self.eud = None
+        # EUD.to_json() for the web UI map
+        self.eud_json = None
 
         self.user = None
 
@@ -79,8 +96,55 @@ class ClientController(Thread):
         # In case the RabbitMQ channel or connection drops, cached_messages will hold message until the channel is open again
         self.cached_messages = []
 
+        # Holds partial CoT messages between reads from the socket
+        self.framer = CoTFramer(app.config.get("OTS_EUD_HANDLER_MAX_FRAME_SIZE"))
+        self.dead_band = DeadBandFilter.for_app(app)
+        self.cert_user_cache = CertUserCache.for_app(app)
+        self.session_cache = SessionCache.for_app(app)
+        self.mission_cache = MissionCache.for_app(app)
+        self.firehose = FirehoseDemand.for_app(app)
+
+        # Messages waiting to be written to the EUD, see send_to_client()
+        self.outbound = OutboundQueue(
+            app.config.get("OTS_EUD_HANDLER_SEND_BUFFER_BYTES"),
+            app.config.get("OTS_EUD_HANDLER_SLOW_CLIENT_POLICY"),
+            app.config.get("OTS_EUD_HANDLER_SLOW_CLIENT_SECONDS"),
+        )
+        self.send_batch_bytes = app.config.get("OTS_EUD_HANDLER_SEND_BATCH_BYTES")
+        self.send_linger = app.config.get("OTS_EUD_HANDLER_SEND_LINGER_MS") / 1000
+
+        # Every CoT this EUD sends is published with the same properties
+        self.envelope_format = app.config.get("OTS_RABBITMQ_ENVELOPE")
+        self.publish_properties = pika.BasicProperties(
+            content_type=cot_envelope.content_type(self.envelope_format),
+            expiration=app.config.get("OTS_RABBITMQ_TTL"),
+        )
+
+        # groups exchange routing keys for CoTs without a <dest>, see get_group_routing_keys()
+        self.group_routing_keys: list[str] | None = None
+        self.group_routing_keys_time = 0.0
+        # groups exchange routing keys this EUD receives from, which its disconnect CoT is sent to
+        self.out_group_routing_keys: list[str] | None = None
+
+        # Finishes disconnecting this EUD together with others that disconnect at about the same time
+        self.disconnects = DisconnectBatcher.for_app(app, logger)
+        self.disconnect_sent = False
+
+        # Receives this EUD's messages from the process's queue instead of queues for its uid and callsign
+        self.router = LocalRouter.for_app(app, logger)
+
+        self.rabbit_connection = None
+        self.rabbit_channel: Channel | None = None
+
+        self.setup_socket()
+        self.connect_to_rabbitmq()
+
+    def setup_socket(self):
+        self.sock.settimeout(1.0)
+
         if self.is_ssl:
             try:
+                # SocketServer does the handshake in its handshake pool, this returns right away
                 self.sock.do_handshake()
                 for c in self.sock.getpeercert()["subject"]:
                     if c[0][0] == "commonName":
@@ -88,15 +152,13 @@ class ClientController(Thread):
                         self.logger.debug("Got common name {}".format(self.common_name))
 
                         with self.app.app_context():
-                            self.user = self.app.security.datastore.find_user(
-                                username=self.common_name
-                            )
+                            self.user = self.find_cert_user()
             except BaseException as e:
                 logger.warning("Failed to do handshake: {}".format(e))
                 self.logger.error(traceback.format_exc())
                 self.close_connection()
 
-        # RabbitMQ
+    def connect_to_rabbitmq(self):
         try:
             rabbit_credentials = pika.PlainCredentials(
                 self.app.config.get("OTS_RABBITMQ_USERNAME"),
@@ -108,7 +170,6 @@ class ClientController(Thread):
                 self.on_connection_open,
                 on_close_callback=self.on_close,
             )
-            self.rabbit_channel: Channel | None = None
             # Start the pika ioloop in a thread or else it blocks and we can't receive any CoT messages
             self.iothread = Thread(target=self.rabbit_connection.ioloop.start, name="IOLOOP")
             self.iothread.daemon = True
@@ -126,6 +187,14 @@ class ClientController(Thread):
         self.logger.debug(f"Opening RabbitMQ channel for {self.callsign or self.address}")
         self.rabbit_channel = channel
         self.rabbit_channel.add_on_close_callback(self.on_channel_close)
+        if self.firehose:
+            self.rabbit_channel.add_on_return_callback(self.firehose.on_return)
+        self.on_channel_ready()
+
+    def on_channel_ready(self):
+        # The EUD's first CoT can be parsed before the channel opens, in which case its queues weren't bound yet
+        if self.out_group_routing_keys is not None and not self.router:
+            self.bind_queues(self.out_group_routing_keys)
 
         for message in self.cached_messages:
             self.route_cot(message)
@@ -133,24 +202,8 @@ class ClientController(Thread):
         self.cached_messages.clear()
 
         # Publish the EUD info to flask-socketio for the web UI map
-        if self.eud:
-            message = {
-                "method": "emit",
-                "event": "eud",
-                "data": self.eud.to_json(),
-                "namespace": "/socket.io",
-                "room": None,
-                "skip_sid": [],
-                "callback": None,
-                "binary": False,
-                "host_id": uuid.uuid4().hex,
-            }
-            self.rabbit_channel.basic_publish(
-                "flask-socketio",
-                "",
-                json.dumps(message),
-                properties=pika.BasicProperties(expiration=self.app.config.get("OTS_RABBITMQ_TTL")),
-            )
+        if self.eud_json:
+            self.publish_eud()
 
     def on_channel_close(self, channel: Channel, error):
         self.logger.error(f"RabbitMQ channel closed for {self.callsign}, shut it down")
@@ -162,8 +215,7 @@ class ClientController(Thread):
             self.rabbit_connection.close()
 
         self.shutdown = True
-        self.sock.shutdown(socket.SHUT_RDWR)
-        self.sock.close()
+        self.close_socket()
 
     def on_close(self, connection, error):
         # Stop the ioloop using add_callback_threadsafe because ioloop.stop() isn't threadsafe
@@ -171,28 +223,58 @@ class ClientController(Thread):
         self.logger.info("Connection closed for {}: {}".format(self.address, error))
 
     def on_message(self, unused_channel, basic_deliver, properties, body):
+        if properties and properties.type == MISSIONS_CHANGED_MESSAGE_TYPE:
+            if self.mission_cache:
+                self.mission_cache.forget(body.decode())
+            return
+
+        if properties and properties.type in (
+            GROUPS_CHANGED_MESSAGE_TYPE,
+            SUBSCRIPTIONS_CHANGED_MESSAGE_TYPE,
+        ):
+            self.group_routing_keys = None
+            if self.session_cache and self.uid:
+                self.session_cache.forget(self.uid)
+            if self.router:
+                # Queries the DB so it can't hold up the router
+                Thread(target=self.subscribe_locally, daemon=True).start()
+            return
+
         try:
-            body = json.loads(body)
-            if body["uid"] != self.uid:
-                self.sock.send(body["cot"].encode())
+            self.deliver(cot_envelope.unpack(body))
         except BaseException as e:
             self.logger.error(f"{self.callsign}: {e}, closing socket")
             self.close_connection()
             self.logger.error(traceback.format_exc())
 
-    def handle_auth(self, auth: str):
+    def deliver(self, envelope):
+        if (envelope.sender_uid or None) != self.uid:
+            self.send_to_client(envelope.xml, envelope.uid, envelope.type)
+
+    def find_mission(self, name: str) -> MissionInfo | None:
+        with self.app.app_context():
+            if self.mission_cache:
+                return self.mission_cache.find_mission(name)
+            return lookup_mission(name)
+
+    def find_cert_user(self):
+        if self.cert_user_cache:
+            return self.cert_user_cache.find_user(self.app, self.common_name)
+        return self.app.security.datastore.find_user(username=self.common_name)
+
+    def handle_auth(self, auth: bytes | str):
         self.logger.debug(auth)
-        if auth:
-            auth = BeautifulSoup(auth, "xml")
-        if self.is_ssl and not self.is_authenticated and (auth or self.common_name):
+        # Certificate only logins pass an empty string
+        auth = parse_xml(auth) if auth else None
+        if self.is_ssl and not self.is_authenticated and (auth is not None or self.common_name):
             user = None
             with self.app.app_context():
-                if auth:
-                    cot = auth.find("cot")
-                    if cot:
-                        username = cot.attrs["username"]
-                        password = cot.attrs["password"]
-                        uid = cot.attrs["uid"]
+                if auth is not None:
+                    cot = auth.find(".//cot")
+                    if cot is not None:
+                        username = cot.attrib["username"]
+                        password = cot.attrib["password"]
+                        uid = cot.attrib["uid"]
 
                         if self.app.config.get("OTS_ENABLE_LDAP"):
                             result = ldap_manager.authenticate(username, password)
@@ -237,7 +319,7 @@ class ClientController(Thread):
                         else:
                             user = self.app.security.datastore.find_user(username=username)
                 elif self.common_name:
-                    user = self.app.security.datastore.find_user(username=self.common_name)
+                    user = self.find_cert_user()
 
                 if not user:
                     self.logger.warning("User {} does not exist".format(self.common_name))
@@ -277,9 +359,9 @@ class ClientController(Thread):
                     self.close_connection()
                     return
 
-    def handle_cot(self, cot):
+    def handle_cot(self, cot: bytes):
         self.logger.debug(cot)
-        event = BeautifulSoup(cot, "xml").find("event")
+        event = CoTEvent.from_xml(cot)
 
         # If this client is connected via ssl, make sure they're authenticated
         # before accepting any data from them
@@ -290,14 +372,100 @@ class ClientController(Thread):
         if self.pong(event):
             return
 
-        if event and not self.uid:
+        if not self.uid:
             self.parse_device_info(event)
 
+        # Stationary EUDs keep sending the same position every few seconds. Only this EUD's own position reports
+        # are filtered, anything with a destination always goes through
+        if (
+            self.dead_band
+            and event.uid == self.uid
+            and event.point is not None
+            and not event.dests
+            and event.type.startswith("a-")
+            and self.dead_band.should_drop(event)
+        ):
+            return
+
         self.route_cot(event)
 
-    # Yes this is super janky
+    def handle_data(self, data: bytes):
+        try:
+            for frame in self.framer.feed(data):
+                try:
+                    if frame.startswith(b"<event"):
+                        self.handle_cot(frame)
+                    else:
+                        self.handle_auth(frame)
+                except (CoTParseError, UnicodeDecodeError) as e:
+                    self.logger.error(f"Failed to parse message from {self.address}: {e}")
+        except FrameTooLarge as e:
+            self.logger.error(f"{self.callsign or self.address}: {e}")
+
+    def send_to_client(self, data: bytes, uid: str = "", cot_type: str = ""):
+        """Queues data for send_loop() to write to the EUD. uid and type let newer position reports replace
+        older ones that haven't been sent yet"""
+        if self.outbound.closed:
+            return
+
+        if not self.outbound.put(data, uid, cot_type):
+            self.logger.warning(
+                f"{self.callsign or self.address} hasn't kept up with its messages for "
+                f"{self.outbound.disconnect_seconds} seconds, disconnecting"
+            )
+            self.disconnect_slow_client()
+
+    def send_loop(self):
+        while not self.shutdown:
+            batch = self.outbound.get_batch(self.send_batch_bytes, 1.0, self.send_linger)
+            if not batch:
+                continue
+
+            try:
+                self.write(batch)
+            except OSError as e:
+                self.logger.warning(f"Failed to send to {self.callsign or self.address}: {e}")
+                break
+
+    def write(self, batch: list[bytes]):
+        """Writes a batch of messages with as few syscalls as possible. TCP sockets get all of them in one sendmsg(),
+        SSL sockets don't support that so they're joined into one write which is split into as few TLS records as
+        possible."""
+        if self.is_ssl or len(batch) == 1:
+            buffers = [memoryview(b"".join(batch))]
+        else:
+            buffers = [memoryview(data) for data in batch]
+
+        # Both can write only part of the batch, and time out after a second when the EUD isn't reading
+        while buffers and not self.shutdown:
+            try:
+                if len(buffers) == 1:
+                    sent = self.sock.send(buffers[0])
+                else:
+                    sent = self.sock.sendmsg(buffers[:IOV_MAX])
+            except TimeoutError:
+                continue
+
+            while sent:
+                if sent < len(buffers[0]):
+                    buffers[0] = buffers[0][sent:]
+                    break
+                sent -= len(buffers.pop(0))
+
+    def disconnect_slow_client(self):
+        self.outbound.close()
+        try:
+            # run() sees the socket close and cleans up
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close_socket(self):
+        self.sock.shutdown(socket.SHUT_RDWR)
+        self.sock.close()
+
     def run(self):
-        cot = ""
+        Thread(target=self.send_loop, name=f"send-{self.address}", daemon=True).start()
 
         while not self.shutdown:
             try:
@@ -312,26 +480,7 @@ class ClientController(Thread):
                     self.close_connection()
                     break
 
-                cot += data.decode("utf-8")
-                cot_list = re.split("</event>|</auth>", cot)
-
-                if len(cot_list) < 2:
-                    continue
-
-                for c in cot_list:
-                    try:
-                        if "<event" in c:
-                            fromstring(c + "</event>")
-                            self.handle_cot(c + "</event>")
-                        elif "<auth>" in c:
-                            fromstring(c + "</auth>")
-                            self.handle_auth(c + "</auth>")
-                    except ParseError as e:
-                        self.logger.error(f"Failed to parse: {e}")
-                        cot = c
-                        break
-
-                cot = ""
+                self.handle_data(data)
 
             except TimeoutError:
                 if self.shutdown:
@@ -352,6 +501,9 @@ class ClientController(Thread):
                 break
 
     def close_connection(self):
+        if self.dead_band and self.uid:
+            self.dead_band.forget(self.uid)
+
         self.unbind_rabbitmq_queues()
         self.send_disconnect_cot()
 
@@ -360,13 +512,20 @@ class ClientController(Thread):
             and not self.rabbit_channel.is_closing
             and not self.rabbit_channel.is_closed
         ):
-            self.rabbit_channel.close()
+            # After the unbinds that were scheduled on the same thread
+            self.call_on_rabbitmq_thread(self.close_rabbitmq_channel)
 
         if not self.shutdown:
             self.shutdown = True
-            self.sock.shutdown(socket.SHUT_RDWR)
-            self.sock.close()
+            self.close_socket()
+
+        self.close_db_session()
 
+    def close_rabbitmq_channel(self):
+        if not self.rabbit_channel.is_closing and not self.rabbit_channel.is_closed:
+            self.rabbit_channel.close()
+
+    def close_db_session(self):
         # Close this thread's DB session. This doesn't affect other EUD's threads
         with self.app.app_context():
             self.db.session.close()
@@ -376,8 +535,8 @@ class ClientController(Thread):
         self.close_connection()
         self.shutdown = True
 
-    def pong(self, event):
-        if event.attrs.get("type") == "t-x-c-t":
+    def pong(self, event: CoTEvent):
+        if event.type == "t-x-c-t":
             now = datetime.datetime.now(datetime.timezone.utc)
             stale = now + datetime.timedelta(seconds=10)
 
@@ -398,7 +557,7 @@ class ClientController(Thread):
             )
 
             try:
-                self.sock.send(event.encode())
+                self.send_to_client(event.xml.encode())
                 return True
             except BaseException as e:
                 self.logger.error(e)
@@ -406,277 +565,278 @@ class ClientController(Thread):
 
         return False
 
-    def parse_device_info(self, event):
-        link = event.find("link")
-        fileshare = event.find("fileshare")
-
+    def parse_device_info(self, event: CoTEvent):
         # EUDs running the Meshtastic and dmrcot plugins can relay messages from their RF networks to the server
         # so we want to use the UID of the "off grid" EUD, not the relay EUD
-        contact = event.find("contact")
-        takv = event.find("takv")
-        if takv or contact:
-            uid = event.attrs.get("uid")
+        contact = event.contact
+        takv = event.takv
+        if takv is not None or contact is not None:
+            uid = event.uid
         else:
             return
 
-        contact = event.find("contact")
-
         # Only assume it's an EUD if it's got a <contact> tag
-        if contact and uid and not uid.endswith("ping") and (self.user or not self.is_ssl):
+        if (
+            contact is not None
+            and uid
+            and not uid.endswith("ping")
+            and (self.user or not self.is_ssl)
+        ):
             self.uid = uid
+            self.disconnects.connected_uid(uid)
             device = operating_system = platform = version = None
-            if takv:
-                device = takv.attrs["device"] if "device" in takv.attrs else None
-                operating_system = takv.attrs["os"] if "os" in takv.attrs else None
-                platform = takv.attrs["platform"] if "platform" in takv.attrs else None
-                version = takv.attrs["version"] if "version" in takv.attrs else None
-
-            if "callsign" in contact.attrs:
-                self.callsign = contact.attrs["callsign"]
-
-                # Declare a RabbitMQ Queue for this uid and join the 'dms' and 'cot' exchanges
-                if (
-                    self.rabbit_channel
-                    and self.rabbit_channel.is_open
-                    and platform != "OpenTAK ICU"
-                    and platform != "Meshtastic"
-                    and platform != "DMRCOT"
-                ):
-
-                    self.logger.debug(f"Declaring queue for {self.callsign} {self.uid}")
-                    self.rabbit_channel.queue_declare(queue=self.callsign)
-                    self.rabbit_channel.queue_declare(queue=self.uid)
-
-                    with self.app.app_context():
-                        if self.is_ssl:
-                            group_memberships = db.session.execute(
-                                db.session.query(GroupUser).filter_by(
-                                    user_id=self.user.id, direction=Group.OUT
-                                )
-                            ).all()
-                            if not group_memberships:
-                                self.logger.debug(
-                                    f"{self.callsign} doesn't belong to any groups, adding them to the __ANON__ group"
-                                )
-                                self.rabbit_channel.queue_bind(
-                                    exchange="groups", queue=self.uid, routing_key="__ANON__.OUT"
-                                )
-                                if {
-                                    "exchange": "groups",
-                                    "routing_key": "__ANON__.OUT",
-                                    "queue": self.uid,
-                                } not in self.bound_queues:
-                                    self.bound_queues.append(
-                                        {
-                                            "exchange": "groups",
-                                            "routing_key": "__ANON__.OUT",
-                                            "queue": self.uid,
-                                        }
-                                    )
+            if takv is not None:
+                device = takv.get("device")
+                operating_system = takv.get("os")
+                platform = takv.get("platform")
+                version = takv.get("version")
+
+            if "callsign" in contact:
+                self.callsign = contact["callsign"]
+
+            if contact.get("phone"):
+                self.phone_number = contact["phone"]
+
+            __group = event.find("__group")
+            attributes = (
+                self.callsign,
+                device,
+                operating_system,
+                platform,
+                version,
+                self.phone_number,
+                self.user.id if self.user else None,
+                bleach.clean(__group.attrib["name"]) if __group is not None else None,
+                bleach.clean(__group.attrib["role"]) if __group is not None else None,
+            )
 
-                            elif group_memberships and self.is_ssl:
-                                for membership in group_memberships:
-                                    membership = membership[0]
-                                    self.rabbit_channel.queue_bind(
-                                        exchange="groups",
-                                        queue=self.uid,
-                                        routing_key=f"{membership.group.name}.OUT",
-                                    )
+            # Nothing needs to be looked up or saved again when the EUD reconnects without changing anything
+            bootstrap = None
+            if self.session_cache:
+                bootstrap = self.session_cache.get(uid, self.common_name)
+                if bootstrap and bootstrap.attributes != attributes:
+                    bootstrap = None
 
-                                    if {
-                                        "exchange": "groups",
-                                        "routing_key": f"{membership.group.name}.OUT",
-                                        "queue": self.uid,
-                                    } not in self.bound_queues:
-                                        self.bound_queues.append(
-                                            {
-                                                "exchange": "groups",
-                                                "routing_key": f"{membership.group.name}.OUT",
-                                                "queue": self.uid,
-                                            }
-                                        )
+            group_routing_keys = bootstrap.group_routing_keys if bootstrap else None
+            if "callsign" in contact and platform not in ("OpenTAK ICU", "Meshtastic", "DMRCOT"):
+                if group_routing_keys is None:
+                    group_routing_keys = self.get_out_group_routing_keys()
+                self.out_group_routing_keys = group_routing_keys
 
-                        self.rabbit_channel.queue_bind(
-                            exchange="missions", routing_key="missions", queue=self.uid
-                        )
-                        if {
-                            "exchange": "missions",
-                            "routing_key": "missions",
-                            "queue": self.uid,
-                        } not in self.bound_queues:
-                            self.bound_queues.append(
-                                {
-                                    "exchange": "groups",
-                                    "routing_key": "__ANON__.OUT",
-                                    "queue": self.uid,
-                                }
-                            )
-
-                        # The DMs queue also binds by callsign since the <dest> tag in CoT messages can be by callsign instead of UID
-                        self.rabbit_channel.queue_bind(
-                            exchange="dms", queue=self.uid, routing_key=self.uid
-                        )
-                        self.rabbit_channel.queue_bind(
-                            exchange="dms", queue=self.callsign, routing_key=self.callsign
-                        )
+                if self.router:
+                    self.subscribe_locally(group_routing_keys)
+                elif self.rabbit_channel and self.rabbit_channel.is_open:
+                    self.bind_queues(group_routing_keys)
 
-                        if {
-                            "exchange": "dms",
-                            "routing_key": self.uid,
-                            "queue": self.uid,
-                        } not in self.bound_queues:
-                            self.bound_queues.append(
-                                {"exchange": "dms", "routing_key": self.uid, "queue": self.uid}
-                            )
-
-                        if {
-                            "exchange": "dms",
-                            "routing_key": self.callsign,
-                            "queue": self.callsign,
-                        } not in self.bound_queues:
-                            self.bound_queues.append(
-                                {
-                                    "exchange": "dms",
-                                    "routing_key": self.callsign,
-                                    "queue": self.callsign,
-                                }
-                            )
-
-                        if not self.is_ssl:
-                            self.logger.debug(
-                                f"{self.callsign} is connected via TCP, adding them to the __ANON__ group"
-                            )
-                            self.rabbit_channel.queue_bind(
-                                exchange="groups", queue=self.uid, routing_key="__ANON__.OUT"
-                            )
-                            self.bound_queues.append(
-                                {
-                                    "exchange": "groups",
-                                    "routing_key": "__ANON__.OUT",
-                                    "queue": self.uid,
-                                }
-                            )
-
-                        self.rabbit_channel.basic_consume(
-                            queue=self.callsign, on_message_callback=self.on_message, auto_ack=True
-                        )
-                        self.rabbit_channel.basic_consume(
-                            queue=self.uid, on_message_callback=self.on_message, auto_ack=True
-                        )
+            with self.app.app_context():
+                if bootstrap:
+                    self.reconnect_eud(bootstrap, event)
+                else:
+                    bootstrap = self.save_eud(event, takv, attributes, group_routing_keys)
+                    if self.session_cache:
+                        self.session_cache.put(bootstrap)
+
+                self.send_meshtastic_node_info(bootstrap)
 
-            if "phone" in contact.attrs and contact.attrs["phone"]:
-                self.phone_number = contact.attrs["phone"]
+            # If the RabbitMQ channel is open, publish the EUD info to socketio to be displayed on the web UI map.
+            # Also save the EUD's info for on_channel_open to publish
+            self.eud_json = bootstrap.eud_json
+            if self.rabbit_channel:
+                self.publish_eud()
 
+    def get_out_group_routing_keys(self) -> list[str]:
+        """groups exchange routing keys this EUD gets CoTs from"""
+        if self.is_ssl and self.user:
             with self.app.app_context():
-                __group = event.find("__group")
-                team = Team()
+                group_memberships = db.session.execute(
+                    db.session.query(GroupUser).filter_by(
+                        user_id=self.user.id, direction=Group.OUT, enabled=True
+                    )
+                ).all()
+                routing_keys = [
+                    f"{membership[0].group.name}.OUT" for membership in group_memberships
+                ]
+
+            if routing_keys:
+                return routing_keys
+
+        self.logger.debug(f"{self.callsign} isn't in any groups, adding them to the __ANON__ group")
+        return ["__ANON__.OUT"]
+
+    def bind_queues(self, group_routing_keys: list[str]):
+        """Declares this EUD's queues, binds them to the 'groups', 'missions' and 'dms' exchanges and consumes them.
+
+        AMQP has no way to bind several keys at once, so all of it is handed to the RabbitMQ connection's thread in
+        one callback and pika sends each operation as soon as the previous one is confirmed.
+        """
+        bindings = [
+            {"exchange": "groups", "routing_key": routing_key, "queue": self.uid}
+            for routing_key in group_routing_keys
+        ]
+        bindings.append({"exchange": "missions", "routing_key": "missions", "queue": self.uid})
+        # The DMs queue also binds by callsign since the <dest> tag in CoT messages can be by callsign instead of UID
+        bindings.append({"exchange": "dms", "routing_key": self.uid, "queue": self.uid})
+        bindings.append({"exchange": "dms", "routing_key": self.callsign, "queue": self.callsign})
+
+        for binding in bindings:
+            if binding not in self.bound_queues:
+                self.bound_queues.append(binding)
+
+        def bind():
+            self.logger.debug(f"Declaring queue for {self.callsign} {self.uid}")
+            self.rabbit_channel.queue_declare(queue=self.callsign)
+            self.rabbit_channel.queue_declare(queue=self.uid)
+            for binding in bindings:
+                self.rabbit_channel.queue_bind(**binding)
+
+            self.rabbit_channel.basic_consume(
+                queue=self.callsign, on_message_callback=self.on_message, auto_ack=True
+            )
+            self.rabbit_channel.basic_consume(
+                queue=self.uid, on_message_callback=self.on_message, auto_ack=True
+            )
 
-                if __group:
-                    team.name = bleach.clean(__group.attrs["name"])
+        self.call_on_rabbitmq_thread(bind)
 
-                    try:
-                        chatroom = self.db.session.execute(
-                            select(Chatroom).filter(Chatroom.name == team.name)
-                        ).first()[0]
-                        team.chatroom_id = chatroom.id
-                    except TypeError:
-                        chatroom = None
+    def call_on_rabbitmq_thread(self, callback):
+        self.rabbit_connection.ioloop.add_callback_threadsafe(callback)
 
-                    try:
-                        self.db.session.add(team)
-                        self.db.session.commit()
-                    except sqlalchemy.exc.IntegrityError:
-                        self.db.session.rollback()
-                        team = self.db.session.execute(
-                            select(Team).filter(Team.name == __group.attrs["name"])
-                        ).first()[0]
-                        if not team.chatroom_id and chatroom:
-                            team.chatroom_id = chatroom.id
-                            self.db.session.execute(
-                                update(Team)
-                                .filter(Team.name == chatroom.id)
-                                .values(chatroom_id=chatroom.id)
-                            )
-
-                try:
-                    eud = self.db.session.execute(select(EUD).filter_by(uid=uid)).first()[0]
-                except:
-                    eud = EUD()
-
-                eud.uid = uid
-                if self.callsign:
-                    eud.callsign = self.callsign
-                if device:
-                    eud.device = device
-
-                eud.os = operating_system
-                eud.platform = platform
-                eud.version = version
-                eud.phone_number = self.phone_number
-                eud.last_event_time = datetime_from_iso8601_string(event.attrs["start"])
-                eud.last_status = "Connected"
-                eud.user_id = self.user.id if self.user else None
-
-                # Set a Meshtastic ID for TAK EUDs to be identified by in the Meshtastic network
-                if not eud.meshtastic_id and eud.platform != "Meshtastic":
-                    meshtastic_id = "{:x}".format(int.from_bytes(os.urandom(4), "big"))
-                    while len(meshtastic_id) < 8:
-                        meshtastic_id = "0" + meshtastic_id
-                    eud.meshtastic_id = int(meshtastic_id, 16)
-                elif not eud.meshtastic_id and eud.platform == "Meshtastic":
-                    try:
-                        eud.meshtastic_id = int(takv.attrs["meshtastic_id"], 16)
-                    except:
-                        meshtastic_id = "{:x}".format(int.from_bytes(os.urandom(4), "big"))
-                        while len(meshtastic_id) < 8:
-                            meshtastic_id = "0" + meshtastic_id
-                        eud.meshtastic_id = int(meshtastic_id, 16)
-
-                # Get the Meshtastic device's mac address or generate a random one for TAK EUDs
-                if takv and "macaddr" in takv.attrs:
-                    eud.meshtastic_macaddr = takv.attrs["macaddr"]
-                else:
-                    eud.meshtastic_macaddr = base64.b64encode(os.urandom(6)).decode("ascii")
+    def reconnect_eud(self, bootstrap: SessionBootstrap, event: CoTEvent):
+        """Only the status and time need to be saved for an EUD that's reconnecting with the same attributes"""
+        last_event_time = datetime_from_iso8601_string(event.start)
+        self.db.session.execute(
+            update(EUD)
+            .where(EUD.uid == self.uid)
+            .values(last_status="Connected", last_event_time=last_event_time)
+        )
+        self.db.session.commit()
 
-                if __group:
-                    eud.team_id = team.id
-                    eud.team_role = bleach.clean(__group.attrs["role"])
+        bootstrap.eud_json = dict(
+            bootstrap.eud_json,
+            last_status="Connected",
+            last_event_time=iso8601_string_from_datetime(last_event_time),
+        )
 
+    def save_eud(
+        self, event: CoTEvent, takv, attributes: tuple, group_routing_keys: list[str]
+    ) -> SessionBootstrap:
+        (
+            callsign,
+            device,
+            operating_system,
+            platform,
+            version,
+            phone_number,
+            user_id,
+            team_name,
+            team_role,
+        ) = attributes
+
+        team = None
+        if team_name:
+            chatroom = self.db.session.execute(
+                select(Chatroom).filter(Chatroom.name == team_name)
+            ).scalar()
+            team = self.db.session.execute(select(Team).filter(Team.name == team_name)).scalar()
+
+            if not team:
+                team = Team()
+                team.name = team_name
+                team.chatroom_id = chatroom.id if chatroom else None
                 try:
-                    self.db.session.add(eud)
+                    self.db.session.add(team)
                     self.db.session.commit()
                 except sqlalchemy.exc.IntegrityError:
+                    # Another EUD on the same team connected at the same time
                     self.db.session.rollback()
-                    self.db.session.execute(
-                        update(EUD).where(EUD.uid == eud.uid).values(**eud.serialize())
-                    )
-                    self.db.session.commit()
+                    team = self.db.session.execute(
+                        select(Team).filter(Team.name == team_name)
+                    ).scalar()
+            elif not team.chatroom_id and chatroom:
+                team.chatroom_id = chatroom.id
+                self.db.session.commit()
 
-                self.send_meshtastic_node_info(eud)
-
-                # If the RabbitMQ channel is open, publish the EUD info to socketio to be displayed on the web UI map.
-                # Also save the EUD's info for on_channel_open to publish
-                self.eud = eud
-                if self.rabbit_channel:
-                    message = {
-                        "method": "emit",
-                        "event": "eud",
-                        "data": eud.to_json(),
-                        "namespace": "/socket.io",
-                        "room": None,
-                        "skip_sid": None,
-                        "callback": None,
-                        "binary": False,
-                        "host_id": uuid.uuid4().hex,
-                    }
-                    self.rabbit_channel.basic_publish(
-                        exchange="flask-socketio",
-                        routing_key="",
-                        body=json.dumps(message).encode(),
-                        properties=pika.BasicProperties(
-                            expiration=self.app.config.get("OTS_RABBITMQ_TTL")
-                        ),
-                    )
+        try:
+            eud = self.db.session.execute(select(EUD).filter_by(uid=self.uid)).first()[0]
+        except:
+            eud = EUD()
+
+        eud.uid = self.uid
+        if callsign:
+            eud.callsign = callsign
+        if device:
+            eud.device = device
+
+        eud.os = operating_system
+        eud.platform = platform
+        eud.version = version
+        eud.phone_number = phone_number
+        eud.last_event_time = datetime_from_iso8601_string(event.start)
+        eud.last_status = "Connected"
+        eud.user_id = user_id
+
+        # Set a Meshtastic ID for TAK EUDs to be identified by in the Meshtastic network
+        if not eud.meshtastic_id and eud.platform != "Meshtastic":
+            meshtastic_id = "{:x}".format(int.from_bytes(os.urandom(4), "big"))
+            while len(meshtastic_id) < 8:
+                meshtastic_id = "0" + meshtastic_id
+            eud.meshtastic_id = int(meshtastic_id, 16)
+        elif not eud.meshtastic_id and eud.platform == "Meshtastic":
+            try:
+                eud.meshtastic_id = int(takv["meshtastic_id"], 16)
+            except:
+                meshtastic_id = "{:x}".format(int.from_bytes(os.urandom(4), "big"))
+                while len(meshtastic_id) < 8:
+                    meshtastic_id = "0" + meshtastic_id
+                eud.meshtastic_id = int(meshtastic_id, 16)
+
+        # Get the Meshtastic device's mac address or generate a random one for TAK EUDs
+        if takv is not None and "macaddr" in takv:
+            eud.meshtastic_macaddr = takv["macaddr"]
+        elif not eud.meshtastic_macaddr:
+            eud.meshtastic_macaddr = base64.b64encode(os.urandom(6)).decode("ascii")
+
+        if team:
+            eud.team_id = team.id
+            eud.team_role = team_role
+
+        try:
+            self.db.session.add(eud)
+            self.db.session.commit()
+        except sqlalchemy.exc.IntegrityError:
+            self.db.session.rollback()
+            self.db.session.execute(update(EUD).where(EUD.uid == eud.uid).values(**eud.serialize()))
+            self.db.session.commit()
+
+        return SessionBootstrap(
+            uid=self.uid,
+            common_name=self.common_name,
+            attributes=attributes,
+            group_routing_keys=group_routing_keys,
+            eud_json=eud.to_json(),
+            callsign=eud.callsign,
+            platform=eud.platform,
+            meshtastic_id=eud.meshtastic_id,
+        )
+
+    def publish_eud(self):
+        message = {
+            "method": "emit",
+            "event": "eud",
+            "data": self.eud_json,
+            "namespace": "/socket.io",
+            "room": None,
+            "skip_sid": None,
+            "callback": None,
+            "binary": False,
+            "host_id": uuid.uuid4().hex,
+        }
+        self.rabbit_channel.basic_publish(
+            exchange="flask-socketio",
+            routing_key="",
+            body=json.dumps(message).encode(),
+            properties=pika.BasicProperties(expiration=self.app.config.get("OTS_RABBITMQ_TTL")),
+        )
 
     def send_meshtastic_node_info(self, eud):
         if self.app.config.get("OTS_ENABLE_MESHTASTIC") and eud.platform != "Meshtastic":
@@ -729,34 +889,53 @@ class ClientController(Thread):
                 )
                 self.logger.debug("Published message to " + routing_key)
 
+    def subscribe_locally(self, group_routing_keys: list[str] | None = None):
+        """Subscribes to the same things bind_queues() binds the EUD's queues to, on the LocalRouter"""
+        try:
+            if group_routing_keys is None:
+                group_routing_keys = self.get_out_group_routing_keys()
+
+            keys = {("dms", self.uid), ("dms", self.callsign), ("missions", "missions")}
+            keys.update(("groups", routing_key) for routing_key in group_routing_keys)
+            with self.app.app_context():
+                # Mission subscriptions are bound by the Marti API when there's a queue per EUD
+                mission_names = db.session.execute(
+                    select(MissionRole.mission_name).filter_by(clientUid=self.uid)
+                ).scalars()
+                for mission_name in mission_names:
+                    keys.add(("missions", f"missions.{mission_name}"))
+
+            if not self.shutdown:
+                self.router.set_subscriptions(self, keys)
+        except BaseException as e:
+            self.logger.error(f"Failed to subscribe {self.callsign} to the local router: {e}")
+            self.logger.debug(traceback.format_exc())
+
     def unbind_rabbitmq_queues(self):
+        if self.router:
+            self.router.unsubscribe(self)
+            return
+
         if (
-            self.uid
+            self.bound_queues
             and self.rabbit_channel
             and not self.rabbit_channel.is_closing
             and not self.rabbit_channel.is_closed
         ):
-            self.rabbit_channel.queue_unbind(
-                queue=self.uid, exchange="missions", routing_key="missions"
-            )
-            self.rabbit_channel.queue_unbind(queue=self.uid, exchange="groups")
-            with self.app.app_context():
-                missions = db.session.execute(db.session.query(Mission)).all()
-                for mission in missions:
-                    self.rabbit_channel.queue_unbind(
-                        queue=self.uid,
-                        exchange="missions",
-                        routing_key=f"missions.{mission[0].name}",
-                    )
-                    self.logger.debug(f"Unbound {self.uid} from mission.{mission[0].name}")
+            # Only what bind_queues() bound. Mission subscriptions bound by the Marti API are unbound by the
+            # DisconnectBatcher, and the queues themselves are deleted when they're no longer consumed
+            bindings, self.bound_queues = self.bound_queues, []
 
-            for bind in self.bound_queues:
-                self.rabbit_channel.queue_unbind(
-                    exchange=bind["exchange"], queue=bind["queue"], routing_key=bind["routing_key"]
-                )
+            def unbind():
+                for binding in bindings:
+                    self.rabbit_channel.queue_unbind(**binding)
+
+            self.call_on_rabbitmq_thread(unbind)
 
     def send_disconnect_cot(self):
-        if self.uid:
+        """Hands the disconnect CoT and saving the EUD's status off to the DisconnectBatcher"""
+        if self.uid and not self.disconnect_sent:
+            self.disconnect_sent = True
             now = datetime.datetime.now(datetime.timezone.utc)
             stale = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=10)
 
@@ -787,259 +966,118 @@ class ClientController(Thread):
                 {"TAK-Server-f1a8159ef7804f7a8a32d8efc4b773d0": iso8601_string_from_datetime(now)},
             )
 
-            message = json.dumps({"uid": self.uid, "cot": tostring(event).decode("utf-8")})
-            if (
-                self.rabbit_channel
-                and not self.rabbit_channel.is_closing
-                and not self.rabbit_channel.is_closed
-                and self.user
-            ):
-                with self.app.app_context():
-                    group_query = self.db.session.query(GroupUser).filter_by(
-                        user_id=self.user.id, direction=Group.OUT, enabled=True
-                    )
-                    groups = self.db.session.execute(group_query).all()
-                    for group in groups:
-                        group = group[0]
-                        self.logger.debug(
-                            f"Publishing to group {group.group.name}.{group.direction}"
-                        )
-                        self.rabbit_channel.basic_publish(
-                            exchange="groups",
-                            routing_key=f"{group.group.name}.{group.direction}",
-                            body=message,
-                            properties=pika.BasicProperties(
-                                expiration=self.app.config.get("OTS_RABBITMQ_TTL")
-                            ),
-                        )
-            elif (
-                self.rabbit_channel
-                and not self.rabbit_channel.is_closing
-                and not self.rabbit_channel.is_closed
-            ):
-                self.rabbit_channel.basic_publish(
-                    exchange="groups",
-                    routing_key=f"__ANON__.{Group.OUT}",
-                    body=message,
-                    properties=pika.BasicProperties(
-                        expiration=self.app.config.get("OTS_RABBITMQ_TTL")
-                    ),
+            self.disconnects.add(
+                Disconnect(
+                    uid=self.uid,
+                    user_id=self.user.id if self.user else None,
+                    xml=tostring(event),
+                    time=now,
+                    group_routing_keys=self.out_group_routing_keys,
+                    has_queue=not self.router,
                 )
+            )
 
+        self.logger.info("{} disconnected".format(self.address))
+
+    def get_group_routing_keys(self) -> list[str]:
+        """Looked up once and cached for the session. The cache is dropped when the web API changes this user's
+        groups, and after OTS_GROUP_ROUTING_CACHE_SECONDS in case they were changed some other way.
+        """
+        if (
+            self.group_routing_keys is not None
+            and time.monotonic() - self.group_routing_keys_time
+            < self.app.config.get("OTS_GROUP_ROUTING_CACHE_SECONDS")
+        ):
+            return self.group_routing_keys
+
+        # Publish all CoT messages received by TCP to the __ANON__ group
+        routing_keys = [f"__ANON__.{Group.OUT}"]
+        if self.is_ssl:
             with self.app.app_context():
-                self.db.session.execute(
-                    update(EUD)
-                    .filter(EUD.uid == self.uid)
-                    .values(last_status="Disconnected", last_event_time=now)
-                )
-                self.db.session.commit()
+                group_memberships = db.session.execute(
+                    db.session.query(GroupUser).filter_by(
+                        user_id=self.user.id, direction=Group.IN, enabled=True
+                    )
+                ).all()
 
-        self.logger.info("{} disconnected".format(self.address))
+                # Default to the __ANON__ group if the user doesn't belong to any IN groups
+                if group_memberships:
+                    routing_keys = [
+                        f"{membership[0].group.name}.{Group.OUT}"
+                        for membership in group_memberships
+                    ]
 
-    def route_cot(self, event):
-        if not event:
-            return
+        self.group_routing_keys = routing_keys
+        self.group_routing_keys_time = time.monotonic()
+        return routing_keys
 
+    def route_cot(self, event: CoTEvent):
         if not self.rabbit_channel or not self.rabbit_channel.is_open:
             self.cached_messages.append(event)
             self.logger.error("RabbitMQ channel is closed, not publishing cot")
             return
 
+        # Serialize once and publish the same bytes to every exchange
+        message = cot_envelope.pack(event, self.uid, self.envelope_format)
+
         # Route all CoTs to the firehose exchange for plugins and users that connect directly to RabbitMQ
-        self.rabbit_channel.basic_publish(
-            exchange="firehose",
-            body=json.dumps({"uid": self.uid, "cot": str(event)}),
-            routing_key="",
-            properties=pika.BasicProperties(expiration=self.app.config.get("OTS_RABBITMQ_TTL")),
-        )
+        if not self.firehose or self.firehose.should_publish():
+            self.rabbit_channel.basic_publish(
+                exchange="firehose",
+                body=message,
+                routing_key="",
+                properties=self.publish_properties,
+                mandatory=self.firehose is not None,
+            )
 
         # Route all cots to the cot_parser direct exchange to be processed by a pool of cot_parser processes
         self.rabbit_channel.basic_publish(
             exchange="cot_parser",
-            body=json.dumps({"uid": self.uid, "cot": str(event)}),
+            body=message,
             routing_key="cot_parser",
-            properties=pika.BasicProperties(expiration=self.app.config.get("OTS_RABBITMQ_TTL")),
+            properties=self.publish_properties,
         )
 
-        mission_changes = []
-        destinations = event.find_all("dest")
+        destinations = event.dests
         if destinations:
 
             for destination in destinations:
-                creator = event.find("creator")
-                creator_uid = self.uid
-                if creator and "uid" in creator.attrs:
-                    creator_uid = creator.attrs["uid"]
-
                 # ATAK and WinTAK use callsign, iTAK uses uid
-                if "callsign" in destination.attrs and destination.attrs["callsign"]:
+                if destination.get("callsign"):
                     self.rabbit_channel.basic_publish(
                         exchange="dms",
-                        routing_key=destination.attrs["callsign"],
-                        body=json.dumps({"uid": self.uid, "cot": str(event)}),
-                        properties=pika.BasicProperties(
-                            expiration=self.app.config.get("OTS_RABBITMQ_TTL")
-                        ),
+                        routing_key=destination["callsign"],
+                        body=message,
+                        properties=self.publish_properties,
                     )
 
                 # iTAK uses its own UID in the <dest> tag when sending CoTs to a mission so we don't send those to the dms exchange
-                elif "uid" in destination.attrs and destination["uid"] != self.uid:
+                elif "uid" in destination and destination["uid"] != self.uid:
                     self.rabbit_channel.basic_publish(
                         exchange="dms",
-                        routing_key=destination.attrs["uid"],
-                        body=json.dumps({"uid": self.uid, "cot": str(event)}),
-                        properties=pika.BasicProperties(
-                            expiration=self.app.config.get("OTS_RABBITMQ_TTL")
-                        ),
+                        routing_key=destination["uid"],
+                        body=message,
+                        properties=self.publish_properties,
                     )
 
-                # For data sync missions
-                elif "mission" in destination.attrs:
-                    with self.app.app_context():
-                        mission = self.db.session.execute(
-                            self.db.session.query(Mission).filter_by(
-                                name=destination.attrs["mission"]
-                            )
-                        ).first()
-
-                        if not mission:
-                            self.logger.error(
-                                f"No such mission found: {destination.attrs['mission']}"
-                            )
-                            return
-
-                        mission = mission[0]
-                        self.rabbit_channel.basic_publish(
-                            "missions",
-                            routing_key=f"missions.{destination.attrs['mission']}",
-                            body=json.dumps({"uid": self.uid, "cot": str(event)}),
-                            properties=pika.BasicProperties(
-                                expiration=self.app.config.get("OTS_RABBITMQ_TTL")
-                            ),
-                        )
-
-                        mission_uid = self.db.session.execute(
-                            self.db.session.query(MissionUID).filter_by(uid=event.attrs["uid"])
-                        ).first()
-
-                        if not mission_uid:
-                            mission_uid = MissionUID()
-                            mission_uid.uid = event.attrs["uid"]
-                            mission_uid.mission_name = destination.attrs["mission"]
-                            mission_uid.timestamp = datetime_from_iso8601_string(
-                                event.attrs["start"]
-                            )
-                            mission_uid.creator_uid = creator_uid
-                            mission_uid.cot_type = event.attrs["type"]
-
-                            color = event.find("color")
-                            icon = event.find("usericon")
-                            point = event.find("point")
-                            contact = event.find("contact")
-
-                            if color and "argb" in color.attrs:
-                                mission_uid.color = color.attrs["argb"]
-                            elif color and "value" in color.attrs:
-                                mission_uid.color = color.attrs["value"]
-                            if icon:
-                                mission_uid.iconset_path = icon["iconsetpath"]
-                            if point:
-                                mission_uid.latitude = float(point.attrs["lat"])
-                                mission_uid.longitude = float(point.attrs["lon"])
-                            if contact:
-                                mission_uid.callsign = contact.attrs["callsign"]
-
-                            try:
-                                self.db.session.add(mission_uid)
-                                self.db.session.commit()
-                            except sqlalchemy.exc.IntegrityError:
-                                self.db.session.rollback()
-                                self.db.session.execute(
-                                    update(MissionUID).values(**mission_uid.serialize())
-                                )
-
-                            mission_change = MissionChange()
-                            mission_change.isFederatedChange = False
-                            mission_change.change_type = MissionChange.ADD_CONTENT
-                            mission_change.mission_name = destination.attrs["mission"]
-                            mission_change.timestamp = datetime_from_iso8601_string(
-                                event.attrs["start"]
-                            )
-                            mission_change.creator_uid = creator_uid
-                            mission_change.server_time = datetime_from_iso8601_string(
-                                event.attrs["start"]
-                            )
-                            mission_change.mission_uid = event.attrs["uid"]
-
-                            change_pk = self.db.session.execute(
-                                insert(MissionChange).values(**mission_change.serialize())
-                            )
-                            self.db.session.commit()
-
-                            body = {
-                                "uid": self.app.config.get("OTS_NODE_ID"),
-                                "cot": tostring(
-                                    generate_mission_change_cot(
-                                        destination.attrs["mission"],
-                                        mission,
-                                        mission_change,
-                                        cot_event=event,
-                                    )
-                                ).decode("utf-8"),
-                            }
-                            mission_changes.append({"mission": mission.name, "message": body})
-                            self.rabbit_channel.basic_publish(
-                                "missions",
-                                routing_key=f"missions.{mission.name}",
-                                body=json.dumps(body),
-                            )
-
-        if not destinations and not self.is_ssl:
-            # Publish all CoT messages received by TCP and that have no destination to the __ANON__ group
-            self.rabbit_channel.basic_publish(
-                exchange="groups",
-                routing_key="__ANON__.OUT",
-                body=json.dumps({"uid": self.uid, "cot": str(event)}),
-                properties=pika.BasicProperties(expiration=self.app.config.get("OTS_RABBITMQ_TTL")),
-            )
-            return
-
-        if not destinations:
-            with self.app.app_context():
-                group_memberships = db.session.execute(
-                    db.session.query(GroupUser).filter_by(
-                        user_id=self.user.id, direction=Group.IN, enabled=True
-                    )
-                ).all()
-                if not group_memberships:
-                    # Default to the __ANON__ group if the user doesn't belong to any IN groups
-                    self.rabbit_channel.basic_publish(
-                        exchange="groups",
-                        routing_key="__ANON__.OUT",
-                        body=json.dumps({"uid": self.uid, "cot": str(event)}),
-                        properties=pika.BasicProperties(
-                            expiration=self.app.config.get("OTS_RABBITMQ_TTL")
-                        ),
-                    )
+                # For data sync missions. cot_parser saves the CoT to the mission and announces the change
+                elif "mission" in destination:
+                    if not self.find_mission(destination["mission"]):
+                        self.logger.error(f"No such mission found: {destination['mission']}")
+                        return
 
-                for membership in group_memberships:
-                    membership = membership[0]
                     self.rabbit_channel.basic_publish(
-                        exchange="groups",
-                        routing_key=f"{membership.group.name}.{Group.OUT}",
-                        body=json.dumps({"uid": self.uid, "cot": str(event)}),
-                        properties=pika.BasicProperties(
-                            expiration=self.app.config.get("OTS_RABBITMQ_TTL")
-                        ),
+                        "missions",
+                        routing_key=f"missions.{destination['mission']}",
+                        body=message,
+                        properties=self.publish_properties,
                     )
 
-        if mission_changes:
-            for change in mission_changes:
+        if not destinations:
+            for routing_key in self.get_group_routing_keys():
                 self.rabbit_channel.basic_publish(
-                    "missions",
-                    routing_key=f"missions.{change['mission']}",
-                    body=json.dumps(change["message"]),
-                    properties=pika.BasicProperties(
-                        expiration=self.app.config.get("OTS_RABBITMQ_TTL")
-                    ),
+                    exchange="groups",
+                    routing_key=routing_key,
+                    body=message,
+                    properties=self.publish_properties,
                 )
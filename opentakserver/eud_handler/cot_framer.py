@@ -0,0 +1,75 @@
+from typing import Iterator
+
+
+class FrameTooLarge(ValueError):
+    """Raised when a CoT message grows past CoTFramer.max_frame_size without being closed"""
+
+
+class CoTFramer:
+    """Splits the byte stream from an EUD into complete <event> and <auth> messages.
+
+    Each call to feed() only scans the bytes that haven't been scanned yet, so a message that arrives over many
+    reads is still found in linear time. Anything between messages, like XML declarations and whitespace, is
+    dropped.
+    """
+
+    START_TAGS = (b"<event", b"<auth")
+    END_TAGS = {b"<event": b"</event>", b"<auth": b"</auth>"}
+
+    def __init__(self, max_frame_size: int = 8 * 1024 * 1024):
+        self.max_frame_size = max_frame_size
+        self.buffer = bytearray()
+        self.end_tag: bytes | None = None
+        self.scan_from = 0
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        """Adds data to the buffer and yields every message it completes, in order"""
+        self.buffer += data
+
+        while True:
+            if self.end_tag is None and not self.find_start():
+                return
+
+            end = self.buffer.find(self.end_tag, self.scan_from)
+            if end == -1:
+                if len(self.buffer) > self.max_frame_size:
+                    size = len(self.buffer)
+                    self.reset()
+                    raise FrameTooLarge(
+                        f"CoT message is over {self.max_frame_size} bytes ({size}), dropping it"
+                    )
+
+                # The end tag could be split between this read and the next one
+                self.scan_from = max(0, len(self.buffer) - len(self.end_tag) + 1)
+                return
+
+            end += len(self.end_tag)
+            frame = bytes(self.buffer[:end])
+            del self.buffer[:end]
+            self.end_tag = None
+            self.scan_from = 0
+            yield frame
+
+    def find_start(self) -> bool:
+        start = -1
+        start_tag = None
+        for tag in self.START_TAGS:
+            index = self.buffer.find(tag)
+            if index != -1 and (start == -1 or index < start):
+                start = index
+                start_tag = tag
+
+        if start == -1:
+            # Keep enough bytes to find a start tag that's split between reads
+            del self.buffer[: max(0, len(self.buffer) - len(self.START_TAGS[0]) + 1)]
+            return False
+
+        del self.buffer[:start]
+        self.end_tag = self.END_TAGS[start_tag]
+        self.scan_from = len(start_tag)
+        return True
+
+    def reset(self):
+        self.buffer.clear()
+        self.end_tag = None
+        self.scan_from = 0
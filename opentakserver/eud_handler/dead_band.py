@@ -0,0 +1,120 @@
+import math
+import time
+from threading import Lock
+
+from flask import Flask
+
+from opentakserver.cot_event import CoTEvent
+from opentakserver.process_stats import write_stats
+
+EARTH_RADIUS_METERS = 6371000
+
+
+class DeadBandFilter:
+    """Drops an EUD's position reports when it hasn't moved, turned or changed speed enough since the last report
+    that was let through. One report is always let through every `seconds` so stationary EUDs don't go stale.
+
+    There's one filter per eud_handler process, shared by all of its clients. Use DeadBandFilter.for_app(app).
+    """
+
+    def __init__(
+        self,
+        seconds: float,
+        meters: float,
+        altitude_meters: float,
+        course_degrees: float,
+        speed: float,
+        data_folder: str | None = None,
+    ):
+        self.seconds = seconds
+        self.meters = meters
+        self.altitude_meters = altitude_meters
+        self.course_degrees = course_degrees
+        self.speed = speed
+        self.data_folder = data_folder
+
+        # uid -> (time, type, latitude, longitude, hae, course, speed) of the last report that was let through
+        self.last_reports: dict[str, tuple] = {}
+        self.lock = Lock()
+        self.stats = {"positions": 0, "dropped": 0, "dropped_bytes": 0, "heartbeats": 0}
+        self.stats_written = 0
+
+    @classmethod
+    def for_app(cls, app: Flask) -> "DeadBandFilter | None":
+        """Returns None when OTS_DEAD_BAND_SECONDS is 0"""
+        if not app.config.get("OTS_DEAD_BAND_SECONDS"):
+            return None
+
+        if "ots_dead_band" not in app.extensions:
+            app.extensions["ots_dead_band"] = cls(
+                app.config.get("OTS_DEAD_BAND_SECONDS"),
+                app.config.get("OTS_DEAD_BAND_METERS"),
+                app.config.get("OTS_DEAD_BAND_ALTITUDE_METERS"),
+                app.config.get("OTS_DEAD_BAND_COURSE_DEGREES"),
+                app.config.get("OTS_DEAD_BAND_SPEED"),
+                app.config.get("OTS_DATA_FOLDER"),
+            )
+        return app.extensions["ots_dead_band"]
+
+    def should_drop(self, event: CoTEvent) -> bool:
+        try:
+            point = event.point
+            track = event.track or {}
+            report = (
+                time.monotonic(),
+                event.type,
+                float(point["lat"]),
+                float(point["lon"]),
+                float(point.get("hae", 0)),
+                float(track.get("course", 0)),
+                float(track.get("speed", 0)),
+            )
+        except (KeyError, TypeError, ValueError):
+            return False
+
+        with self.lock:
+            self.stats["positions"] += 1
+            last = self.last_reports.get(event.uid)
+            drop = last is not None and not self.changed(last, report)
+            if drop:
+                self.stats["dropped"] += 1
+                self.stats["dropped_bytes"] += len(event.xml)
+            else:
+                if last is not None and report[0] - last[0] >= self.seconds:
+                    self.stats["heartbeats"] += 1
+                self.last_reports[event.uid] = report
+
+        self.report_stats()
+        return drop
+
+    def changed(self, last: tuple, report: tuple) -> bool:
+        if report[0] - last[0] >= self.seconds or report[1] != last[1]:
+            return True
+
+        # Equirectangular distance is accurate enough over a few meters
+        latitude = math.radians((last[2] + report[2]) / 2)
+        x = math.radians(report[3] - last[3]) * math.cos(latitude)
+        y = math.radians(report[2] - last[2])
+        if math.hypot(x, y) * EARTH_RADIUS_METERS >= self.meters:
+            return True
+
+        course = abs(report[5] - last[5]) % 360
+        return (
+            abs(report[4] - last[4]) >= self.altitude_meters
+            or min(course, 360 - course) >= self.course_degrees
+            or abs(report[6] - last[6]) >= self.speed
+        )
+
+    def forget(self, uid: str):
+        """Lets the next report from uid through, like when it reconnects"""
+        with self.lock:
+            self.last_reports.pop(uid, None)
+
+    def report_stats(self):
+        if not self.data_folder or time.monotonic() - self.stats_written < 10:
+            return
+
+        self.stats_written = time.monotonic()
+        with self.lock:
+            stats = dict(self.stats, tracked_uids=len(self.last_reports))
+        write_stats(self.data_folder, "dead_band", stats)
@@ -0,0 +1,206 @@
+import datetime
+import time
+import traceback
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from threading import Condition, Lock, Thread
+
+import pika
+from flask import Flask
+from sqlalchemy import case, select, update
+
+from opentakserver import cot_envelope
+from opentakserver.cot_event import CoTEvent
+from opentakserver.extensions import db
+from opentakserver.models.EUD import EUD
+from opentakserver.models.Group import Group
+from opentakserver.models.GroupUser import GroupUser
+from opentakserver.models.MissionRole import MissionRole
+
+_create_lock = Lock()
+
+
+@dataclass(slots=True)
+class Disconnect:
+    uid: str
+    user_id: int | None
+    # The t-x-d-d CoT to send the EUD's groups
+    xml: bytes
+    time: datetime.datetime
+    # None when the EUD's groups weren't looked up while it was connected
+    group_routing_keys: list[str] | None
+    # Its queue is named after its uid. False with OTS_EUD_HANDLER_LOCAL_ROUTING
+    has_queue: bool
+
+
+class DisconnectBatcher:
+    """Finishes disconnecting EUDs in a thread of its own, in batches.
+
+    When a lot of EUDs drop at once, like during a network outage, each of them would otherwise look up its groups,
+    publish a disconnect CoT to each one and update its EUD row from its own socket thread. Instead, everything that
+    disconnects within window seconds is handled together: one UPDATE for every EUD, one query for their groups and
+    mission subscriptions. Each disconnect CoT is still its own message, packed once and published to each of the EUD's
+    groups.
+
+    EUDs that have already reconnected to this process by the time the batch runs are skipped. There's one batcher
+    per eud_handler process. Use DisconnectBatcher.for_app(app, logger).
+    """
+
+    def __init__(self, app: Flask, logger, window: float):
+        self.app = app
+        self.logger = logger
+        self.window = window
+        self.pending: list[Disconnect] = []
+        self.condition = Condition()
+        # uid -> number of this process's sessions using it
+        self.connected = Counter()
+        self.rabbit_connection: pika.BlockingConnection | None = None
+        self.rabbit_channel = None
+        self.stats = {"disconnects": 0, "skipped": 0, "batches": 0, "publishes": 0}
+
+    @classmethod
+    def for_app(cls, app: Flask, logger) -> "DisconnectBatcher":
+        with _create_lock:
+            if "ots_disconnect_batcher" not in app.extensions:
+                batcher = cls(
+                    app, logger, app.config.get("OTS_EUD_HANDLER_DISCONNECT_WINDOW_MS") / 1000
+                )
+                Thread(target=batcher.run, name="disconnects", daemon=True).start()
+                app.extensions["ots_disconnect_batcher"] = batcher
+        return app.extensions["ots_disconnect_batcher"]
+
+    def connected_uid(self, uid: str):
+        with self.condition:
+            self.connected[uid] += 1
+
+    def add(self, disconnect: Disconnect):
+        with self.condition:
+            self.connected[disconnect.uid] -= 1
+            if self.connected[disconnect.uid] <= 0:
+                del self.connected[disconnect.uid]
+
+            self.pending.append(disconnect)
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            batch = self.take_batch()
+            if not batch:
+                continue
+
+            try:
+                self.process(batch)
+            except BaseException as e:
+                self.logger.error(f"Failed to process {len(batch)} disconnects: {e}")
+                self.logger.debug(traceback.format_exc())
+                # Reconnect for the next batch in case the connection to RabbitMQ was lost
+                self.rabbit_channel = None
+
+    def take_batch(self) -> list[Disconnect]:
+        """Waits for a disconnect, then for window seconds for the rest of the EUDs that dropped at the same time"""
+        with self.condition:
+            while not self.pending:
+                self.condition.wait()
+
+        time.sleep(self.window)
+
+        with self.condition:
+            batch, self.pending = self.pending, []
+            # The last of these for each uid wins
+            batch = list({disconnect.uid: disconnect for disconnect in batch}.values())
+            reconnected = [d for d in batch if d.uid in self.connected]
+            self.stats["skipped"] += len(reconnected)
+            return [d for d in batch if d.uid not in self.connected]
+
+    def process(self, batch: list[Disconnect]):
+        uids = [disconnect.uid for disconnect in batch]
+        with self.app.app_context():
+            unknown_users = {
+                d.user_id for d in batch if d.group_routing_keys is None and d.user_id is not None
+            }
+            user_groups = defaultdict(list)
+            if unknown_users:
+                rows = db.session.execute(
+                    select(GroupUser.user_id, Group.name)
+                    .join(Group, Group.id == GroupUser.group_id)
+                    .where(
+                        GroupUser.user_id.in_(unknown_users),
+                        GroupUser.direction == Group.OUT,
+                        GroupUser.enabled.is_(True),
+                    )
+                ).all()
+                for user_id, group_name in rows:
+                    user_groups[user_id].append(f"{group_name}.{Group.OUT}")
+
+            # Mission subscriptions are bound to the EUD's queue by the Marti API, the EUD didn't record them
+            queue_uids = [d.uid for d in batch if d.has_queue]
+            subscriptions = []
+            if queue_uids:
+                subscriptions = db.session.execute(
+                    select(MissionRole.clientUid, MissionRole.mission_name).where(
+                        MissionRole.clientUid.in_(queue_uids)
+                    )
+                ).all()
+
+            db.session.execute(
+                update(EUD)
+                .where(EUD.uid.in_(uids))
+                .values(
+                    last_status="Disconnected",
+                    # Each EUD keeps its own disconnect time, delete_old_data() expires EUDs by it
+                    last_event_time=case({d.uid: d.time for d in batch}, value=EUD.uid),
+                )
+            )
+            db.session.commit()
+
+        envelope_format = self.app.config.get("OTS_RABBITMQ_ENVELOPE")
+        # Consumers of the groups exchange expect one CoT per message
+        messages = []
+        for disconnect in batch:
+            routing_keys = disconnect.group_routing_keys
+            if routing_keys is None:
+                routing_keys = user_groups.get(disconnect.user_id) or [f"__ANON__.{Group.OUT}"]
+            body = cot_envelope.pack(
+                CoTEvent.from_xml(disconnect.xml), disconnect.uid, envelope_format
+            )
+            for routing_key in routing_keys:
+                messages.append((routing_key, body))
+
+        channel = self.get_channel()
+        properties = pika.BasicProperties(
+            content_type=cot_envelope.content_type(envelope_format),
+            expiration=self.app.config.get("OTS_RABBITMQ_TTL"),
+        )
+        for routing_key, body in messages:
+            channel.basic_publish(
+                exchange="groups", routing_key=routing_key, body=body, properties=properties
+            )
+            self.stats["publishes"] += 1
+
+        for uid, mission_name in subscriptions:
+            channel.queue_unbind(
+                queue=uid, exchange="missions", routing_key=f"missions.{mission_name}"
+            )
+
+        self.stats["disconnects"] += len(batch)
+        self.stats["batches"] += 1
+        self.logger.info(f"Finished disconnecting {len(batch)} EUDs")
+
+    def get_channel(self):
+        if self.rabbit_channel and self.rabbit_channel.is_open:
+            return self.rabbit_channel
+
+        rabbit_credentials = pika.PlainCredentials(
+            self.app.config.get("OTS_RABBITMQ_USERNAME"),
+            self.app.config.get("OTS_RABBITMQ_PASSWORD"),
+        )
+        rabbit_host = self.app.config.get("OTS_RABBITMQ_SERVER_ADDRESS")
+        self.rabbit_connection = pika.BlockingConnection(
+            pika.ConnectionParameters(host=rabbit_host, credentials=rabbit_credentials)
+        )
+        self.rabbit_channel = self.rabbit_connection.channel()
+        return self.rabbit_channel
+
+    def get_stats(self) -> dict:
+        with self.condition:
+            return dict(self.stats, pending=len(self.pending))
@@ -2,7 +2,9 @@ import argparse
 import logging
 import os
 import platform
+import socket
 import sys
+import traceback
 from logging.handlers import TimedRotatingFileHandler
 
 import colorlog
@@ -15,10 +17,11 @@ from flask_security.models import fsqla
 
 from opentakserver.defaultconfig import DefaultConfig
 from opentakserver.EmailValidator import EmailValidator
+from opentakserver.eud_handler.AsyncSocketServer import AsyncSocketServer
+from opentakserver.eud_handler.SocketServer import SocketServer, create_ssl_context
+from opentakserver.extensions import db, ldap_manager, logger
 
 # These unused imports are required by SQLAlchemy, don't remove them
-from opentakserver.eud_handler.SocketServer import SocketServer
-from opentakserver.extensions import db, ldap_manager, logger
 from opentakserver.models.Alert import Alert
 from opentakserver.models.CasEvac import CasEvac
 from opentakserver.models.Certificate import Certificate
@@ -147,20 +150,65 @@ def status():
     return jsonify({"status": "ok"})
 
 
-def main():
-    opts = args()
-    if opts.ssl:
-        socket_server = SocketServer(
-            logger, app.app_context(), app.config.get("OTS_SSL_STREAMING_PORT"), True
+def run_server(ssl: bool, ssl_context=None):
+    server_class = SocketServer
+    if app.config.get("OTS_EUD_HANDLER_ASYNCIO"):
+        server_class = AsyncSocketServer
+
+    if ssl:
+        socket_server = server_class(
+            logger, app.app_context(), app.config.get("OTS_SSL_STREAMING_PORT"), True, ssl_context
         )
         logger.info(f"Started SSL server on port {app.config.get('OTS_SSL_STREAMING_PORT')}")
     else:
-        socket_server = SocketServer(
+        socket_server = server_class(
             logger, app.app_context(), app.config.get("OTS_TCP_STREAMING_PORT")
         )
         logger.info(f"Started TCP server on port {app.config.get('OTS_TCP_STREAMING_PORT')}")
     socket_server.run()
 
 
+def main():
+    opts = args()
+    workers = app.config.get("OTS_EUD_HANDLER_WORKERS")
+    if workers > 1 and not (hasattr(os, "fork") and hasattr(socket, "SO_REUSEPORT")):
+        logger.warning("OTS_EUD_HANDLER_WORKERS needs fork() and SO_REUSEPORT, starting one worker")
+        workers = 1
+
+    if workers <= 1:
+        run_server(opts.ssl)
+        return
+
+    # Created before forking so every worker has the same session ticket keys and an EUD can resume its TLS session
+    # with whichever worker it reconnects to
+    ssl_context = create_ssl_context(app) if opts.ssl else None
+
+    # Each worker opens its own listening socket, RabbitMQ connections and DB connections after the fork and the
+    # kernel spreads new connections between the workers' sockets
+    child_processes = []
+    for i in range(workers):
+        try:
+            pid = os.fork()
+            if pid == 0:
+                with app.app_context():
+                    db.engine.dispose(close=False)
+                run_server(opts.ssl, ssl_context)
+                return
+            else:
+                child_processes.append(pid)
+        except KeyboardInterrupt:
+            pass
+        except BaseException as e:
+            logger.error(f"eud_handler error: {e}")
+            logger.debug(traceback.format_exc())
+
+    for child in child_processes:
+        try:
+            os.waitpid(child, 0)
+        except BaseException:
+            logger.info("Exiting...")
+            sys.exit()
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,53 @@
+import time
+from threading import Lock
+
+from flask import Flask
+
+
+class FirehoseDemand:
+    """Decides whether CoTs need to be published to the firehose exchange at all.
+
+    Firehose messages are published with mandatory set, so RabbitMQ returns them when no queue is bound to the
+    exchange. After a return, publishing stops for seconds and then the next CoT is published again to see if
+    anything has been bound since. A consumer that binds in the meantime misses up to seconds of CoTs, nothing is
+    lost otherwise since the returned messages had nowhere to go. There's one per eud_handler process. Use
+    FirehoseDemand.for_app(app).
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.idle_until = 0.0
+        self.lock = Lock()
+        self.stats = {"published": 0, "skipped": 0, "returned": 0}
+
+    @classmethod
+    def for_app(cls, app: Flask) -> "FirehoseDemand | None":
+        """Returns None when OTS_FIREHOSE_CHECK_SECONDS is 0, which always publishes to the firehose"""
+        if not app.config.get("OTS_FIREHOSE_CHECK_SECONDS"):
+            return None
+
+        if "ots_firehose_demand" not in app.extensions:
+            app.extensions["ots_firehose_demand"] = cls(
+                app.config.get("OTS_FIREHOSE_CHECK_SECONDS")
+            )
+        return app.extensions["ots_firehose_demand"]
+
+    def should_publish(self) -> bool:
+        if time.monotonic() < self.idle_until:
+            self.stats["skipped"] += 1
+            return False
+
+        self.stats["published"] += 1
+        return True
+
+    def on_return(self, channel, method, properties, body):
+        """Add to every channel that publishes to the firehose with add_on_return_callback()"""
+        if method.exchange != "firehose":
+            return
+
+        with self.lock:
+            self.stats["returned"] += 1
+            self.idle_until = time.monotonic() + self.seconds
+
+    def get_stats(self) -> dict:
+        return dict(self.stats, idle=time.monotonic() < self.idle_until)
@@ -0,0 +1,215 @@
+import os
+import socket
+import traceback
+from threading import Lock, Thread
+
+import pika
+from flask import Flask
+from pika.channel import Channel
+
+from opentakserver import cot_envelope
+
+# (exchange, routing_key)
+Subscription = tuple[str, str]
+
+_create_lock = Lock()
+
+
+class LocalRouter:
+    """Delivers messages from RabbitMQ to the EUDs connected to this eud_handler process.
+
+    Instead of a queue per EUD, the process has one queue which is bound to every routing key that at least one of
+    its EUDs needs. RabbitMQ sends a CoT to the process once no matter how many of its EUDs should get it, and the
+    router hands it to each of them. EUDs on other eud_handler processes or servers get it from their own process's
+    queue, so delivery between nodes still goes through RabbitMQ.
+
+    There's one router per eud_handler process. Use LocalRouter.for_app(app).
+    """
+
+    RECONNECT_DELAY = 5
+
+    def __init__(self, app: Flask, logger):
+        self.app = app
+        self.logger = logger
+        self.queue = f"eud_handler.{socket.gethostname()}.{os.getpid()}"
+
+        # Both indexes are guarded by self.lock
+        self.sessions_by_key: dict[Subscription, set] = {}
+        self.keys_by_session: dict[object, set[Subscription]] = {}
+        self.lock = Lock()
+
+        self.connection: pika.SelectConnection | None = None
+        self.channel: Channel | None = None
+        self.ready = False
+        self.closing = False
+        self.stats = {"received": 0, "delivered": 0}
+
+    @classmethod
+    def for_app(cls, app: Flask, logger) -> "LocalRouter | None":
+        """Returns None unless OTS_EUD_HANDLER_LOCAL_ROUTING is enabled"""
+        if not app.config.get("OTS_EUD_HANDLER_LOCAL_ROUTING"):
+            return None
+
+        with _create_lock:
+            if "ots_local_router" not in app.extensions:
+                router = cls(app, logger)
+                router.start()
+                app.extensions["ots_local_router"] = router
+        return app.extensions["ots_local_router"]
+
+    def start(self):
+        self.connect()
+        Thread(target=self.connection.ioloop.start, name="local-router", daemon=True).start()
+
+    def connect(self):
+        rabbit_credentials = pika.PlainCredentials(
+            self.app.config.get("OTS_RABBITMQ_USERNAME"),
+            self.app.config.get("OTS_RABBITMQ_PASSWORD"),
+        )
+        rabbit_host = self.app.config.get("OTS_RABBITMQ_SERVER_ADDRESS")
+        self.connection = pika.SelectConnection(
+            pika.ConnectionParameters(host=rabbit_host, credentials=rabbit_credentials),
+            on_open_callback=self.on_connection_open,
+            on_open_error_callback=self.on_connection_error,
+            on_close_callback=self.on_connection_closed,
+        )
+
+    def on_connection_open(self, connection: pika.SelectConnection):
+        connection.channel(on_open_callback=self.on_channel_open)
+
+    def on_connection_error(self, connection: pika.SelectConnection, error):
+        self.logger.error(f"Local router failed to connect to RabbitMQ: {error}")
+        self.reconnect(connection)
+
+    def on_connection_closed(self, connection: pika.SelectConnection, error):
+        self.ready = False
+        self.channel = None
+        if not self.closing:
+            self.logger.error(f"Local router's RabbitMQ connection closed: {error}")
+            self.reconnect(connection)
+
+    def reconnect(self, connection: pika.SelectConnection):
+        def reopen():
+            # The new connection uses the same ioloop, which keeps running in the router's thread
+            self.connection = pika.SelectConnection(
+                connection.params,
+                on_open_callback=self.on_connection_open,
+                on_open_error_callback=self.on_connection_error,
+                on_close_callback=self.on_connection_closed,
+                custom_ioloop=connection.ioloop,
+            )
+
+        if not self.closing:
+            connection.ioloop.call_later(self.RECONNECT_DELAY, reopen)
+
+    def on_channel_open(self, channel: Channel):
+        self.channel = channel
+        # The queue goes away with the connection, it's declared again with every binding after reconnecting
+        channel.queue_declare(
+            queue=self.queue, exclusive=True, auto_delete=True, callback=self.on_queue_declared
+        )
+
+    def on_queue_declared(self, frame):
+        with self.lock:
+            keys = list(self.sessions_by_key)
+            self.ready = True
+
+        for exchange, routing_key in keys:
+            self.channel.queue_bind(queue=self.queue, exchange=exchange, routing_key=routing_key)
+
+        self.channel.basic_consume(
+            queue=self.queue, on_message_callback=self.on_message, auto_ack=True
+        )
+        self.logger.info(f"Local router is consuming from {self.queue}")
+
+    def set_subscriptions(self, session, keys: set[Subscription]):
+        """Replaces everything the session is subscribed to with keys"""
+        with self.lock:
+            old_keys = self.keys_by_session.get(session, set())
+            added = keys - old_keys
+            removed = old_keys - keys
+
+            for key in added:
+                self.sessions_by_key.setdefault(key, set()).add(session)
+            for key in removed:
+                self.sessions_by_key[key].discard(session)
+
+            if keys:
+                self.keys_by_session[session] = set(keys)
+            else:
+                self.keys_by_session.pop(session, None)
+
+            # Only bind the process's queue for the first session on a key and unbind it after the last one leaves
+            bind = [key for key in added if len(self.sessions_by_key[key]) == 1]
+            unbind = [key for key in removed if not self.sessions_by_key[key]]
+            for key in unbind:
+                del self.sessions_by_key[key]
+
+            ready = self.ready
+
+        # Until the queue is declared, on_queue_declared() binds everything in sessions_by_key
+        if ready and (bind or unbind):
+            self.connection.ioloop.add_callback_threadsafe(
+                lambda: self.update_bindings(bind, unbind)
+            )
+
+    def unsubscribe(self, session):
+        self.set_subscriptions(session, set())
+
+    def update_bindings(self, bind: list[Subscription], unbind: list[Subscription]):
+        if not self.channel or not self.channel.is_open:
+            return
+
+        for exchange, routing_key in bind:
+            self.channel.queue_bind(queue=self.queue, exchange=exchange, routing_key=routing_key)
+        for exchange, routing_key in unbind:
+            with self.lock:
+                # Another session may have subscribed since this was scheduled
+                if (exchange, routing_key) in self.sessions_by_key:
+                    continue
+            self.channel.queue_unbind(queue=self.queue, exchange=exchange, routing_key=routing_key)
+
+    def on_message(self, unused_channel, basic_deliver, properties, body):
+        with self.lock:
+            sessions = list(
+                self.sessions_by_key.get((basic_deliver.exchange, basic_deliver.routing_key), ())
+            )
+
+        self.stats["received"] += 1
+        if not sessions:
+            return
+
+        # Control messages like GROUPS_CHANGED_MESSAGE_TYPE are handled by each session
+        if properties and properties.type:
+            for session in sessions:
+                session.on_message(unused_channel, basic_deliver, properties, body)
+            return
+
+        try:
+            envelope = cot_envelope.unpack(body)
+        except BaseException as e:
+            self.logger.error(f"Local router failed to read a message: {e}")
+            self.logger.debug(traceback.format_exc())
+            return
+
+        for session in sessions:
+            try:
+                session.deliver(envelope)
+                self.stats["delivered"] += 1
+            except BaseException as e:
+                self.logger.error(f"Local router failed to deliver to {session.callsign}: {e}")
+                self.logger.debug(traceback.format_exc())
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(
+                self.stats,
+                queue=self.queue,
+                bindings=len(self.sessions_by_key),
+                sessions=len(self.keys_by_session),
+            )
+
+    def close(self):
+        self.closing = True
+        if self.connection and not (self.connection.is_closing or self.connection.is_closed):
+            self.connection.ioloop.add_callback_threadsafe(self.connection.close)
@@ -0,0 +1,74 @@
+import time
+from dataclasses import dataclass
+from threading import Lock
+
+from flask import Flask
+from sqlalchemy import select
+
+from opentakserver.extensions import db
+from opentakserver.models.Mission import Mission
+
+
+@dataclass(slots=True, frozen=True)
+class MissionInfo:
+    name: str
+    guid: str | None
+
+
+class MissionCache:
+    """Data sync missions looked up by name, so CoTs sent to a busy mission don't query the DB every time.
+
+    Missions that don't exist are cached too. Entries are dropped when the Marti or OTS API creates or deletes a
+    mission, see notify_missions_changed(), and after seconds in case that message was missed. There's one cache per
+    eud_handler process. Use MissionCache.for_app(app).
+    """
+
+    MAX_SIZE = 10000
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        # name -> (mission or None, time it was looked up)
+        self.missions: dict[str, tuple[MissionInfo | None, float]] = {}
+        self.lock = Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    @classmethod
+    def for_app(cls, app: Flask) -> "MissionCache | None":
+        """Returns None when OTS_MISSION_CACHE_SECONDS is 0"""
+        if not app.config.get("OTS_MISSION_CACHE_SECONDS"):
+            return None
+
+        if "ots_mission_cache" not in app.extensions:
+            app.extensions["ots_mission_cache"] = cls(app.config.get("OTS_MISSION_CACHE_SECONDS"))
+        return app.extensions["ots_mission_cache"]
+
+    def find_mission(self, name: str) -> MissionInfo | None:
+        """Call inside an app context"""
+        now = time.monotonic()
+        with self.lock:
+            cached = self.missions.get(name)
+            if cached and now - cached[1] < self.seconds:
+                self.stats["hits"] += 1
+                return cached[0]
+
+        self.stats["misses"] += 1
+        mission = lookup_mission(name)
+        with self.lock:
+            if len(self.missions) >= self.MAX_SIZE:
+                self.missions.clear()
+            self.missions[name] = (mission, now)
+        return mission
+
+    def forget(self, name: str):
+        with self.lock:
+            self.missions.pop(name, None)
+            self.stats["invalidations"] += 1
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(self.stats, cached=len(self.missions))
+
+
+def lookup_mission(name: str) -> MissionInfo | None:
+    row = db.session.execute(select(Mission.name, Mission.guid).filter_by(name=name)).first()
+    return MissionInfo(row.name, row.guid) if row else None
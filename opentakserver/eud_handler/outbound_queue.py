@@ -0,0 +1,168 @@
+import itertools
+import time
+from collections import OrderedDict
+from threading import Condition
+
+DROP_OLDEST = "drop_oldest"
+DROP_SA = "drop_sa"
+DISCONNECT = "disconnect"
+POLICIES = (DROP_OLDEST, DROP_SA, DISCONNECT)
+
+
+class OutboundQueue:
+    """Messages waiting to be written to one EUD's socket.
+
+    Holds up to max_bytes. A position report (a-* types) that's still waiting when a newer one from the same uid
+    arrives is replaced by the newer one since nobody needs the old position. When it's still full, policy decides
+    what happens:
+
+    drop_oldest: Drop the oldest messages until the new one fits
+    drop_sa: Drop position reports first, oldest first, so chat and everything else gets through
+    disconnect: Like drop_oldest, but put() returns False once it's been full for disconnect_seconds
+    """
+
+    def __init__(self, max_bytes: int, policy: str = DROP_SA, disconnect_seconds: float = 30):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown slow client policy {policy}, must be one of {POLICIES}")
+
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.disconnect_seconds = disconnect_seconds
+
+        # key -> (data, is_position). Position reports are keyed by uid so newer ones can replace them in place
+        self.messages: OrderedDict[object, tuple[bytes, bool]] = OrderedDict()
+        self.bytes = 0
+        self.sequence = itertools.count()
+        self.full_since: float | None = None
+        self.closed = False
+        self.condition = Condition()
+        self.stats = {
+            "sent": 0,
+            "sent_bytes": 0,
+            "dropped": 0,
+            "dropped_bytes": 0,
+            "coalesced": 0,
+            "max_queued_bytes": 0,
+            # Each batch is written to the socket at once
+            "batches": 0,
+        }
+
+    def put(self, data: bytes, uid: str = "", cot_type: str = "") -> bool:
+        """Returns False when the EUD should be disconnected"""
+        is_position = bool(uid) and cot_type.startswith("a-")
+        key = ("position", uid) if is_position else next(self.sequence)
+
+        with self.condition:
+            if is_position and key in self.messages:
+                # Keeps the old message's place in line
+                self.bytes -= len(self.messages[key][0])
+                self.messages[key] = (data, True)
+                self.bytes += len(data)
+                self.stats["coalesced"] += 1
+                self.make_room(key)
+                return self.keep_connected()
+
+            self.messages[key] = (data, is_position)
+            self.bytes += len(data)
+            self.make_room(key)
+            self.stats["max_queued_bytes"] = max(self.stats["max_queued_bytes"], self.bytes)
+            self.condition.notify()
+            return self.keep_connected()
+
+    def make_room(self, newest_key):
+        if self.bytes <= self.max_bytes:
+            self.full_since = None
+            return
+
+        if self.full_since is None:
+            self.full_since = time.monotonic()
+
+        if self.policy == DROP_SA:
+            # Including the new one if it's a position report
+            for key, message in list(self.messages.items()):
+                if self.bytes <= self.max_bytes:
+                    return
+                if message[1]:
+                    self.drop(key)
+
+            if newest_key not in self.messages:
+                return
+
+        # Otherwise the new message is kept, even if it's bigger than max_bytes on its own
+        for key in list(self.messages):
+            if self.bytes <= self.max_bytes:
+                return
+            if key != newest_key:
+                self.drop(key)
+
+    def drop(self, key):
+        data, is_position = self.messages.pop(key)
+        self.bytes -= len(data)
+        self.stats["dropped"] += 1
+        self.stats["dropped_bytes"] += len(data)
+
+    def keep_connected(self) -> bool:
+        return not (
+            self.policy == DISCONNECT
+            and self.full_since is not None
+            and time.monotonic() - self.full_since >= self.disconnect_seconds
+        )
+
+    def pop(self) -> bytes | None:
+        with self.condition:
+            if not self.messages:
+                return None
+
+            data, is_position = self.messages.popitem(last=False)[1]
+            self.bytes -= len(data)
+            self.stats["sent"] += 1
+            self.stats["sent_bytes"] += len(data)
+            return data
+
+    def pop_batch(self, max_bytes: int) -> list[bytes]:
+        """Pops the oldest messages up to max_bytes in total, or the oldest one if it's bigger than that"""
+        batch = []
+        with self.condition:
+            size = 0
+            while self.messages:
+                data = next(iter(self.messages.values()))[0]
+                if batch and size + len(data) > max_bytes:
+                    break
+
+                batch.append(self.pop())
+                size += len(data)
+
+            if batch:
+                self.stats["batches"] += 1
+        return batch
+
+    def get_batch(
+        self, max_bytes: int, timeout: float | None = None, linger: float = 0.0
+    ) -> list[bytes]:
+        """Waits up to timeout seconds for a message, then up to linger seconds for max_bytes of them so they can be
+        sent together. Returns an empty list if there weren't any or the queue was closed"""
+        with self.condition:
+            if not self.messages and not self.closed:
+                self.condition.wait(timeout)
+
+            if self.messages and linger:
+                deadline = time.monotonic() + linger
+                while self.bytes < max_bytes and not self.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+
+            return self.pop_batch(max_bytes)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def __len__(self):
+        return len(self.messages)
+
+    def get_stats(self) -> dict:
+        with self.condition:
+            return dict(self.stats, queued=len(self.messages), queued_bytes=self.bytes)
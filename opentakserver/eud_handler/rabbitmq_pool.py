@@ -0,0 +1,315 @@
+import asyncio
+import threading
+import uuid
+from collections import deque
+
+import pika
+from flask import Flask
+from pika.adapters.asyncio_connection import AsyncioConnection
+from pika.channel import Channel
+
+from opentakserver.eud_handler.firehose import FirehoseDemand
+
+
+class PooledChannel:
+    """The parts of the pika Channel API that ClientController uses, backed by a shared PooledConnection.
+
+    Every method is thread safe. Broker operations are queued on the connection and run in order on the event loop,
+    so an EUD never owns an AMQP connection or channel of its own.
+    """
+
+    def __init__(self, connection: "PooledConnection"):
+        self.connection = connection
+        self.consumer_tags = []
+        self.on_close_callbacks = []
+        self.closed = False
+
+    @property
+    def is_open(self) -> bool:
+        return not self.closed and self.connection.is_open
+
+    @property
+    def is_closing(self) -> bool:
+        return False
+
+    @property
+    def is_closed(self) -> bool:
+        return self.closed
+
+    def add_on_close_callback(self, callback):
+        self.on_close_callbacks.append(callback)
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        self.connection.publish(exchange, routing_key, body, properties, mandatory)
+
+    def queue_declare(self, *args, **kwargs):
+        self.connection.schedule("queue_declare", *args, **kwargs)
+
+    def queue_bind(self, *args, **kwargs):
+        self.connection.schedule("queue_bind", *args, **kwargs)
+
+    def queue_unbind(self, *args, **kwargs):
+        self.connection.schedule("queue_unbind", *args, **kwargs)
+
+    def basic_consume(self, queue, on_message_callback, auto_ack=False, **kwargs):
+        consumer_tag = self.connection.consume(queue, on_message_callback, auto_ack)
+        self.consumer_tags.append(consumer_tag)
+        return consumer_tag
+
+    def close(self):
+        self.closed = True
+        for consumer_tag in self.consumer_tags:
+            self.connection.cancel(consumer_tag)
+        self.consumer_tags.clear()
+        self.connection.channels.discard(self)
+
+    def on_pool_closed(self, error):
+        self.closed = True
+        for callback in self.on_close_callbacks:
+            callback(self, error)
+
+
+class PooledConnection:
+    """One AMQP connection and channel shared by many EUDs.
+
+    Publishes and queue operations from worker threads are put in a queue and a single callback is scheduled on the
+    event loop to flush everything that's pending, so a burst of messages costs one wakeup instead of one per
+    message. Deliveries are demultiplexed to each EUD by consumer tag. If the channel or connection drops it is
+    reopened and every consumer is registered again.
+    """
+
+    RECONNECT_DELAY = 5
+
+    def __init__(self, pool: "RabbitMQPool", name: str):
+        self.pool = pool
+        self.name = name
+        self.connection: AsyncioConnection | None = None
+        self.channel: Channel | None = None
+        self.channels: set[PooledChannel] = set()
+
+        # Consumer tag -> (queue, callback, auto_ack)
+        self.consumers = {}
+        self.pending = deque()
+        # How many of the pending operations are publishes, and how many were dropped because there were too many
+        self.pending_publishes = 0
+        self.dropped = 0
+        self.waiting = []
+        self.lock = threading.Lock()
+        self.flush_scheduled = False
+        self.closing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.channel is not None and self.channel.is_open
+
+    def connect(self):
+        self.connection = AsyncioConnection(
+            self.pool.connection_parameters,
+            on_open_callback=self.on_connection_open,
+            on_open_error_callback=self.on_connection_error,
+            on_close_callback=self.on_connection_closed,
+            custom_ioloop=self.pool.loop,
+        )
+
+    def on_connection_open(self, connection: AsyncioConnection):
+        self.pool.logger.debug(f"RabbitMQ pool connection {self.name} is open")
+        connection.channel(on_open_callback=self.on_channel_open)
+
+    def on_connection_error(self, connection: AsyncioConnection, error):
+        self.pool.logger.error(f"RabbitMQ pool connection {self.name} failed: {error}")
+        self.reconnect()
+
+    def on_connection_closed(self, connection: AsyncioConnection, error):
+        self.channel = None
+        if not self.closing:
+            self.pool.logger.error(f"RabbitMQ pool connection {self.name} closed: {error}")
+            self.reconnect()
+
+    def reconnect(self):
+        if not self.closing:
+            self.pool.loop.call_later(self.RECONNECT_DELAY, self.connect)
+
+    def on_channel_open(self, channel: Channel):
+        self.channel = channel
+        self.channel.add_on_close_callback(self.on_channel_closed)
+        if self.pool.firehose:
+            self.channel.add_on_return_callback(self.pool.firehose.on_return)
+
+        for consumer_tag, (queue, callback, auto_ack) in list(self.consumers.items()):
+            self.channel.basic_consume(
+                queue=queue,
+                on_message_callback=callback,
+                auto_ack=auto_ack,
+                consumer_tag=consumer_tag,
+            )
+
+        waiting, self.waiting = self.waiting, []
+        for callback in waiting:
+            callback()
+
+        self.flush()
+
+    def on_channel_closed(self, channel: Channel, error):
+        self.channel = None
+        if self.closing or not self.connection or not self.connection.is_open:
+            return
+
+        # A broker error caused by one EUD closes the channel for everyone so open it back up
+        self.pool.logger.error(f"RabbitMQ pool channel {self.name} closed: {error}, reopening")
+        self.connection.channel(on_open_callback=self.on_channel_open)
+
+    def when_open(self, callback):
+        """Runs callback on the event loop as soon as the channel is open"""
+        if self.is_open:
+            callback()
+        else:
+            self.waiting.append(callback)
+
+    def publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        self.schedule(
+            "basic_publish",
+            exchange=exchange,
+            routing_key=routing_key,
+            body=body,
+            properties=properties,
+            mandatory=mandatory,
+        )
+
+    def schedule(self, method: str, *args, **kwargs):
+        with self.lock:
+            # Only publishes are dropped. Queue operations are needed to set up each EUD when the channel opens and
+            # there's only a few per EUD
+            if method == "basic_publish":
+                if self.pending_publishes >= self.pool.MAX_PENDING_PUBLISHES:
+                    self.dropped += 1
+                    if self.dropped == 1:
+                        self.pool.logger.warning(
+                            f"RabbitMQ pool connection {self.name} has too many pending publishes, dropping new ones"
+                        )
+                    return
+                self.pending_publishes += 1
+
+            self.pending.append((method, args, kwargs))
+            if self.flush_scheduled:
+                return
+            self.flush_scheduled = True
+
+        self.pool.loop.call_soon_threadsafe(self.flush)
+
+    def flush(self):
+        with self.lock:
+            self.flush_scheduled = False
+
+        if not self.is_open:
+            # Everything stays queued until on_channel_open() calls flush() again
+            return
+
+        count = 0
+        publishes = 0
+        while self.pending and self.is_open:
+            method, args, kwargs = self.pending.popleft()
+            if method == "basic_publish":
+                publishes += 1
+            try:
+                if (
+                    method == "basic_consume"
+                    and kwargs["consumer_tag"] in self.channel.consumer_tags
+                ):
+                    # Already registered again by on_channel_open()
+                    continue
+                if (
+                    method == "basic_cancel"
+                    and kwargs["consumer_tag"] not in self.channel.consumer_tags
+                ):
+                    continue
+
+                getattr(self.channel, method)(*args, **kwargs)
+                if method == "basic_publish":
+                    count += 1
+            except BaseException as e:
+                self.pool.logger.error(f"RabbitMQ pool {method} failed: {e}")
+
+        with self.lock:
+            self.pending_publishes -= publishes
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            self.pool.logger.warning(
+                f"RabbitMQ pool connection {self.name} dropped {dropped} publishes"
+            )
+
+        if count:
+            self.pool.published += count
+            self.pool.batches += 1
+
+    def consume(self, queue: str, callback, auto_ack: bool) -> str:
+        consumer_tag = f"ots-{uuid.uuid4().hex}"
+        self.consumers[consumer_tag] = (queue, callback, auto_ack)
+        self.schedule(
+            "basic_consume",
+            queue=queue,
+            on_message_callback=callback,
+            auto_ack=auto_ack,
+            consumer_tag=consumer_tag,
+        )
+        return consumer_tag
+
+    def cancel(self, consumer_tag: str):
+        self.consumers.pop(consumer_tag, None)
+        self.schedule("basic_cancel", consumer_tag=consumer_tag)
+
+    def close(self):
+        self.closing = True
+        for channel in list(self.channels):
+            channel.on_pool_closed("RabbitMQ pool closed")
+
+        if self.connection and not (self.connection.is_closing or self.connection.is_closed):
+            self.connection.close()
+
+
+class RabbitMQPool:
+    """A small pool of AMQP connections shared by every EUD served by one eud_handler process.
+
+    EUDs are spread across the connections by how many channels each one is serving, so the number of broker
+    connections depends on OTS_EUD_HANDLER_RABBITMQ_CONNECTIONS instead of how many EUDs are connected.
+    """
+
+    # Publishes held per connection while it's reconnecting. Newer ones are dropped
+    MAX_PENDING_PUBLISHES = 100000
+
+    def __init__(self, app: Flask, logger, loop: asyncio.AbstractEventLoop, size: int):
+        self.app = app
+        self.logger = logger
+        self.loop = loop
+        self.published = 0
+        self.batches = 0
+        self.firehose = FirehoseDemand.for_app(app)
+
+        self.connection_parameters = pika.ConnectionParameters(
+            host=app.config.get("OTS_RABBITMQ_SERVER_ADDRESS"),
+            credentials=pika.PlainCredentials(
+                app.config.get("OTS_RABBITMQ_USERNAME"), app.config.get("OTS_RABBITMQ_PASSWORD")
+            ),
+        )
+        self.connections = [PooledConnection(self, str(i)) for i in range(size)]
+
+    def start(self):
+        for connection in self.connections:
+            connection.connect()
+
+    def channel(self, on_open_callback):
+        """Calls on_open_callback with a new PooledChannel on the event loop once its connection is open.
+
+        Thread safe.
+        """
+
+        def open_channel():
+            connection = min(self.connections, key=lambda c: len(c.channels))
+            pooled_channel = PooledChannel(connection)
+            connection.channels.add(pooled_channel)
+            connection.when_open(lambda: on_open_callback(pooled_channel))
+
+        self.loop.call_soon_threadsafe(open_channel)
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
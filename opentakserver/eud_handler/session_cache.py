@@ -0,0 +1,80 @@
+import time
+from dataclasses import dataclass
+from threading import Lock
+
+from flask import Flask
+
+
+@dataclass(slots=True)
+class SessionBootstrap:
+    """What ClientController.parse_device_info() looked up and saved when an EUD connected.
+
+    callsign, platform and meshtastic_id are what send_meshtastic_node_info() needs from the EUD.
+    """
+
+    uid: str
+    common_name: str | None
+    # The device, user and team attributes that were saved, see parse_device_info()
+    attributes: tuple
+    group_routing_keys: list[str]
+    eud_json: dict
+    callsign: str | None = None
+    platform: str | None = None
+    meshtastic_id: int | None = None
+
+
+class SessionCache:
+    """Keeps each EUD's SessionBootstrap for a while after it connects so a reconnect can skip most of the queries
+    and writes in parse_device_info().
+
+    Entries are keyed by uid and certificate common name. An EUD that reconnects within seconds with a changed
+    callsign, team or anything else in attributes is set up from scratch. Group changes made in the web UI are
+    applied right away to connected EUDs but an EUD that's offline at the time keeps its old groups until its entry
+    expires. There's one cache per eud_handler process. Use SessionCache.for_app(app).
+    """
+
+    MAX_SIZE = 10000
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        # (uid, common name) -> (bootstrap, time it was saved)
+        self.sessions: dict[tuple[str, str | None], tuple[SessionBootstrap, float]] = {}
+        self.lock = Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @classmethod
+    def for_app(cls, app: Flask) -> "SessionCache | None":
+        """Returns None when OTS_EUD_SESSION_CACHE_SECONDS is 0"""
+        if not app.config.get("OTS_EUD_SESSION_CACHE_SECONDS"):
+            return None
+
+        if "ots_session_cache" not in app.extensions:
+            app.extensions["ots_session_cache"] = cls(
+                app.config.get("OTS_EUD_SESSION_CACHE_SECONDS")
+            )
+        return app.extensions["ots_session_cache"]
+
+    def get(self, uid: str, common_name: str | None) -> SessionBootstrap | None:
+        with self.lock:
+            cached = self.sessions.get((uid, common_name))
+            if cached and time.monotonic() - cached[1] < self.seconds:
+                self.stats["hits"] += 1
+                return cached[0]
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, bootstrap: SessionBootstrap):
+        with self.lock:
+            if len(self.sessions) >= self.MAX_SIZE:
+                self.sessions.clear()
+            self.sessions[(bootstrap.uid, bootstrap.common_name)] = (bootstrap, time.monotonic())
+
+    def forget(self, uid: str):
+        with self.lock:
+            for key in [key for key in self.sessions if key[0] == uid]:
+                del self.sessions[key]
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(self.stats, cached=len(self.sessions))
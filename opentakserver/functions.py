@@ -1,12 +1,16 @@
 import json
 import math
 import re
+import traceback
 from datetime import datetime, timezone
 from xml.etree.ElementTree import Element, SubElement, tostring
 
+import pika
 import pika.channel
 from flask import current_app as app
 
+from opentakserver.extensions import logger
+
 ISO8601_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
 ISO8601_FORMAT_NO_MICROSECONDS = "%Y-%m-%dT%H:%M:%SZ"
 affiliations = [
@@ -21,6 +25,14 @@ affiliations = [
     "faker",
 ]
 
+# The type of the message the web API sends to an EUD's queue when its user's groups change, so the eud_handler
+# reloads the groups it routes that EUD's CoTs to
+GROUPS_CHANGED_MESSAGE_TYPE = "ots.groups_changed"
+# Sent when an EUD subscribes to or unsubscribes from a mission and OTS_EUD_HANDLER_LOCAL_ROUTING is enabled
+SUBSCRIPTIONS_CHANGED_MESSAGE_TYPE = "ots.subscriptions_changed"
+# Sent to the missions exchange when a mission is created or deleted. The body is the mission's name
+MISSIONS_CHANGED_MESSAGE_TYPE = "ots.missions_changed"
+
 # For WTForms BooleanField, the default doesn't include 'False'
 # https://wtforms.readthedocs.io/en/3.1.x/fields/?highlight=false_values#wtforms.fields.BooleanField
 false_values = (False, "False", "false", "")
@@ -205,3 +217,60 @@ def bytes_to_gigabytes(size_bytes: int | None):
     if not size_bytes:
         return 0
     return round(size_bytes / 1024**3, 2)
+
+
+def notify_groups_changed(users: list):
+    notify_euds([eud.uid for user in users for eud in user.euds], GROUPS_CHANGED_MESSAGE_TYPE)
+
+
+def notify_euds(uids: list[str], message_type: str):
+    if not uids:
+        return
+
+    try:
+        rabbit_credentials = pika.PlainCredentials(
+            app.config.get("OTS_RABBITMQ_USERNAME"), app.config.get("OTS_RABBITMQ_PASSWORD")
+        )
+        rabbit_host = app.config.get("OTS_RABBITMQ_SERVER_ADDRESS")
+        rabbit_connection = pika.BlockingConnection(
+            pika.ConnectionParameters(host=rabbit_host, credentials=rabbit_credentials)
+        )
+        channel = rabbit_connection.channel()
+        properties = pika.BasicProperties(
+            type=message_type, expiration=app.config.get("OTS_RABBITMQ_TTL")
+        )
+        for uid in uids:
+            channel.basic_publish(exchange="dms", routing_key=uid, body=b"", properties=properties)
+
+        channel.close()
+        rabbit_connection.close()
+    except BaseException as e:
+        logger.error(f"Failed to send {message_type} to EUDs: {e}")
+        logger.debug(traceback.format_exc())
+
+
+def notify_missions_changed(mission_name: str):
+    """Tells every eud_handler process to forget what it cached about a mission"""
+    try:
+        rabbit_credentials = pika.PlainCredentials(
+            app.config.get("OTS_RABBITMQ_USERNAME"), app.config.get("OTS_RABBITMQ_PASSWORD")
+        )
+        rabbit_host = app.config.get("OTS_RABBITMQ_SERVER_ADDRESS")
+        rabbit_connection = pika.BlockingConnection(
+            pika.ConnectionParameters(host=rabbit_host, credentials=rabbit_credentials)
+        )
+        channel = rabbit_connection.channel()
+        channel.basic_publish(
+            exchange="missions",
+            routing_key="missions",
+            body=mission_name.encode(),
+            properties=pika.BasicProperties(
+                type=MISSIONS_CHANGED_MESSAGE_TYPE, expiration=app.config.get("OTS_RABBITMQ_TTL")
+            ),
+        )
+
+        channel.close()
+        rabbit_connection.close()
+    except BaseException as e:
+        logger.error(f"Failed to send {MISSIONS_CHANGED_MESSAGE_TYPE} for {mission_name}: {e}")
+        logger.debug(traceback.format_exc())
@@ -0,0 +1,43 @@
+"""Added cot_details and cot_dictionaries tables
+
+Revision ID: 20261017_cot_xml_storage
+Revises: 20261017_marker_timestamp
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261017_cot_xml_storage"
+down_revision = "20261017_marker_timestamp"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "cot_details",
+        sa.Column("hash", sa.String(length=64), nullable=False),
+        sa.Column("xml", sa.TEXT(), nullable=False),
+        sa.Column("last_used", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("hash"),
+    )
+    with op.batch_alter_table("cot_details", schema=None) as batch_op:
+        batch_op.create_index(batch_op.f("ix_cot_details_last_used"), ["last_used"], unique=False)
+
+    op.create_table(
+        "cot_dictionaries",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade():
+    op.drop_table("cot_dictionaries")
+    with op.batch_alter_table("cot_details", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_cot_details_last_used"))
+    op.drop_table("cot_details")
@@ -0,0 +1,45 @@
+"""Added current_tracks table
+
+Revision ID: 20261017_current_tracks
+Revises: 20260205_split_duplicate_euds
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261017_current_tracks"
+down_revision = "20260205_split_duplicate_euds"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "current_tracks",
+        sa.Column("uid", sa.String(length=255), nullable=False),
+        sa.Column("device_uid", sa.String(length=255), nullable=True),
+        sa.Column("type", sa.String(length=255), nullable=True),
+        sa.Column("how", sa.String(length=255), nullable=True),
+        sa.Column("callsign", sa.String(length=255), nullable=True),
+        sa.Column("latitude", sa.Float(), nullable=True),
+        sa.Column("longitude", sa.Float(), nullable=True),
+        sa.Column("ce", sa.Float(), nullable=True),
+        sa.Column("hae", sa.Float(), nullable=True),
+        sa.Column("le", sa.Float(), nullable=True),
+        sa.Column("course", sa.Float(), nullable=True),
+        sa.Column("speed", sa.Float(), nullable=True),
+        sa.Column("azimuth", sa.Float(), nullable=True),
+        sa.Column("fov", sa.Float(), nullable=True),
+        sa.Column("location_source", sa.String(length=255), nullable=True),
+        sa.Column("battery", sa.Float(), nullable=True),
+        sa.Column("timestamp", sa.DateTime(), nullable=True),
+        sa.Column("stale", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("uid"),
+    )
+
+
+def downgrade():
+    op.drop_table("current_tracks")
@@ -0,0 +1,78 @@
+"""Added indexes for the hot query columns
+
+Revision ID: 20261017_hot_query_indexes
+Revises: 20261017_current_tracks
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261017_hot_query_indexes"
+down_revision = "20261017_current_tracks"
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, kwargs). Keep in sync with __table_args__ in the models
+INDEXES = [
+    ("ix_cot_uid_start", "cot", ["uid", "start"], {}),
+    ("ix_cot_timestamp", "cot", ["timestamp"], {"postgresql_using": "brin"}),
+    ("ix_cot_stale", "cot", ["stale"], {}),
+    (
+        "ix_cot_mission_name",
+        "cot",
+        ["mission_name"],
+        {
+            "postgresql_where": sa.text("mission_name IS NOT NULL"),
+            "sqlite_where": sa.text("mission_name IS NOT NULL"),
+        },
+    ),
+    (
+        "ix_points_device_uid_timestamp",
+        "points",
+        ["device_uid", "timestamp"],
+        {
+            "postgresql_where": sa.text("device_uid IS NOT NULL"),
+            "sqlite_where": sa.text("device_uid IS NOT NULL"),
+        },
+    ),
+    ("ix_points_timestamp", "points", ["timestamp"], {"postgresql_using": "brin"}),
+    ("ix_points_cot_id", "points", ["cot_id"], {}),
+    ("ix_markers_cot_id", "markers", ["cot_id"], {}),
+    ("ix_markers_point_id", "markers", ["point_id"], {}),
+    (
+        "ix_mission_changes_mission_name_timestamp",
+        "mission_changes",
+        ["mission_name", "timestamp"],
+        {},
+    ),
+    ("ix_mission_uids_mission_name", "mission_uids", ["mission_name"], {}),
+    ("ix_eud_stats_eud_uid_id", "eud_stats", ["eud_uid", "id"], {}),
+]
+
+
+def existing_indexes(table: str) -> set:
+    # MySQL and MariaDB already index foreign key columns with their own names, which is harmless
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        # Build the indexes without locking the tables against writes. CONCURRENTLY can't run in a transaction
+        with op.get_context().autocommit_block():
+            for name, table, columns, kwargs in INDEXES:
+                if name not in existing_indexes(table):
+                    op.create_index(name, table, columns, postgresql_concurrently=True, **kwargs)
+        return
+
+    for name, table, columns, kwargs in INDEXES:
+        if name not in existing_indexes(table):
+            op.create_index(name, table, columns, **kwargs)
+
+
+def downgrade():
+    for name, table, columns, kwargs in reversed(INDEXES):
+        if name in existing_indexes(table):
+            op.drop_index(name, table_name=table)
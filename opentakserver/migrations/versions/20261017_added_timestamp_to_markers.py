@@ -0,0 +1,70 @@
+"""Added timestamp column to markers
+
+Revision ID: 20261017_marker_timestamp
+Revises: 20261017_hot_query_indexes
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+import datetime
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261017_marker_timestamp"
+down_revision = "20261017_hot_query_indexes"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def parse_production_time(production_time: str | None) -> datetime.datetime:
+    for iso8601_format in ("%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%SZ"):
+        try:
+            return datetime.datetime.strptime(production_time, iso8601_format).replace(
+                tzinfo=datetime.timezone.utc
+            )
+        except (TypeError, ValueError):
+            pass
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def upgrade():
+    with op.batch_alter_table("markers", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("timestamp", sa.DateTime(), nullable=True))
+        batch_op.create_index("ix_markers_timestamp", ["timestamp"], unique=False)
+
+    # Copy production_time into the new column
+    markers = sa.table(
+        "markers",
+        sa.column("id", sa.Integer),
+        sa.column("production_time", sa.String),
+        sa.column("timestamp", sa.DateTime),
+    )
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(markers.c.id, markers.c.production_time)
+            .where(markers.c.id > last_id)
+            .order_by(markers.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+
+        for marker_id, production_time in rows:
+            connection.execute(
+                sa.update(markers)
+                .where(markers.c.id == marker_id)
+                .values(timestamp=parse_production_time(production_time))
+            )
+        last_id = rows[-1][0]
+
+
+def downgrade():
+    with op.batch_alter_table("markers", schema=None) as batch_op:
+        batch_op.drop_index("ix_markers_timestamp")
+        batch_op.drop_column("timestamp")
@@ -1,14 +1,30 @@
 from datetime import datetime
 
-from sqlalchemy import JSON, TEXT, DateTime, ForeignKey, Integer, String
+from sqlalchemy import JSON, DateTime, ForeignKey, Index, Integer, String, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+from opentakserver.cot_storage import CoTXml
 from opentakserver.extensions import db
 from opentakserver.functions import iso8601_string_from_datetime
 
 
 class CoT(db.Model):
     __tablename__ = "cot"
+    __table_args__ = (
+        # /Marti/api/cot/xml/<uid> and its /all variant, which also filters on start
+        Index("ix_cot_uid_start", "uid", "start"),
+        # delete_old_data(). Rows are inserted in time order so a BRIN index is enough on PostgreSQL
+        Index("ix_cot_timestamp", "timestamp", postgresql_using="brin"),
+        # /api/map_state only wants CoTs that aren't stale yet
+        Index("ix_cot_stale", "stale"),
+        # Only data sync CoTs have a mission
+        Index(
+            "ix_cot_mission_name",
+            "mission_name",
+            postgresql_where=text("mission_name IS NOT NULL"),
+            sqlite_where=text("mission_name IS NOT NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     how: Mapped[str] = mapped_column(String(255), nullable=True)
@@ -23,7 +39,8 @@ class CoT(db.Model):
     timestamp: Mapped[datetime] = mapped_column(DateTime)
     start: Mapped[datetime] = mapped_column(DateTime)
     stale: Mapped[datetime] = mapped_column(DateTime)
-    xml: Mapped[str] = mapped_column(TEXT)
+    # Can be stored compressed or without its <detail>, reading it always gives the XML
+    xml: Mapped[str] = mapped_column(CoTXml)
     mission_name: Mapped[str] = mapped_column(
         String(255), ForeignKey("missions.name"), nullable=True
     )
@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from sqlalchemy import TEXT, DateTime, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from opentakserver.extensions import db
+
+
+class CoTDetail(db.Model):
+    """A <detail> element shared by CoTs that only store a reference to it. See opentakserver.cot_storage"""
+
+    __tablename__ = "cot_details"
+
+    # sha256 of xml
+    hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    xml: Mapped[str] = mapped_column(TEXT)
+    # The newest CoT timestamp that references it, give or take cot_storage.LAST_USED_INTERVAL
+    last_used: Mapped[datetime] = mapped_column(DateTime, index=True)
@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, LargeBinary
+from sqlalchemy.orm import Mapped, mapped_column
+
+from opentakserver.extensions import db
+
+
+class CoTDictionary(db.Model):
+    """A zstd dictionary made by `flask ots train-cot-dictionary`. See opentakserver.cot_storage"""
+
+    __tablename__ = "cot_dictionaries"
+
+    # The dictionary ID in the header of every zstd frame compressed with it
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+    created: Mapped[datetime] = mapped_column(DateTime)
@@ -0,0 +1,90 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Float, String
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Mapped, Session, mapped_column
+
+from opentakserver.extensions import db
+from opentakserver.functions import iso8601_string_from_datetime
+
+
+class CurrentTrack(db.Model):
+    """The latest position of every uid. cot_parser upserts this for every point so things that only need
+    the current state, like the web map, don't have to search the points table."""
+
+    __tablename__ = "current_tracks"
+
+    uid: Mapped[str] = mapped_column(String(255), primary_key=True)
+    # Not a foreign key so tracks from other servers and EUDs that haven't connected yet can still be saved
+    device_uid: Mapped[str] = mapped_column(String(255), nullable=True)
+    type: Mapped[str] = mapped_column(String(255), nullable=True)
+    how: Mapped[str] = mapped_column(String(255), nullable=True)
+    callsign: Mapped[str] = mapped_column(String(255), nullable=True)
+    latitude: Mapped[float] = mapped_column(Float, nullable=True)
+    longitude: Mapped[float] = mapped_column(Float, nullable=True)
+    ce: Mapped[float] = mapped_column(Float, nullable=True)
+    hae: Mapped[float] = mapped_column(Float, nullable=True)
+    le: Mapped[float] = mapped_column(Float, nullable=True)
+    course: Mapped[float] = mapped_column(Float, nullable=True)
+    speed: Mapped[float] = mapped_column(Float, nullable=True)
+    azimuth: Mapped[float] = mapped_column(Float, nullable=True)
+    fov: Mapped[float] = mapped_column(Float, nullable=True)
+    location_source: Mapped[str] = mapped_column(String(255), nullable=True)
+    battery: Mapped[float] = mapped_column(Float, nullable=True)
+    timestamp: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    stale: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+    def to_json(self):
+        return {
+            "uid": self.uid,
+            "device_uid": self.device_uid,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "ce": self.ce,
+            "hae": self.hae,
+            "le": self.le,
+            "course": self.course,
+            "speed": self.speed,
+            "azimuth": self.azimuth,
+            "fov": self.fov,
+            "location_source": self.location_source,
+            "battery": self.battery,
+            "timestamp": iso8601_string_from_datetime(self.timestamp) if self.timestamp else None,
+            "stale": iso8601_string_from_datetime(self.stale) if self.stale else None,
+            "how": self.how,
+            "type": self.type,
+            "callsign": self.callsign,
+        }
+
+
+def upsert_current_tracks(session: Session, tracks: list[dict]):
+    """Inserts or updates the current_tracks rows in a single statement.
+
+    On PostgreSQL and SQLite a row is only replaced by one with the same or a newer timestamp, so a delayed
+    message can't move a track back to an old position.
+    """
+    # One statement can't update the same row twice, keep the newest position for each uid
+    latest = {}
+    for track in tracks:
+        if track["uid"] not in latest or track["timestamp"] >= latest[track["uid"]]["timestamp"]:
+            latest[track["uid"]] = track
+    tracks = list(latest.values())
+    if not tracks:
+        return
+
+    dialect = session.get_bind().dialect.name
+    if dialect == "mysql":
+        statement = mysql.insert(CurrentTrack).values(tracks)
+        columns = {key: statement.inserted[key] for key in tracks[0] if key != "uid"}
+        statement = statement.on_duplicate_key_update(**columns)
+    else:
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = insert(CurrentTrack).values(tracks)
+        columns = {key: statement.excluded[key] for key in tracks[0] if key != "uid"}
+        statement = statement.on_conflict_do_update(
+            index_elements=[CurrentTrack.uid],
+            set_=columns,
+            where=CurrentTrack.timestamp <= statement.excluded.timestamp,
+        )
+
+    session.execute(statement)
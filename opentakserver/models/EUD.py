@@ -7,6 +7,7 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 from opentakserver.extensions import db
 from opentakserver.functions import iso8601_string_from_datetime
 from opentakserver.models.Chatrooms import Chatroom
+from opentakserver.models.CurrentTrack import CurrentTrack
 
 # Leave these imports, they're needed when making new DB migrations
 from opentakserver.models.Team import Team
@@ -51,6 +52,12 @@ class EUD(db.Model):
     owned_missions = relationship("Mission", back_populates="owner")
     stats = relationship("EUDStats", back_populates="eud")
     profiles = relationship("DeviceProfiles", back_populates="eud")
+    current_track = relationship(
+        "CurrentTrack",
+        primaryjoin="EUD.uid == foreign(CurrentTrack.uid)",
+        viewonly=True,
+        uselist=False,
+    )
 
     def serialize(self):
         return {
@@ -85,7 +92,7 @@ class EUD(db.Model):
             ),
             "last_status": self.last_status,
             "username": self.user.username if self.user else None,
-            "last_point": None,  # Setting to None for now since it can cause a huge overhead when an EUD has lots of points in the DB
+            "last_point": self.current_track.to_json() if self.current_track else None,
             "team": self.team.name if self.team else None,
             "team_color": self.team.get_team_color() if self.team else None,
             "team_role": self.team_role,
@@ -1,6 +1,7 @@
 from dataclasses import dataclass
+from datetime import datetime
 
-from sqlalchemy import Boolean, ForeignKey, Integer, String
+from sqlalchemy import Boolean, DateTime, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from opentakserver.extensions import db
@@ -10,6 +11,13 @@ from opentakserver.functions import iso8601_string_from_datetime
 @dataclass
 class Marker(db.Model):
     __tablename__ = "markers"
+    # /api/map_state joins markers to their CoTs, and deleting a CoT or point cascades to its marker
+    __table_args__ = (
+        Index("ix_markers_cot_id", "cot_id"),
+        Index("ix_markers_point_id", "point_id"),
+        # delete_old_data()
+        Index("ix_markers_timestamp", "timestamp"),
+    )
 
     # type = a-[a-z]-[A-Z]
     # how = h-g-i-g-o
@@ -26,6 +34,8 @@ class Marker(db.Model):
     iconset_path: Mapped[str] = mapped_column(String(255), nullable=True)
     parent_callsign: Mapped[str] = mapped_column(String(255), nullable=True)
     production_time: Mapped[str] = mapped_column(String(255), nullable=True)
+    # production_time as a datetime so it can be compared in SQL
+    timestamp: Mapped[datetime] = mapped_column(DateTime, nullable=True)
     relation: Mapped[str] = mapped_column(String(255), nullable=True)
     relation_type: Mapped[str] = mapped_column(String(255), nullable=True)
     location_source: Mapped[str] = mapped_column(String(255), nullable=True)
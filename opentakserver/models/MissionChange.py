@@ -3,10 +3,10 @@ import uuid
 from dataclasses import dataclass
 from xml.etree.ElementTree import Element, SubElement
 
-from bs4 import BeautifulSoup
-from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String
+from sqlalchemy import Boolean, DateTime, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+from opentakserver.cot_event import CoTEvent
 from opentakserver.extensions import db, logger
 from opentakserver.functions import iso8601_string_from_datetime
 from opentakserver.models.Mission import Mission
@@ -17,6 +17,10 @@ from opentakserver.models.MissionUID import MissionUID
 @dataclass
 class MissionChange(db.Model):
     __tablename__ = "mission_changes"
+    # /Marti/api/missions/<name>/changes
+    __table_args__ = (
+        Index("ix_mission_changes_mission_name_timestamp", "mission_name", "timestamp"),
+    )
 
     CREATE_MISSION = "CREATE_MISSION"
     DELETE_MISSION = "DELETE_MISSION"
@@ -83,14 +87,14 @@ def generate_mission_change_cot(
     mission: Mission,
     mission_change: MissionChange,
     content: MissionContent | None = None,
-    cot_event: BeautifulSoup | None = None,
+    cot_event: CoTEvent | None = None,
     mission_uid: MissionUID = None,
     cot_type: str = "t-x-m-c",
 ) -> Element:
     if content:
         uid = content.uid
     elif cot_event:
-        uid = cot_event.attrs["uid"]
+        uid = cot_event.uid
     else:
         uid = str(uuid.uuid4())
 
@@ -145,25 +149,23 @@ def generate_mission_change_cot(
         SubElement(mission_change_element, "contentUid").text = mission_change.content_uid
 
     if cot_event:
-        details_tag = SubElement(
-            mission_change_element, "details", {"type": cot_event.attrs["type"]}
-        )
+        details_tag = SubElement(mission_change_element, "details", {"type": cot_event.type})
 
-        point = cot_event.find("point")
+        point = cot_event.point
         color = cot_event.find("color")
-        callsign = cot_event.find("contact")
+        callsign = cot_event.contact
         icon = cot_event.find("usericon")
 
-        if color and "argb" in color.attrs:
-            details_tag.set("color", color.attrs["argb"])
-        if color and "value" in color.attrs:
-            details_tag.set("color", color.attrs["value"])
-        if callsign:
-            details_tag.set("callsign", callsign.attrs["callsign"])
-        if icon:
-            details_tag.set("iconsetPath", icon.attrs["iconsetpath"])
+        if color is not None and "argb" in color.attrib:
+            details_tag.set("color", color.attrib["argb"])
+        if color is not None and "value" in color.attrib:
+            details_tag.set("color", color.attrib["value"])
+        if callsign is not None:
+            details_tag.set("callsign", callsign["callsign"])
+        if icon is not None:
+            details_tag.set("iconsetPath", icon.attrib["iconsetpath"])
 
-        SubElement(details_tag, "location", {"lon": point.attrs["lon"], "lat": point.attrs["lat"]})
+        SubElement(details_tag, "location", {"lon": point["lon"], "lat": point["lat"]})
         # SubElement(mission_change_element, "contentUid").text = cot_event.attrs['uid']
 
     if mission_uid:
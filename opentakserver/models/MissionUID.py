@@ -1,7 +1,7 @@
 import datetime
 from dataclasses import dataclass
 
-from sqlalchemy import DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy import DateTime, Float, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from opentakserver.extensions import db
@@ -11,6 +11,7 @@ from opentakserver.functions import iso8601_string_from_datetime
 @dataclass
 class MissionUID(db.Model):
     __tablename__ = "mission_uids"
+    __table_args__ = (Index("ix_mission_uids_mission_name", "mission_name"),)
 
     uid: Mapped[str] = mapped_column(String(255), primary_key=True)  # Equals the original CoT's UID
     mission_name: Mapped[str] = mapped_column(
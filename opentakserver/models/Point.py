@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy import DateTime, Float, ForeignKey, Index, Integer, String, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from opentakserver.extensions import db
@@ -11,6 +11,20 @@ from opentakserver.functions import iso8601_string_from_datetime
 
 class Point(db.Model):
     __tablename__ = "points"
+    __table_args__ = (
+        # /Marti/ExportMissionKML. Only EUDs' own positions have a device_uid
+        Index(
+            "ix_points_device_uid_timestamp",
+            "device_uid",
+            "timestamp",
+            postgresql_where=text("device_uid IS NOT NULL"),
+            sqlite_where=text("device_uid IS NOT NULL"),
+        ),
+        # delete_old_data(). Rows are inserted in time order so a BRIN index is enough on PostgreSQL
+        Index("ix_points_timestamp", "timestamp", postgresql_using="brin"),
+        # Deleting a CoT cascades to its point
+        Index("ix_points_cot_id", "cot_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     uid: Mapped[str] = mapped_column(String(255))
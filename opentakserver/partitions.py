@@ -0,0 +1,285 @@
+import datetime
+import re
+from typing import Callable
+
+from sqlalchemy import Table, delete, inspect, select, sql, text, update
+from sqlalchemy.orm import Session
+
+from opentakserver.extensions import db, logger
+from opentakserver.models.CoT import CoT
+from opentakserver.models.Point import Point
+
+# Tables that can be stored as PostgreSQL range partitions on their timestamp column
+PARTITIONED_TABLES = {"cot": CoT.__table__, "points": Point.__table__}
+INTERVALS = {"day": datetime.timedelta(days=1), "week": datetime.timedelta(weeks=1)}
+
+BOUND_REGEX = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def is_partitioned(session: Session, table: str) -> bool:
+    if session.get_bind().dialect.name != "postgresql":
+        return False
+
+    return (
+        session.execute(
+            text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+            {"table": table},
+        ).first()
+        is not None
+    )
+
+
+def get_partitions(
+    session: Session, table: str
+) -> list[tuple[str, datetime.datetime | None, datetime.datetime | None]]:
+    """Returns (name, start, end) for each of table's partitions, oldest first. end is exclusive. The default
+    partition has None for start and end
+    """
+    partitions = []
+    for name, bound in session.execute(
+        text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(:table)"
+        ),
+        {"table": table},
+    ):
+        match = BOUND_REGEX.search(bound)
+        if match:
+            partitions.append(
+                (
+                    name,
+                    datetime.datetime.fromisoformat(match.group(1)),
+                    datetime.datetime.fromisoformat(match.group(2)),
+                )
+            )
+        else:
+            partitions.append((name, None, None))
+
+    return sorted(partitions, key=lambda p: p[1] or datetime.datetime.max)
+
+
+def partition_start(timestamp: datetime.datetime, interval: str) -> datetime.datetime:
+    start = datetime.datetime.combine(timestamp.date(), datetime.time())
+    if interval == "week":
+        start -= datetime.timedelta(days=start.weekday())
+    return start
+
+
+def create_partition(
+    session: Session, table: str, start: datetime.datetime, end: datetime.datetime
+):
+    """Rows for the new partition that already landed in the default partition are moved into it, otherwise
+    PostgreSQL refuses to attach it
+    """
+    name = f"{table}_p{start:%Y%m%d}"
+    default = f"{table}_default"
+    bounds = {"start": start, "end": end}
+
+    session.execute(
+        text(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    )
+    session.execute(
+        text(
+            f'WITH moved AS (DELETE FROM "{default}" '
+            'WHERE "timestamp" >= :start AND "timestamp" < :end RETURNING *) '
+            f'INSERT INTO "{name}" SELECT * FROM moved'
+        ),
+        bounds,
+    )
+    # Bounds are literals in the DDL, binding them isn't allowed
+    session.execute(
+        text(
+            f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" '
+            f"FOR VALUES FROM ('{start.isoformat(' ')}') TO ('{end.isoformat(' ')}')"
+        )
+    )
+    logger.info(f"Created partition {name}")
+
+
+def create_partitions(
+    session: Session, table: str, interval: str, ahead: int, since: datetime.datetime | None = None
+):
+    """Makes sure there are partitions from since, or the current one, through ahead intervals from now. The caller
+    commits
+    """
+    step = INTERVALS[interval]
+    existing = [(start, end) for name, start, end in get_partitions(session, table) if start]
+
+    start = partition_start(since or datetime.datetime.now(), interval)
+    last = partition_start(datetime.datetime.now(), interval) + step * ahead
+    while start <= last:
+        end = start + step
+        # Skip ranges overlapping an existing partition, like one made with a different interval
+        if not any(start < e and s < end for s, e in existing):
+            create_partition(session, table, start, end)
+        start = end
+
+
+def partition_tables(session: Session, interval: str, since: datetime.datetime, ahead: int):
+    """Converts the cot and points tables to partitioned tables. Expects OpenTAKServer to be stopped.
+
+    Partitioned tables can't be referenced by foreign keys that don't include the partition column, so the foreign
+    keys pointing at cot and points are dropped and delete_expired() does their ON DELETE instead. Rows older than
+    since go into the default partition, to be deleted in batches by the next delete_old_data() run.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        raise ValueError("Partitioning requires PostgreSQL")
+
+    for table in PARTITIONED_TABLES:
+        if is_partitioned(session, table):
+            logger.warning(f"{table} is already partitioned")
+            continue
+
+        logger.info(f"Partitioning {table}...")
+        inspector = inspect(session.connection())
+        indexes = [index["name"] for index in inspector.get_indexes(table)]
+        indexes.append(inspector.get_pk_constraint(table)["name"])
+        for other in inspector.get_table_names():
+            for foreign_key in inspector.get_foreign_keys(other):
+                if foreign_key["referred_table"] == table:
+                    session.execute(
+                        text(f'ALTER TABLE "{other}" DROP CONSTRAINT "{foreign_key["name"]}"')
+                    )
+
+        old = f"{table}_unpartitioned"
+        session.execute(text(f'ALTER TABLE "{table}" RENAME TO "{old}"'))
+        # Index names are unique per schema
+        for index in indexes:
+            session.execute(text(f'ALTER INDEX "{index}" RENAME TO "{index}_old"'))
+
+        session.execute(
+            text(
+                f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING ALL EXCLUDING INDEXES) '
+                'PARTITION BY RANGE ("timestamp")'
+            )
+        )
+        # The partition column has to be part of the primary key
+        session.execute(text(f'ALTER TABLE "{table}" ADD PRIMARY KEY (id, "timestamp")'))
+        for index in PARTITIONED_TABLES[table].indexes:
+            index.create(session.connection())
+
+        for foreign_key in inspector.get_foreign_keys(old):
+            if foreign_key["referred_table"] in PARTITIONED_TABLES:
+                continue
+            columns = ", ".join(foreign_key["constrained_columns"])
+            referred_columns = ", ".join(foreign_key["referred_columns"])
+            on_delete = foreign_key["options"].get("ondelete")
+            session.execute(
+                text(
+                    f'ALTER TABLE "{table}" ADD CONSTRAINT "{foreign_key["name"]}" FOREIGN KEY ({columns}) '
+                    f'REFERENCES "{foreign_key["referred_table"]}" ({referred_columns})'
+                    + (f" ON DELETE {on_delete}" if on_delete else "")
+                )
+            )
+
+        session.execute(text(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT'))
+        create_partitions(session, table, interval, ahead, since)
+
+        session.execute(text(f'INSERT INTO "{table}" SELECT * FROM "{old}"'))
+        # Keep the serial sequence when the old table is dropped, an identity column got a new one from LIKE
+        sequence = session.execute(
+            text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": old}
+        ).scalar()
+        if sequence and session.execute(
+            text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table}
+        ).scalar() in (None, sequence):
+            session.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY "{table}".id'))
+        session.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence(:table, 'id'), "
+                f'(SELECT COALESCE(MAX(id), 0) + 1 FROM "{table}"), false)'
+            ),
+            {"table": table},
+        )
+        session.execute(text(f'DROP TABLE "{old}"'))
+        session.commit()
+        logger.info(f"Partitioned {table}")
+
+
+def delete_dependents(session: Session, table: str, ids):
+    """Does the ON DELETE of the foreign keys that were dropped when table was partitioned. ids is a list or a
+    select of the ids being deleted
+    """
+    for other in db.metadata.sorted_tables:
+        for foreign_key in other.foreign_keys:
+            if foreign_key.column.table.name != table or foreign_key.column.name != "id":
+                continue
+            column = foreign_key.parent
+            if foreign_key.ondelete == "CASCADE" or not column.nullable:
+                session.execute(delete(other).where(column.in_(ids)))
+            else:
+                session.execute(update(other).where(column.in_(ids)).values({column.name: None}))
+
+
+def delete_expired(
+    session: Session,
+    table: Table,
+    cutoff: datetime.datetime,
+    batch_size: int,
+    on_batch: Callable[[int], None] | None = None,
+    max_id: int | None = None,
+) -> int:
+    """Deletes table's rows with a timestamp <= cutoff. Partitions that have expired entirely are dropped, the rest
+    is deleted batch_size rows at a time with a commit after each batch so no lock is held for long. Returns how many
+    rows were deleted in batches, on_batch is called with the size of each batch.
+
+    With max_id, only rows up to that id are deleted, like the ones archive_expired() has copied.
+    """
+    key = next(iter(table.primary_key.columns))
+    condition = table.c.timestamp <= cutoff
+    if max_id is not None:
+        condition = condition & (key <= max_id)
+    deleted = 0
+    partitioned = is_partitioned(session, table.name)
+    if partitioned:
+        for name, start, end in get_partitions(session, table.name):
+            if end is None or end > cutoff:
+                continue
+
+            partition = sql.table(name, sql.column("id"))
+            if (
+                max_id is not None
+                and session.execute(
+                    select(partition.c.id).where(partition.c.id > max_id).limit(1)
+                ).first()
+            ):
+                # Rows arrived after it was archived, they're archived and deleted next time
+                continue
+
+            delete_dependents(session, table.name, select(partition.c.id))
+            session.execute(text(f'DROP TABLE "{name}"'))
+            session.commit()
+            logger.info(f"Dropped partition {name}")
+
+    while True:
+        ids = session.execute(select(key).where(condition).limit(batch_size)).scalars().all()
+        if not ids:
+            break
+
+        if partitioned:
+            delete_dependents(session, table.name, ids)
+        session.execute(delete(table).where(key.in_(ids)))
+        session.commit()
+        deleted += len(ids)
+        if on_batch:
+            on_batch(len(ids))
+        if len(ids) < batch_size:
+            break
+
+    return deleted
+
+
+def create_future_partitions(session: Session, interval: str, ahead: int):
+    """Only does anything for tables that were converted with `flask ots partition-history`"""
+    if session.get_bind().dialect.name != "postgresql":
+        logger.warning("OTS_HISTORY_PARTITION_INTERVAL only applies to PostgreSQL, ignoring it")
+        return
+
+    for table in PARTITIONED_TABLES:
+        if is_partitioned(session, table):
+            create_partitions(session, table, interval, ahead)
+        else:
+            logger.warning(
+                f"{table} isn't partitioned, convert it with `flask ots partition-history`"
+            )
+    session.commit()
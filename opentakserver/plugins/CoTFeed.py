@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import queue
+import time
+import traceback
+from threading import Lock, Thread
+from typing import Callable
+
+import pika
+from flask import Flask
+
+from opentakserver import cot_envelope
+from opentakserver.cot_event import CoTEvent
+from opentakserver.extensions import logger
+
+
+class CoTSubscription:
+    """One plugin's CoTs. They wait in a queue of up to max_queued and callback is called with each one from a thread
+    of its own, so a slow plugin only holds up itself. CoTs that arrive while the queue is full are dropped.
+    """
+
+    def __init__(
+        self, name: str, callback: Callable[[CoTEvent, str | None], None], max_queued: int
+    ):
+        self.name = name
+        self.callback = callback
+        self.queue = queue.Queue(max_queued)
+        self.stats = {"delivered": 0, "dropped": 0, "errors": 0}
+        self.thread = Thread(target=self.run, name=f"cot-feed-{name}", daemon=True)
+        self.thread.start()
+
+    def put(self, event: CoTEvent, sender_uid: str | None):
+        try:
+            self.queue.put_nowait((event, sender_uid))
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+
+            try:
+                self.callback(*item)
+                self.stats["delivered"] += 1
+            except BaseException as e:
+                self.stats["errors"] += 1
+                logger.error(f"{self.name} failed to handle a CoT: {e}")
+                logger.debug(traceback.format_exc())
+
+    def stop(self):
+        # Wait for room rather than dropping the sentinel
+        self.queue.put(None)
+
+
+class CoTFeed:
+    """Every CoT on the firehose exchange, for plugins running in this process.
+
+    Only one queue is bound to the firehose for all of the plugins, and only while at least one of them is
+    subscribed, since eud_handler stops publishing to the firehose when nothing is bound to it. Each message is
+    unpacked and parsed once and the same CoTEvent is handed to every subscription, so plugins must not modify it.
+    """
+
+    RECONNECT_DELAY = 5
+
+    def __init__(self, app: Flask):
+        self.app = app
+        self.subscriptions: dict[str, CoTSubscription] = {}
+        self.lock = Lock()
+        self.rabbit_connection: pika.BlockingConnection | None = None
+        self.rabbit_channel = None
+        self.thread: Thread | None = None
+        self.stats = {"received": 0, "failed": 0}
+
+    def subscribe(
+        self,
+        name: str,
+        callback: Callable[[CoTEvent, str | None], None],
+        max_queued: int | None = None,
+    ):
+        """callback is called with (event, sender_uid). Subscribing again with the same name replaces the callback"""
+        subscription = CoTSubscription(
+            name, callback, max_queued or self.app.config.get("OTS_PLUGIN_COT_QUEUE_SIZE")
+        )
+        with self.lock:
+            old = self.subscriptions.get(name)
+            self.subscriptions[name] = subscription
+            if not self.thread:
+                self.thread = Thread(target=self.run, name="cot-feed", daemon=True)
+                self.thread.start()
+
+        if old:
+            old.stop()
+
+    def unsubscribe(self, name: str):
+        with self.lock:
+            subscription = self.subscriptions.pop(name, None)
+            if not self.subscriptions and self.rabbit_connection:
+                # The queue is auto delete so the firehose goes idle again once it's gone
+                self.rabbit_connection.add_callback_threadsafe(self.rabbit_channel.stop_consuming)
+
+        if subscription:
+            subscription.stop()
+
+    def run(self):
+        while True:
+            with self.lock:
+                if not self.subscriptions:
+                    self.thread = None
+                    return
+
+            try:
+                self.consume()
+            except BaseException as e:
+                logger.error(f"Plugin CoT feed failed: {e}, reconnecting")
+                logger.debug(traceback.format_exc())
+                time.sleep(self.RECONNECT_DELAY)
+
+    def consume(self):
+        rabbit_credentials = pika.PlainCredentials(
+            self.app.config.get("OTS_RABBITMQ_USERNAME"),
+            self.app.config.get("OTS_RABBITMQ_PASSWORD"),
+        )
+        rabbit_host = self.app.config.get("OTS_RABBITMQ_SERVER_ADDRESS")
+        connection = pika.BlockingConnection(
+            pika.ConnectionParameters(host=rabbit_host, credentials=rabbit_credentials)
+        )
+        try:
+            channel = connection.channel()
+            result = channel.queue_declare(queue="", exclusive=True, auto_delete=True)
+            channel.queue_bind(exchange="firehose", queue=result.method.queue)
+            channel.basic_consume(
+                queue=result.method.queue, on_message_callback=self.on_message, auto_ack=True
+            )
+
+            with self.lock:
+                if not self.subscriptions:
+                    return
+                self.rabbit_connection = connection
+                self.rabbit_channel = channel
+
+            channel.start_consuming()
+        finally:
+            with self.lock:
+                self.rabbit_connection = None
+                self.rabbit_channel = None
+            if connection.is_open:
+                connection.close()
+
+    def on_message(self, channel, method, properties, body: bytes):
+        self.stats["received"] += 1
+        try:
+            envelope = cot_envelope.unpack(body)
+            event = CoTEvent.from_xml(envelope.xml)
+        except BaseException as e:
+            self.stats["failed"] += 1
+            logger.debug(f"Plugin CoT feed failed to parse a CoT: {e}")
+            return
+
+        sender_uid = envelope.sender_uid or None
+        with self.lock:
+            subscriptions = list(self.subscriptions.values())
+        for subscription in subscriptions:
+            subscription.put(event, sender_uid)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            subscriptions = {name: dict(s.stats) for name, s in self.subscriptions.items()}
+        return dict(self.stats, subscriptions=subscriptions)
@@ -5,7 +5,7 @@ import selectors
 import subprocess
 import sys
 import traceback
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Callable
 
 import sqlalchemy.exc
 from flask import Flask
@@ -16,8 +16,10 @@ from sqlalchemy import update
 from werkzeug.utils import secure_filename
 
 from opentakserver.blueprints.ots_socketio import administrator_only
+from opentakserver.cot_event import CoTEvent
 from opentakserver.extensions import db, logger, socketio
 from opentakserver.models.Plugins import Plugins
+from opentakserver.plugins.CoTFeed import CoTFeed
 from opentakserver.plugins.Plugin import Plugin
 
 if TYPE_CHECKING:
@@ -33,6 +35,7 @@ class PluginManager:
         self._group = group
         self.plugins: dict[str, Plugin] = {}
         self._app = app
+        self.cot_feed = CoTFeed(app)
 
     def load_plugins(self) -> None:
         plugin_entrypoints = self.get_plugin_entry_points()
@@ -79,12 +82,31 @@ class PluginManager:
                 logger.error(f"Failed to load plugin: {e}")
                 logger.error(traceback.format_exc())
 
+    def subscribe_cot(
+        self,
+        plugin: Plugin,
+        callback: Callable[[CoTEvent, str | None], None],
+        max_queued: int | None = None,
+    ) -> None:
+        """Calls callback with (event, sender_uid) for every CoT on the firehose, parsed once for all plugins.
+
+        Plugins usually call this from activate(). Calls come from a thread for this plugin, CoTs that arrive while
+        max_queued (OTS_PLUGIN_COT_QUEUE_SIZE by default) are waiting are dropped. The CoTEvent is shared with
+        other plugins, don't modify it.
+        """
+        self.cot_feed.subscribe(plugin.distro.lower(), callback, max_queued)
+
+    def unsubscribe_cot(self, plugin: Plugin) -> None:
+        self.cot_feed.unsubscribe(plugin.distro.lower())
+
     def stop_plugins(self):
         for name, plugin in self.plugins.items():
+            self.unsubscribe_cot(plugin)
             plugin.stop()
 
     def disable_plugin(self, plugin_distro: str):
         plugin = self.plugins[plugin_distro]
+        self.unsubscribe_cot(plugin)
         plugin.stop()
 
         db.session.execute(
@@ -0,0 +1,85 @@
+import atexit
+import json
+import os
+import time
+
+from opentakserver.extensions import logger
+
+# The snapshots this process has written, removed when it exits
+_written: set[str] = set()
+
+
+def stats_folder(data_folder: str) -> str:
+    return os.path.join(data_folder, "stats")
+
+
+def write_stats(data_folder: str, component: str, stats: dict):
+    """Saves a snapshot of this process's counters so the web process can show them in /api/status.
+
+    Each process writes its own file, named after the component and PID, so no locking is needed. The file is removed
+    when the process exits, and read_stats removes the ones left by processes that were killed.
+    """
+    folder = stats_folder(data_folder)
+    path = os.path.join(folder, f"{component}-{os.getpid()}.json")
+    try:
+        os.makedirs(folder, exist_ok=True)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({"pid": os.getpid(), "timestamp": time.time(), **stats}, f)
+        os.replace(f"{path}.tmp", path)
+        if path not in _written:
+            _written.add(path)
+            atexit.register(_remove_stats, path)
+    except OSError as e:
+        logger.warning(f"Failed to write {component} stats: {e}")
+
+
+def _remove_stats(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def read_stats(data_folder: str, max_age: int = 60) -> dict[str, list[dict]]:
+    """Reads every process's stats snapshot, grouped by component. Snapshots older than max_age seconds are from
+    processes that have exited and are deleted."""
+    folder = stats_folder(data_folder)
+    if not os.path.isdir(folder):
+        return {}
+
+    now = time.time()
+    components = {}
+    for filename in sorted(os.listdir(folder)):
+        if not filename.endswith(".json"):
+            continue
+
+        try:
+            with open(os.path.join(folder, filename)) as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            continue
+
+        if now - stats.get("timestamp", 0) > max_age:
+            _remove_stats(os.path.join(folder, filename))
+            continue
+
+        component = filename.rsplit("-", 1)[0]
+        components.setdefault(component, []).append(stats)
+
+    return components
+
+
+def total_stats(components: dict[str, list[dict]]) -> dict[str, dict]:
+    """Adds up each component's numeric counters across all of its processes, like the eud_handler workers"""
+    totals = {}
+    for component, processes in components.items():
+        component_totals = {"processes": len(processes)}
+        for stats in processes:
+            for key, value in stats.items():
+                if key in ("pid", "timestamp", "port") or isinstance(value, bool):
+                    continue
+                if isinstance(value, (int, float)):
+                    component_totals[key] = component_totals.get(key, 0) + value
+        totals[component] = component_totals
+
+    return totals
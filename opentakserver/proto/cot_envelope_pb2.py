@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: cot_envelope.proto
+"""Generated protocol buffer code."""
+
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(
+    b'\n\x12\x63ot_envelope.proto\x12\ropentakserver"\xac\x01\n\x0b\x43oTEnvelope\x12\x0f\n\x07version\x18\x01 \x01(\r\x12\x12\n\nsender_uid\x18\x02 \x01(\t\x12\x0b\n\x03uid\x18\x03 \x01(\t\x12\x0c\n\x04type\x18\x04 \x01(\t\x12\x0b\n\x03how\x18\x05 \x01(\t\x12\x11\n\thas_point\x18\x06 \x01(\x08\x12\x10\n\x08latitude\x18\x07 \x01(\x01\x12\x11\n\tlongitude\x18\x08 \x01(\x01\x12\x0b\n\x03hae\x18\t \x01(\x01\x12\x0b\n\x03xml\x18\x0f \x01(\x0c\x62\x06proto3'
+)
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, "cot_envelope_pb2", globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+    DESCRIPTOR._options = None
+    _COTENVELOPE._serialized_start = 38
+    _COTENVELOPE._serialized_end = 210
+# @@protoc_insertion_point(module_scope)
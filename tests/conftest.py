@@ -1,7 +1,12 @@
+import importlib
+import pkgutil
+
 import pytest
 import sqlalchemy
 from flask_security import hash_password
+from flask_security.models import fsqla
 
+import opentakserver.models
 from opentakserver.app import create_app
 from opentakserver.extensions import db, logger
 
@@ -75,3 +80,16 @@ def client(app):
 @pytest.fixture
 def auth(app, client):
     return AuthActions(app, client)
+
+
+@pytest.fixture(scope="session")
+def metadata():
+    """Every model's tables, for tests that create them in a database of their own"""
+    # The foreign keys reach most of the other tables, including Flask-Security's
+    try:
+        fsqla.FsModels.set_db_info(db)
+    except sqlalchemy.exc.InvalidRequestError:
+        pass
+    for module in pkgutil.iter_modules(opentakserver.models.__path__):
+        importlib.import_module(f"opentakserver.models.{module.name}")
+    return db.metadata
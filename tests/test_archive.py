@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from opentakserver.archive import archive_expired, read_archive
+from opentakserver.partitions import delete_expired
+
+NOW = datetime(2026, 10, 17, 12)
+
+
+def test_archive_and_delete(metadata, tmp_path):
+    cot = metadata.tables["cot"]
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    with Session(engine) as session:
+        session.execute(
+            insert(cot),
+            [
+                {
+                    "id": i,
+                    "uid": f"eud-{i % 2}",
+                    "timestamp": NOW - timedelta(hours=12 * i),
+                    "start": NOW - timedelta(hours=12 * i),
+                    "stale": NOW,
+                    "xml": f'<event uid="eud-{i % 2}"/>',
+                }
+                for i in range(10)
+            ],
+        )
+        session.commit()
+
+        cutoff = NOW - timedelta(days=1)
+        max_id = archive_expired(session, cot, cutoff, str(tmp_path), 3, 3)
+        assert max_id == 9
+
+        # A row with an old timestamp that arrives after archiving has to survive the delete
+        session.execute(
+            insert(cot), [{"id": 10, "timestamp": cutoff, "start": NOW, "stale": NOW, "xml": ""}]
+        )
+        session.commit()
+        assert delete_expired(session, cot, cutoff, 3, max_id=max_id) == 8
+        assert sorted(session.execute(select(cot.c.id)).scalars()) == [0, 1, 10]
+
+    # One file per day
+    assert len(list((tmp_path / "cot").glob("date=*/*.ndjson.zst"))) == 4
+
+    rows = list(read_archive(str(tmp_path), cot))
+    assert sorted(row["id"] for row in rows) == list(range(2, 10))
+    assert rows[0]["start"] == rows[0]["timestamp"]
+
+    rows = read_archive(
+        str(tmp_path),
+        cot,
+        NOW - timedelta(days=3),
+        contains='"eud-1"',
+        match=lambda row: row["start"] >= NOW - timedelta(days=3),
+    )
+    assert sorted(row["id"] for row in rows) == [3, 5]
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from bench import samples
+from opentakserver import cot_envelope
+from opentakserver.cot_event import CoTEvent
+
+
+def test_round_trip():
+    event = CoTEvent.from_xml(samples.position("EUD-1", "ANDROID-1"))
+    envelope = cot_envelope.unpack(cot_envelope.pack(event, "ANDROID-1"))
+    assert envelope.version == cot_envelope.ENVELOPE_VERSION
+    assert envelope.sender_uid == "ANDROID-1"
+    assert (envelope.uid, envelope.type, envelope.how) == ("ANDROID-1", "a-f-G-U-C", "m-g")
+    assert envelope.has_point and envelope.latitude == pytest.approx(40.744213)
+    assert envelope.xml.decode() == event.xml
+
+
+def test_no_point():
+    event = CoTEvent.from_xml(b'<event uid="x" type="t-x-c-t"/>')
+    envelope = cot_envelope.unpack(cot_envelope.pack(event, None))
+    assert envelope.sender_uid == "" and not envelope.has_point
+
+
+def test_json():
+    event = CoTEvent.from_xml(samples.marker())
+    body = cot_envelope.pack(event, "ANDROID-1", "json")
+    assert json.loads(body) == {"uid": "ANDROID-1", "cot": event.xml}
+
+    envelope = cot_envelope.unpack(body)
+    assert envelope.sender_uid == "ANDROID-1" and envelope.xml.decode() == event.xml
+    assert (envelope.uid, envelope.type, envelope.how) == (event.uid, event.type, event.how)
+
+    envelope = cot_envelope.unpack(json.dumps({"uid": None, "cot": event.xml}).encode())
+    assert envelope.sender_uid == ""
+
+
+def test_json_event_tag():
+    xml = """<?xml version="1.0"?>\n<event version="2.0" type='a-f-G'\n uid="A &amp; B"><point/></event>"""
+    envelope = cot_envelope.unpack(json.dumps({"uid": "ANDROID-1", "cot": xml}).encode())
+    assert (envelope.uid, envelope.type, envelope.how) == ("A & B", "a-f-G", "")
+
+
+def test_newer_version():
+    body = cot_envelope.CoTEnvelope(version=cot_envelope.ENVELOPE_VERSION + 1).SerializeToString()
+    with pytest.raises(ValueError):
+        cot_envelope.unpack(body)
@@ -0,0 +1,47 @@
+import pytest
+
+from bench import samples
+from opentakserver.cot_event import CoTEvent, CoTParseError
+
+
+def test_position():
+    event = CoTEvent.from_xml(samples.position("EUD-1", "ANDROID-1"))
+    assert event.uid == "ANDROID-1"
+    assert event.type == "a-f-G-U-C"
+    assert event.how == "m-g"
+    assert event.point["lat"] == "40.744213"
+    assert event.track["course"] == "123.4"
+    assert event.contact["callsign"] == "EUD-1"
+    assert event.takv["platform"] == "ATAK-CIV"
+    assert event.find("__group").get("name") == "Cyan"
+    assert event.chat is None and event.dests == []
+    assert {"contact", "takv", "track", "__group"} <= event.tags
+
+
+def test_geochat():
+    event = CoTEvent.from_xml(samples.geochat().decode())
+    assert event.chat["chatroom"] == "All Chat Rooms"
+    assert event.dests == [{"callsign": "EUD-2"}]
+    assert event.find("chatgrp").get("uid0") == "ANDROID-0000000000000001"
+    assert "".join(event.find("remarks").itertext()) == "Moving to the rally point"
+
+
+def test_xml_is_kept_as_received():
+    message = samples.marker()
+    assert CoTEvent.from_xml(message).xml == message.decode()
+
+
+def test_invalid():
+    with pytest.raises(CoTParseError):
+        CoTEvent.from_xml(b"<event><detail></event>")
+    with pytest.raises(CoTParseError):
+        CoTEvent.from_xml(b"<auth><cot/></auth>")
+
+
+def test_entities_are_not_resolved():
+    message = (
+        b'<?xml version="1.0"?><!DOCTYPE event [<!ENTITY x SYSTEM "file:///etc/passwd">]>'
+        b'<event uid="1" type="b-t-f"><detail><remarks>&x;</remarks></detail></event>'
+    )
+    event = CoTEvent.from_xml(message)
+    assert "root:" not in "".join(event.find("remarks").itertext())
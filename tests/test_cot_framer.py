@@ -0,0 +1,41 @@
+import pytest
+
+from opentakserver.eud_handler.cot_framer import CoTFramer, FrameTooLarge
+
+EVENT = b'<event version="2.0" uid="ANDROID-1" type="a-f-G-U-C"><point lat="1" lon="2"/><detail/></event>'
+AUTH = b'<auth><cot username="user" password="pass" uid="ANDROID-1"/></auth>'
+
+
+def test_complete_messages():
+    framer = CoTFramer()
+    data = b'<?xml version="1.0" encoding="UTF-8"?>\n' + AUTH + EVENT + b"\n" + EVENT
+    assert list(framer.feed(data)) == [AUTH, EVENT, EVENT]
+    assert framer.buffer == b""
+
+
+def test_messages_split_across_reads():
+    framer = CoTFramer()
+    stream = (AUTH + EVENT) * 3
+    frames = []
+    for i in range(len(stream)):
+        frames += framer.feed(stream[i : i + 1])
+
+    assert frames == [AUTH, EVENT] * 3
+
+
+def test_split_utf8_character():
+    framer = CoTFramer()
+    event = '<event uid="1"><detail><remarks>Ä</remarks></detail></event>'.encode()
+    split = event.index(b"\xc3") + 1
+    assert list(framer.feed(event[:split])) == []
+    assert [f.decode() for f in framer.feed(event[split:])] == [event.decode()]
+
+
+def test_max_frame_size():
+    framer = CoTFramer(max_frame_size=len(EVENT))
+    assert list(framer.feed(EVENT[:-1])) == []
+    with pytest.raises(FrameTooLarge):
+        list(framer.feed(b"<remarks>" + b"x" * len(EVENT)))
+
+    # The oversized message is dropped and the next one still comes through
+    assert list(framer.feed(b"</remarks></detail></event>" + EVENT)) == [EVENT]
@@ -0,0 +1,41 @@
+from bench import samples
+from opentakserver.cot_event import CoTEvent
+from opentakserver.cot_parser.handlers import HandlerRegistry
+
+
+def handler_names(registry, message):
+    return [handler.name for handler in registry.match(CoTEvent.from_xml(message))]
+
+
+def test_match_by_type_and_tags():
+    registry = HandlerRegistry()
+    registry.register("geochat", print, tags=("__chat",))
+    registry.register(
+        "marker",
+        print,
+        types=("a-h-", "b-m-p"),
+        exclude_types=("b-m-p-s-p-loc",),
+        exclude_tags=("takv",),
+    )
+    registry.register("everything", print)
+
+    assert handler_names(registry, samples.position()) == ["everything"]
+    assert handler_names(registry, samples.geochat()) == ["geochat", "everything"]
+    assert handler_names(registry, samples.marker()) == ["marker", "everything"]
+
+
+def test_run_counts_calls_and_errors():
+    registry = HandlerRegistry()
+    calls = []
+    registry.register(
+        "ok", lambda event, uid, point_pk, cot_pk: calls.append((uid, point_pk, cot_pk))
+    )
+    registry.register("broken", lambda event, uid, point_pk, cot_pk: 1 / 0)
+
+    registry.run(CoTEvent.from_xml(samples.position()), "ANDROID-1", 2, 1)
+    registry.run(CoTEvent.from_xml(samples.position()), "ANDROID-1", 4, 3, exclude=("broken",))
+
+    assert calls == [("ANDROID-1", 2, 1), ("ANDROID-1", 4, 3)]
+    assert registry.stats()["ok"]["calls"] == 2
+    assert registry.stats()["broken"]["calls"] == 1
+    assert registry.stats()["broken"]["errors"] == 1
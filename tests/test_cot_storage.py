@@ -0,0 +1,91 @@
+import datetime
+
+from flask import Flask
+from sqlalchemy import func, insert, select
+
+from opentakserver.cot_storage import (
+    DETAIL_PREFIX,
+    ZSTD_PREFIX,
+    CoTXmlEncoder,
+    delete_unused_details,
+    train_dictionary,
+)
+from opentakserver.defaultconfig import DefaultConfig
+from opentakserver.extensions import db
+from opentakserver.models.CoT import CoT
+from opentakserver.models.CoTDetail import CoTDetail
+
+NOW = datetime.datetime(2026, 10, 17, 12)
+
+
+def make_xml(i: int, battery: int = 90) -> str:
+    return (
+        f'<event version="2.0" uid="eud-{i % 50}" type="a-f-G-U-C" how="m-g" time="2026-10-17T12:00:{i % 60:02}Z" '
+        f'start="2026-10-17T12:00:{i % 60:02}Z" stale="2026-10-17T12:05:00Z">'
+        f'<point lat="{40 + i / 1000}" lon="{-75 - i / 1000}" hae="{i % 100}" ce="9999999.0" le="9999999.0"/>'
+        f'<detail><contact callsign="EUD {i % 50}" endpoint="*:-1:stcp"/><__group name="Cyan" role="Team Member"/>'
+        f'<status battery="{battery}"/><takv device="Pixel" platform="ATAK-CIV" os="34" version="5.3.0"/>'
+        f'<track course="{i % 360}" speed="0.0"/></detail></event>'
+    )
+
+
+def test_encode_and_decode(metadata):
+    app = Flask(__name__)
+    app.config.from_object(DefaultConfig)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI="sqlite://",
+        OTS_COT_XML_STORAGE="zstd",
+        OTS_COT_XML_DEDUPE_DETAILS=True,
+    )
+    db.init_app(app)
+
+    with app.app_context():
+        metadata.create_all(db.engine)
+        samples = [make_xml(i) for i in range(500)]
+        db.session.execute(
+            insert(CoT),
+            [
+                {"id": i, "timestamp": NOW, "start": NOW, "stale": NOW, "xml": xml}
+                for i, xml in enumerate(samples)
+            ],
+        )
+        dictionary = train_dictionary(db.session, 500, 4096)
+        db.session.commit()
+        assert dictionary.id == 1
+
+        encoder = CoTXmlEncoder.for_app(app)
+        first = make_xml(1000)
+        repeat = make_xml(1000)
+        changed = make_xml(1000, battery=89)
+        stored = [
+            encoder.encode(db.session, "eud-0", xml, NOW - datetime.timedelta(days=1))
+            for xml in (first, repeat, changed)
+        ]
+        db.session.execute(
+            insert(CoT),
+            [
+                {"id": 1000 + i, "timestamp": NOW, "start": NOW, "stale": NOW, "xml": xml}
+                for i, xml in enumerate(stored)
+            ],
+        )
+        db.session.commit()
+
+        assert all(xml.startswith(ZSTD_PREFIX) for xml in stored)
+        assert sum(len(xml) for xml in stored) < len(first) * 3 / 2
+
+        # Only the repeated detail is replaced with a reference
+        assert db.session.execute(select(func.count()).select_from(CoTDetail)).scalar() == 1
+        encoder.compress = False
+        assert encoder.encode(db.session, "eud-0", changed, NOW).startswith(DETAIL_PREFIX)
+        db.session.rollback()
+        assert [
+            cot.xml
+            for cot in db.session.execute(
+                select(CoT).where(CoT.id >= 1000).order_by(CoT.id)
+            ).scalars()
+        ] == [first, repeat, changed]
+
+        # Plain XML from before the storage was changed still reads the same
+        assert db.session.execute(select(CoT.xml).where(CoT.id == 3)).scalar() == samples[3]
+
+        assert delete_unused_details(db.session, NOW) == 1
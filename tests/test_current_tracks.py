@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+
+from flask import Flask
+from meshtastic import mesh_pb2
+from sqlalchemy import create_engine, create_mock_engine, insert, select
+from sqlalchemy.dialects import mysql, postgresql
+from sqlalchemy.orm import Session
+
+from opentakserver.cot_event import CoTEvent
+from opentakserver.cot_parser.cot_parser import CoTController
+from opentakserver.defaultconfig import DefaultConfig
+from opentakserver.extensions import db, logger
+from opentakserver.models.CurrentTrack import CurrentTrack, upsert_current_tracks
+from opentakserver.models.EUD import EUD
+from opentakserver.proto import atak_pb2
+
+NOW = datetime(2026, 1, 1)
+
+
+def track(uid, latitude, seconds=0):
+    return {"uid": uid, "latitude": latitude, "timestamp": NOW + timedelta(seconds=seconds)}
+
+
+def test_upsert_keeps_newest_position():
+    engine = create_engine("sqlite://")
+    CurrentTrack.__table__.create(engine)
+
+    with Session(engine) as session:
+        upsert_current_tracks(session, [track("ANDROID-1", 1), track("ANDROID-1", 2, 10)])
+        upsert_current_tracks(session, [track("ANDROID-1", 3, 5), track("ANDROID-2", 4)])
+        session.commit()
+
+        table = CurrentTrack.__table__
+        tracks = dict(session.execute(select(table.c.uid, table.c.latitude)).all())
+        assert tracks == {"ANDROID-1": 2, "ANDROID-2": 4}
+
+
+def test_upsert_statement_per_dialect():
+    for dialect, expected in (
+        (postgresql, "ON CONFLICT (uid) DO UPDATE"),
+        (mysql, "ON DUPLICATE KEY"),
+    ):
+        statements = []
+
+        class FakeSession:
+            def get_bind(self):
+                return create_mock_engine(f"{dialect.dialect.name}://", None)
+
+            def execute(self, statement):
+                statements.append(str(statement.compile(dialect=dialect.dialect())))
+
+        upsert_current_tracks(FakeSession(), [track("ANDROID-1", 1)])
+        assert expected in statements[0]
+
+
+class FakeSocketIO:
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, event, data, namespace=None):
+        self.emitted.append((event, data))
+
+
+def test_point_without_history(metadata):
+    app = Flask(__name__)
+    app.config.from_object(DefaultConfig)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI="sqlite://",
+        OTS_COT_PARSER_NO_HISTORY_TYPES=["a-f-G"],
+        OTS_ENABLE_MESHTASTIC=True,
+    )
+    db.init_app(app)
+    with app.app_context():
+        metadata.create_all(db.engine)
+        db.session.execute(
+            insert(EUD), [{"uid": "ANDROID-1", "callsign": "EUD 1", "meshtastic_id": 1234}]
+        )
+        db.session.commit()
+
+    socketio = FakeSocketIO()
+    controller = CoTController(app.app_context(), logger, db, socketio)
+    published = []
+    controller.publish_to_meshtastic = published.append
+
+    event = CoTEvent.from_xml(
+        '<event version="2.0" uid="ANDROID-1" type="a-f-G-U-C" how="m-g" time="2026-01-01T00:00:00Z" '
+        'start="2026-01-01T00:00:00Z" stale="2026-01-01T00:05:00Z">'
+        '<point lat="40.5" lon="-75.5" hae="12.3" ce="9.9" le="3.1"/>'
+        '<detail><contact callsign="EUD 1"/><takv platform="ATAK-CIV"/><status battery="87"/>'
+        '<track course="45.6" speed="7.8"/></detail></event>'
+    )
+    assert controller.parse_point(event, "ANDROID-1", None, history=False) is None
+
+    # The point isn't saved, so it's never reloaded from the database with the attributes as floats
+    (name, point), *_ = socketio.emitted
+    assert name == "point"
+    for key in ("ce", "hae", "le", "course", "speed"):
+        assert isinstance(point[key], float), key
+    assert point["battery"] == 87
+
+    # Position and TAKPacket, NodeInfo is rate limited
+    assert len(published) == 2
+    position = mesh_pb2.Position()
+    position.ParseFromString(published[0].packet.decoded.payload)
+    assert position.altitude == 12
+    assert position.ground_track == 45
+    assert position.ground_speed == 7
+    tak_packet = atak_pb2.TAKPacket()
+    tak_packet.ParseFromString(published[1].packet.decoded.payload)
+    assert tak_packet.status.battery == 87
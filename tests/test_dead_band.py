@@ -0,0 +1,35 @@
+from bench import samples
+from opentakserver.cot_event import CoTEvent
+from opentakserver.eud_handler import dead_band
+from opentakserver.eud_handler.dead_band import DeadBandFilter
+
+
+def position(latitude="40.744213", course="123.4"):
+    xml = samples.position().decode().replace('lat="40.744213"', f'lat="{latitude}"')
+    return CoTEvent.from_xml(xml.replace('course="123.4"', f'course="{course}"'))
+
+
+def test_dead_band(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(dead_band.time, "monotonic", lambda: now[0])
+    dead_band_filter = DeadBandFilter(30, 5, 5, 10, 1)
+
+    assert not dead_band_filter.should_drop(position())
+    now[0] += 5
+    assert dead_band_filter.should_drop(position())
+    # About 3 meters north
+    assert dead_band_filter.should_drop(position(latitude="40.744240"))
+    # About 11 meters north
+    assert not dead_band_filter.should_drop(position(latitude="40.744313"))
+    assert not dead_band_filter.should_drop(position(latitude="40.744313", course="140"))
+    # Courses wrap around at 360
+    assert not dead_band_filter.should_drop(position(latitude="40.744313", course="355"))
+    assert dead_band_filter.should_drop(position(latitude="40.744313", course="2"))
+
+    now[0] += 30
+    assert not dead_band_filter.should_drop(position(latitude="40.744313", course="2"))
+
+    dead_band_filter.forget(position().uid)
+    assert not dead_band_filter.should_drop(position(latitude="40.744313", course="2"))
+    assert dead_band_filter.stats["dropped"] == 3
+    assert dead_band_filter.stats["heartbeats"] == 1
@@ -0,0 +1,115 @@
+import datetime
+from types import SimpleNamespace
+from xml.etree.ElementTree import fromstring
+
+from flask import Flask
+from sqlalchemy import select
+
+from opentakserver.defaultconfig import DefaultConfig
+from opentakserver.eud_handler.disconnects import Disconnect, DisconnectBatcher
+from opentakserver.eud_handler.local_router import LocalRouter
+from opentakserver.extensions import db, logger
+from opentakserver.models.EUD import EUD
+
+
+def disconnect(uid: str, time: datetime.datetime | None = None) -> Disconnect:
+    xml = f'<event type="t-x-d-d"><detail><link uid="{uid}"/></detail></event>'.encode()
+    return Disconnect(
+        uid=uid,
+        user_id=None,
+        xml=xml,
+        time=time or datetime.datetime.now(datetime.timezone.utc),
+        group_routing_keys=["__ANON__.OUT"],
+        has_queue=True,
+    )
+
+
+def test_disconnect_batch():
+    app = Flask(__name__)
+    app.config.from_object(DefaultConfig)
+    batcher = DisconnectBatcher(app, logger, 0)
+
+    for uid in ("alpha", "bravo", "charlie"):
+        batcher.connected_uid(uid)
+        batcher.add(disconnect(uid))
+    batcher.add(disconnect("alpha"))
+
+    # charlie reconnected before the batch was processed
+    batcher.connected_uid("charlie")
+
+    batch = batcher.take_batch()
+    assert [d.uid for d in batch] == ["alpha", "bravo"]
+    assert batcher.stats["skipped"] == 1
+    assert batcher.pending == []
+
+
+class FakeChannel:
+    is_open = True
+
+    def __init__(self):
+        self.published = []
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.published.append((exchange, routing_key, body))
+
+    def queue_unbind(self, queue, exchange, routing_key):
+        pass
+
+
+class Session:
+    def __init__(self, uid):
+        self.uid = uid
+        self.received = []
+
+    def deliver(self, envelope):
+        self.received.append(fromstring(envelope.xml))
+
+
+def test_one_cot_per_message(metadata):
+    app = Flask(__name__)
+    app.config.from_object(DefaultConfig)
+    app.config.update(SQLALCHEMY_DATABASE_URI="sqlite://")
+    db.init_app(app)
+    with app.app_context():
+        metadata.create_all(db.engine)
+
+    batcher = DisconnectBatcher(app, logger, 0)
+    batcher.rabbit_channel = FakeChannel()
+    batcher.process([disconnect("alpha"), disconnect("bravo")])
+
+    # Consumers of the groups exchange, like LocalRouter, parse each message as one CoT
+    router = LocalRouter(app, logger)
+    delta = Session("delta")
+    router.set_subscriptions(delta, {("groups", "__ANON__.OUT")})
+    for exchange, routing_key, body in batcher.rabbit_channel.published:
+        router.on_message(
+            None, SimpleNamespace(exchange=exchange, routing_key=routing_key), None, body
+        )
+
+    assert [event.find("detail/link").get("uid") for event in delta.received] == ["alpha", "bravo"]
+    assert batcher.stats["publishes"] == 2
+
+
+def test_each_eud_keeps_its_disconnect_time(metadata):
+    app = Flask(__name__)
+    app.config.from_object(DefaultConfig)
+    app.config.update(SQLALCHEMY_DATABASE_URI="sqlite://")
+    db.init_app(app)
+    times = {
+        "alpha": datetime.datetime(2026, 10, 17, 12),
+        "bravo": datetime.datetime(2026, 10, 17, 12, 0, 5),
+    }
+    with app.app_context():
+        metadata.create_all(db.engine)
+        db.session.add_all([EUD(uid=uid, last_status="Connected") for uid in times])
+        db.session.commit()
+
+        batcher = DisconnectBatcher(app, logger, 0)
+        batcher.rabbit_channel = FakeChannel()
+        batcher.process([disconnect(uid, time) for uid, time in times.items()])
+
+        euds = db.session.execute(select(EUD.uid, EUD.last_status, EUD.last_event_time)).all()
+        assert sorted(euds) == [
+            ("alpha", "Disconnected", times["alpha"]),
+            ("bravo", "Disconnected", times["bravo"]),
+        ]
@@ -0,0 +1,73 @@
+import time
+from types import SimpleNamespace
+
+from flask import Flask
+
+from bench import samples
+from opentakserver import cot_envelope
+from opentakserver.cot_event import CoTEvent
+from opentakserver.defaultconfig import DefaultConfig
+from opentakserver.eud_handler import firehose
+from opentakserver.eud_handler.firehose import FirehoseDemand
+from opentakserver.plugins.CoTFeed import CoTFeed, CoTSubscription
+
+
+def test_firehose_demand(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(firehose.time, "monotonic", lambda: now[0])
+    demand = FirehoseDemand(10)
+
+    assert demand.should_publish()
+    demand.on_return(None, SimpleNamespace(exchange="groups"), None, b"")
+    assert demand.should_publish()
+
+    # Nothing is bound to the firehose
+    demand.on_return(None, SimpleNamespace(exchange="firehose"), None, b"")
+    assert not demand.should_publish()
+
+    now[0] += 11
+    assert demand.should_publish()
+    assert demand.stats == {"published": 3, "skipped": 1, "returned": 1}
+
+
+def test_cot_feed(monkeypatch):
+    app = Flask(__name__)
+    app.config.from_object(DefaultConfig)
+    feed = CoTFeed(app)
+    # Not connected to RabbitMQ, on_message() is called directly
+    monkeypatch.setattr(CoTFeed, "run", lambda self: None)
+
+    received = []
+    feed.subscribe("alpha", lambda event, uid: received.append(("alpha", event, uid)))
+    feed.subscribe("bravo", lambda event, uid: received.append(("bravo", event, uid)))
+
+    event = CoTEvent.from_xml(samples.position())
+    feed.on_message(None, None, None, cot_envelope.pack(event, "ANDROID-1"))
+    feed.on_message(None, None, None, b"not a CoT")
+
+    for _ in range(100):
+        if len(received) == 2:
+            break
+        time.sleep(0.01)
+
+    assert sorted(name for name, event, uid in received) == ["alpha", "bravo"]
+    # Parsed once for both of them
+    assert received[0][1] is received[1][1]
+    assert received[0][2] == "ANDROID-1"
+    assert feed.stats == {"received": 2, "failed": 1}
+
+    feed.unsubscribe("alpha")
+    feed.unsubscribe("bravo")
+    assert feed.subscriptions == {}
+
+
+def test_cot_subscription_is_bounded():
+    blocked = []
+    subscription = CoTSubscription("slow", lambda event, uid: blocked.append(event), 2)
+    subscription.stop()
+    subscription.thread.join(1)
+
+    for i in range(3):
+        subscription.put(i, None)
+    assert subscription.stats["dropped"] == 1
+    assert blocked == []
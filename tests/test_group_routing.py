@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+import pika
+from flask import Flask
+
+from opentakserver.defaultconfig import DefaultConfig
+from opentakserver.eud_handler.client_controller import ClientController
+from opentakserver.extensions import logger
+from opentakserver.functions import GROUPS_CHANGED_MESSAGE_TYPE
+
+
+class Controller(ClientController):
+    def setup_socket(self):
+        pass
+
+    def connect_to_rabbitmq(self):
+        pass
+
+
+def test_group_routing_keys_are_cached():
+    app = Flask(__name__)
+    app.config.from_object(DefaultConfig)
+    controller = Controller("127.0.0.1", 8088, None, logger, app, False)
+
+    assert controller.get_group_routing_keys() == ["__ANON__.OUT"]
+
+    controller.group_routing_keys = ["Cyan.OUT"]
+    assert controller.get_group_routing_keys() == ["Cyan.OUT"]
+
+    controller.on_message(None, None, pika.BasicProperties(type=GROUPS_CHANGED_MESSAGE_TYPE), b"")
+    assert controller.group_routing_keys is None
+    assert controller.get_group_routing_keys() == ["__ANON__.OUT"]
+
+
+class FakeChannel:
+    is_open = True
+
+    def __init__(self):
+        self.calls = []
+
+    def add_on_close_callback(self, callback):
+        pass
+
+    def queue_declare(self, queue):
+        self.calls.append(("queue_declare", queue))
+
+    def queue_bind(self, exchange, routing_key, queue):
+        self.calls.append(("queue_bind", exchange, routing_key))
+
+    def basic_consume(self, queue, on_message_callback, auto_ack):
+        self.calls.append(("basic_consume", queue))
+
+
+def test_queues_bound_when_channel_opens_late():
+    app = Flask(__name__)
+    app.config.from_object(DefaultConfig)
+    controller = Controller("127.0.0.1", 8088, None, logger, app, False)
+    controller.rabbit_connection = SimpleNamespace(
+        ioloop=SimpleNamespace(add_callback_threadsafe=lambda callback: callback())
+    )
+
+    # The EUD's first CoT was parsed before its channel opened, so nothing could be bound then
+    controller.uid = "ANDROID-1"
+    controller.callsign = "EUD 1"
+    controller.out_group_routing_keys = ["Cyan.OUT"]
+
+    channel = FakeChannel()
+    controller.on_channel_open(channel)
+
+    assert ("queue_bind", "groups", "Cyan.OUT") in channel.calls
+    assert ("basic_consume", "ANDROID-1") in channel.calls
+    assert ("basic_consume", "EUD 1") in channel.calls
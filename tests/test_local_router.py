@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+from flask import Flask
+
+from bench import samples
+from opentakserver import cot_envelope
+from opentakserver.cot_event import CoTEvent
+from opentakserver.defaultconfig import DefaultConfig
+from opentakserver.eud_handler.local_router import LocalRouter
+from opentakserver.extensions import logger
+
+
+class Session:
+    def __init__(self, uid):
+        self.uid = uid
+        self.callsign = uid
+        self.received = []
+
+    def deliver(self, envelope):
+        if envelope.sender_uid != self.uid:
+            self.received.append(envelope.uid)
+
+
+def test_local_router():
+    app = Flask(__name__)
+    app.config.from_object(DefaultConfig)
+    router = LocalRouter(app, logger)
+
+    alpha, bravo, charlie = Session("alpha"), Session("bravo"), Session("charlie")
+    router.set_subscriptions(alpha, {("groups", "Cyan.OUT"), ("dms", "alpha")})
+    router.set_subscriptions(bravo, {("groups", "Cyan.OUT"), ("dms", "bravo")})
+    router.set_subscriptions(charlie, {("groups", "Red.OUT"), ("dms", "charlie")})
+    assert router.sessions_by_key[("groups", "Cyan.OUT")] == {alpha, bravo}
+
+    event = CoTEvent.from_xml(samples.position())
+    body = cot_envelope.pack(event, "alpha")
+    router.on_message(None, SimpleNamespace(exchange="groups", routing_key="Cyan.OUT"), None, body)
+    router.on_message(None, SimpleNamespace(exchange="dms", routing_key="charlie"), None, body)
+    assert alpha.received == []
+    assert bravo.received == [event.uid]
+    assert charlie.received == [event.uid]
+
+    router.set_subscriptions(bravo, {("dms", "bravo")})
+    router.unsubscribe(charlie)
+    assert router.sessions_by_key[("groups", "Cyan.OUT")] == {alpha}
+    assert ("groups", "Red.OUT") not in router.sessions_by_key
+    assert charlie not in router.keys_by_session
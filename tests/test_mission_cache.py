@@ -0,0 +1,32 @@
+from opentakserver.eud_handler import mission_cache
+from opentakserver.eud_handler.mission_cache import MissionCache, MissionInfo
+
+
+def test_mission_cache(monkeypatch):
+    now = [1000.0]
+    lookups = []
+    missions = {"sync": MissionInfo("sync", "guid-1")}
+
+    def lookup_mission(name):
+        lookups.append(name)
+        return missions.get(name)
+
+    monkeypatch.setattr(mission_cache.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(mission_cache, "lookup_mission", lookup_mission)
+    cache = MissionCache(60)
+
+    assert cache.find_mission("sync").guid == "guid-1"
+    assert cache.find_mission("sync").guid == "guid-1"
+    assert cache.find_mission("new") is None
+    assert cache.find_mission("new") is None
+    assert lookups == ["sync", "new"]
+
+    # Created, then the notification arrives
+    missions["new"] = MissionInfo("new", "guid-2")
+    cache.forget("new")
+    assert cache.find_mission("new").guid == "guid-2"
+
+    del missions["sync"]
+    now[0] += 61
+    assert cache.find_mission("sync") is None
+    assert lookups == ["sync", "new", "new", "sync"]
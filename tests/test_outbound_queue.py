@@ -0,0 +1,134 @@
+import socket
+from threading import Thread
+
+from flask import Flask
+
+from opentakserver import cot_envelope
+from opentakserver.cot_event import CoTEvent
+from opentakserver.defaultconfig import DefaultConfig
+from opentakserver.eud_handler import outbound_queue
+from opentakserver.eud_handler.client_controller import ClientController
+from opentakserver.eud_handler.outbound_queue import OutboundQueue
+from opentakserver.extensions import logger
+
+
+def drain(queue: OutboundQueue) -> list[bytes]:
+    messages = []
+    while (data := queue.pop()) is not None:
+        messages.append(data)
+    return messages
+
+
+def test_positions_are_coalesced():
+    queue = OutboundQueue(1000)
+    queue.put(b"position 1", "ANDROID-1", "a-f-G-U-C")
+    queue.put(b"chat", "GeoChat.1", "b-t-f")
+    queue.put(b"position 2", "ANDROID-1", "a-f-G-U-C")
+    queue.put(b"other position", "ANDROID-2", "a-f-G-U-C")
+
+    assert drain(queue) == [b"position 2", b"chat", b"other position"]
+    assert queue.get_stats()["coalesced"] == 1
+
+
+def test_drop_sa_keeps_chat():
+    queue = OutboundQueue(20, outbound_queue.DROP_SA)
+    queue.put(b"chat 1....", "GeoChat.1", "b-t-f")
+    queue.put(b"position..", "ANDROID-1", "a-f-G-U-C")
+    queue.put(b"chat 2....", "GeoChat.2", "b-t-f")
+    queue.put(b"position 2", "ANDROID-2", "a-f-G-U-C")
+
+    assert drain(queue) == [b"chat 1....", b"chat 2...."]
+    assert queue.get_stats()["dropped"] == 2
+
+
+def test_drop_oldest():
+    queue = OutboundQueue(20, outbound_queue.DROP_OLDEST)
+    for i in range(4):
+        queue.put(f"message {i}.".encode())
+
+    assert drain(queue) == [b"message 2.", b"message 3."]
+    assert queue.bytes == 0
+
+
+def test_disconnect(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(outbound_queue.time, "monotonic", lambda: now[0])
+    queue = OutboundQueue(20, outbound_queue.DISCONNECT, 30)
+
+    for i in range(3):
+        assert queue.put(f"message {i}.".encode())
+    now[0] += 29
+    assert queue.put(b"message 3.")
+    now[0] += 1
+    assert not queue.put(b"message 4.")
+
+    # Catching up resets the timer
+    drain(queue)
+    assert queue.put(b"message 5.")
+
+
+def test_pop_batch():
+    queue = OutboundQueue(1000)
+    for i in range(5):
+        queue.put(f"message {i}.".encode())
+    queue.put(b"x" * 50)
+
+    assert queue.pop_batch(30) == [b"message 0.", b"message 1.", b"message 2."]
+    assert queue.pop_batch(30) == [b"message 3.", b"message 4."]
+    # Bigger than max_bytes on its own
+    assert queue.pop_batch(30) == [b"x" * 50]
+    assert queue.pop_batch(30) == [] and queue.get_batch(30, timeout=0) == []
+    assert queue.get_stats()["batches"] == 3
+
+
+class Controller(ClientController):
+    def connect_to_rabbitmq(self):
+        pass
+
+
+def test_deliver_coalesces_positions():
+    app = Flask(__name__)
+    app.config.from_object(DefaultConfig)
+    server, client = socket.socketpair()
+    controller = Controller("127.0.0.1", 8088, server, logger, app, False)
+    controller.uid = "ANDROID-3"
+
+    envelope_format = app.config.get("OTS_RABBITMQ_ENVELOPE")
+    for xml, sender in (
+        (
+            '<event uid="ANDROID-1" type="a-f-G-U-C" how="m-g"><point lat="1" lon="1"/></event>',
+            "ANDROID-1",
+        ),
+        ('<event uid="GeoChat.1" type="b-t-f" how="h-g-i-g-o"/>', "ANDROID-2"),
+        (
+            '<event uid="ANDROID-1" type="a-f-G-U-C" how="m-g"><point lat="2" lon="2"/></event>',
+            "ANDROID-1",
+        ),
+    ):
+        body = cot_envelope.pack(CoTEvent.from_xml(xml), sender, envelope_format)
+        controller.deliver(cot_envelope.unpack(body))
+
+    messages = drain(controller.outbound)
+    assert len(messages) == 2 and b'lat="2"' in messages[0] and b"GeoChat.1" in messages[1]
+    assert controller.outbound.get_stats()["coalesced"] == 1
+    server.close()
+    client.close()
+
+
+def test_write_batch():
+    app = Flask(__name__)
+    app.config.from_object(DefaultConfig)
+    server, client = socket.socketpair()
+    controller = Controller("127.0.0.1", 8088, server, logger, app, False)
+
+    batch = [f"<event uid='{i}'/>".encode() * 100 for i in range(2000)]
+    received = bytearray()
+    reader = Thread(
+        target=lambda: [received.extend(d) for d in iter(lambda: client.recv(65536), b"")]
+    )
+    reader.start()
+
+    controller.write(batch)
+    server.shutdown(socket.SHUT_WR)
+    reader.join()
+    assert received == b"".join(batch)
@@ -0,0 +1,47 @@
+import json
+import os
+
+from opentakserver import process_stats
+from opentakserver.process_stats import read_stats, stats_folder, total_stats, write_stats
+
+
+def test_write_and_read_stats(tmp_path):
+    write_stats(str(tmp_path), "cot_parser", {"batches": 3})
+    stats = read_stats(str(tmp_path))
+    assert list(stats) == ["cot_parser"]
+    assert stats["cot_parser"][0]["batches"] == 3
+    assert stats["cot_parser"][0]["pid"] == os.getpid()
+
+
+def test_stale_stats_are_deleted(tmp_path):
+    os.makedirs(stats_folder(str(tmp_path)))
+    path = os.path.join(stats_folder(str(tmp_path)), "cot_parser-1.json")
+    with open(path, "w") as f:
+        json.dump({"pid": 1, "timestamp": 0, "batches": 3}, f)
+
+    assert read_stats(str(tmp_path)) == {}
+    assert not os.path.exists(path)
+
+
+def test_stats_removed_at_exit(tmp_path, monkeypatch):
+    registered = []
+    monkeypatch.setattr(process_stats, "_written", set())
+    monkeypatch.setattr(process_stats.atexit, "register", lambda *args: registered.append(args))
+
+    write_stats(str(tmp_path), "cot_parser", {"batches": 3})
+    write_stats(str(tmp_path), "cot_parser", {"batches": 4})
+    assert len(registered) == 1
+
+    function, path = registered[0]
+    function(path)
+    assert os.listdir(stats_folder(str(tmp_path))) == []
+
+
+def test_total_stats():
+    components = {
+        "eud_handler": [
+            {"pid": 1, "timestamp": 1.0, "ssl": True, "port": 8089, "queued": 2, "clients": []},
+            {"pid": 2, "timestamp": 1.0, "ssl": True, "port": 8089, "queued": 3, "clients": []},
+        ]
+    }
+    assert total_stats(components) == {"eud_handler": {"processes": 2, "queued": 5}}
@@ -0,0 +1,170 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, delete, insert, select
+
+from opentakserver.models.CoT import CoT
+from opentakserver.models.EUDStats import EUDStats
+from opentakserver.models.Marker import Marker
+from opentakserver.models.MissionChange import MissionChange
+from opentakserver.models.MissionUID import MissionUID
+from opentakserver.models.Point import Point
+
+# Set OTS_QUERY_PLAN_ROWS=1000000 or more to check the plans against a production sized table
+ROWS = int(os.getenv("OTS_QUERY_PLAN_ROWS", 20000))
+EUDS = 100
+NOW = datetime(2026, 1, 1)
+
+cot = CoT.__table__
+point = Point.__table__
+marker = Marker.__table__
+mission_change = MissionChange.__table__
+mission_uid = MissionUID.__table__
+eud_stats = EUDStats.__table__
+
+
+@pytest.fixture(scope="module")
+def engine(metadata):
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        for start in range(0, ROWS, 10000):
+            rows = range(start, min(start + 10000, ROWS))
+            connection.execute(
+                insert(cot),
+                [
+                    {
+                        "id": i,
+                        "uid": f"uid-{i % (ROWS // 10)}",
+                        "timestamp": NOW - timedelta(seconds=ROWS - i),
+                        "start": NOW - timedelta(seconds=ROWS - i),
+                        # Most CoTs are long stale
+                        "stale": NOW - timedelta(seconds=ROWS - i) + timedelta(minutes=2),
+                        # And only a few belong to a mission
+                        "mission_name": f"mission-{i % 10}" if i % 100 == 0 else None,
+                        "xml": "<event/>",
+                    }
+                    for i in rows
+                ],
+            )
+            connection.execute(
+                insert(point),
+                [
+                    {
+                        "id": i,
+                        "uid": f"uid-{i}",
+                        "cot_id": i,
+                        "device_uid": f"ANDROID-{i % EUDS}" if i % 2 else None,
+                        "timestamp": NOW - timedelta(seconds=ROWS - i),
+                    }
+                    for i in rows
+                ],
+            )
+            connection.execute(
+                insert(marker),
+                [{"id": i, "uid": f"uid-{i}", "cot_id": i, "point_id": i} for i in rows[::4]],
+            )
+            connection.execute(
+                insert(eud_stats),
+                [{"id": i, "eud_uid": f"ANDROID-{i % EUDS}"} for i in rows[::4]],
+            )
+        connection.execute(
+            insert(mission_change),
+            [
+                {
+                    "id": i,
+                    "isFederatedChange": False,
+                    "change_type": "ADD_CONTENT",
+                    "mission_name": f"mission-{i % 10}",
+                    "timestamp": NOW,
+                    "creator_uid": "ANDROID-1",
+                    "server_time": NOW,
+                }
+                for i in range(ROWS // 10)
+            ],
+        )
+        connection.execute(
+            insert(mission_uid),
+            [{"uid": f"uid-{i}", "mission_name": f"mission-{i % 10}"} for i in range(ROWS // 10)],
+        )
+        connection.exec_driver_sql("ANALYZE")
+
+    return engine
+
+
+def query_plan(engine, statement) -> str:
+    sql = statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()
+    return "\n".join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize(
+    "name,statement,indexes",
+    [
+        (
+            "cot_marti_api.get_cot",
+            lambda: select(cot).where(cot.c.uid == "uid-5"),
+            ["ix_cot_uid_start"],
+        ),
+        (
+            "cot_marti_api.get_all_cot",
+            lambda: select(cot).where(cot.c.uid == "uid-5", cot.c.start >= NOW),
+            ["ix_cot_uid_start"],
+        ),
+        (
+            "marti_api.ExportMissionKML",
+            lambda: select(point).where(
+                point.c.device_uid == "ANDROID-1",
+                point.c.timestamp >= NOW - timedelta(hours=1),
+                point.c.timestamp <= NOW,
+            ),
+            ["ix_points_device_uid_timestamp"],
+        ),
+        (
+            "api.get_map_state",
+            lambda: select(marker).join(cot, marker.c.cot_id == cot.c.id).where(cot.c.stale >= NOW),
+            ["ix_cot_stale", "ix_markers_cot_id"],
+        ),
+        (
+            "mission_marti_api.get_mission_changes",
+            lambda: select(mission_change).where(mission_change.c.mission_name == "mission-1"),
+            ["ix_mission_changes_mission_name_timestamp"],
+        ),
+        (
+            "mission_marti_api.get_mission_cots",
+            lambda: select(cot).where(cot.c.mission_name == "mission-1"),
+            ["ix_cot_mission_name"],
+        ),
+        (
+            "mission_marti_api.get_mission_uids",
+            lambda: select(mission_uid).where(mission_uid.c.mission_name == "mission-1"),
+            ["ix_mission_uids_mission_name"],
+        ),
+        (
+            "eud_stats_api.get_eud_stats",
+            lambda: select(eud_stats)
+            .where(eud_stats.c.eud_uid == "ANDROID-1")
+            .order_by(eud_stats.c.id.desc())
+            .limit(50),
+            ["ix_eud_stats_eud_uid_id"],
+        ),
+        (
+            "scheduled_jobs.delete_old_data",
+            lambda: delete(point).where(point.c.timestamp <= NOW - timedelta(hours=1)),
+            ["ix_points_timestamp"],
+        ),
+        (
+            "scheduled_jobs.delete_old_data",
+            lambda: delete(cot).where(cot.c.timestamp <= NOW - timedelta(hours=1)),
+            ["ix_cot_timestamp"],
+        ),
+    ],
+)
+def test_query_uses_index(engine, name, statement, indexes):
+    plan = query_plan(engine, statement())
+    for index in indexes:
+        assert f"INDEX {index} " in plan, f"{name}: {plan}"
+    assert "SCAN" not in plan and "TEMP B-TREE" not in plan, f"{name}: {plan}"
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+from opentakserver.eud_handler.rabbitmq_pool import PooledConnection
+from opentakserver.extensions import logger
+
+
+class FakeChannel:
+    is_open = True
+    consumer_tags = []
+
+    def __init__(self):
+        self.calls = []
+
+    def queue_declare(self, queue):
+        self.calls.append(("queue_declare", queue))
+
+    def queue_bind(self, exchange, routing_key, queue):
+        self.calls.append(("queue_bind", routing_key))
+
+    def basic_consume(self, queue, on_message_callback, auto_ack, consumer_tag):
+        self.calls.append(("basic_consume", queue))
+
+    def basic_publish(self, exchange, routing_key, body, properties, mandatory):
+        self.calls.append(("basic_publish", body))
+
+
+def test_only_publishes_are_dropped():
+    pool = SimpleNamespace(
+        MAX_PENDING_PUBLISHES=2,
+        logger=logger,
+        loop=SimpleNamespace(call_soon_threadsafe=lambda callback: None),
+        published=0,
+        batches=0,
+    )
+    connection = PooledConnection(pool, "0")
+
+    # The channel is still opening
+    for body in (b"1", b"2", b"3"):
+        connection.publish("groups", "__ANON__", body)
+    connection.schedule("queue_declare", queue="uid")
+    connection.schedule("queue_bind", exchange="groups", routing_key="__ANON__", queue="uid")
+    connection.consume("uid", lambda *args: None, False)
+
+    connection.channel = FakeChannel()
+    connection.flush()
+    assert connection.channel.calls == [
+        ("basic_publish", b"1"),
+        ("basic_publish", b"2"),
+        ("queue_declare", "uid"),
+        ("queue_bind", "__ANON__"),
+        ("basic_consume", "uid"),
+    ]
+    assert pool.published == 2
+
+    # There's room again once the pending publishes are sent
+    connection.publish("groups", "__ANON__", b"4")
+    connection.flush()
+    assert connection.channel.calls[-1] == ("basic_publish", b"4")
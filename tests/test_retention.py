@@ -0,0 +1,84 @@
+import datetime
+from xml.etree.ElementTree import fromstring
+
+from flask import Flask
+from sqlalchemy import insert, select
+
+from opentakserver import cot_envelope
+from opentakserver.blueprints.scheduled_jobs import JobProgress, delete_expired_objects
+from opentakserver.defaultconfig import DefaultConfig
+from opentakserver.extensions import db
+from opentakserver.models.CoT import CoT
+from opentakserver.models.Marker import Marker
+
+NOW = datetime.datetime(2026, 10, 17, 12)
+
+
+class FakeChannel:
+    def __init__(self):
+        self.published = []
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.published.append((exchange, routing_key, body))
+
+
+def test_delete_expired_markers(metadata):
+    app = Flask(__name__)
+    app.config.from_object(DefaultConfig)
+    app.config.update(SQLALCHEMY_DATABASE_URI="sqlite://", OTS_DELETE_OLD_DATA_BATCH_SIZE=2)
+    db.init_app(app)
+
+    with app.app_context():
+        metadata.create_all(db.engine)
+        db.session.execute(
+            insert(CoT),
+            [
+                {"id": i, "type": "a-u-G", "timestamp": NOW, "start": NOW, "stale": NOW, "xml": ""}
+                for i in range(5)
+            ],
+        )
+        db.session.execute(
+            insert(Marker),
+            [
+                {
+                    "id": i,
+                    "uid": f"marker-{i}",
+                    "point_id": i,
+                    "cot_id": i,
+                    "timestamp": NOW - datetime.timedelta(days=i),
+                }
+                for i in range(5)
+            ],
+        )
+        db.session.commit()
+
+        channel = FakeChannel()
+        progress = JobProgress()
+        progress.start("delete_old_data")
+        delete_expired_objects(
+            Marker,
+            Marker.timestamp,
+            NOW - datetime.timedelta(days=2),
+            channel,
+            ["__ANON__", "Team"],
+            progress,
+        )
+
+        assert db.session.execute(select(Marker.uid)).scalars().all() == ["marker-0", "marker-1"]
+        assert progress.get("delete_old_data")["counts"] == {"markers": 3}
+
+        # One CoT per message, for each group and the firehose
+        groups = [body for exchange, _, body in channel.published if exchange == "groups"]
+        firehose = [body for exchange, _, body in channel.published if exchange == "firehose"]
+        assert len(groups) == 6
+        assert len(firehose) == 3
+        uids = [fromstring(cot_envelope.unpack(body).xml).get("uid") for body in groups]
+        assert sorted(uids) == [
+            "marker-2",
+            "marker-2",
+            "marker-3",
+            "marker-3",
+            "marker-4",
+            "marker-4",
+        ]
+        assert cot_envelope.unpack(firehose[2]).xml.count(b"<event") == 1
@@ -0,0 +1,20 @@
+from opentakserver.eud_handler import session_cache
+from opentakserver.eud_handler.session_cache import SessionBootstrap, SessionCache
+
+
+def test_session_cache(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(session_cache.time, "monotonic", lambda: now[0])
+    cache = SessionCache(60)
+
+    bootstrap = SessionBootstrap("uid-1", "user", ("EUD-1",), ["Cyan.OUT"], {"uid": "uid-1"})
+    cache.put(bootstrap)
+    assert cache.get("uid-1", "user") is bootstrap
+    assert cache.get("uid-1", "other user") is None
+
+    now[0] += 61
+    assert cache.get("uid-1", "user") is None
+
+    cache.put(SessionBootstrap("uid-1", "user", ("EUD-1",), ["Cyan.OUT"], {"uid": "uid-1"}))
+    cache.forget("uid-1")
+    assert cache.get("uid-1", "user") is None
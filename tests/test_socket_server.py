@@ -0,0 +1,22 @@
+import ssl
+
+import pytest
+from flask import Flask
+
+from opentakserver.defaultconfig import DefaultConfig
+from opentakserver.eud_handler.AsyncSocketServer import AsyncSocketServer
+from opentakserver.eud_handler.SocketServer import SocketServer
+from opentakserver.extensions import logger
+
+
+@pytest.mark.parametrize("server_class", [SocketServer, AsyncSocketServer])
+def test_ssl_context_is_used(server_class):
+    app = Flask(__name__)
+    app.config.from_object(DefaultConfig)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+
+    # The arguments eud_handler.run_server() passes
+    server = server_class(
+        logger, app.app_context(), app.config.get("OTS_SSL_STREAMING_PORT"), True, context
+    )
+    assert server.get_ssl_context() is context